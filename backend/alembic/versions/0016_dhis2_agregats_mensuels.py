@@ -0,0 +1,35 @@
+"""add dhis2_agregats_mensuels table
+
+Revision ID: 0016_dhis2_agregats
+Revises: 0015_phase1_to_6_tables
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0016_dhis2_agregats"
+down_revision = "0015_phase1_to_6_tables"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "dhis2_agregats_mensuels",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("periode", sa.String(6), index=True, nullable=False),
+        sa.Column("org_unit", sa.String(64), index=True, nullable=False),
+        sa.Column("indicateur", sa.String(64), nullable=False),
+        sa.Column("valeur", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("computed_at", sa.DateTime(timezone=True), nullable=False),
+        sa.UniqueConstraint("periode", "org_unit", "indicateur", name="uq_dhis2_agregat"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("dhis2_agregats_mensuels")
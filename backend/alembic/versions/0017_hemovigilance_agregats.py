@@ -0,0 +1,118 @@
+"""add hemovigilance_agregats table
+
+Revision ID: 0017_hemovigilance_agregats
+Revises: 0016_dhis2_agregats
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session
+
+from app.core.dates import sql_month_key
+
+revision = "0017_hemovigilance_agregats"
+down_revision = "0016_dhis2_agregats"
+branch_labels = None
+depends_on = None
+
+
+agregats = sa.table(
+    "hemovigilance_agregats",
+    sa.column("id"),
+    sa.column("mois"),
+    sa.column("dimension"),
+    sa.column("cle"),
+    sa.column("total"),
+)
+actes = sa.table("actes_transfusionnels", sa.column("date_transfusion"), sa.column("hopital_id"))
+rappels = sa.table(
+    "rappels",
+    sa.column("created_at"),
+    sa.column("statut"),
+    sa.column("type_cible"),
+    sa.column("valeur_cible"),
+)
+eir = sa.table("eir", sa.column("date_declaration"), sa.column("created_at"), sa.column("gravite"))
+
+
+def _backfill(conn) -> None:
+    """Compteurs de l'historique, une instruction INSERT ... SELECT par dimension.
+
+    Mêmes clés que ``app.core.hemovigilance`` : mois ``YYYYMM``, clé vide pour
+    NULL, UUID au format texte canonique.
+    """
+    db = Session(bind=conn)
+    postgres = conn.dialect.name == "postgresql"
+    new_id = (
+        sa.func.gen_random_uuid()
+        if postgres
+        else sa.func.lower(sa.func.hex(sa.func.randomblob(16)))
+    )
+
+    def uuid_text(column):
+        if postgres:
+            return sa.cast(column, sa.String)
+        # SQLite : 32 caractères hexadécimaux, remis au format 8-4-4-4-12
+        parts = [
+            sa.func.substr(column, start, length)
+            for start, length in ((1, 8), (9, 4), (13, 4), (17, 4), (21, 12))
+        ]
+        text = parts[0]
+        for part in parts[1:]:
+            text = text + "-" + part
+        return text
+
+    date_eir = sa.func.coalesce(eir.c.date_declaration, eir.c.created_at)
+    sources = [
+        (
+            "transfusions_hopital",
+            actes,
+            actes.c.date_transfusion,
+            uuid_text(actes.c.hopital_id),
+            None,
+        ),
+        ("rappels_statut", rappels, rappels.c.created_at, rappels.c.statut, None),
+        (
+            "rappels_lot",
+            rappels,
+            rappels.c.created_at,
+            rappels.c.valeur_cible,
+            rappels.c.type_cible == "LOT",
+        ),
+        ("eir_gravite", eir, date_eir, eir.c.gravite, None),
+    ]
+    for dimension, source, date_col, cle_col, condition in sources:
+        mois = sql_month_key(db, date_col)
+        cle = sa.func.coalesce(cle_col, "")
+        rows = sa.select(new_id, mois, sa.literal(dimension), cle, sa.func.count()).select_from(
+            source
+        )
+        if condition is not None:
+            rows = rows.where(condition)
+        rows = rows.group_by(mois, cle)
+        conn.execute(
+            agregats.insert().from_select(["id", "mois", "dimension", "cle", "total"], rows)
+        )
+
+
+def upgrade() -> None:
+    op.create_table(
+        "hemovigilance_agregats",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("mois", sa.String(6), index=True, nullable=False),
+        sa.Column("dimension", sa.String(32), index=True, nullable=False),
+        sa.Column("cle", sa.String(64), nullable=False),
+        sa.Column("total", sa.Integer, nullable=False, server_default="0"),
+        sa.UniqueConstraint("mois", "dimension", "cle", name="uq_hemovigilance_agregat"),
+    )
+    # Reprise de l'historique : sans elle le rapport aux autorités part de zéro
+    _backfill(op.get_bind())
+
+
+def downgrade() -> None:
+    op.drop_table("hemovigilance_agregats")
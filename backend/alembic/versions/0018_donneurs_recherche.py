@@ -0,0 +1,98 @@
+"""add donneurs search keys and indexes
+
+Revision ID: 0018_donneurs_recherche
+Revises: 0017_hemovigilance_agregats
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.core.text import normalize_phone, normalize_text
+
+revision = "0018_donneurs_recherche"
+down_revision = "0017_hemovigilance_agregats"
+branch_labels = None
+depends_on = None
+
+_BATCH = 10_000
+
+donneurs = sa.table(
+    "donneurs",
+    sa.column("id"),
+    sa.column("nom", sa.String),
+    sa.column("prenom", sa.String),
+    sa.column("telephone", sa.String),
+    sa.column("nom_normalise", sa.String),
+    sa.column("telephone_normalise", sa.String),
+)
+
+
+def _backfill(conn) -> None:
+    last_id = None
+    while True:
+        stmt = sa.select(donneurs.c.id, donneurs.c.nom, donneurs.c.prenom, donneurs.c.telephone)
+        if last_id is not None:
+            stmt = stmt.where(donneurs.c.id > last_id)
+        rows = conn.execute(stmt.order_by(donneurs.c.id).limit(_BATCH)).all()
+        if not rows:
+            return
+        conn.execute(
+            donneurs.update()
+            .where(donneurs.c.id == sa.bindparam("b_id"))
+            .values(
+                nom_normalise=sa.bindparam("b_nom"),
+                telephone_normalise=sa.bindparam("b_tel"),
+            ),
+            [
+                {
+                    "b_id": row.id,
+                    "b_nom": normalize_text(row.nom, row.prenom),
+                    "b_tel": normalize_phone(row.telephone) or None,
+                }
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    op.add_column("donneurs", sa.Column("nom_normalise", sa.String(255), nullable=True))
+    op.add_column("donneurs", sa.Column("telephone_normalise", sa.String(32), nullable=True))
+    _backfill(conn)
+
+    if conn.dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            "ix_donneurs_nom_normalise_trgm",
+            "donneurs",
+            ["nom_normalise"],
+            postgresql_using="gin",
+            postgresql_ops={"nom_normalise": "gin_trgm_ops"},
+        )
+    else:
+        op.create_index("ix_donneurs_nom_normalise_trgm", "donneurs", ["nom_normalise"])
+    op.create_index(
+        "ix_donneurs_telephone_normalise",
+        "donneurs",
+        ["telephone_normalise"],
+        postgresql_ops={"telephone_normalise": "varchar_pattern_ops"},
+    )
+    op.create_index(
+        "ix_cartes_donneur_numero_carte_prefix",
+        "cartes_donneur",
+        ["numero_carte"],
+        postgresql_ops={"numero_carte": "varchar_pattern_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_cartes_donneur_numero_carte_prefix", table_name="cartes_donneur")
+    op.drop_index("ix_donneurs_telephone_normalise", table_name="donneurs")
+    op.drop_index("ix_donneurs_nom_normalise_trgm", table_name="donneurs")
+    op.drop_column("donneurs", "telephone_normalise")
+    op.drop_column("donneurs", "nom_normalise")
@@ -0,0 +1,32 @@
+"""add donneurs.eligible_le
+
+Revision ID: 0019_donneurs_eligible_le
+Revises: 0018_donneurs_recherche
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.orm import Session
+
+from app.core.eligibility import recompute
+
+revision = "0019_donneurs_eligible_le"
+down_revision = "0018_donneurs_recherche"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("donneurs", sa.Column("eligible_le", sa.Date, nullable=True))
+    op.create_index("ix_donneurs_eligible_le", "donneurs", ["eligible_le"])
+    # Calcul initial en une instruction UPDATE (voir app.core.eligibility)
+    recompute(Session(bind=op.get_bind()))
+
+
+def downgrade() -> None:
+    op.drop_index("ix_donneurs_eligible_le", table_name="donneurs")
+    op.drop_column("donneurs", "eligible_le")
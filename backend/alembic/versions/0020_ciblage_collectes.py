@@ -0,0 +1,33 @@
+"""add donor targeting index and notifications.reference_id
+
+Revision ID: 0020_ciblage_collectes
+Revises: 0019_donneurs_eligible_le
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0020_ciblage_collectes"
+down_revision = "0019_donneurs_eligible_le"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_donneurs_ciblage", "donneurs", ["region", "groupe_sanguin", "eligible_le"])
+    op.add_column(
+        "notifications",
+        sa.Column("reference_id", postgresql.UUID(as_uuid=True), nullable=True),
+    )
+    op.create_index("ix_notifications_reference_id", "notifications", ["reference_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notifications_reference_id", table_name="notifications")
+    op.drop_column("notifications", "reference_id")
+    op.drop_index("ix_donneurs_ciblage", table_name="donneurs")
@@ -0,0 +1,30 @@
+"""add notifications.prochain_essai for batched retries
+
+Revision ID: 0021_notifications_relance
+Revises: 0020_ciblage_collectes
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0021_notifications_relance"
+down_revision = "0020_ciblage_collectes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "notifications",
+        sa.Column("prochain_essai", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_notifications_relance", "notifications", ["statut", "prochain_essai"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notifications_relance", table_name="notifications")
+    op.drop_column("notifications", "prochain_essai")
@@ -0,0 +1,87 @@
+"""add collection-drive slots with maintained booking counters
+
+Revision ID: 0022_creneaux_collecte
+Revises: 0021_notifications_relance
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0022_creneaux_collecte"
+down_revision = "0021_notifications_relance"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "creneaux_collecte",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "campagne_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("campagnes_collecte.id"),
+            nullable=False,
+        ),
+        sa.Column(
+            "site_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("sites.id"), nullable=True
+        ),
+        sa.Column("debut", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("fin", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("capacite", sa.Integer(), nullable=False),
+        sa.Column("reserves", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False
+        ),
+        sa.UniqueConstraint("campagne_id", "debut", name="uq_creneaux_collecte_debut"),
+        sa.CheckConstraint("reserves >= 0 AND reserves <= capacite", name="ck_creneaux_capacite"),
+    )
+    op.create_index("ix_creneaux_collecte_site_id", "creneaux_collecte", ["site_id"])
+    op.create_index(
+        "ix_creneaux_collecte_disponibles",
+        "creneaux_collecte",
+        ["campagne_id", "debut", "reserves", "capacite"],
+    )
+
+    op.add_column(
+        "inscriptions_collecte",
+        sa.Column(
+            "creneau_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("creneaux_collecte.id"),
+            nullable=True,
+        ),
+    )
+    op.create_index("ix_inscriptions_collecte_creneau_id", "inscriptions_collecte", ["creneau_id"])
+    # Doublons existants : on garde l'inscription la plus récente de chaque donneur
+    op.execute(
+        """
+        UPDATE inscriptions_collecte AS i SET statut = 'ANNULE'
+        WHERE i.donneur_id IS NOT NULL AND EXISTS (
+            SELECT 1 FROM inscriptions_collecte AS j
+            WHERE j.campagne_id = i.campagne_id AND j.donneur_id = i.donneur_id
+              AND (j.created_at, j.id) > (i.created_at, i.id)
+        )
+        """
+    )
+    op.create_index(
+        "uq_inscriptions_collecte_donneur",
+        "inscriptions_collecte",
+        ["campagne_id", "donneur_id"],
+        unique=True,
+        postgresql_where=sa.text("donneur_id IS NOT NULL AND statut <> 'ANNULE'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_inscriptions_collecte_donneur", table_name="inscriptions_collecte")
+    op.drop_index("ix_inscriptions_collecte_creneau_id", table_name="inscriptions_collecte")
+    op.drop_column("inscriptions_collecte", "creneau_id")
+    op.drop_index("ix_creneaux_collecte_disponibles", table_name="creneaux_collecte")
+    op.drop_index("ix_creneaux_collecte_site_id", table_name="creneaux_collecte")
+    op.drop_table("creneaux_collecte")
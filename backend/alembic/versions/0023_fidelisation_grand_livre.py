@@ -0,0 +1,49 @@
+"""add loyalty leaderboard indexes and one ledger credit per donation
+
+Revision ID: 0023_fidelisation_grand_livre
+Revises: 0022_creneaux_collecte
+Create Date: 2026-10-19
+
+Les soldes en cache se resynchronisent avec le grand livre par la tâche
+``app.tasks.maintenance.recompute_loyalty``.
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0023_fidelisation_grand_livre"
+down_revision = "0022_creneaux_collecte"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_cartes_donneur_classement", "cartes_donneur", ["points", "id"])
+    op.create_index("ix_cartes_donneur_niveau_points", "cartes_donneur", ["niveau", "points"])
+    # Doublons de crédit d'un même don : conservés au grand livre sous un autre type
+    op.execute(
+        """
+        UPDATE points_historique AS p SET type_operation = 'DON_DOUBLON'
+        WHERE p.type_operation = 'DON' AND p.reference_id IS NOT NULL AND EXISTS (
+            SELECT 1 FROM points_historique AS q
+            WHERE q.type_operation = 'DON' AND q.carte_id = p.carte_id
+              AND q.reference_id = p.reference_id
+              AND (q.created_at, q.id) < (p.created_at, p.id)
+        )
+        """
+    )
+    op.create_index(
+        "uq_points_historique_don",
+        "points_historique",
+        ["carte_id", "reference_id"],
+        unique=True,
+        postgresql_where=sa.text("type_operation = 'DON'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_points_historique_don", table_name="points_historique")
+    op.drop_index("ix_cartes_donneur_niveau_points", table_name="cartes_donneur")
+    op.drop_index("ix_cartes_donneur_classement", table_name="cartes_donneur")
@@ -0,0 +1,50 @@
+"""add donor duplicate candidates
+
+Revision ID: 0024_donneurs_doublons
+Revises: 0023_fidelisation_grand_livre
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0024_donneurs_doublons"
+down_revision = "0023_fidelisation_grand_livre"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "donneurs_doublons",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("donneur_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("doublon_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("motifs", postgresql.JSONB(), nullable=False),
+        sa.Column("statut", sa.String(length=16), nullable=False, server_default="A_EXAMINER"),
+        sa.Column(
+            "created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False
+        ),
+        sa.Column("decided_at", sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint("donneur_id", "doublon_id", name="uq_donneurs_doublons_paire"),
+    )
+    op.create_index("ix_donneurs_doublons_donneur_id", "donneurs_doublons", ["donneur_id"])
+    op.create_index("ix_donneurs_doublons_doublon_id", "donneurs_doublons", ["doublon_id"])
+    op.create_index("ix_donneurs_doublons_revue", "donneurs_doublons", ["statut", "score"])
+    # Blocs de la détection : mêmes nom complet, téléphone, date de naissance
+    op.create_index("ix_donneurs_nom_normalise", "donneurs", ["nom_normalise"])
+    op.create_index("ix_donneurs_naissance", "donneurs", ["date_naissance", "sexe"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_donneurs_naissance", table_name="donneurs")
+    op.drop_index("ix_donneurs_nom_normalise", table_name="donneurs")
+    op.drop_index("ix_donneurs_doublons_revue", table_name="donneurs_doublons")
+    op.drop_index("ix_donneurs_doublons_doublon_id", table_name="donneurs_doublons")
+    op.drop_index("ix_donneurs_doublons_donneur_id", table_name="donneurs_doublons")
+    op.drop_table("donneurs_doublons")
@@ -0,0 +1,45 @@
+"""add CNI hashes of merged donor records
+
+Revision ID: 0025_donneurs_cni_alias
+Revises: 0024_donneurs_doublons
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0025_donneurs_cni_alias"
+down_revision = "0024_donneurs_doublons"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "donneurs_cni_alias",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "donneur_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("donneurs.id"),
+            nullable=False,
+        ),
+        sa.Column("cni_hash", sa.String(length=128), nullable=False),
+        sa.Column(
+            "created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False
+        ),
+    )
+    op.create_index("ix_donneurs_cni_alias_donneur_id", "donneurs_cni_alias", ["donneur_id"])
+    op.create_index(
+        "ix_donneurs_cni_alias_cni_hash", "donneurs_cni_alias", ["cni_hash"], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_donneurs_cni_alias_cni_hash", table_name="donneurs_cni_alias")
+    op.drop_index("ix_donneurs_cni_alias_donneur_id", table_name="donneurs_cni_alias")
+    op.drop_table("donneurs_cni_alias")
@@ -1,8 +1,11 @@
+import threading
+import time
 import uuid
+from collections import OrderedDict
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, APIKeyHeader
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from app.core.config import settings
 from app.core.tokens import verify_token
@@ -12,6 +15,59 @@ from app.db.session import get_db
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
+# Comptes authentifiés récemment : évite un SELECT par requête protégée.
+# Les routes de users.py et admin_auth.py invalident l'entrée ; entre workers,
+# la fraîcheur est bornée par auth_user_cache_ttl_seconds.
+_CACHED_USER_FIELDS = ("id", "email", "is_active", "role", "mfa_enabled")
+_user_cache: OrderedDict[uuid.UUID, tuple[float, UserAccount]] = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+
+def invalidate_user(user_id: uuid.UUID) -> None:
+    """Oublie le compte en cache (désactivation, modification, mot de passe)."""
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+
+def clear_user_cache() -> None:
+    with _user_cache_lock:
+        _user_cache.clear()
+
+
+def _load_user(db: Session, user_id: uuid.UUID) -> UserAccount | None:
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        if entry is not None and entry[0] < time.monotonic():
+            del _user_cache[user_id]
+            entry = None
+    if entry is not None:
+        # Rattaché à la session de la requête sans requête SQL ; les champs
+        # non mis en cache (hash du mot de passe...) se chargent à l'accès.
+        return db.merge(entry[1], load=False)
+
+    user = db.get(UserAccount, user_id)
+    if user is not None and settings.auth_user_cache_ttl_seconds > 0:
+        snapshot = UserAccount(**{field: getattr(user, field) for field in _CACHED_USER_FIELDS})
+        make_transient_to_detached(snapshot)
+        with _user_cache_lock:
+            _user_cache[user_id] = (
+                time.monotonic() + settings.auth_user_cache_ttl_seconds,
+                snapshot,
+            )
+            while len(_user_cache) > settings.auth_user_cache_max_entries:
+                _user_cache.popitem(last=False)
+    return user
+
+
+def _token_user_id(token: str) -> uuid.UUID | None:
+    payload = verify_token(token, secret=settings.auth_token_secret)
+    if not payload or payload.get("type") != "access":
+        return None
+    try:
+        return uuid.UUID(str(payload.get("sub")))
+    except ValueError:
+        return None
+
 
 def get_current_user(
     db: Session = Depends(get_db),
@@ -25,24 +81,15 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    payload = verify_token(token, secret=settings.auth_token_secret)
-    if not payload or payload.get("type") != "access":
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    try:
-        user_id = uuid.UUID(str(payload.get("sub")))
-    except ValueError:
+    user_id = _token_user_id(token)
+    if user_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.get(UserAccount, user_id)
+    user = _load_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
@@ -59,16 +106,11 @@ def get_current_user_optional(
     if not token:
         return None
 
-    payload = verify_token(token, secret=settings.auth_token_secret)
-    if not payload or payload.get("type") != "access":
+    user_id = _token_user_id(token)
+    if user_id is None:
         return None
 
-    try:
-        user_id = uuid.UUID(str(payload.get("sub")))
-    except ValueError:
-        return None
-
-    user = db.get(UserAccount, user_id)
+    user = _load_user(db, user_id)
     if not user or not user.is_active:
         return None
 
@@ -87,16 +129,10 @@ def require_auth_in_production(
     is_production = settings.env in ("prod", "production", "staging")
 
     # Try Bearer token first
-    if token:
-        payload = verify_token(token, secret=settings.auth_token_secret)
-        if payload and payload.get("type") == "access":
-            try:
-                user_id = uuid.UUID(str(payload.get("sub")))
-                user = db.get(UserAccount, user_id)
-                if user and user.is_active:
-                    return user
-            except ValueError:
-                pass
+    if token and (user_id := _token_user_id(token)) is not None:
+        user = _load_user(db, user_id)
+        if user and user.is_active:
+            return user
 
     # Try API key
     if api_key and hasattr(settings, "api_keys"):
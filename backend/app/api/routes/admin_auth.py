@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, Header, HTTPException
 from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 
+from app.api.deps import invalidate_user
 from app.audit.events import log_event
 from app.core.config import settings
 from app.db.models import UserAccount, UserRecoveryCode
@@ -69,6 +70,7 @@ def disable_2fa_for_user(
     revoked = _disable_user_2fa(db, user=user, admin_email=admin_email, reason=body.reason)
     disabled_at = user.mfa_disabled_at or dt.datetime.now(dt.timezone.utc)
     db.commit()
+    invalidate_user(user.id)
     return AdminDisable2faOut(
         user_id=user.id, disabled_at=disabled_at, recovery_codes_revoked=revoked
     )
@@ -106,4 +108,6 @@ def disable_2fa_for_all_users(
         },
     )
     db.commit()
+    for user_id in disabled_ids:
+        invalidate_user(user_id)
     return AdminDisable2faAllOut(disabled_count=len(disabled_ids), disabled_user_ids=disabled_ids)
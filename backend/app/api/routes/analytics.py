@@ -5,10 +5,11 @@ from enum import Enum
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy import func, select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
 from app.db.models import Commande, Don, Poche
-from app.db.session import get_db
+from app.db.session import get_async_read_db
 
 router = APIRouter(prefix="/analytics")
 
@@ -20,10 +21,10 @@ class TimeGranularity(str, Enum):
 
 
 @router.get("/dashboard")
-def get_dashboard_stats(
+async def get_dashboard_stats(
     start_date: dt.date | None = None,
     end_date: dt.date | None = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     """
     Récupérer les statistiques agrégées pour le tableau de bord analytique.
@@ -35,28 +36,31 @@ def get_dashboard_stats(
 
     # 1. Tendance des dons par jour
     dons_trend = (
-        db.query(func.date(Don.date_don).label("date"), func.count(Don.id).label("count"))
-        .filter(Don.date_don >= start_date, Don.date_don <= end_date)
-        .group_by(func.date(Don.date_don))
-        .order_by("date")
-        .all()
-    )
+        await db.execute(
+            select(func.date(Don.date_don).label("date"), func.count(Don.id).label("count"))
+            .where(Don.date_don >= start_date, Don.date_don <= end_date)
+            .group_by(func.date(Don.date_don))
+            .order_by("date")
+        )
+    ).all()
 
     # 2. Répartition par groupe sanguin (sur le stock disponible)
     stock_by_blood_type = (
-        db.query(Poche.groupe_sanguin, func.count(Poche.id).label("count"))
-        .filter(Poche.statut_distribution == "DISPONIBLE")
-        .group_by(Poche.groupe_sanguin)
-        .all()
-    )
+        await db.execute(
+            select(Poche.groupe_sanguin, func.count(Poche.id).label("count"))
+            .where(Poche.statut_distribution == "DISPONIBLE")
+            .group_by(Poche.groupe_sanguin)
+        )
+    ).all()
 
     # 3. Commandes par statut
     commandes_status = (
-        db.query(Commande.statut, func.count(Commande.id).label("count"))
-        .filter(Commande.created_at >= start_date)
-        .group_by(Commande.statut)
-        .all()
-    )
+        await db.execute(
+            select(Commande.statut, func.count(Commande.id).label("count"))
+            .where(Commande.created_at >= start_date)
+            .group_by(Commande.statut)
+        )
+    ).all()
 
     return {
         "period": {"start": start_date, "end": end_date},
@@ -72,11 +76,11 @@ def get_dashboard_stats(
 
 
 @router.get("/trend/dons")
-def get_dons_trend(
+async def get_dons_trend(
     start_date: dt.date = Query(...),
     end_date: dt.date = Query(...),
     granularity: TimeGranularity = Query(TimeGranularity.DAY),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     """
     Récupérer les tendances de collecte de dons avec granularité configurable.
@@ -90,15 +94,16 @@ def get_dons_trend(
         trunc_func = func.date_trunc("month", Don.date_don)
 
     trend = (
-        db.query(
-            trunc_func.label("period"),
-            func.count(Don.id).label("value"),
+        await db.execute(
+            select(
+                trunc_func.label("period"),
+                func.count(Don.id).label("value"),
+            )
+            .where(Don.date_don >= start_date, Don.date_don <= end_date)
+            .group_by("period")
+            .order_by("period")
         )
-        .filter(Don.date_don >= start_date, Don.date_don <= end_date)
-        .group_by("period")
-        .order_by("period")
-        .all()
-    )
+    ).all()
 
     return {
         "data": [
@@ -109,27 +114,27 @@ def get_dons_trend(
 
 
 @router.get("/trend/stock")
-def get_stock_trend(
+async def get_stock_trend(
     start_date: dt.date = Query(...),
     end_date: dt.date = Query(...),
     product_type: str | None = Query(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     """
     Récupérer les tendances du stock par type de produit.
     """
-    query = db.query(
+    query = select(
         func.date_trunc("day", Poche.created_at).label("period"),
         func.count(Poche.id).label("value"),
-    ).filter(
+    ).where(
         Poche.created_at >= start_date,
         Poche.created_at <= end_date,
     )
 
     if product_type:
-        query = query.filter(Poche.type_produit == product_type)
+        query = query.where(Poche.type_produit == product_type)
 
-    trend = query.group_by("period").order_by("period").all()
+    trend = (await db.execute(query.group_by("period").order_by("period"))).all()
 
     return {
         "data": [
@@ -140,28 +145,29 @@ def get_stock_trend(
 
 
 @router.get("/trend/distribution")
-def get_distribution_trend(
+async def get_distribution_trend(
     start_date: dt.date = Query(...),
     end_date: dt.date = Query(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     """
     Récupérer les tendances de distribution (commandes servies).
     """
     trend = (
-        db.query(
-            func.date_trunc("day", Commande.updated_at).label("period"),
-            func.count(Commande.id).label("value"),
-        )
-        .filter(
-            Commande.statut == "SERVIE",
-            Commande.updated_at >= start_date,
-            Commande.updated_at <= end_date,
+        await db.execute(
+            select(
+                func.date_trunc("day", Commande.updated_at).label("period"),
+                func.count(Commande.id).label("value"),
+            )
+            .where(
+                Commande.statut == "SERVIE",
+                Commande.updated_at >= start_date,
+                Commande.updated_at <= end_date,
+            )
+            .group_by("period")
+            .order_by("period")
         )
-        .group_by("period")
-        .order_by("period")
-        .all()
-    )
+    ).all()
 
     return {
         "data": [
@@ -174,7 +180,7 @@ def get_distribution_trend(
 
 
 @router.get("/kpi/collection-rate")
-def get_collection_rate_kpi(db: Session = Depends(get_db)):
+async def get_collection_rate_kpi(db: AsyncSession = Depends(get_async_read_db)):
     """
     Calculer le taux de collecte (dons par jour) avec tendance.
     """
@@ -184,20 +190,22 @@ def get_collection_rate_kpi(db: Session = Depends(get_db)):
 
     # Période actuelle
     current_count = (
-        db.query(func.count(Don.id))
-        .filter(Don.date_don >= current_period_start, Don.date_don <= today)
-        .scalar()
+        await db.scalar(
+            select(func.count(Don.id)).where(
+                Don.date_don >= current_period_start, Don.date_don <= today
+            )
+        )
         or 0
     )
 
     # Période précédente
     previous_count = (
-        db.query(func.count(Don.id))
-        .filter(
-            Don.date_don >= previous_period_start,
-            Don.date_don < current_period_start,
+        await db.scalar(
+            select(func.count(Don.id)).where(
+                Don.date_don >= previous_period_start,
+                Don.date_don < current_period_start,
+            )
         )
-        .scalar()
         or 0
     )
 
@@ -221,7 +229,7 @@ def get_collection_rate_kpi(db: Session = Depends(get_db)):
 
 
 @router.get("/kpi/wastage-rate")
-def get_wastage_rate_kpi(db: Session = Depends(get_db)):
+async def get_wastage_rate_kpi(db: AsyncSession = Depends(get_async_read_db)):
     """
     Calculer le taux de gaspillage (poches périmées / total).
     """
@@ -229,21 +237,21 @@ def get_wastage_rate_kpi(db: Session = Depends(get_db)):
 
     # Total de poches créées dans les 90 derniers jours
     total_poches = (
-        db.query(func.count(Poche.id))
-        .filter(Poche.created_at >= today - dt.timedelta(days=90))
-        .scalar()
+        await db.scalar(
+            select(func.count(Poche.id)).where(Poche.created_at >= today - dt.timedelta(days=90))
+        )
         or 0
     )
 
     # Poches périmées (date_peremption passée et non distribuées)
     expired_poches = (
-        db.query(func.count(Poche.id))
-        .filter(
-            Poche.date_peremption < today,
-            Poche.statut_distribution.in_(["DISPONIBLE", "NON_DISTRIBUABLE"]),
-            Poche.created_at >= today - dt.timedelta(days=90),
+        await db.scalar(
+            select(func.count(Poche.id)).where(
+                Poche.date_peremption < today,
+                Poche.statut_distribution.in_(["DISPONIBLE", "NON_DISTRIBUABLE"]),
+                Poche.created_at >= today - dt.timedelta(days=90),
+            )
         )
-        .scalar()
         or 0
     )
 
@@ -254,24 +262,24 @@ def get_wastage_rate_kpi(db: Session = Depends(get_db)):
     previous_period_end = today - dt.timedelta(days=90)
 
     previous_total = (
-        db.query(func.count(Poche.id))
-        .filter(
-            Poche.created_at >= previous_period_start,
-            Poche.created_at < previous_period_end,
+        await db.scalar(
+            select(func.count(Poche.id)).where(
+                Poche.created_at >= previous_period_start,
+                Poche.created_at < previous_period_end,
+            )
         )
-        .scalar()
         or 0
     )
 
     previous_expired = (
-        db.query(func.count(Poche.id))
-        .filter(
-            Poche.date_peremption < previous_period_end,
-            Poche.statut_distribution.in_(["DISPONIBLE", "NON_DISTRIBUABLE"]),
-            Poche.created_at >= previous_period_start,
-            Poche.created_at < previous_period_end,
+        await db.scalar(
+            select(func.count(Poche.id)).where(
+                Poche.date_peremption < previous_period_end,
+                Poche.statut_distribution.in_(["DISPONIBLE", "NON_DISTRIBUABLE"]),
+                Poche.created_at >= previous_period_start,
+                Poche.created_at < previous_period_end,
+            )
         )
-        .scalar()
         or 0
     )
 
@@ -291,7 +299,7 @@ def get_wastage_rate_kpi(db: Session = Depends(get_db)):
 
 
 @router.get("/kpi/liberation-rate")
-def get_liberation_rate_kpi(db: Session = Depends(get_db)):
+async def get_liberation_rate_kpi(db: AsyncSession = Depends(get_async_read_db)):
     """
     Calculer le taux de libération biologique (dons libérés / total dons).
     """
@@ -299,20 +307,20 @@ def get_liberation_rate_kpi(db: Session = Depends(get_db)):
     period_start = today - dt.timedelta(days=30)
 
     total_dons = (
-        db.query(func.count(Don.id))
-        .filter(Don.date_don >= period_start, Don.date_don <= today)
-        .scalar()
+        await db.scalar(
+            select(func.count(Don.id)).where(Don.date_don >= period_start, Don.date_don <= today)
+        )
         or 0
     )
 
     liberated_dons = (
-        db.query(func.count(Don.id))
-        .filter(
-            Don.date_don >= period_start,
-            Don.date_don <= today,
-            Don.statut_qualification == "LIBERE",
+        await db.scalar(
+            select(func.count(Don.id)).where(
+                Don.date_don >= period_start,
+                Don.date_don <= today,
+                Don.statut_qualification == "LIBERE",
+            )
         )
-        .scalar()
         or 0
     )
 
@@ -321,20 +329,22 @@ def get_liberation_rate_kpi(db: Session = Depends(get_db)):
     # Période précédente
     previous_period_start = period_start - dt.timedelta(days=30)
     previous_total = (
-        db.query(func.count(Don.id))
-        .filter(Don.date_don >= previous_period_start, Don.date_don < period_start)
-        .scalar()
+        await db.scalar(
+            select(func.count(Don.id)).where(
+                Don.date_don >= previous_period_start, Don.date_don < period_start
+            )
+        )
         or 0
     )
 
     previous_liberated = (
-        db.query(func.count(Don.id))
-        .filter(
-            Don.date_don >= previous_period_start,
-            Don.date_don < period_start,
-            Don.statut_qualification == "LIBERE",
+        await db.scalar(
+            select(func.count(Don.id)).where(
+                Don.date_don >= previous_period_start,
+                Don.date_don < period_start,
+                Don.statut_qualification == "LIBERE",
+            )
         )
-        .scalar()
         or 0
     )
 
@@ -354,12 +364,14 @@ def get_liberation_rate_kpi(db: Session = Depends(get_db)):
 
 
 @router.get("/kpi/stock-available")
-def get_stock_available_kpi(db: Session = Depends(get_db)):
+async def get_stock_available_kpi(db: AsyncSession = Depends(get_async_read_db)):
     """
     Nombre de poches disponibles en stock.
     """
     current_stock = (
-        db.query(func.count(Poche.id)).filter(Poche.statut_distribution == "DISPONIBLE").scalar()
+        await db.scalar(
+            select(func.count(Poche.id)).where(Poche.statut_distribution == "DISPONIBLE")
+        )
         or 0
     )
 
@@ -368,12 +380,12 @@ def get_stock_available_kpi(db: Session = Depends(get_db)):
     # On ne peut pas vraiment retrouver le stock d'il y a 7 jours sauf si on a un historique
     # Pour simplifier, on compare avec le stock total créé récemment
     previous_stock = (
-        db.query(func.count(Poche.id))
-        .filter(
-            Poche.statut_distribution == "DISPONIBLE",
-            Poche.created_at < seven_days_ago,
+        await db.scalar(
+            select(func.count(Poche.id)).where(
+                Poche.statut_distribution == "DISPONIBLE",
+                Poche.created_at < seven_days_ago,
+            )
         )
-        .scalar()
         or 0
     )
 
@@ -397,19 +409,19 @@ def get_stock_available_kpi(db: Session = Depends(get_db)):
 
 
 @router.get("/stock/breakdown")
-def get_stock_breakdown(db: Session = Depends(get_db)):
+async def get_stock_breakdown(db: AsyncSession = Depends(get_async_read_db)):
     """
     Répartition du stock par type de produit et statut.
     """
     breakdown = (
-        db.query(
-            Poche.type_produit,
-            Poche.statut_distribution,
-            func.count(Poche.id).label("count"),
+        await db.execute(
+            select(
+                Poche.type_produit,
+                Poche.statut_distribution,
+                func.count(Poche.id).label("count"),
+            ).group_by(Poche.type_produit, Poche.statut_distribution)
         )
-        .group_by(Poche.type_produit, Poche.statut_distribution)
-        .all()
-    )
+    ).all()
 
     # Restructurer les données
     result = {}
@@ -436,37 +448,10 @@ def get_stock_breakdown(db: Session = Depends(get_db)):
     return {"breakdown": list(result.values())}
 
 
-@router.get("/export")
-def export_report(
-    format: str = Query(..., pattern=r"^(csv|excel|pdf)$"),
-    report_type: str = Query(..., pattern=r"^(activity|stock)$"),
-    db: Session = Depends(get_db),
-):
-    """
-    Exporter un rapport au format spécifié.
-    """
+def _render_export(df, format: str, report_type: str, filename: str):
+    """Construit le fichier (CPU) ; appelé hors de la boucle d'événements."""
     import pandas as pd
 
-    # Génération des données
-    if report_type == "activity":
-        # Exemple: Liste des dons récents
-        stmt = select(Don.din, Don.date_don, Don.type_don, Don.statut_qualification).limit(1000)
-        data = db.execute(stmt).all()
-        df = pd.DataFrame(data, columns=["DIN", "Date", "Type", "Statut"])
-        filename = f"rapport_activite_{dt.date.today()}"
-
-    elif report_type == "stock":
-        stmt = select(
-            Poche.code_produit_isbt, Poche.type_produit, Poche.groupe_sanguin, Poche.date_peremption
-        ).where(Poche.statut_distribution == "DISPONIBLE")
-        data = db.execute(stmt).all()
-        df = pd.DataFrame(data, columns=["Code Produit", "Type", "Groupe", "Expiration"])
-        filename = f"rapport_stock_{dt.date.today()}"
-
-    else:
-        raise HTTPException(status_code=400, detail="Type de rapport inconnu")
-
-    # Export selon format
     buffer = io.BytesIO()
 
     if format == "csv":
@@ -520,6 +505,43 @@ def export_report(
         filename += ".pdf"
 
     buffer.seek(0)
+    return buffer, media_type, filename
+
+
+@router.get("/export")
+async def export_report(
+    format: str = Query(..., pattern=r"^(csv|excel|pdf)$"),
+    report_type: str = Query(..., pattern=r"^(activity|stock)$"),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Exporter un rapport au format spécifié.
+    """
+    import pandas as pd
+
+    # Génération des données
+    if report_type == "activity":
+        # Exemple: Liste des dons récents
+        stmt = select(Don.din, Don.date_don, Don.type_don, Don.statut_qualification).limit(1000)
+        data = (await db.execute(stmt)).all()
+        df = pd.DataFrame(data, columns=["DIN", "Date", "Type", "Statut"])
+        filename = f"rapport_activite_{dt.date.today()}"
+
+    elif report_type == "stock":
+        stmt = select(
+            Poche.code_produit_isbt, Poche.type_produit, Poche.groupe_sanguin, Poche.date_peremption
+        ).where(Poche.statut_distribution == "DISPONIBLE")
+        data = (await db.execute(stmt)).all()
+        df = pd.DataFrame(data, columns=["Code Produit", "Type", "Groupe", "Expiration"])
+        filename = f"rapport_stock_{dt.date.today()}"
+
+    else:
+        raise HTTPException(status_code=400, detail="Type de rapport inconnu")
+
+    # Export selon format (pandas / reportlab, CPU) dans le pool de threads
+    buffer, media_type, filename = await run_in_threadpool(
+        _render_export, df, format, report_type, filename
+    )
     return StreamingResponse(
         buffer,
         media_type=media_type,
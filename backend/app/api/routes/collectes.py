@@ -1,19 +1,35 @@
 import uuid
+from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, selectinload
 
 from app.api.deps import require_auth_in_production
 from app.audit.events import log_event
-from app.db.models import CampagneCollecte, InscriptionCollecte, UserAccount
+from app.core import slots
+from app.core.notifications import dispatch
+from app.core.targeting import fan_out, targets
+from app.db.models import CampagneCollecte, CreneauCollecte, InscriptionCollecte, UserAccount
 from app.db.session import get_db
 from app.schemas.collectes import (
     CampagneCollecteCreate,
     CampagneCollecteOut,
     CampagneCollecteUpdate,
+    CiblageCriteres,
+    CiblageNotificationsCreate,
+    CiblageNotificationsOut,
+    CiblageOut,
+    CreneauCollecteOut,
+    CreneauxGeneration,
+    CreneauxGenerationOut,
+    DonneurCibleOut,
     InscriptionCollecteCreate,
     InscriptionCollecteOut,
+    InscriptionRefus,
+    InscriptionsLotCreate,
+    InscriptionsLotOut,
 )
 
 router = APIRouter(prefix="/collectes")
@@ -177,7 +193,7 @@ def bilan_campagne(campagne_id: uuid.UUID, db: Session = Depends(get_db)) -> dic
     if campagne is None:
         raise HTTPException(status_code=404, detail="campagne introuvable")
 
-    inscrits = len(campagne.inscriptions)
+    inscrits = sum(1 for i in campagne.inscriptions if i.statut != "ANNULE")
     presents = sum(1 for i in campagne.inscriptions if i.statut in ("PRESENT", "PRELEVE"))
     preleves = sum(1 for i in campagne.inscriptions if i.statut == "PRELEVE")
     absents = sum(1 for i in campagne.inscriptions if i.statut == "ABSENT")
@@ -197,6 +213,125 @@ def bilan_campagne(campagne_id: uuid.UUID, db: Session = Depends(get_db)) -> dic
     }
 
 
+# ── Ciblage des donneurs ────────────────────
+
+
+@router.post("/{campagne_id}/ciblage", response_model=CiblageOut)
+def ciblage_campagne(
+    campagne_id: uuid.UUID,
+    criteres: CiblageCriteres,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    _user: UserAccount | None = Depends(require_auth_in_production),
+) -> CiblageOut:
+    campagne = db.get(CampagneCollecte, campagne_id)
+    if campagne is None:
+        raise HTTPException(status_code=404, detail="campagne introuvable")
+
+    stmt, deficits = targets(db, campagne, criteres)
+    total = db.execute(select(func.count()).select_from(stmt.order_by(None).subquery())).scalar()
+    donneurs = [
+        DonneurCibleOut.model_validate(donneur).model_copy(
+            update={"niveau": niveau, "score": score}
+        )
+        for donneur, niveau, score in db.execute(stmt.offset(offset).limit(limit))
+    ]
+    return CiblageOut(total=total, deficits=deficits, donneurs=donneurs)
+
+
+@router.post(
+    "/{campagne_id}/ciblage/notifications",
+    response_model=CiblageNotificationsOut,
+    status_code=201,
+)
+def notifier_cibles(
+    campagne_id: uuid.UUID,
+    payload: CiblageNotificationsCreate,
+    db: Session = Depends(get_db),
+    _user: UserAccount | None = Depends(require_auth_in_production),
+) -> CiblageNotificationsOut:
+    campagne = db.get(CampagneCollecte, campagne_id)
+    if campagne is None:
+        raise HTTPException(status_code=404, detail="campagne introuvable")
+
+    ids = fan_out(
+        db,
+        campagne,
+        payload,
+        canal=payload.canal,
+        template=payload.template,
+        priorite=payload.priorite,
+        max_destinataires=payload.max_destinataires,
+    )
+    log_event(
+        db,
+        aggregate_type="campagne_collecte",
+        aggregate_id=campagne.id,
+        event_type="campagne.donneurs_notifies",
+        payload={"canal": payload.canal, "template": payload.template, "notifications": len(ids)},
+    )
+    db.commit()
+
+    # Envoi par lots des seules notifications créées ici (best effort)
+    dispatch(ids, payload.canal)
+
+    return CiblageNotificationsOut(campagne_id=campagne.id, notifications=len(ids))
+
+
+# ── Créneaux ────────────────────────────────
+
+
+@router.post("/{campagne_id}/creneaux", response_model=CreneauxGenerationOut, status_code=201)
+def generer_creneaux(
+    campagne_id: uuid.UUID,
+    payload: CreneauxGeneration,
+    db: Session = Depends(get_db),
+    _user: UserAccount | None = Depends(require_auth_in_production),
+) -> CreneauxGenerationOut:
+    campagne = db.get(CampagneCollecte, campagne_id)
+    if campagne is None:
+        raise HTTPException(status_code=404, detail="campagne introuvable")
+
+    crees = slots.generate(
+        db,
+        campagne,
+        duree_minutes=payload.duree_minutes,
+        capacite=payload.capacite,
+        debut=payload.debut,
+        fin=payload.fin,
+    )
+    log_event(
+        db,
+        aggregate_type="campagne_collecte",
+        aggregate_id=campagne.id,
+        event_type="campagne.creneaux_generes",
+        payload={"crees": crees, "capacite": payload.capacite},
+    )
+    db.commit()
+    return CreneauxGenerationOut(campagne_id=campagne.id, crees=crees)
+
+
+@router.get("/{campagne_id}/creneaux", response_model=list[CreneauCollecteOut])
+def list_creneaux(
+    campagne_id: uuid.UUID,
+    disponibles: bool = Query(default=True),
+    a_partir_de: datetime | None = Query(default=None),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=10, ge=1, le=500),
+    db: Session = Depends(get_db),
+) -> list[CreneauCollecte]:
+    if disponibles:
+        after = a_partir_de or datetime.now(timezone.utc)
+        return slots.next_available(db, campagne_id, after=after, limit=limit)
+    stmt = select(CreneauCollecte).where(CreneauCollecte.campagne_id == campagne_id)
+    if a_partir_de:
+        stmt = stmt.where(CreneauCollecte.debut >= a_partir_de)
+    return list(
+        db.execute(stmt.order_by(CreneauCollecte.debut).offset(offset).limit(limit)).scalars()
+    )
+
+
 # ── Inscriptions ────────────────────────────
 
 
@@ -210,14 +345,94 @@ def create_inscription(
     if campagne is None:
         raise HTTPException(status_code=404, detail="campagne introuvable")
 
+    creneau, creneau_id = payload.creneau, None
+    if payload.creneau_id is not None or slots.has_slots(db, campagne_id):
+        place = slots.reserve(
+            db,
+            campagne_id,
+            creneau_id=payload.creneau_id,
+            at=payload.creneau,
+            after=datetime.now(timezone.utc),
+        )
+        if place is None:
+            raise HTTPException(status_code=409, detail="creneau complet")
+        creneau, creneau_id = place.debut, place.creneau_id
+
     inscription = InscriptionCollecte(
         campagne_id=campagne_id,
         donneur_id=payload.donneur_id,
         nom=payload.nom,
         telephone=payload.telephone,
-        creneau=payload.creneau,
+        creneau=creneau,
+        creneau_id=creneau_id,
     )
     db.add(inscription)
+    try:
+        db.commit()
+    except IntegrityError:
+        # La place réservée est rendue avec le reste de la transaction
+        db.rollback()
+        raise HTTPException(status_code=409, detail="donneur deja inscrit a cette campagne")
+    db.refresh(inscription)
+    return inscription
+
+
+@router.post("/{campagne_id}/inscriptions/lot", response_model=InscriptionsLotOut, status_code=201)
+def create_inscriptions_lot(
+    campagne_id: uuid.UUID,
+    payload: InscriptionsLotCreate,
+    db: Session = Depends(get_db),
+    _user: UserAccount | None = Depends(require_auth_in_production),
+) -> InscriptionsLotOut:
+    campagne = db.get(CampagneCollecte, campagne_id)
+    if campagne is None:
+        raise HTTPException(status_code=404, detail="campagne introuvable")
+
+    rows, refus = slots.register_many(
+        db,
+        campagne_id,
+        [item.model_dump() for item in payload.inscriptions],
+        after=payload.a_partir_de or datetime.now(timezone.utc),
+    )
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="inscriptions concurrentes, lot a renvoyer")
+
+    inscrites = []
+    if rows:
+        inscrites = db.execute(
+            select(InscriptionCollecte)
+            .where(InscriptionCollecte.id.in_([row["id"] for row in rows]))
+            .order_by(InscriptionCollecte.creneau)
+        ).scalars()
+    return InscriptionsLotOut(
+        inscrites=[InscriptionCollecteOut.model_validate(i) for i in inscrites],
+        refus=[InscriptionRefus(rang=rang, motif=motif) for rang, motif in refus],
+    )
+
+
+@router.post(
+    "/{campagne_id}/inscriptions/{inscription_id}/annuler",
+    response_model=InscriptionCollecteOut,
+)
+def annuler_inscription(
+    campagne_id: uuid.UUID,
+    inscription_id: uuid.UUID,
+    db: Session = Depends(get_db),
+) -> InscriptionCollecte:
+    inscription = db.get(InscriptionCollecte, inscription_id)
+    if inscription is None or inscription.campagne_id != campagne_id:
+        raise HTTPException(status_code=404, detail="inscription introuvable")
+    if inscription.statut != "INSCRIT":
+        raise HTTPException(
+            status_code=409, detail="seule une inscription en attente est annulable"
+        )
+
+    inscription.statut = "ANNULE"
+    if inscription.creneau_id is not None:
+        slots.release(db, inscription.creneau_id)
     db.commit()
     db.refresh(inscription)
     return inscription
@@ -1,11 +1,12 @@
 from typing import Any
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_user
+from app.core.cache import cached_json_response
 from app.db.models import Article, UserAccount
 from app.db.session import get_db
 from app.schemas.content import ArticleCreate, ArticleResponse, ArticleUpdate
@@ -15,6 +16,7 @@ router = APIRouter(prefix="/articles")
 
 @router.get("", response_model=list[ArticleResponse])
 def get_articles(
+    request: Request,
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
@@ -25,19 +27,28 @@ def get_articles(
     """
     Retrieve articles.
     """
-    query = select(Article)
 
-    if published_only:
-        query = query.where(Article.is_published.is_(True))
-    elif status:
-        query = query.where(Article.is_published.is_(status == "PUBLISHED"))
+    def build() -> list[dict]:
+        query = select(Article)
 
-    if category:
-        query = query.where(Article.category == category)
+        if published_only:
+            query = query.where(Article.is_published.is_(True))
+        elif status:
+            query = query.where(Article.is_published.is_(status == "PUBLISHED"))
 
-    query = query.order_by(Article.published_at.desc()).offset(skip).limit(limit)
-    articles = db.execute(query).scalars().all()
-    return articles
+        if category:
+            query = query.where(Article.category == category)
+
+        query = query.order_by(Article.published_at.desc()).offset(skip).limit(limit)
+        articles = db.execute(query).scalars().all()
+        return [ArticleResponse.model_validate(a).model_dump(mode="json") for a in articles]
+
+    return cached_json_response(
+        request,
+        namespace="content.articles",
+        key=f"{skip}:{limit}:{category}:{status}:{published_only}",
+        build=build,
+    )
 
 
 @router.get("/{slug}", response_model=ArticleResponse)
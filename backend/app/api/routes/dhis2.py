@@ -1,16 +1,57 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import func, select
+import logging
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api.deps import require_auth_in_production
 from app.audit.events import log_event
-from app.db.models import DHIS2Export, Don, Donneur, Poche, UserAccount
+from app.core.dhis2 import (
+    build_data_value_set,
+    compute_indicators,
+    compute_indicators_bulk,
+    normalize_periode,
+    send_data_value_set,
+)
+from app.db.models import DHIS2Export, UserAccount
 from app.db.session import get_db
-from app.schemas.dhis2 import DHIS2ExportCreate, DHIS2ExportOut
+from app.schemas.dhis2 import DHIS2BulkExportCreate, DHIS2ExportCreate, DHIS2ExportOut
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/dhis2")
 
 
+def _export_payload(periode: str, org_unit: str, indicateurs: dict, data_set: str | None) -> dict:
+    return {
+        "periode": normalize_periode(periode),
+        "org_unit": org_unit,
+        "indicateurs": indicateurs,
+        "dataValueSet": build_data_value_set([(periode, org_unit, indicateurs)], data_set=data_set),
+    }
+
+
+def _send_export(db: Session, export: DHIS2Export) -> None:
+    try:
+        status_code, body = send_data_value_set(export.payload["dataValueSet"])
+    except (OSError, RuntimeError) as exc:
+        logger.warning("Envoi DHIS2 %s échoué : %s", export.id, exc)
+        export.statut = "ECHEC"
+        export.response_code = None
+        body = {"erreur": str(exc)[:500]}
+    else:
+        export.statut = "ENVOYE" if 200 <= status_code < 300 else "ECHEC"
+        export.response_code = status_code
+    log_event(
+        db,
+        aggregate_type="dhis2_export",
+        aggregate_id=export.id,
+        event_type="dhis2.export_envoye" if export.statut == "ENVOYE" else "dhis2.export_echec",
+        payload={"periode": export.periode, "org_unit": export.org_unit, "reponse": body},
+    )
+
+
 @router.get("/exports", response_model=list[DHIS2ExportOut])
 def list_exports(
     statut: str | None = Query(default=None),
@@ -34,14 +75,18 @@ def create_export(
     db: Session = Depends(get_db),
     _user: UserAccount | None = Depends(require_auth_in_production),
 ) -> DHIS2Export:
-    # Build aggregated data for the period
-    indicators = _compute_indicators(db, payload.periode)
+    try:
+        result = compute_indicators(db, periode=payload.periode, org_unit=payload.org_unit)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
 
     export = DHIS2Export(
         periode=payload.periode,
         org_unit=payload.org_unit,
         data_set=payload.data_set,
-        payload=indicators,
+        payload=_export_payload(
+            payload.periode, payload.org_unit, result["indicateurs"], payload.data_set
+        ),
     )
     db.add(export)
     db.flush()
@@ -50,44 +95,84 @@ def create_export(
         aggregate_type="dhis2_export",
         aggregate_id=export.id,
         event_type="dhis2.export_cree",
-        payload={"periode": payload.periode},
+        payload={"periode": payload.periode, "org_unit": payload.org_unit},
     )
     db.commit()
     db.refresh(export)
     return export
 
 
+@router.post("/exports/bulk", response_model=list[DHIS2ExportOut], status_code=201)
+def create_exports_bulk(
+    payload: DHIS2BulkExportCreate,
+    db: Session = Depends(get_db),
+    _user: UserAccount | None = Depends(require_auth_in_production),
+) -> list[DHIS2Export]:
+    """Génère les exports de plusieurs périodes × org units en une passe groupée."""
+    try:
+        results = compute_indicators_bulk(
+            db, periodes=payload.periodes, org_units=payload.org_units
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+    exports: list[DHIS2Export] = []
+    for periode in dict.fromkeys(payload.periodes):
+        for org_unit in dict.fromkeys(payload.org_units):
+            indicateurs = results[(normalize_periode(periode), org_unit)]
+            export = DHIS2Export(
+                periode=periode,
+                org_unit=org_unit,
+                data_set=payload.data_set,
+                payload=_export_payload(periode, org_unit, indicateurs, payload.data_set),
+            )
+            db.add(export)
+            exports.append(export)
+    db.flush()
+
+    for export in exports:
+        log_event(
+            db,
+            aggregate_type="dhis2_export",
+            aggregate_id=export.id,
+            event_type="dhis2.export_cree",
+            payload={"periode": export.periode, "org_unit": export.org_unit},
+        )
+        if payload.envoyer:
+            _send_export(db, export)
+    db.commit()
+    for export in exports:
+        db.refresh(export)
+    return exports
+
+
+@router.post("/exports/{export_id}/envoyer", response_model=DHIS2ExportOut)
+def send_export(
+    export_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    _user: UserAccount | None = Depends(require_auth_in_production),
+) -> DHIS2Export:
+    export = db.get(DHIS2Export, export_id)
+    if export is None:
+        raise HTTPException(status_code=404, detail="export introuvable")
+    if export.statut == "ENVOYE":
+        return export
+    if "dataValueSet" not in export.payload:
+        raise HTTPException(status_code=409, detail="export sans dataValueSet")
+    _send_export(db, export)
+    db.commit()
+    db.refresh(export)
+    return export
+
+
 @router.get("/preview")
 def preview_indicators(
     periode: str = Query(),
+    org_unit: str | None = Query(default=None),
     db: Session = Depends(get_db),
 ) -> dict:
-    return _compute_indicators(db, periode)
-
-
-def _compute_indicators(db: Session, periode: str) -> dict:
-    """Compute national blood transfusion indicators for a given period (YYYY-MM format)."""
-    total_dons = db.execute(select(func.count(Don.id))).scalar() or 0
-    total_donneurs = db.execute(select(func.count(Donneur.id))).scalar() or 0
-    poches_disponibles = (
-        db.execute(
-            select(func.count(Poche.id)).where(Poche.statut_distribution == "DISPONIBLE")
-        ).scalar()
-        or 0
-    )
-    poches_distribuees = (
-        db.execute(
-            select(func.count(Poche.id)).where(Poche.statut_distribution == "DISTRIBUE")
-        ).scalar()
-        or 0
-    )
-
-    return {
-        "periode": periode,
-        "indicateurs": {
-            "total_dons": total_dons,
-            "total_donneurs_inscrits": total_donneurs,
-            "poches_disponibles": poches_disponibles,
-            "poches_distribuees": poches_distribuees,
-        },
-    }
+    """Indicateurs d'une période, sans écrire d'agrégats (lecture seule)."""
+    try:
+        return compute_indicators(db, periode=periode, org_unit=org_unit, persist=False)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
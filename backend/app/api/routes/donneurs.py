@@ -1,18 +1,61 @@
 import datetime as dt
+import json
+import uuid
+from collections.abc import Iterator
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, or_
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session, selectinload
+from starlette.concurrency import run_in_threadpool
 
 from app.api.deps import require_auth_in_production
+from app.audit.events import log_event
+from app.core import dedup
 from app.core.dates import add_months
-from app.core.security import hash_cni
-from app.db.models import CarteDonneur, Donneur, UserAccount
+from app.core.donor_import import import_donneurs, iter_lines
+from app.core.donor_search import card_prefix_filter, search_filter
+from app.core.eligibility import (
+    DEFINITIF,
+    compute_eligible_le,
+    delai_inter_don,
+    donor_reactions,
+    eligible_filter,
+    recompute,
+    refresh_eligible_le,
+)
+from app.core.security import cni_hash_candidates, hash_cni
+from app.db.models import Donneur, DoublonDonneur, UserAccount
 from app.db.session import get_db
-from app.schemas.donneurs import DonneurCreate, DonneurOut, DonneurUpdate, EligibiliteOut
+from app.schemas.donneurs import (
+    DonneurCreate,
+    DonneurImportOut,
+    DonneurOut,
+    DonneurUpdate,
+    DoublonOut,
+    EligibiliteOut,
+    FusionCreate,
+    FusionOut,
+)
 
 router = APIRouter(prefix="/donneurs")
 
+_STREAM_BATCH = 2000
+_ELIGIBLE_COLUMNS = (
+    Donneur.id,
+    Donneur.nom,
+    Donneur.prenom,
+    Donneur.sexe,
+    Donneur.groupe_sanguin,
+    Donneur.region,
+    Donneur.telephone,
+    Donneur.email,
+    Donneur.dernier_don,
+    Donneur.eligible_le,
+)
+
 
 @router.post("", response_model=DonneurOut)
 def create_donneur(
@@ -20,8 +63,9 @@ def create_donneur(
     db: Session = Depends(get_db),
     _user: UserAccount | None = Depends(require_auth_in_production),
 ) -> Donneur:
-    cni_hash = hash_cni(payload.cni)
-    existing = db.execute(select(Donneur).where(Donneur.cni_hash == cni_hash)).scalar_one_or_none()
+    candidates = cni_hash_candidates(payload.cni)
+    cni_hash = candidates[0]
+    existing = db.execute(select(Donneur).where(dedup.cni_filter(candidates))).scalar_one_or_none()
     if existing is not None:
         return existing
     row = Donneur(
@@ -47,6 +91,47 @@ def create_donneur(
     return row
 
 
+def _body_chunks(request: Request) -> Iterator[bytes]:
+    """Corps de la requête lu au fil de l'eau depuis un thread du pool."""
+    stream = request.stream()
+    while True:
+        try:
+            yield anyio.from_thread.run(stream.__anext__)
+        except StopAsyncIteration:
+            return
+
+
+@router.post("/import", response_model=DonneurImportOut)
+async def import_donneurs_bulk(
+    request: Request,
+    format: str | None = Query(default=None, pattern="^(csv|ndjson)$"),
+    chunk_size: int = Query(default=5000, ge=1, le=50000),
+    skip: int = Query(default=0, ge=0),
+    db: Session = Depends(get_db),
+    _user: UserAccount | None = Depends(require_auth_in_production),
+) -> DonneurImportOut:
+    """
+    Import en masse depuis un flux CSV (en-tête = champs de DonneurCreate) ou
+    NDJSON (un objet par ligne), transmis tel quel dans le corps de la requête.
+
+    - **format**: csv ou ndjson (défaut : d'après le Content-Type)
+    - **chunk_size**: lignes validées et insérées par transaction
+    - **skip**: lignes de données à ignorer (reprise après ``derniere_ligne``)
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "json" in content_type else "csv"
+    report = await run_in_threadpool(
+        import_donneurs,
+        db,
+        iter_lines(_body_chunks(request)),
+        fmt=format,
+        chunk_size=chunk_size,
+        skip=skip,
+    )
+    return DonneurImportOut.model_validate(report)
+
+
 @router.get("", response_model=list[DonneurOut])
 def list_donneurs(
     q: str | None = Query(default=None),
@@ -59,23 +144,15 @@ def list_donneurs(
     db: Session = Depends(get_db),
 ) -> list[Donneur]:
     stmt = select(Donneur)
+    order_by = [Donneur.created_at.desc()]
 
     if numero_carte:
-        # Recherche par numéro de carte donneur (identifiant unique)
-        stmt = stmt.join(CarteDonneur, CarteDonneur.donneur_id == Donneur.id).where(
-            CarteDonneur.numero_carte.ilike(f"%{numero_carte}%")
-        )
+        # Recherche par préfixe du numéro de carte donneur
+        stmt = stmt.where(card_prefix_filter(numero_carte))
     elif q:
-        # Search by name, telephone or card number
-        name_filter = or_(
-            Donneur.nom.ilike(f"%{q}%"),
-            Donneur.prenom.ilike(f"%{q}%"),
-            Donneur.telephone.ilike(f"%{q}%"),
-        )
-        carte_subq = select(CarteDonneur.donneur_id).where(
-            CarteDonneur.numero_carte.ilike(f"%{q}%")
-        )
-        stmt = stmt.where(or_(name_filter, Donneur.id.in_(carte_subq)))
+        # Nom (accents et fautes tolérés), préfixe de téléphone ou de carte
+        condition, order_by = search_filter(db, q)
+        stmt = stmt.where(condition)
 
     if sexe:
         stmt = stmt.where(Donneur.sexe == sexe)
@@ -87,9 +164,140 @@ def list_donneurs(
         stmt = stmt.where(Donneur.region == region)
 
     stmt = stmt.options(selectinload(Donneur.carte_donneur))
-    return list(
-        db.execute(stmt.order_by(Donneur.created_at.desc()).offset(offset).limit(limit)).scalars()
+    return list(db.execute(stmt.order_by(*order_by).offset(offset).limit(limit)).scalars())
+
+
+@router.get("/eligibles")
+def list_eligibles(
+    as_of: dt.date | None = Query(default=None),
+    sexe: str | None = Query(default=None),
+    groupe_sanguin: str | None = Query(default=None),
+    region: str | None = Query(default=None),
+    db: Session = Depends(get_db),
+    _user: UserAccount | None = Depends(require_auth_in_production),
+) -> StreamingResponse:
+    """
+    Donneurs éligibles au don à la date ``as_of`` (défaut : aujourd'hui), en
+    NDJSON, une ligne par donneur, lus au fil de l'eau (``eligible_le`` indexé).
+    """
+    ref_date = as_of or dt.date.today()
+    stmt = select(*_ELIGIBLE_COLUMNS).where(eligible_filter(ref_date))
+    if sexe:
+        stmt = stmt.where(Donneur.sexe == sexe)
+    if groupe_sanguin:
+        stmt = stmt.where(Donneur.groupe_sanguin == groupe_sanguin)
+    if region:
+        stmt = stmt.where(Donneur.region == region)
+    rows = db.execute(stmt.order_by(Donneur.id).execution_options(yield_per=_STREAM_BATCH))
+
+    def lines() -> Iterator[bytes]:
+        for row in rows:
+            yield (json.dumps(jsonable_encoder(row._asdict()), ensure_ascii=False) + "\n").encode()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/eligibilite/recalcul")
+def recalcul_eligibilite(
+    db: Session = Depends(get_db),
+    _user: UserAccount | None = Depends(require_auth_in_production),
+) -> dict:
+    """Recalcule ``eligible_le`` pour toute la base en une instruction SQL."""
+    updated = recompute(db)
+    db.commit()
+    return {"donneurs": updated}
+
+
+# ── Doublons ────────────────────────────────
+
+
+@router.post("/doublons/detection", status_code=202)
+def lancer_detection_doublons(
+    _user: UserAccount | None = Depends(require_auth_in_production),
+) -> dict:
+    """Planifie la détection des doublons sur toute la base (tâche Celery, best effort)."""
+    try:
+        from app.tasks.maintenance import detect_duplicates
+
+        detect_duplicates.delay()
+    except Exception:
+        pass
+    return {"statut": "PLANIFIEE"}
+
+
+@router.get("/doublons", response_model=list[DoublonOut])
+def list_doublons(
+    statut: str = Query(default="A_EXAMINER"),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+) -> list[DoublonDonneur]:
+    stmt = (
+        select(DoublonDonneur)
+        .where(DoublonDonneur.statut == statut)
+        .order_by(DoublonDonneur.score.desc(), DoublonDonneur.id)
+        .offset(offset)
+        .limit(limit)
+    )
+    return list(db.execute(stmt).scalars())
+
+
+def _candidat(db: Session, doublon_id: uuid.UUID) -> DoublonDonneur:
+    candidat = db.get(DoublonDonneur, doublon_id)
+    if candidat is None:
+        raise HTTPException(status_code=404, detail="doublon not found")
+    if candidat.statut != "A_EXAMINER":
+        raise HTTPException(status_code=409, detail=f"doublon déjà traité ({candidat.statut})")
+    return candidat
+
+
+@router.post("/doublons/{doublon_id}/fusionner", response_model=FusionOut)
+def fusionner_doublon(
+    doublon_id: uuid.UUID,
+    payload: FusionCreate | None = None,
+    db: Session = Depends(get_db),
+    _user: UserAccount | None = Depends(require_auth_in_production),
+) -> FusionOut:
+    candidat = _candidat(db, doublon_id)
+    paire = (candidat.donneur_id, candidat.doublon_id)
+    conserver_id = payload.conserver_id if payload and payload.conserver_id else paire[0]
+    if conserver_id not in paire:
+        raise HTTPException(
+            status_code=422, detail="conserver_id doit désigner une fiche de la paire"
+        )
+    supprime_id = paire[1] if conserver_id == paire[0] else paire[0]
+    survivant, doublon = db.get(Donneur, conserver_id), db.get(Donneur, supprime_id)
+    if survivant is None or doublon is None:
+        raise HTTPException(status_code=404, detail="donneur not found")
+
+    # Décision enregistrée d'abord : la fusion écarte les autres paires encore à examiner
+    candidat.statut = "FUSIONNE"
+    candidat.decided_at = dt.datetime.now(dt.timezone.utc)
+    db.flush()
+    lignes = dedup.merge(db, survivant, doublon)
+    log_event(
+        db,
+        aggregate_type="donneur",
+        aggregate_id=survivant.id,
+        event_type="donneur.fusionne",
+        payload={"supprime_id": str(supprime_id), "lignes_reprises": lignes},
     )
+    db.commit()
+    return FusionOut(donneur_id=survivant.id, supprime_id=supprime_id, lignes_reprises=lignes)
+
+
+@router.post("/doublons/{doublon_id}/rejeter", response_model=DoublonOut)
+def rejeter_doublon(
+    doublon_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    _user: UserAccount | None = Depends(require_auth_in_production),
+) -> DoublonDonneur:
+    candidat = _candidat(db, doublon_id)
+    candidat.statut = "REJETE"
+    candidat.decided_at = dt.datetime.now(dt.timezone.utc)
+    db.commit()
+    db.refresh(candidat)
+    return candidat
 
 
 @router.get("/{donneur_id}", response_model=DonneurOut)
@@ -104,7 +312,7 @@ def get_donneur(donneur_id: str, db: Session = Depends(get_db)) -> Donneur:
 
 @router.put("/{donneur_id}", response_model=DonneurOut)
 def update_donneur(
-    donneur_id: str,
+    donneur_id: uuid.UUID,
     payload: DonneurUpdate,
     db: Session = Depends(get_db),
     _user: UserAccount | None = Depends(require_auth_in_production),
@@ -114,6 +322,14 @@ def update_donneur(
         raise HTTPException(status_code=404, detail="donneur not found")
 
     if payload.cni is not None:
+        # Pendant une rotation, un autre donneur peut porter l'ancienne empreinte
+        autre = db.execute(
+            select(Donneur.id).where(
+                dedup.cni_filter(cni_hash_candidates(payload.cni)), Donneur.id != row.id
+            )
+        ).first()
+        if autre is not None:
+            raise HTTPException(status_code=409, detail="CNI déjà attribuée à un autre donneur")
         # Update only the hash, not the plaintext CNI (privacy/GDPR)
         row.cni_hash = hash_cni(payload.cni)
 
@@ -123,6 +339,7 @@ def update_donneur(
         row.prenom = payload.prenom
     if payload.sexe is not None:
         row.sexe = payload.sexe
+        refresh_eligible_le(db, row)
     if payload.date_naissance is not None:
         row.date_naissance = payload.date_naissance
     if payload.groupe_sanguin is not None:
@@ -147,7 +364,7 @@ def update_donneur(
 
 @router.get("/{donneur_id}/eligibilite", response_model=EligibiliteOut)
 def eligibilite(
-    donneur_id: str,
+    donneur_id: uuid.UUID,
     as_of: dt.date | None = Query(default=None),
     db: Session = Depends(get_db),
 ) -> EligibiliteOut:
@@ -155,21 +372,24 @@ def eligibilite(
     if row is None:
         raise HTTPException(status_code=404, detail="donneur not found")
     ref_date = as_of or dt.date.today()
-    if row.dernier_don is None:
+    eligible_le = compute_eligible_le(row.sexe, row.dernier_don, donor_reactions(db, row.id))
+    if eligible_le is None:
         return EligibiliteOut(
             eligible=True,
             eligible_le=None,
             raison="Premier don — aucun délai requis",
         )
-    months = 2 if row.sexe == "H" else 4
-    eligible_le = add_months(row.dernier_don, months)
+    months = delai_inter_don(row.sexe)
     is_eligible = ref_date >= eligible_le
     delai = (eligible_le - ref_date).days if not is_eligible else None
-    raison = (
-        "Éligible au don"
-        if is_eligible
-        else f"Délai inter-don non respecté ({months * 30} jours minimum)"
-    )
+    if is_eligible:
+        raison = "Éligible au don"
+    elif eligible_le == DEFINITIF:
+        raison = "Ajournement définitif (réaction adverse avec séquelle)"
+    elif row.dernier_don is None or eligible_le > add_months(row.dernier_don, months):
+        raison = "Ajournement après réaction adverse"
+    else:
+        raison = f"Délai inter-don non respecté ({months * 30} jours minimum)"
     return EligibiliteOut(
         eligible=is_eligible,
         eligible_le=eligible_le,
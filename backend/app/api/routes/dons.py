@@ -9,7 +9,9 @@ from sqlalchemy.orm import Session, joinedload
 from app.api.deps import require_auth_in_production
 from app.audit.events import log_event
 from app.core.din import generate_din
+from app.core.eligibility import refresh_eligible_le
 from app.core.idempotency import get_idempotent_response, store_idempotent_response
+from app.core.loyalty import accrue_don
 from app.db.models import Don, Donneur, Poche, UserAccount
 from app.db.session import get_db
 from app.schemas.dons import DonCreate, DonOut, EtiquetteOut
@@ -49,6 +51,7 @@ def create_don(
     db.add(don)
 
     donneur.dernier_don = payload.date_don
+    refresh_eligible_le(db, donneur)
 
     poche = Poche(
         don=don,
@@ -59,6 +62,8 @@ def create_don(
         statut_distribution="NON_DISTRIBUABLE",
     )
     db.add(poche)
+    db.flush()
+    accrue_don(db, don)
 
     db.commit()
     db.refresh(don)
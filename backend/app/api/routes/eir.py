@@ -1,11 +1,14 @@
+import datetime as dt
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from app.api.deps import require_auth_in_production
 from app.audit.events import log_event
+from app.core.cache import cached_json_response
+from app.core.stats import grouped_counts, period_filters
 from app.db.models import EIR, ActeTransfusionnel, UserAccount
 from app.db.session import get_db
 from app.schemas.eir import EIRCreate, EIROut, EIRUpdate
@@ -68,26 +71,37 @@ def list_eir(
 
 
 @router.get("/statistiques")
-def statistiques_eir(db: Session = Depends(get_db)) -> dict:
-    total = db.execute(select(func.count(EIR.id))).scalar() or 0
-    by_type = dict(
-        db.execute(select(EIR.type_eir, func.count(EIR.id)).group_by(EIR.type_eir)).all()
-    )
-    by_gravite = dict(
-        db.execute(select(EIR.gravite, func.count(EIR.id)).group_by(EIR.gravite)).all()
-    )
-    ouvertes = (
-        db.execute(
-            select(func.count(EIR.id)).where(EIR.statut_investigation != "CLOTUREE")
-        ).scalar()
-        or 0
+def statistiques_eir(
+    request: Request,
+    start_date: dt.date | None = Query(default=None),
+    end_date: dt.date | None = Query(default=None),
+    hopital_id: uuid.UUID | None = Query(default=None),
+    db: Session = Depends(get_db),
+) -> Response:
+    def build() -> dict:
+        stmt = select(
+            EIR.type_eir.label("par_type"),
+            EIR.gravite.label("par_gravite"),
+            (EIR.statut_investigation != "CLOTUREE").label("investigations_ouvertes"),
+        ).where(
+            *period_filters(
+                func.coalesce(EIR.date_declaration, EIR.created_at), start_date, end_date
+            )
+        )
+        if hopital_id is not None:
+            stmt = stmt.join(
+                ActeTransfusionnel, ActeTransfusionnel.id == EIR.acte_transfusionnel_id
+            ).where(ActeTransfusionnel.hopital_id == hopital_id)
+        return grouped_counts(
+            db,
+            stmt,
+            dimensions=("par_type", "par_gravite"),
+            mesures=("investigations_ouvertes",),
+        )
+
+    return cached_json_response(
+        request, namespace="stats.eir", key=f"{start_date}:{end_date}:{hopital_id}", build=build
     )
-    return {
-        "total": total,
-        "par_type": by_type,
-        "par_gravite": by_gravite,
-        "investigations_ouvertes": ouvertes,
-    }
 
 
 @router.get("/{eir_id}", response_model=EIROut)
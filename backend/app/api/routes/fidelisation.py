@@ -2,10 +2,12 @@ import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.api.deps import require_auth_in_production
 from app.audit.events import log_event
+from app.core import loyalty
 from app.db.models import (
     CampagneRecrutement,
     CarteDonneur,
@@ -112,28 +114,20 @@ def ajouter_points(
     db: Session = Depends(get_db),
     _user: UserAccount | None = Depends(require_auth_in_production),
 ) -> PointsHistorique:
-    carte = db.get(CarteDonneur, payload.carte_id)
-    if carte is None:
+    try:
+        entry = loyalty.append(db, **payload.model_dump())
+    except LookupError:
         raise HTTPException(status_code=404, detail="carte introuvable")
+    except loyalty.SoldeInsuffisant:
+        raise HTTPException(status_code=409, detail="solde de points insuffisant")
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="ce don est deja credite")
 
-    entry = PointsHistorique(**payload.model_dump())
-    db.add(entry)
-
-    carte.points += payload.points
-
-    # Update level based on total points
-    if carte.points >= 1000:
-        carte.niveau = "PLATINE"
-    elif carte.points >= 500:
-        carte.niveau = "OR"
-    elif carte.points >= 200:
-        carte.niveau = "ARGENT"
-
-    db.flush()
     log_event(
         db,
         aggregate_type="carte_donneur",
-        aggregate_id=carte.id,
+        aggregate_id=payload.carte_id,
         event_type="points.ajoutes",
         payload={"points": payload.points, "type": payload.type_operation},
     )
@@ -159,6 +153,35 @@ def historique_points(
     return list(db.execute(stmt).scalars())
 
 
+@router.get("/classement", response_model=list[CarteDonneurOut])
+def classement(
+    niveau: str | None = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=500),
+    db: Session = Depends(get_db),
+) -> list[CarteDonneur]:
+    """Meilleurs soldes, lus par l'index du classement."""
+    stmt = select(CarteDonneur)
+    if niveau:
+        stmt = stmt.where(CarteDonneur.niveau == niveau)
+    stmt = stmt.order_by(CarteDonneur.points.desc(), CarteDonneur.id.desc()).limit(limit)
+    return list(db.execute(stmt).scalars())
+
+
+@router.post("/recalcul")
+def recalcul_soldes(
+    db: Session = Depends(get_db),
+    _user: UserAccount | None = Depends(require_auth_in_production),
+) -> dict:
+    """Recalcule tous les soldes depuis le grand livre.
+
+    Le rattrapage des dons antérieurs au grand livre est une opération unique :
+    tâche ``app.tasks.maintenance.backfill_loyalty``.
+    """
+    cartes = loyalty.recompute(db)
+    db.commit()
+    return {"cartes": cartes}
+
+
 # ── Campagnes de Recrutement ─────────────────
 
 
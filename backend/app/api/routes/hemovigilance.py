@@ -3,28 +3,39 @@ import uuid
 import csv
 import io
 import datetime as dt
+from collections.abc import Iterator
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import PlainTextResponse
-from sqlalchemy import String, cast, func, or_, select
+from fastapi.responses import StreamingResponse
+from sqlalchemy import String, cast, or_, select
 from sqlalchemy.orm import Session
 
 from app.api.deps import require_auth_in_production
 from app.audit.events import TraceEvent, log_event
+from app.core.dates import add_months
+from app.core.dhis2 import normalize_periode
+from app.core.hemovigilance import (
+    EIR_GRAVITE,
+    RAPPELS_LOT,
+    RAPPELS_STATUT,
+    TRANSFUSIONS_HOPITAL,
+    rapport_periode,
+)
+from app.core.lineage import impacts_aggregate_stmt, impacts_stmt, lineage_cte
 from app.core.sync_cursor import decode_cursor, encode_cursor
 from app.db.models import (
     ActeTransfusionnel,
-    Commande,
     Don,
     Poche,
     RappelAction,
     RappelLot,
-    Reservation,
     UserAccount,
 )
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.schemas.hemovigilance import (
     ActeTransfusionnelOut,
+    EIRGraviteStat,
+    HemovigilanceMoisStat,
     ImpactRappelOut,
     PartenaireFluxOut,
     PartenaireEventOut,
@@ -69,72 +80,48 @@ def _log_rappel_action(
     )
 
 
-def _compute_impacts(db: Session, *, rappel: RappelLot, limit: int) -> list[ImpactRappelOut]:
-    stmt = (
-        select(
-            Poche.id,
-            Poche.don_id,
-            Don.din,
-            Poche.type_produit,
-            Poche.lot,
-            Poche.statut_distribution,
-            ActeTransfusionnel.hopital_id,
-            ActeTransfusionnel.receveur_id,
-            ActeTransfusionnel.commande_id,
-            ActeTransfusionnel.date_transfusion,
-            Reservation.commande_id.label("commande_reservation_id"),
-            Reservation.receveur_id.label("receveur_reservation_id"),
-            Commande.hopital_id.label("hopital_reservation_id"),
-        )
-        .join(Don, Don.id == Poche.don_id)
-        .outerjoin(ActeTransfusionnel, ActeTransfusionnel.poche_id == Poche.id)
-        .outerjoin(
-            Reservation,
-            (Reservation.poche_id == Poche.id) & (Reservation.released_at.is_(None)),
-        )
-        .outerjoin(Commande, Commande.id == Reservation.commande_id)
-    )
-    if rappel.type_cible == "DIN":
-        stmt = stmt.where(Don.din == rappel.valeur_cible)
-    elif rappel.type_cible == "LOT":
-        stmt = stmt.where(Poche.lot == rappel.valeur_cible)
-    else:
+def _lineage(rappel: RappelLot):
+    try:
+        return lineage_cte(rappel.type_cible, rappel.valeur_cible)
+    except ValueError:
         raise HTTPException(status_code=409, detail="type_cible invalide")
 
-    stmt = stmt.order_by(Poche.created_at.desc()).limit(limit)
-    rows = list(db.execute(stmt).all())
 
-    out: list[ImpactRappelOut] = []
-    for (
-        poche_id,
-        don_id,
-        din_value,
-        type_produit,
-        lot_value,
-        statut_distribution,
-        hopital_id,
-        receveur_id,
-        commande_id,
-        date_transfusion,
-        commande_reservation_id,
-        receveur_reservation_id,
-        hopital_reservation_id,
-    ) in rows:
-        out.append(
-            ImpactRappelOut(
-                poche_id=poche_id,
-                don_id=don_id,
-                din=din_value,
-                type_produit=type_produit,
-                lot=lot_value,
-                statut_distribution=statut_distribution,
-                hopital_id=hopital_id or hopital_reservation_id,
-                receveur_id=receveur_id or receveur_reservation_id,
-                commande_id=commande_id or commande_reservation_id,
-                date_transfusion=date_transfusion,
-            )
-        )
-    return out
+def _get_rappel(db: Session, rappel_id: uuid.UUID) -> RappelLot:
+    rappel = db.get(RappelLot, rappel_id)
+    if rappel is None:
+        raise HTTPException(status_code=404, detail="rappel introuvable")
+    return rappel
+
+
+def _iter_impacts_json(rows) -> Iterator[str]:
+    yield "["
+    for i, row in enumerate(rows):
+        yield ("," if i else "") + ImpactRappelOut.model_validate(row._mapping).model_dump_json()
+    yield "]"
+
+
+def _iter_csv(fieldnames: list[str], rows) -> Iterator[str]:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(fieldnames)
+    for row in rows:
+        w.writerow(["" if row[f] is None else str(row[f]) for f in fieldnames])
+        if buf.tell() > 64 * 1024:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def _export_impacts(db: Session, rappel_id: uuid.UUID, *, dimension: str, format: str):
+    rappel = _get_rappel(db, rappel_id)
+    stmt = impacts_aggregate_stmt(_lineage(rappel), dimension)
+    rows = [dict(r._mapping) for r in db.execute(stmt)]
+    if format == "json":
+        return rows
+    fieldnames = [dimension, "total", "distribuees", "reservees", "autres"]
+    return StreamingResponse(_iter_csv(fieldnames, rows), media_type="text/csv")
 
 
 @router.get("/transfusions", response_model=list[ActeTransfusionnelOut])
@@ -270,39 +257,173 @@ def list_rappel_actions(
     return list(db.execute(stmt).scalars())
 
 
-@router.get("/rapports/autorites", response_model=RapportAutoriteOut)
-def rapport_autorites(db: Session = Depends(get_db)) -> RapportAutoriteOut:
-    rappels_rows = list(
-        db.execute(select(RappelLot.statut, func.count()).group_by(RappelLot.statut)).all()
-    )
-    transfusions_rows = list(
-        db.execute(
-            select(ActeTransfusionnel.hopital_id, func.count()).group_by(
-                ActeTransfusionnel.hopital_id
-            )
-        ).all()
-    )
-    rappels_lot_rows = list(db.execute(select(Poche.lot, func.count()).group_by(Poche.lot)).all())
+def _bornes_rapport(debut: str | None, fin: str | None) -> tuple[str, str]:
+    try:
+        fin_value = normalize_periode(fin) if fin else _now_utc().strftime("%Y%m")
+        if debut:
+            debut_value = normalize_periode(debut)
+        else:
+            # 12 mois glissants par défaut
+            debut_value = add_months(
+                dt.date(int(fin_value[:4]), int(fin_value[4:]), 1), -11
+            ).strftime("%Y%m")
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    if debut_value > fin_value:
+        raise HTTPException(status_code=422, detail="debut postérieur à fin")
+    return debut_value, fin_value
+
+
+def _build_rapport(
+    debut: str, fin: str, agregats: dict[str, list[tuple[str, str, int]]]
+) -> RapportAutoriteOut:
+    def totaux(dimension: str) -> list[tuple[str, int]]:
+        acc: dict[str, int] = {}
+        for _mois, cle, total in agregats[dimension]:
+            acc[cle] = acc.get(cle, 0) + total
+        return sorted(acc.items())
+
+    par_mois: dict[str, HemovigilanceMoisStat] = {}
+    for dimension, champ in (
+        (TRANSFUSIONS_HOPITAL, "transfusions"),
+        (RAPPELS_STATUT, "rappels"),
+        (EIR_GRAVITE, "eir"),
+    ):
+        for mois, _cle, total in agregats[dimension]:
+            stat = par_mois.setdefault(mois, HemovigilanceMoisStat(mois=mois))
+            setattr(stat, champ, getattr(stat, champ) + total)
 
     return RapportAutoriteOut(
         generated_at=_now_utc(),
+        periode_debut=debut,
+        periode_fin=fin,
         rappels_par_statut=[
-            RappelStatutStat(statut=statut, total=total) for statut, total in rappels_rows
+            RappelStatutStat(statut=statut, total=total) for statut, total in totaux(RAPPELS_STATUT)
         ],
         transfusions_par_hopital=[
-            TransfusionHopitalStat(hopital_id=hopital_id, total=total)
-            for hopital_id, total in transfusions_rows
+            TransfusionHopitalStat(hopital_id=uuid.UUID(cle) if cle else None, total=total)
+            for cle, total in totaux(TRANSFUSIONS_HOPITAL)
+        ],
+        rappels_par_lot=[
+            RappelLotStat(lot=cle or None, total=total) for cle, total in totaux(RAPPELS_LOT)
         ],
-        rappels_par_lot=[RappelLotStat(lot=lot, total=total) for lot, total in rappels_lot_rows],
+        eir_par_gravite=[
+            EIRGraviteStat(gravite=cle or None, total=total) for cle, total in totaux(EIR_GRAVITE)
+        ],
+        par_mois=[par_mois[m] for m in sorted(par_mois)],
     )
 
 
+def _iter_rapport_csv(agregats: dict[str, list[tuple[str, str, int]]]) -> Iterator[str]:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(["mois", "dimension", "cle", "total"])
+    for dimension, rows in agregats.items():
+        for mois, cle, total in rows:
+            w.writerow([mois, dimension, cle, total])
+            if buf.tell() > 64 * 1024:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+    yield buf.getvalue()
+
+
+def _rapport_pdf(rapport: RapportAutoriteOut) -> bytes:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    style = TableStyle(
+        [
+            ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ]
+    )
+    sections = [
+        (
+            "Activité mensuelle",
+            ["Mois", "Transfusions", "Rappels", "EIR"],
+            [[m.mois, m.transfusions, m.rappels, m.eir] for m in rapport.par_mois],
+        ),
+        (
+            "Rappels par statut",
+            ["Statut", "Total"],
+            [[r.statut, r.total] for r in rapport.rappels_par_statut],
+        ),
+        ("Rappels par lot", ["Lot", "Total"], [[r.lot, r.total] for r in rapport.rappels_par_lot]),
+        (
+            "Transfusions par hôpital",
+            ["Hôpital", "Total"],
+            [[str(r.hopital_id or "-"), r.total] for r in rapport.transfusions_par_hopital],
+        ),
+        (
+            "EIR par gravité",
+            ["Gravité", "Total"],
+            [[r.gravite, r.total] for r in rapport.eir_par_gravite],
+        ),
+    ]
+
+    elements = [
+        Paragraph("Rapport d'hémovigilance", styles["Title"]),
+        Paragraph(
+            f"Période {rapport.periode_debut} – {rapport.periode_fin}, "
+            f"généré le {rapport.generated_at:%Y-%m-%d %H:%M} UTC",
+            styles["Normal"],
+        ),
+    ]
+    for titre, entetes, lignes in sections:
+        elements += [Spacer(1, 12), Paragraph(titre, styles["Heading2"])]
+        if lignes:
+            table = Table([entetes, *lignes])
+            table.setStyle(style)
+            elements.append(table)
+        else:
+            elements.append(Paragraph("Aucune donnée", styles["Normal"]))
+
+    buf = io.BytesIO()
+    SimpleDocTemplate(buf, pagesize=A4).build(elements)
+    return buf.getvalue()
+
+
+@router.get("/rapports/autorites", response_model=RapportAutoriteOut)
+def rapport_autorites(
+    debut: str | None = Query(default=None, description="YYYY-MM (défaut: fin - 11 mois)"),
+    fin: str | None = Query(default=None, description="YYYY-MM (défaut: mois en cours)"),
+    format: str = Query(default="json", pattern="^(json|csv|pdf)$"),
+    db: Session = Depends(get_read_db),
+):
+    debut_value, fin_value = _bornes_rapport(debut, fin)
+    agregats = rapport_periode(db, debut=debut_value, fin=fin_value)
+    filename = f"rapport_hemovigilance_{debut_value}_{fin_value}"
+
+    if format == "csv":
+        return StreamingResponse(
+            _iter_rapport_csv(agregats),
+            media_type="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={filename}.csv"},
+        )
+
+    rapport = _build_rapport(debut_value, fin_value, agregats)
+    if format == "pdf":
+        pdf = _rapport_pdf(rapport)
+        return StreamingResponse(
+            (pdf[i : i + 64 * 1024] for i in range(0, len(pdf), 64 * 1024)),
+            media_type="application/pdf",
+            headers={"Content-Disposition": f"attachment; filename={filename}.pdf"},
+        )
+    return rapport
+
+
 @router.get("/partenaires/flux", response_model=PartenaireFluxOut)
 def flux_partenaires(
     cursor: str | None = Query(default=None),
     hopital_id: uuid.UUID | None = Query(default=None),
     limit: int = Query(default=200, ge=1, le=1000),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> PartenaireFluxOut:
     stmt = (
         select(TraceEvent)
@@ -436,120 +557,37 @@ def cloturer_rappel(
 @router.get("/rappels/{rappel_id}/impacts", response_model=list[ImpactRappelOut])
 def impacts_rappel(
     rappel_id: uuid.UUID,
-    limit: int = Query(default=500, le=2000),
-    db: Session = Depends(get_db),
-) -> list[ImpactRappelOut]:
-    rappel = db.get(RappelLot, rappel_id)
-    if rappel is None:
-        raise HTTPException(status_code=404, detail="rappel introuvable")
-    return _compute_impacts(db, rappel=rappel, limit=limit)
+    limit: int | None = Query(default=None, ge=1, description="toutes les poches si absent"),
+    format: str = Query(default="json", pattern="^(json|csv)$"),
+    db: Session = Depends(get_read_db),
+) -> StreamingResponse:
+    """Poches impactées par le rappel, dérivés de fractionnement compris, en streaming."""
+    rappel = _get_rappel(db, rappel_id)
+    stmt = impacts_stmt(_lineage(rappel)).order_by(Poche.created_at.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    rows = db.execute(stmt.execution_options(yield_per=1000))
+    if format == "csv":
+        return StreamingResponse(
+            _iter_csv(list(ImpactRappelOut.model_fields), (r._mapping for r in rows)),
+            media_type="text/csv",
+        )
+    return StreamingResponse(_iter_impacts_json(rows), media_type="application/json")
 
 
 @router.get("/rappels/{rappel_id}/export/hopitaux")
 def export_impacts_hopitaux(
     rappel_id: uuid.UUID,
     format: str = Query(default="json", pattern="^(json|csv)$"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    rappel = db.get(RappelLot, rappel_id)
-    if rappel is None:
-        raise HTTPException(status_code=404, detail="rappel introuvable")
-    impacts = _compute_impacts(db, rappel=rappel, limit=2000)
-    agg: dict[str, dict] = {}
-    for it in impacts:
-        key = str(it.hopital_id) if it.hopital_id is not None else "NONE"
-        row = agg.setdefault(
-            key,
-            {
-                "hopital_id": it.hopital_id,
-                "total": 0,
-                "distribuees": 0,
-                "reservees": 0,
-                "autres": 0,
-            },
-        )
-        row["total"] += 1
-        if it.statut_distribution == "DISTRIBUE":
-            row["distribuees"] += 1
-        elif it.statut_distribution == "RESERVE":
-            row["reservees"] += 1
-        else:
-            row["autres"] += 1
-
-    rows = list(agg.values())
-    rows.sort(key=lambda r: (r["hopital_id"] is None, str(r["hopital_id"])))
-
-    if format == "json":
-        return rows
-
-    buf = io.StringIO()
-    w = csv.DictWriter(
-        buf, fieldnames=["hopital_id", "total", "distribuees", "reservees", "autres"]
-    )
-    w.writeheader()
-    for r in rows:
-        w.writerow(
-            {
-                "hopital_id": str(r["hopital_id"]) if r["hopital_id"] is not None else "",
-                "total": r["total"],
-                "distribuees": r["distribuees"],
-                "reservees": r["reservees"],
-                "autres": r["autres"],
-            }
-        )
-    return PlainTextResponse(buf.getvalue(), media_type="text/csv")
+    return _export_impacts(db, rappel_id, dimension="hopital_id", format=format)
 
 
 @router.get("/rappels/{rappel_id}/export/receveurs")
 def export_impacts_receveurs(
     rappel_id: uuid.UUID,
     format: str = Query(default="json", pattern="^(json|csv)$"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    rappel = db.get(RappelLot, rappel_id)
-    if rappel is None:
-        raise HTTPException(status_code=404, detail="rappel introuvable")
-    impacts = _compute_impacts(db, rappel=rappel, limit=2000)
-    agg: dict[str, dict] = {}
-    for it in impacts:
-        key = str(it.receveur_id) if it.receveur_id is not None else "NONE"
-        row = agg.setdefault(
-            key,
-            {
-                "receveur_id": it.receveur_id,
-                "total": 0,
-                "distribuees": 0,
-                "reservees": 0,
-                "autres": 0,
-            },
-        )
-        row["total"] += 1
-        if it.statut_distribution == "DISTRIBUE":
-            row["distribuees"] += 1
-        elif it.statut_distribution == "RESERVE":
-            row["reservees"] += 1
-        else:
-            row["autres"] += 1
-
-    rows = list(agg.values())
-    rows.sort(key=lambda r: (r["receveur_id"] is None, str(r["receveur_id"])))
-
-    if format == "json":
-        return rows
-
-    buf = io.StringIO()
-    w = csv.DictWriter(
-        buf, fieldnames=["receveur_id", "total", "distribuees", "reservees", "autres"]
-    )
-    w.writeheader()
-    for r in rows:
-        w.writerow(
-            {
-                "receveur_id": str(r["receveur_id"]) if r["receveur_id"] is not None else "",
-                "total": r["total"],
-                "distribuees": r["distribuees"],
-                "reservees": r["reservees"],
-                "autres": r["autres"],
-            }
-        )
-    return PlainTextResponse(buf.getvalue(), media_type="text/csv")
+    return _export_impacts(db, rappel_id, dimension="receveur_id", format=format)
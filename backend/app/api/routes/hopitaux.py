@@ -1,10 +1,11 @@
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api.deps import require_auth_in_production
+from app.core.cache import cached_json_response
 from app.db.models import Hopital, UserAccount
 from app.db.session import get_db
 from app.schemas.hopitaux import HopitalCreate, HopitalOut, HopitalUpdate
@@ -36,15 +37,23 @@ def create_hopital(
 
 @router.get("", response_model=list[HopitalOut])
 def list_hopitaux(
+    request: Request,
     convention_actif: bool | None = Query(default=None),
     limit: int = Query(default=200, le=500),
     db: Session = Depends(get_db),
-) -> list[Hopital]:
-    stmt = select(Hopital)
-    if convention_actif is not None:
-        stmt = stmt.where(Hopital.convention_actif.is_(convention_actif))
-    stmt = stmt.order_by(Hopital.nom.asc()).limit(limit)
-    return list(db.execute(stmt).scalars())
+) -> Response:
+    def build() -> list[dict]:
+        stmt = select(Hopital)
+        if convention_actif is not None:
+            stmt = stmt.where(Hopital.convention_actif.is_(convention_actif))
+        stmt = stmt.order_by(Hopital.nom.asc()).limit(limit)
+        return [
+            HopitalOut.model_validate(h).model_dump(mode="json") for h in db.execute(stmt).scalars()
+        ]
+
+    return cached_json_response(
+        request, namespace="hopitaux", key=f"{convention_actif}:{limit}", build=build
+    )
 
 
 @router.get("/{hopital_id}", response_model=HopitalOut)
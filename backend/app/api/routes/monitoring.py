@@ -1,57 +1,152 @@
-import random
+import time
+from http import HTTPStatus
 from typing import Any
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.core.monitoring import Point, celery_queue_depth, sampler
+from app.db.instrumentation import recent_slow_queries, slow_query_count
+from app.db.models import SyncIngestedEvent
+from app.db.session import get_db, pool_stats
 from app.schemas import metrics as schemas
 
 router = APIRouter()
 
+_STARTED_AT = time.monotonic()
 
-@router.get("/dashboard", response_model=schemas.MonitoringDashboard)
-async def get_monitoring_dashboard() -> Any:
-    """
-    Get monitoring dashboard data.
-    """
-    # Generate mock data
-    metrics = [
-        schemas.MetricPoint(
-            time=f"{i}:00",
-            requests=random.randint(100, 600),
-            errors=random.randint(0, 20),
-            latency=random.randint(20, 120),
-        )
-        for i in range(24)
-    ]
 
+def _format_uptime(seconds: float) -> str:
+    minutes, _ = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    return f"{days}j {hours:02d}h {minutes:02d}min" if days else f"{hours}h {minutes:02d}min"
+
+
+def _metric_point(point: Point) -> schemas.MetricPoint:
+    return schemas.MetricPoint(
+        time=point.at.strftime("%H:%M"),
+        requests=point.requests,
+        errors=point.errors,
+        latency=round(point.latency_avg_ms or 0),
+        latency_p95=point.latency_p95_ms,
+        latency_p99=point.latency_p99_ms,
+        slow_queries=point.slow_queries,
+        db_checked_out=point.db_checked_out,
+        celery_queue_depth=point.celery_queue_depth,
+        sync_lag_p95_seconds=point.sync_lag_p95_seconds,
+    )
+
+
+def _services(
+    db: Session, pools: list[dict], queue_depth: int | None
+) -> list[schemas.ServiceStatus]:
     services = [
         schemas.ServiceStatus(
-            name="API Gateway", status="healthy", uptime="99.99%", version="v1.2.0"
-        ),
-        schemas.ServiceStatus(
-            name="Auth Service", status="healthy", uptime="99.95%", version="v1.1.5"
-        ),
+            name="API",
+            status="healthy",
+            uptime=_format_uptime(time.monotonic() - _STARTED_AT),
+            version=settings.api_version,
+        )
+    ]
+
+    dialect = db.get_bind().dialect
+    try:
+        db.execute(text("SELECT 1"))
+        db_status = "healthy"
+    except SQLAlchemyError:
+        db_status = "down"
+    server_version = ".".join(str(v) for v in dialect.server_version_info or ())
+    services.append(
         schemas.ServiceStatus(
-            name="Stock Service", status="degraded", uptime="98.50%", version="v2.0.1"
-        ),
+            name="Base de données",
+            status=db_status,
+            uptime="-",
+            version=f"{dialect.name} {server_version}".strip(),
+        )
+    )
+
+    for stats in pools:
+        if "lag_seconds" not in stats:
+            continue
+        lag = stats["lag_seconds"]
+        if lag is None:
+            replica_status = "unknown"
+        elif lag <= settings.db_replica_max_lag_seconds:
+            replica_status = "healthy"
+        else:
+            replica_status = "degraded"
+        services.append(
+            schemas.ServiceStatus(
+                name=f"Réplica {stats['pool']}", status=replica_status, uptime="-", version="-"
+            )
+        )
+
+    services.append(
         schemas.ServiceStatus(
-            name="Notification Service", status="healthy", uptime="99.99%", version="v1.0.2"
-        ),
-    ]
+            name="Celery (Redis)",
+            status="healthy" if queue_depth is not None else "down",
+            uptime="-",
+            version="-",
+        )
+    )
+    return services
+
+
+def _error_distribution(status_counts: dict[str, int]) -> list[schemas.ErrorDistribution]:
+    errors = []
+    for code, count in status_counts.items():
+        if not code.isdigit() or int(code) < 400 or not count:
+            continue
+        try:
+            label = f"{code} {HTTPStatus(int(code)).phrase}"
+        except ValueError:
+            label = code
+        errors.append(schemas.ErrorDistribution(name=label, count=count))
+    return sorted(errors, key=lambda e: e.count, reverse=True)
 
-    errors = [
-        schemas.ErrorDistribution(name="500 Internal Error", count=45),
-        schemas.ErrorDistribution(name="401 Unauthorized", count=120),
-        schemas.ErrorDistribution(name="404 Not Found", count=80),
-        schemas.ErrorDistribution(name="400 Bad Request", count=200),
-        schemas.ErrorDistribution(name="503 Service Unavailable", count=15),
-    ]
+
+@router.get("/dashboard", response_model=schemas.MonitoringDashboard)
+def get_monitoring_dashboard(db: Session = Depends(get_db)) -> Any:
+    """
+    Get monitoring dashboard data.
+
+    Série temporelle des dernières 24 h (un point par ``monitoring_sample_seconds``),
+    statistiques par route sur les 15 dernières minutes, pools et requêtes lentes,
+    files Celery et retard d'ingestion de la synchronisation.
+    """
+    sampler.sample_if_due()
+    points = sampler.points()
+    pools = pool_stats()
+    queue_depth = points[-1].celery_queue_depth if points else celery_queue_depth()
+
+    total_requests = sum(p.requests for p in points)
+    total_errors = sum(p.errors for p in points)
+    timed = [(p.latency_avg_ms, p.requests) for p in points if p.latency_avg_ms is not None]
+    timed_requests = sum(n for _, n in timed)
+    avg_latency = sum(avg * n for avg, n in timed) / timed_requests if timed_requests else 0
+    lags = [p.sync_lag_p95_seconds for p in points if p.sync_lag_p95_seconds is not None]
 
     return schemas.MonitoringDashboard(
-        metrics=metrics,
-        services=services,
-        errors=errors,
-        total_requests=1200000,
-        avg_latency=45,
-        error_rate=0.12,
+        metrics=[_metric_point(p) for p in points],
+        services=_services(db, pools, queue_depth),
+        errors=_error_distribution(sampler.status_counts()),
+        total_requests=total_requests,
+        avg_latency=round(avg_latency),
+        error_rate=round(100 * total_errors / total_requests, 2) if total_requests else 0.0,
+        routes=[schemas.RouteMetrics(**r) for r in sampler.route_stats()],
+        database=schemas.DatabaseMetrics(
+            pools=pools,
+            slow_query_threshold_ms=settings.db_slow_query_ms,
+            slow_queries_total=slow_query_count(),
+            recent_slow_queries=recent_slow_queries(),
+        ),
+        celery_queue_depth=queue_depth,
+        sync=schemas.SyncMetrics(
+            lag_p95_seconds=lags[-1] if lags else None,
+            last_ingested_at=db.scalar(select(func.max(SyncIngestedEvent.created_at))),
+        ),
     )
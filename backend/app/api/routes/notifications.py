@@ -6,9 +6,13 @@ from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_user, require_auth_in_production
 from app.audit.events import log_event
+from app.core.config import settings
+from app.core.notifications import dispatch, insert_notifications
 from app.db.models import Notification, NotificationPreference, UserAccount
 from app.db.session import get_db
 from app.schemas.notifications import (
+    NotificationBulkCreate,
+    NotificationBulkOut,
     NotificationCreate,
     NotificationOut,
     NotificationPreferenceOut,
@@ -49,16 +53,53 @@ def create_notification(
     db.refresh(notif)
 
     # Enqueue sending via Celery (best effort, don't fail if Redis unavailable)
-    try:
-        from app.tasks.notifications import send_notification
-
-        send_notification.delay(str(notif.id))
-    except Exception:
-        pass
+    dispatch([notif.id], notif.canal)
 
     return notif
 
 
+@router.post("/bulk", response_model=NotificationBulkOut, status_code=201)
+def create_notifications_bulk(
+    payload: NotificationBulkCreate,
+    db: Session = Depends(get_db),
+    _user: UserAccount | None = Depends(require_auth_in_production),
+) -> NotificationBulkOut:
+    if len(payload.destinataires) > settings.notification_bulk_max:
+        raise HTTPException(
+            status_code=413,
+            detail=f"au plus {settings.notification_bulk_max} destinataires par envoi",
+        )
+
+    ids = insert_notifications(
+        db,
+        (
+            {
+                "canal": payload.canal,
+                "destinataire": d.destinataire,
+                "template": payload.template,
+                "variables": {**payload.variables, **d.variables},
+                "priorite": payload.priorite,
+                "reference_id": payload.reference_id,
+            }
+            for d in payload.destinataires
+        ),
+    )
+    log_event(
+        db,
+        aggregate_type="notification",
+        aggregate_id=payload.reference_id or ids[0],
+        event_type="notifications.creees",
+        payload={"canal": payload.canal, "template": payload.template, "nombre": len(ids)},
+    )
+    db.commit()
+
+    return NotificationBulkOut(
+        notifications=len(ids),
+        lots=dispatch(ids, payload.canal),
+        reference_id=payload.reference_id,
+    )
+
+
 @router.get("", response_model=list[NotificationOut])
 def list_notifications(
     canal: str | None = Query(default=None),
@@ -104,6 +145,7 @@ def retry_notification(
 
     notif.statut = "EN_ATTENTE"
     notif.erreur = None
+    notif.prochain_essai = None
 
     log_event(
         db,
@@ -115,12 +157,7 @@ def retry_notification(
     db.commit()
     db.refresh(notif)
 
-    try:
-        from app.tasks.notifications import send_notification
-
-        send_notification.delay(str(notif.id))
-    except Exception:
-        pass
+    dispatch([notif.id], notif.canal)
 
     return notif
 
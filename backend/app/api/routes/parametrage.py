@@ -1,10 +1,11 @@
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api.deps import require_auth_in_production
+from app.core.cache import cached_json_response
 from app.db.models import ExpirationRule, UserAccount
 from app.db.session import get_db
 from app.schemas import parametrage as schemas
@@ -12,40 +13,55 @@ from app.schemas import parametrage as schemas
 router = APIRouter()
 
 
+REGIONS = [
+    "Dakar",
+    "Diourbel",
+    "Fatick",
+    "Kaffrine",
+    "Kaolack",
+    "Kédougou",
+    "Kolda",
+    "Louga",
+    "Matam",
+    "Saint-Louis",
+    "Sédhiou",
+    "Tambacounda",
+    "Thiès",
+    "Ziguinchor",
+]
+
+
 @router.get("/regions", response_model=list[str])
-def get_regions() -> list[str]:
+def get_regions(request: Request) -> Response:
     """
     Get list of regions (Senegal).
     """
-    return [
-        "Dakar",
-        "Diourbel",
-        "Fatick",
-        "Kaffrine",
-        "Kaolack",
-        "Kédougou",
-        "Kolda",
-        "Louga",
-        "Matam",
-        "Saint-Louis",
-        "Sédhiou",
-        "Tambacounda",
-        "Thiès",
-        "Ziguinchor",
-    ]
+    return cached_json_response(
+        request, namespace="parametrage.regions", key="all", build=lambda: REGIONS
+    )
 
 
 @router.get("/rules", response_model=list[schemas.ExpirationRule])
 def read_expiration_rules(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
-) -> list[ExpirationRule]:
+) -> Response:
     """
     Retrieve expiration rules.
     """
-    stmt = select(ExpirationRule).offset(skip).limit(limit)
-    return list(db.execute(stmt).scalars())
+
+    def build() -> list[dict]:
+        stmt = select(ExpirationRule).offset(skip).limit(limit)
+        return [
+            schemas.ExpirationRule.model_validate(r).model_dump(mode="json")
+            for r in db.execute(stmt).scalars()
+        ]
+
+    return cached_json_response(
+        request, namespace="parametrage.rules", key=f"{skip}:{limit}", build=build
+    )
 
 
 @router.post("/rules", response_model=schemas.ExpirationRule)
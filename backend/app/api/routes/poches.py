@@ -3,6 +3,7 @@ import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 
 from app.api.deps import require_auth_in_production
@@ -10,7 +11,7 @@ from app.audit.events import log_event
 from app.core.blood import normalize_groupe_sanguin
 from app.core.isbt128.generator import generate_datamatrix_content
 from app.db.models import Don, Hopital, Poche, UserAccount
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
 from app.schemas.etiquettes import EtiquetteProduitOut
 from app.schemas.poches import (
     PocheCreate,
@@ -45,11 +46,11 @@ def _notify_hopitaux_poche_disponible(db: Session, *, poche: Poche, din: str | N
 
 
 @router.get("/disponibles", response_model=list[PocheOut])
-def list_poches_disponibles(
+async def list_poches_disponibles(
     type_produit: str | None = Query(default=None),
     groupe_sanguin: str | None = Query(default=None, max_length=8),
     limit: int = Query(default=200, le=500),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> list[Poche]:
     stmt = select(Poche).where(Poche.statut_distribution == "DISPONIBLE")
     if type_produit is not None:
@@ -57,7 +58,7 @@ def list_poches_disponibles(
     if groupe_sanguin is not None:
         stmt = stmt.where(Poche.groupe_sanguin == normalize_groupe_sanguin(groupe_sanguin))
     stmt = stmt.order_by(Poche.date_peremption.asc(), Poche.created_at.asc()).limit(limit)
-    return list(db.execute(stmt).scalars())
+    return list((await db.execute(stmt)).scalars())
 
 
 @router.post("", response_model=PocheOut, status_code=201)
@@ -1,11 +1,15 @@
+import datetime as dt
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api.deps import require_auth_in_production
 from app.audit.events import log_event
+from app.core.cache import cached_json_response
+from app.core.eligibility import refresh_eligible_le
+from app.core.stats import grouped_counts, period_filters
 from app.db.models import Don, Donneur, ReactionAdverseDonneur, UserAccount
 from app.db.session import get_db
 from app.schemas.reactions_donneur import (
@@ -33,6 +37,7 @@ def create_reaction(
     reaction = ReactionAdverseDonneur(**payload.model_dump())
     db.add(reaction)
     db.flush()
+    refresh_eligible_le(db, donneur)
 
     log_event(
         db,
@@ -73,6 +78,42 @@ def list_reactions(
     )
 
 
+@router.get("/statistiques")
+def statistiques_reactions(
+    request: Request,
+    start_date: dt.date | None = Query(default=None),
+    end_date: dt.date | None = Query(default=None),
+    region: str | None = Query(default=None),
+    db: Session = Depends(get_db),
+) -> Response:
+    def build() -> dict:
+        stmt = select(
+            ReactionAdverseDonneur.type_reaction.label("par_type"),
+            ReactionAdverseDonneur.gravite.label("par_gravite"),
+            ReactionAdverseDonneur.moment.label("par_moment"),
+            (ReactionAdverseDonneur.gravite == "GRAVE").label("graves"),
+            (ReactionAdverseDonneur.evolution == "EN_COURS").label("en_cours"),
+        ).where(*period_filters(ReactionAdverseDonneur.created_at, start_date, end_date))
+        if region is not None:
+            # les dons ne portent pas de site : on filtre sur la région du donneur
+            stmt = stmt.join(Donneur, Donneur.id == ReactionAdverseDonneur.donneur_id).where(
+                Donneur.region == region
+            )
+        return grouped_counts(
+            db,
+            stmt,
+            dimensions=("par_type", "par_gravite", "par_moment"),
+            mesures=("graves", "en_cours"),
+        )
+
+    return cached_json_response(
+        request,
+        namespace="stats.reactions_donneur",
+        key=f"{start_date}:{end_date}:{region}",
+        build=build,
+    )
+
+
 @router.get("/{reaction_id}", response_model=ReactionAdverseDonneurOut)
 def get_reaction(reaction_id: uuid.UUID, db: Session = Depends(get_db)) -> ReactionAdverseDonneur:
     reaction = db.get(ReactionAdverseDonneur, reaction_id)
@@ -94,6 +135,9 @@ def update_reaction(
 
     for field, value in payload.model_dump(exclude_unset=True).items():
         setattr(reaction, field, value)
+    donneur = db.get(Donneur, reaction.donneur_id)
+    if donneur is not None:
+        refresh_eligible_le(db, donneur)
 
     log_event(
         db,
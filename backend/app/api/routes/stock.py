@@ -1,13 +1,14 @@
 import datetime as dt
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import JSONResponse
 from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from app.api.deps import require_auth_in_production
 from app.audit.events import log_event
+from app.core.cache import cached_json_response
 from app.core.config import settings
 from app.core.idempotency import get_idempotent_response, store_idempotent_response
 from app.db.models import (
@@ -42,36 +43,38 @@ from app.schemas.stock import (
 router = APIRouter(prefix="/stock")
 
 
+_DEFAULT_PRODUCT_RULES: dict[str, dict] = {
+    "ST": {
+        "shelf_life_days": 35,
+        "default_volume_ml": 450,
+        "min_volume_ml": 350,
+        "max_volume_ml": 550,
+    },
+    "CGR": {
+        "shelf_life_days": 42,
+        "default_volume_ml": 280,
+        "min_volume_ml": 200,
+        "max_volume_ml": 400,
+    },
+    "PFC": {
+        "shelf_life_days": 365,
+        "default_volume_ml": 200,
+        "min_volume_ml": 120,
+        "max_volume_ml": 400,
+    },
+    "CP": {
+        "shelf_life_days": 5,
+        "default_volume_ml": 60,
+        "min_volume_ml": 40,
+        "max_volume_ml": 120,
+    },
+}
+
+
 def _get_product_rule(db: Session, type_produit: str) -> ProductRule:
     rule = db.get(ProductRule, type_produit)
     if rule is None:
-        defaults: dict[str, dict] = {
-            "ST": {
-                "shelf_life_days": 35,
-                "default_volume_ml": 450,
-                "min_volume_ml": 350,
-                "max_volume_ml": 550,
-            },
-            "CGR": {
-                "shelf_life_days": 42,
-                "default_volume_ml": 280,
-                "min_volume_ml": 200,
-                "max_volume_ml": 400,
-            },
-            "PFC": {
-                "shelf_life_days": 365,
-                "default_volume_ml": 200,
-                "min_volume_ml": 120,
-                "max_volume_ml": 400,
-            },
-            "CP": {
-                "shelf_life_days": 5,
-                "default_volume_ml": 60,
-                "min_volume_ml": 40,
-                "max_volume_ml": 120,
-            },
-        }
-        seed = defaults.get(type_produit)
+        seed = _DEFAULT_PRODUCT_RULES.get(type_produit)
         if seed is None:
             raise HTTPException(status_code=400, detail=f"règle produit manquante: {type_produit}")
         rule = ProductRule(type_produit=type_produit, **seed)
@@ -251,14 +254,22 @@ def fractionner(
 
 
 @router.get("/regles", response_model=list[ProductRuleOut])
-def list_product_rules(db: Session = Depends(get_db)) -> list[ProductRule]:
-    # Ensure default rules exist
-    defaults = ["ST", "CGR", "PFC", "CP"]
-    for type_produit in defaults:
-        _get_product_rule(db, type_produit)
+def list_product_rules(request: Request, db: Session = Depends(get_db)) -> Response:
+    def build() -> list[dict]:
+        rules = list(db.execute(select(ProductRule).order_by(ProductRule.type_produit)).scalars())
+        # Les règles par défaut ne sont créées qu'une fois, en une seule transaction
+        missing = _DEFAULT_PRODUCT_RULES.keys() - {r.type_produit for r in rules}
+        if missing:
+            db.add_all(
+                ProductRule(type_produit=t, **_DEFAULT_PRODUCT_RULES[t]) for t in sorted(missing)
+            )
+            db.commit()
+            rules = list(
+                db.execute(select(ProductRule).order_by(ProductRule.type_produit)).scalars()
+            )
+        return [ProductRuleOut.model_validate(r).model_dump(mode="json") for r in rules]
 
-    stmt = select(ProductRule).order_by(ProductRule.type_produit)
-    return list(db.execute(stmt).scalars())
+    return cached_json_response(request, namespace="stock.regles", key="all", build=build)
 
 
 @router.put("/regles/{type_produit}", response_model=ProductRuleOut)
@@ -292,24 +303,36 @@ def update_product_rule(
 
 @router.get("/recettes", response_model=list[RecetteFractionnementOut])
 def list_recettes(
+    request: Request,
     site_code: str | None = Query(default=None, max_length=32),
     actif: bool = Query(default=True),
     inclure_globales: bool = Query(default=True),
     db: Session = Depends(get_db),
-) -> list[FractionnementRecette]:
-    stmt = select(FractionnementRecette)
-    if actif:
-        stmt = stmt.where(FractionnementRecette.actif.is_(True))
-    if site_code is not None:
-        if inclure_globales:
-            stmt = stmt.where(
-                (FractionnementRecette.site_code == site_code)
-                | (FractionnementRecette.site_code.is_(None))
-            )
-        else:
-            stmt = stmt.where(FractionnementRecette.site_code == site_code)
-    stmt = stmt.order_by(FractionnementRecette.code.asc()).limit(200)
-    return list(db.execute(stmt).scalars())
+) -> Response:
+    def build() -> list[dict]:
+        stmt = select(FractionnementRecette)
+        if actif:
+            stmt = stmt.where(FractionnementRecette.actif.is_(True))
+        if site_code is not None:
+            if inclure_globales:
+                stmt = stmt.where(
+                    (FractionnementRecette.site_code == site_code)
+                    | (FractionnementRecette.site_code.is_(None))
+                )
+            else:
+                stmt = stmt.where(FractionnementRecette.site_code == site_code)
+        stmt = stmt.order_by(FractionnementRecette.code.asc()).limit(200)
+        return [
+            RecetteFractionnementOut.model_validate(r).model_dump(mode="json")
+            for r in db.execute(stmt).scalars()
+        ]
+
+    return cached_json_response(
+        request,
+        namespace="stock.recettes",
+        key=f"{site_code}:{actif}:{inclure_globales}",
+        build=build,
+    )
 
 
 @router.get("/recettes/{code}", response_model=RecetteFractionnementOut)
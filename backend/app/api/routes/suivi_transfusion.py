@@ -1,11 +1,14 @@
+import datetime as dt
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api.deps import require_auth_in_production
 from app.audit.events import log_event
+from app.core.cache import cached_json_response
+from app.core.stats import grouped_counts, period_filters
 from app.db.models import ActeTransfusionnel, SuiviPerTransfusionnel, UserAccount
 from app.db.session import get_db
 from app.schemas.suivi_transfusion import SuiviPerTransfusionnelCreate, SuiviPerTransfusionnelOut
@@ -63,6 +66,34 @@ def list_suivis(
     )
 
 
+@router.get("/statistiques")
+def statistiques_suivis(
+    request: Request,
+    start_date: dt.date | None = Query(default=None),
+    end_date: dt.date | None = Query(default=None),
+    hopital_id: uuid.UUID | None = Query(default=None),
+    db: Session = Depends(get_db),
+) -> Response:
+    def build() -> dict:
+        stmt = select(
+            SuiviPerTransfusionnel.moment.label("par_moment"),
+            SuiviPerTransfusionnel.alerte.label("alertes"),
+        ).where(*period_filters(SuiviPerTransfusionnel.created_at, start_date, end_date))
+        if hopital_id is not None:
+            stmt = stmt.join(
+                ActeTransfusionnel,
+                ActeTransfusionnel.id == SuiviPerTransfusionnel.acte_transfusionnel_id,
+            ).where(ActeTransfusionnel.hopital_id == hopital_id)
+        return grouped_counts(db, stmt, dimensions=("par_moment",), mesures=("alertes",))
+
+    return cached_json_response(
+        request,
+        namespace="stats.suivi_transfusion",
+        key=f"{start_date}:{end_date}:{hopital_id}",
+        build=build,
+    )
+
+
 @router.get("/{suivi_id}", response_model=SuiviPerTransfusionnelOut)
 def get_suivi(suivi_id: uuid.UUID, db: Session = Depends(get_db)) -> SuiviPerTransfusionnel:
     suivi = db.get(SuiviPerTransfusionnel, suivi_id)
@@ -2,14 +2,19 @@ import datetime as dt
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.audit.events import TraceEvent, log_event
+from app.core.dedup import cni_filter
 from app.core.din import generate_din
-from app.core.security import hash_cni
+from app.core.eligibility import refresh_eligible_le
+from app.core.loyalty import accrue_don
+from app.core.metrics import metrics
+from app.core.security import cni_hash_candidates
 from app.core.sync_cursor import decode_cursor, encode_cursor
 from app.db.models import Don, Donneur, Poche, SyncDevice, SyncIngestedEvent
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
 from app.schemas.sync import (
     SyncPullEventOut,
     SyncPullOut,
@@ -20,12 +25,26 @@ from app.schemas.sync import (
 
 router = APIRouter(prefix="/sync")
 
+# Délai entre la saisie hors ligne (occurred_at) et l'ingestion serveur
+_ingestion_lag = metrics.histogram(
+    "sync_ingestion_lag_seconds",
+    buckets=(1, 5, 30, 60, 300, 900, 3600, 21600, 86400, 604800),
+).labels()
+
+
+def _observe_ingestion_lag(occurred_at: dt.datetime | None, now: dt.datetime) -> None:
+    if occurred_at is None:
+        return
+    if occurred_at.tzinfo is None:
+        occurred_at = occurred_at.replace(tzinfo=dt.timezone.utc)
+    _ingestion_lag.observe(max(0.0, (now - occurred_at).total_seconds()))
+
 
 @router.get("/events", response_model=SyncPullOut)
-def pull_events(
+async def pull_events(
     cursor: str | None = Query(default=None),
     limit: int = Query(default=200, ge=1, le=1000),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> SyncPullOut:
     stmt = (
         select(TraceEvent).order_by(TraceEvent.created_at.asc(), TraceEvent.id.asc()).limit(limit)
@@ -39,7 +58,7 @@ def pull_events(
             )
         )
 
-    rows = list(db.execute(stmt).scalars())
+    rows = list((await db.execute(stmt)).scalars())
     next_cursor = (
         encode_cursor(created_at=rows[-1].created_at, event_id=rows[-1].id) if rows else None
     )
@@ -62,6 +81,7 @@ def push_events(payload: SyncPushIn, db: Session = Depends(get_db)) -> SyncPushO
         device.last_seen_at = dt.datetime.now(dt.timezone.utc)
         db.commit()
 
+    received_at = dt.datetime.now(dt.timezone.utc)
     results: list[SyncPushEventResult] = []
     for ev in payload.events:
         existing = db.execute(
@@ -82,6 +102,7 @@ def push_events(payload: SyncPushIn, db: Session = Depends(get_db)) -> SyncPushO
             )
             continue
 
+        _observe_ingestion_lag(ev.occurred_at, received_at)
         try:
             response_json = _apply_mobile_event(
                 db, device_id=payload.device_id, event_type=ev.type, payload=ev.payload
@@ -158,11 +179,15 @@ def _apply_mobile_event(db: Session, *, device_id: str, event_type: str, payload
         if sexe not in {"H", "F"}:
             raise HTTPException(status_code=422, detail="sexe invalide")
 
-        cni_h = hash_cni(str(cni))
-        existing = db.execute(select(Donneur).where(Donneur.cni_hash == cni_h)).scalar_one_or_none()
+        candidates = cni_hash_candidates(str(cni))
+        existing = db.execute(select(Donneur).where(cni_filter(candidates))).scalar_one_or_none()
         if existing is None:
             existing = Donneur(
-                cni_hash=cni_h, nom=str(nom), prenom=str(prenom), sexe=str(sexe), dernier_don=None
+                cni_hash=candidates[0],
+                nom=str(nom),
+                prenom=str(prenom),
+                sexe=str(sexe),
+                dernier_don=None,
             )
             db.add(existing)
             db.commit()
@@ -193,8 +218,8 @@ def _apply_mobile_event(db: Session, *, device_id: str, event_type: str, payload
         except Exception:
             raise HTTPException(status_code=422, detail="date_don invalide")
 
-        cni_h = hash_cni(str(donneur_cni))
-        donneur = db.execute(select(Donneur).where(Donneur.cni_hash == cni_h)).scalar_one_or_none()
+        candidates = cni_hash_candidates(str(donneur_cni))
+        donneur = db.execute(select(Donneur).where(cni_filter(candidates))).scalar_one_or_none()
         if donneur is None:
             raise HTTPException(status_code=409, detail="donneur introuvable (upsert requis)")
 
@@ -208,6 +233,7 @@ def _apply_mobile_event(db: Session, *, device_id: str, event_type: str, payload
         )
         db.add(don)
         donneur.dernier_don = date_don_parsed
+        refresh_eligible_le(db, donneur)
         poche = Poche(
             don=don,
             type_produit="ST",
@@ -218,6 +244,8 @@ def _apply_mobile_event(db: Session, *, device_id: str, event_type: str, payload
             statut_stock="EN_STOCK",
         )
         db.add(poche)
+        db.flush()
+        accrue_don(db, don)
         db.commit()
         db.refresh(don)
         db.refresh(poche)
@@ -4,10 +4,11 @@ import uuid
 from fastapi import APIRouter, Depends, Query
 from fastapi import HTTPException
 from sqlalchemy import String, cast, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.audit.events import TraceEvent
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
 from app.schemas.trace import TraceEventOut
 
 router = APIRouter(prefix="/trace")
@@ -22,7 +23,7 @@ def get_trace_event(event_id: uuid.UUID, db: Session = Depends(get_db)) -> Trace
 
 
 @router.get("/events", response_model=list[TraceEventOut])
-def list_trace_events(
+async def list_trace_events(
     aggregate_type: str | None = Query(default=None, max_length=32),
     aggregate_id: uuid.UUID | None = Query(default=None),
     event_type: str | None = Query(default=None, max_length=64),
@@ -31,7 +32,7 @@ def list_trace_events(
         default=None, description="Pagination: created_at < before (UTC)"
     ),
     limit: int = Query(default=200, le=1000),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> list[TraceEvent]:
     stmt = select(TraceEvent)
     if aggregate_type is not None:
@@ -49,4 +50,4 @@ def list_trace_events(
         else:
             stmt = stmt.where(cast(TraceEvent.payload, String).like(f'%"din": "{din}"%'))
     stmt = stmt.order_by(TraceEvent.created_at.desc()).limit(limit)
-    return list(db.execute(stmt).scalars())
+    return list((await db.execute(stmt)).scalars())
@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
+from app.api.deps import invalidate_user
 from app.audit.events import log_event
 from app.core.passwords import hash_password
 from app.db.models import UserAccount
@@ -155,6 +156,7 @@ def update_user(
 
     if changes:
         db.commit()
+        invalidate_user(user.id)
         db.refresh(user)
 
         # Log event
@@ -190,6 +192,7 @@ def deactivate_user(
 
     user.is_active = False
     db.commit()
+    invalidate_user(user.id)
 
     # Log event
     log_event(
@@ -225,6 +228,7 @@ def reset_user_password(
     # Hash new password
     user.password_hash = hash_password(payload.password)
     db.commit()
+    invalidate_user(user.id)
 
     # Log event
     log_event(
@@ -4,6 +4,7 @@ from sqlalchemy import DateTime, JSON, String, func
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, Session, mapped_column
 
+from app.core.cache import mark_dirty, namespaces_for_event
 from app.db.base import Base
 
 
@@ -34,3 +35,4 @@ def log_event(
             payload=payload,
         )
     )
+    mark_dirty(db, *namespaces_for_event(event_type))
@@ -0,0 +1,295 @@
+"""Cache des réponses de référentiels : LRU en mémoire + Redis optionnel.
+
+Les lectures de données de référence peu modifiées (règles produits, recettes,
+hôpitaux, articles...) sont servies depuis le cache avec un ETag, et
+``If-None-Match`` renvoie 304 sans toucher la base.
+
+Chaque namespace porte un numéro de version. Un commit qui modifie un modèle
+enregistré (``register_model``) ou un événement d'audit associé
+(``register_event``) incrémente la version : les entrées précédentes ne sont plus
+jamais lues. Avec Redis, les versions sont partagées entre workers ; sans Redis,
+chaque process invalide son propre cache et ``cache_ttl_seconds`` borne la
+fraîcheur vis-à-vis des autres workers.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core.config import settings
+from app.core.tracing import instrument_redis
+
+logger = logging.getLogger(__name__)
+
+_SESSION_KEY = "cache_namespaces"
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+
+
+def _make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {c.strip().removeprefix("W/") for c in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+class _LRU:
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self._data: OrderedDict[str, tuple[float, CachedResponse]] = OrderedDict()
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: CachedResponse) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self._ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class ResponseCache:
+    def __init__(
+        self, *, max_entries: int, ttl_seconds: float, redis_url: str | None = None
+    ) -> None:
+        self._local = _LRU(max_entries, ttl_seconds)
+        self._ttl = ttl_seconds
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url:
+            try:
+                import redis
+
+                self._redis = instrument_redis(redis.Redis.from_url(redis_url, socket_timeout=0.5))
+            except ImportError:
+                logger.warning("redis indisponible, cache des réponses en mémoire uniquement")
+
+    def _version(self, namespace: str) -> int:
+        if self._redis is not None:
+            try:
+                raw = self._redis.get(f"cnts:cache:v:{namespace}")
+                return int(raw or 0)
+            except Exception:
+                logger.warning("Redis injoignable, cache désactivé pour %s", namespace)
+                return -1
+        return self._versions.get(namespace, 0)
+
+    def version(self, namespace: str) -> int:
+        """Version courante de ``namespace`` (-1 : cache indisponible)."""
+        return self._version(namespace)
+
+    def get(self, namespace: str, key: str, *, version: int | None = None) -> CachedResponse | None:
+        if version is None:
+            version = self._version(namespace)
+        if version < 0:
+            return None
+        full_key = f"{namespace}:{version}:{key}"
+        hit = self._local.get(full_key)
+        if hit is not None or self._redis is None:
+            return hit
+        try:
+            raw = self._redis.get(f"cnts:cache:e:{full_key}")
+        except Exception:
+            return None
+        if raw is None:
+            return None
+        hit = CachedResponse(body=raw, etag=_make_etag(raw))
+        self._local.set(full_key, hit)
+        return hit
+
+    def set(
+        self, namespace: str, key: str, body: bytes, *, version: int | None = None
+    ) -> CachedResponse:
+        """Met ``body`` en cache sous ``version``.
+
+        ``version`` : celle lue avant de construire ``body``. Une invalidation
+        survenue entre-temps laisse ainsi l'entrée sous l'ancienne version, où
+        elle n'est plus servie.
+        """
+        entry = CachedResponse(body=body, etag=_make_etag(body))
+        if version is None:
+            version = self._version(namespace)
+        if version < 0:
+            return entry
+        full_key = f"{namespace}:{version}:{key}"
+        self._local.set(full_key, entry)
+        if self._redis is not None:
+            try:
+                self._redis.set(f"cnts:cache:e:{full_key}", body, ex=int(self._ttl))
+            except Exception:
+                pass
+        return entry
+
+    def invalidate(self, *namespaces: str) -> None:
+        for namespace in namespaces:
+            with self._lock:
+                self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            if self._redis is not None:
+                try:
+                    self._redis.incr(f"cnts:cache:v:{namespace}")
+                except Exception:
+                    logger.warning("Invalidation Redis échouée pour %s", namespace)
+
+    def clear(self) -> None:
+        self._local.clear()
+        with self._lock:
+            self._versions.clear()
+
+
+response_cache = ResponseCache(
+    max_entries=settings.cache_max_entries,
+    ttl_seconds=settings.cache_ttl_seconds,
+    redis_url=settings.redis_url if settings.cache_redis_enabled else None,
+)
+
+
+def cached_json_response(
+    request: Request,
+    *,
+    namespace: str,
+    key: str,
+    build: Callable[[], Any],
+) -> Response:
+    """Réponse JSON servie depuis le cache ; ``build`` n'est appelé qu'en cas d'absence."""
+    entry, version = None, None
+    if settings.cache_enabled:
+        # Version lue avant build() : une écriture validée pendant le calcul
+        # ne doit pas publier le corps périmé sous la nouvelle version
+        version = response_cache.version(namespace)
+        entry = response_cache.get(namespace, key, version=version)
+    if entry is None:
+        body = json.dumps(
+            jsonable_encoder(build()), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        entry = (
+            response_cache.set(namespace, key, body, version=version)
+            if settings.cache_enabled
+            else CachedResponse(body=body, etag=_make_etag(body))
+        )
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+# ── Invalidation pilotée par les écritures ──
+
+_MODEL_NAMESPACES: dict[type, tuple[str, ...]] = {}
+_EVENT_NAMESPACES: dict[str, tuple[str, ...]] = {}
+
+
+def register_model(model: type, *namespaces: str) -> None:
+    """Invalide ``namespaces`` à chaque commit qui crée/modifie/supprime ``model``."""
+    _MODEL_NAMESPACES[model] = _MODEL_NAMESPACES.get(model, ()) + namespaces
+
+
+def register_event(prefix: str, *namespaces: str) -> None:
+    """Invalide ``namespaces`` pour chaque événement d'audit commençant par ``prefix``."""
+    _EVENT_NAMESPACES[prefix] = _EVENT_NAMESPACES.get(prefix, ()) + namespaces
+
+
+def namespaces_for_event(event_type: str) -> set[str]:
+    out: set[str] = set()
+    for prefix, namespaces in _EVENT_NAMESPACES.items():
+        if event_type.startswith(prefix):
+            out.update(namespaces)
+    return out
+
+
+def mark_dirty(session: Session, *namespaces: str) -> None:
+    """Programme l'invalidation de ``namespaces`` au prochain commit de ``session``."""
+    if namespaces:
+        session.info.setdefault(_SESSION_KEY, set()).update(namespaces)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_dirty_namespaces(session: Session, _flush_context) -> None:
+    if not _MODEL_NAMESPACES:
+        return
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        namespaces = _MODEL_NAMESPACES.get(type(obj))
+        if namespaces:
+            mark_dirty(session, *namespaces)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    namespaces = session.info.pop(_SESSION_KEY, None)
+    if namespaces:
+        response_cache.invalidate(*namespaces)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session: Session, _previous_transaction) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+def _register_namespaces() -> None:
+    from app.db.models import (
+        EIR,
+        Article,
+        ExpirationRule,
+        FractionnementRecette,
+        Hopital,
+        ProductRule,
+        ReactionAdverseDonneur,
+        SuiviPerTransfusionnel,
+    )
+
+    register_model(ProductRule, "stock.regles")
+    register_model(FractionnementRecette, "stock.recettes")
+    register_model(ExpirationRule, "parametrage.rules")
+    register_model(Hopital, "hopitaux")
+    register_model(Article, "content.articles")
+    register_model(EIR, "stats.eir")
+    register_model(ReactionAdverseDonneur, "stats.reactions_donneur")
+    register_model(SuiviPerTransfusionnel, "stats.suivi_transfusion")
+
+    register_event("product_rule.", "stock.regles")
+    register_event("recette.", "stock.recettes")
+    register_event("expiration_rule.", "parametrage.rules")
+    register_event("hopital.", "hopitaux")
+    register_event("article.", "content.articles")
+
+
+_register_namespaces()
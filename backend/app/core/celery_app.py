@@ -3,6 +3,7 @@
 from celery import Celery
 
 from app.core.config import settings
+from app.core.tracing import instrument_celery
 
 celery_app = Celery(
     "cnts",
@@ -28,7 +29,26 @@ celery_app.conf.update(
             "task": "app.tasks.maintenance.check_expiration_alerts",
             "schedule": 86400.0,
         },
+        "retry-due-notifications": {
+            "task": "app.tasks.notifications.retry_due",
+            "schedule": 60.0,
+        },
+        "recompute-loyalty-balances": {
+            "task": "app.tasks.maintenance.recompute_loyalty",
+            "schedule": 86400.0,
+        },
+        "detect-duplicate-donors": {
+            "task": "app.tasks.maintenance.detect_duplicates",
+            "schedule": 86400.0,
+        },
+        "refresh-dhis2-aggregates": {
+            "task": "app.tasks.reports.refresh_dhis2_aggregates",
+            "schedule": 86400.0,
+        },
     },
 )
 
 celery_app.autodiscover_tasks(["app.tasks"])
+
+# Contexte de trace propagé dans les en-têtes des tâches (tracing_enabled)
+instrument_celery()
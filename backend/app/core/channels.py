@@ -0,0 +1,314 @@
+"""Canaux d'envoi des notifications (email, SMS, WhatsApp).
+
+Chaque processus worker garde une connexion par canal (``channel``) et la
+réutilise d'une tâche à l'autre : session SMTP authentifiée ; client HTTP/2
+(httpx avec h2, extra ``notifications``) ou à défaut connexion HTTP/1.1
+keep-alive vers la passerelle SMS et l'API WhatsApp. La connexion est
+renouvelée après ``notification_connection_max_age_seconds``, et rouverte une
+fois si le fournisseur l'a coupée entre deux messages.
+
+Le débit est façonné sur le quota de chaque fournisseur
+(``notification_rate_limits``, messages par seconde) par un seau à jetons GCRA
+(``app.core.rate_limit``) : rafale d'une seconde de quota, puis attente du
+prochain jeton. Avec ``notification_rate_redis_enabled`` le seau est partagé
+par tous les workers via Redis, sinon il est propre au processus.
+
+Un refus du fournisseur lève ``DeliveryError`` ; ``permanent`` distingue un
+refus définitif (destinataire invalide, 4xx) d'un échec à retenter (quota,
+5xx, coupure). En ``env=dev`` les messages sont seulement journalisés.
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import logging
+import smtplib
+import time
+from email.message import EmailMessage
+from typing import Self
+from urllib.parse import urlsplit
+
+from app.core.config import settings
+from app.core.rate_limit import Policy, RateLimiter
+
+try:
+    import h2  # noqa: F401 - HTTP/2 pour httpx
+    import httpx
+except ImportError:  # extra "notifications" non installé
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+CANAUX = ("EMAIL", "SMS", "WHATSAPP")
+
+WHATSAPP_API_URL = "https://graph.facebook.com/v19.0"
+
+# Textes des modèles connus ; un autre modèle envoie ``variables["message"]``
+MESSAGES = {
+    "rappel_collecte": (
+        "Bonjour {prenom}, le CNTS organise la collecte « {nom_campagne} » ({lieu}) "
+        "le {date_debut:.10}. Vous pouvez de nouveau donner votre sang : merci de venir !"
+    ),
+}
+
+# Coupures de connexion : on rouvre une fois avant de compter un échec
+_DISCONNECTS: tuple[type[Exception], ...] = (
+    smtplib.SMTPServerDisconnected,
+    http.client.HTTPException,
+    ConnectionError,
+)
+if httpx is not None:
+    _DISCONNECTS += (httpx.TransportError,)
+
+
+class DeliveryError(Exception):
+    def __init__(self, message: str, *, permanent: bool = False) -> None:
+        super().__init__(message)
+        self.permanent = permanent
+
+
+class _Defaults(dict):
+    def __missing__(self, key: str) -> str:
+        return ""
+
+
+def render(template: str, variables: dict) -> str:
+    text = MESSAGES.get(template)
+    if text is None:
+        return str(variables.get("message") or template)
+    return text.format_map(_Defaults(variables))
+
+
+# ── Quotas des fournisseurs ──
+
+_limiter: RateLimiter | None = None
+
+
+def _quota_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        redis_url = settings.redis_url if settings.notification_rate_redis_enabled else None
+        _limiter = RateLimiter(redis_url=redis_url, max_local_keys=len(CANAUX))
+    return _limiter
+
+
+def shape(canal: str) -> None:
+    """Attend un jeton du seau du canal (sans limite si aucun quota)."""
+    rate = settings.notification_rate_limits.get(canal, 0)
+    if rate <= 0:
+        return
+    policy = Policy(f"notifications:{canal}", rate, period_seconds=1.0)
+    while True:
+        decision = _quota_limiter().hit(f"notifications:{canal}", policy)
+        if decision.allowed:
+            return
+        time.sleep(decision.retry_after)
+
+
+# ── Canaux ──
+
+
+class Channel:
+    """Connexion à un fournisseur, réutilisée pour plusieurs messages."""
+
+    canal = ""
+
+    def __init__(self) -> None:
+        self.opened_at = time.monotonic()
+        self.connect()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def expired(self) -> bool:
+        age = time.monotonic() - self.opened_at
+        return age > settings.notification_connection_max_age_seconds
+
+    def connect(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def send(self, destinataire: str, template: str, variables: dict) -> None:
+        shape(self.canal)
+        try:
+            self._send(destinataire, template, variables)
+        except _DISCONNECTS:
+            logger.info("Connexion %s coupée, reconnexion", self.canal)
+            self.close()
+            self.opened_at = time.monotonic()
+            self.connect()
+            self._send(destinataire, template, variables)
+
+    def _send(self, destinataire: str, template: str, variables: dict) -> None:
+        raise NotImplementedError
+
+
+class DevChannel(Channel):
+    def __init__(self, canal: str) -> None:
+        self.canal = canal
+        super().__init__()
+
+    def _send(self, destinataire: str, template: str, variables: dict) -> None:
+        logger.info(
+            "[DEV] %s simulé vers %s | template=%s | variables=%s",
+            self.canal,
+            destinataire,
+            template,
+            variables,
+        )
+
+
+class EmailChannel(Channel):
+    canal = "EMAIL"
+
+    def connect(self) -> None:
+        self._smtp = smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=30)
+        if settings.smtp_port == 587:
+            self._smtp.starttls()
+        if settings.smtp_user:
+            self._smtp.login(settings.smtp_user, settings.smtp_password)
+
+    def close(self) -> None:
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+
+    def _send(self, destinataire: str, template: str, variables: dict) -> None:
+        message = EmailMessage()
+        message["From"] = settings.smtp_user or f"cnts@{settings.smtp_host}"
+        message["To"] = destinataire
+        message["Subject"] = str(variables.get("sujet") or "CNTS")
+        message.set_content(render(template, variables))
+        try:
+            self._smtp.send_message(message)
+        except smtplib.SMTPRecipientsRefused as exc:
+            raise DeliveryError(f"destinataire refusé : {destinataire}", permanent=True) from exc
+        except smtplib.SMTPServerDisconnected:
+            raise
+        except smtplib.SMTPResponseException as exc:
+            raise DeliveryError(
+                f"SMTP {exc.smtp_code} : {exc.smtp_error!r}", permanent=exc.smtp_code >= 500
+            ) from exc
+
+
+class _HttpChannel(Channel):
+    """Client HTTP persistant vers une API JSON (HTTP/2 si httpx et h2 sont installés)."""
+
+    base_url = ""
+
+    def connect(self) -> None:
+        if httpx is not None:
+            self._client = httpx.Client(base_url=self.base_url, http2=True, timeout=30)
+            return
+        url = urlsplit(self.base_url)
+        connection = (
+            http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        )
+        self._path = url.path.rstrip("/")
+        self._connection = connection(url.netloc, timeout=30)
+
+    def close(self) -> None:
+        if httpx is not None:
+            self._client.close()
+        else:
+            self._connection.close()
+
+    def _post(self, path: str, payload: dict, headers: dict[str, str]) -> None:
+        if httpx is not None:
+            response = self._client.post(path, json=payload, headers=headers)
+            status, detail = response.status_code, response.text
+        else:
+            body = json.dumps(payload).encode("utf-8")
+            headers = {"Content-Type": "application/json", **headers}
+            self._connection.request("POST", self._path + path, body=body, headers=headers)
+            response = self._connection.getresponse()
+            # Lire toute la réponse libère la connexion pour le message suivant
+            status, detail = response.status, response.read().decode(errors="replace")
+        if status >= 400:
+            permanent = status < 500 and status not in (408, 429)
+            raise DeliveryError(f"HTTP {status} : {detail[:200]}", permanent=permanent)
+
+
+class SmsChannel(_HttpChannel):
+    canal = "SMS"
+
+    def __init__(self) -> None:
+        if not settings.sms_api_url:
+            raise RuntimeError("passerelle SMS non configurée (CNTS_SMS_API_URL)")
+        self.base_url = settings.sms_api_url
+        super().__init__()
+
+    def _send(self, destinataire: str, template: str, variables: dict) -> None:
+        self._post(
+            "",
+            {"to": destinataire, "message": render(template, variables)},
+            {"Authorization": f"Bearer {settings.sms_api_key}"},
+        )
+
+
+class WhatsAppChannel(_HttpChannel):
+    canal = "WHATSAPP"
+    base_url = WHATSAPP_API_URL
+
+    def __init__(self) -> None:
+        if not settings.whatsapp_phone_id:
+            raise RuntimeError("WhatsApp non configuré (CNTS_WHATSAPP_PHONE_ID)")
+        super().__init__()
+
+    def _send(self, destinataire: str, template: str, variables: dict) -> None:
+        self._post(
+            f"/{settings.whatsapp_phone_id}/messages",
+            {
+                "messaging_product": "whatsapp",
+                "to": destinataire,
+                "type": "text",
+                "text": {"body": render(template, variables)},
+            },
+            {"Authorization": f"Bearer {settings.whatsapp_api_token}"},
+        )
+
+
+_CHANNELS = {"EMAIL": EmailChannel, "SMS": SmsChannel, "WHATSAPP": WhatsAppChannel}
+
+
+def open_channel(canal: str) -> Channel:
+    if canal not in _CHANNELS:
+        raise ValueError(f"canal inconnu : {canal}")
+    if settings.env == "dev":
+        return DevChannel(canal)
+    return _CHANNELS[canal]()
+
+
+# ── Connexions du processus ──
+
+_open: dict[str, Channel] = {}
+
+
+def channel(canal: str) -> Channel:
+    """Connexion du processus pour ``canal``, ouverte ou renouvelée au besoin."""
+    current = _open.get(canal)
+    if current is not None and current.expired:
+        current.close()
+        current = None
+    if current is None:
+        current = _open[canal] = open_channel(canal)
+    return current
+
+
+def discard_channel(canal: str) -> None:
+    current = _open.pop(canal, None)
+    if current is not None:
+        current.close()
+
+
+def close_channels() -> None:
+    for canal in list(_open):
+        discard_channel(canal)
@@ -1,5 +1,8 @@
 import datetime as dt
 
+from sqlalchemy import Date, Integer, String, cast, func, literal_column
+from sqlalchemy.orm import Session
+
 
 def add_months(date: dt.date, months: int) -> dt.date:
     year = date.year + (date.month - 1 + months) // 12
@@ -15,3 +18,26 @@ def _days_in_month(year: int, month: int) -> int:
         next_month = dt.date(year, month + 1, 1)
     this_month = dt.date(year, month, 1)
     return (next_month - this_month).days
+
+
+def sql_month_key(db: Session, column):
+    """Expression SQL ``YYYYMM`` d'une colonne date/datetime, selon le dialecte."""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(column, "YYYYMM")
+    return func.strftime("%Y%m", column)
+
+
+def sql_add_months(db: Session, column, months: int):
+    """Expression SQL de ``add_months`` : jour ramené au dernier jour du mois cible."""
+    months = int(months)
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(column.op("+")(literal_column(f"interval '{months} months'")), Date)
+    # SQLite déborde sur le mois suivant (31/01 + 1 mois = 02/03) : on borne par
+    # le dernier jour du mois cible
+    day_offset = cast(func.strftime("%d", column), Integer) - 1
+    return func.min(
+        func.date(
+            column, "start of month", f"+{months} months", "+" + cast(day_offset, String) + " days"
+        ),
+        func.date(column, "start of month", f"+{months + 1} months", "-1 day"),
+    )
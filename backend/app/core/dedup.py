@@ -0,0 +1,278 @@
+"""Doublons de donneurs : détection par blocs et fusion.
+
+Détection (``detect``, tâche ``app.tasks.maintenance.detect_duplicates``) :
+les fiches sont regroupées par clé de blocage (``BLOCS`` : même téléphone,
+même date de naissance et sexe, même nom complet normalisé), chaque bloc en
+une requête ``GROUP BY`` servie par un index. Seules les fiches d'un même
+bloc sont comparées deux à deux (``score`` : similarité des noms, téléphone,
+date de naissance) ; un bloc de plus de ``dedup_taille_bloc_max`` fiches
+(homonymes fréquents) est ignoré. Les paires d'au moins ``dedup_seuil`` sont
+enregistrées comme candidates (``DoublonDonneur``), sans écraser une paire
+déjà examinée.
+
+Fusion (``merge``) : toutes les lignes qui référencent la fiche en double
+(dons, carte et points, phénotypes, rendez-vous, inscriptions...) passent à
+la fiche conservée par une instruction ``UPDATE`` par table, puis la fiche
+en double est supprimée. Son empreinte CNI est gardée comme alias de la fiche
+conservée (``DonneurCniAlias``) : les recherches par CNI (``cni_filter``)
+retrouvent le donneur au lieu de recréer le doublon. Les champs vides de la
+fiche conservée sont complétés, l'éligibilité et le solde de fidélité
+recalculés.
+"""
+
+from __future__ import annotations
+
+import uuid
+from collections.abc import Iterator, Sequence
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from sqlalchemy import ColumnElement, Row, delete, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core import eligibility, loyalty, slots
+from app.core.config import settings
+from app.db.base import Base
+from app.db.models import (
+    CarteDonneur,
+    Donneur,
+    DonneurCniAlias,
+    DoublonDonneur,
+    InscriptionCollecte,
+    Phenotypage,
+    PointsHistorique,
+    RegistreGroupeRare,
+)
+
+# Clés de blocage : seules les fiches d'un même bloc sont comparées
+BLOCS: dict[str, tuple[ColumnElement, ...]] = {
+    "telephone": (Donneur.telephone_normalise,),
+    "naissance": (Donneur.date_naissance, Donneur.sexe),
+    "nom": (Donneur.nom_normalise,),
+}
+
+POIDS_NOM = 0.6
+POIDS_TELEPHONE = 0.25
+POIDS_NAISSANCE = 0.25
+
+# Champs de la fiche en double repris quand ceux de la fiche conservée sont vides
+CHAMPS_COMPLETES = (
+    "date_naissance",
+    "groupe_sanguin",
+    "adresse",
+    "region",
+    "departement",
+    "telephone",
+    "email",
+    "profession",
+    "user_id",
+)
+
+_COMPARED = (
+    Donneur.id,
+    Donneur.nom_normalise,
+    Donneur.telephone_normalise,
+    Donneur.date_naissance,
+    Donneur.sexe,
+    Donneur.created_at,
+)
+# Blocs lus par requête (les fiches d'un lot de blocs sont chargées ensemble)
+_BLOCKS_PER_QUERY = 200
+_INSERT_CHUNK = 500
+
+
+def _tokens(nom: str | None) -> str:
+    return " ".join(sorted((nom or "").split()))
+
+
+def score(a: Row, b: Row) -> float:
+    """Vraisemblance (0 à 1) que les fiches ``a`` et ``b`` soient le même donneur."""
+    total = (
+        POIDS_NOM
+        * SequenceMatcher(None, _tokens(a.nom_normalise), _tokens(b.nom_normalise)).ratio()
+    )
+    if a.telephone_normalise and a.telephone_normalise == b.telephone_normalise:
+        total += POIDS_TELEPHONE
+    if a.date_naissance and b.date_naissance:
+        total += POIDS_NAISSANCE if a.date_naissance == b.date_naissance else -POIDS_NAISSANCE
+    if a.sexe != b.sexe:
+        total /= 2
+    return round(min(max(total, 0.0), 1.0), 3)
+
+
+def _ids(value) -> list[uuid.UUID]:
+    # array_agg (PostgreSQL) ou group_concat des UUID en hexadécimal (SQLite)
+    if isinstance(value, str):
+        return [uuid.UUID(part) for part in value.split(",")]
+    return list(value)
+
+
+def _blocks(db: Session, columns: Sequence[ColumnElement]) -> Iterator[list[list[uuid.UUID]]]:
+    """Blocs de fiches partageant ``columns``, par lots de ``_BLOCKS_PER_QUERY``."""
+    members = (
+        func.array_agg(Donneur.id)
+        if db.get_bind().dialect.name == "postgresql"
+        else func.group_concat(Donneur.id)
+    )
+    stmt = (
+        select(members)
+        .where(*[column.is_not(None) for column in columns])
+        .group_by(*columns)
+        .having(func.count() >= 2, func.count() <= settings.dedup_taille_bloc_max)
+        .execution_options(yield_per=_BLOCKS_PER_QUERY)
+    )
+    for partition in db.execute(stmt).scalars().partitions():
+        yield [_ids(value) for value in partition]
+
+
+def candidates(db: Session) -> dict[tuple[uuid.UUID, uuid.UUID], tuple[float, list[str]]]:
+    """Paires candidates ``(conservée, doublon) -> (score, motifs)`` de toute la base."""
+    found: dict[tuple[uuid.UUID, uuid.UUID], tuple[float, list[str]]] = {}
+    for motif, columns in BLOCS.items():
+        for blocks in _blocks(db, columns):
+            ids = {donneur_id for block in blocks for donneur_id in block}
+            rows = {
+                row.id: row for row in db.execute(select(*_COMPARED).where(Donneur.id.in_(ids)))
+            }
+            for block in blocks:
+                ordered = sorted(block, key=lambda i: (rows[i].created_at, i))
+                for pair in combinations(ordered, 2):
+                    if pair in found:
+                        found[pair][1].append(motif)
+                        continue
+                    value = score(rows[pair[0]], rows[pair[1]])
+                    if value >= settings.dedup_seuil:
+                        found[pair] = (value, [motif])
+    return found
+
+
+def detect(db: Session) -> int:
+    """Enregistre les nouvelles paires candidates ; renvoie leur nombre."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "donneur_id": donneur_id,
+            "doublon_id": doublon_id,
+            "score": value,
+            "motifs": motifs,
+            "statut": "A_EXAMINER",
+        }
+        for (donneur_id, doublon_id), (value, motifs) in candidates(db).items()
+    ]
+    created = 0
+    for start in range(0, len(rows), _INSERT_CHUNK):
+        stmt = (
+            insert(DoublonDonneur)
+            .values(rows[start : start + _INSERT_CHUNK])
+            .on_conflict_do_nothing(index_elements=["donneur_id", "doublon_id"])
+            .returning(DoublonDonneur.id)
+        )
+        created += len(db.execute(stmt).all())
+    return created
+
+
+def cni_filter(cni_hashes: Sequence[str]) -> ColumnElement[bool]:
+    """Donneurs portant l'une des empreintes ``cni_hashes``, alias de fusion compris."""
+    alias = select(DonneurCniAlias.donneur_id).where(DonneurCniAlias.cni_hash.in_(cni_hashes))
+    return or_(Donneur.cni_hash.in_(cni_hashes), Donneur.id.in_(alias))
+
+
+def _donneur_references() -> list:
+    """Colonnes de toutes les tables qui référencent ``donneurs.id``."""
+    target = Donneur.__table__.c.id
+    return [
+        fk.parent
+        for table in Base.metadata.sorted_tables
+        for fk in table.foreign_keys
+        if fk.column is target
+    ]
+
+
+def merge(db: Session, survivant: Donneur, doublon: Donneur) -> dict[str, int]:
+    """Fusionne ``doublon`` dans ``survivant`` ; renvoie les lignes reprises par table."""
+    if survivant.id == doublon.id:
+        raise ValueError("une fiche ne peut pas être fusionnée avec elle-même")
+    moved: dict[str, int] = {}
+
+    # Tables à une ligne par donneur : on garde celle de la fiche conservée
+    cartes = {
+        carte.donneur_id: carte.id
+        for carte in db.execute(
+            select(CarteDonneur.donneur_id, CarteDonneur.id).where(
+                CarteDonneur.donneur_id.in_([survivant.id, doublon.id])
+            )
+        )
+    }
+    if len(cartes) == 2:
+        moved["points_historique"] = db.execute(
+            update(PointsHistorique)
+            .where(PointsHistorique.carte_id == cartes[doublon.id])
+            .values(carte_id=cartes[survivant.id])
+        ).rowcount
+        db.execute(delete(CarteDonneur).where(CarteDonneur.id == cartes[doublon.id]))
+    registre = select(RegistreGroupeRare.id).where(RegistreGroupeRare.donneur_id == survivant.id)
+    if db.execute(registre).first() is not None:
+        db.execute(delete(RegistreGroupeRare).where(RegistreGroupeRare.donneur_id == doublon.id))
+    db.execute(
+        delete(Phenotypage).where(
+            Phenotypage.donneur_id == doublon.id,
+            Phenotypage.systeme.in_(
+                select(Phenotypage.systeme).where(Phenotypage.donneur_id == survivant.id)
+            ),
+        )
+    )
+    # Inscriptions en double à une même collecte : celle du doublon est annulée
+    double_inscriptions = db.execute(
+        update(InscriptionCollecte)
+        .where(
+            InscriptionCollecte.donneur_id == doublon.id,
+            InscriptionCollecte.statut != "ANNULE",
+            InscriptionCollecte.campagne_id.in_(
+                select(InscriptionCollecte.campagne_id).where(
+                    InscriptionCollecte.donneur_id == survivant.id,
+                    InscriptionCollecte.statut != "ANNULE",
+                )
+            ),
+        )
+        .values(statut="ANNULE")
+        .returning(InscriptionCollecte.creneau_id)
+    ).scalars()
+    for creneau_id in list(double_inscriptions):
+        if creneau_id is not None:
+            slots.release(db, creneau_id)
+
+    for column in _donneur_references():
+        count = db.execute(
+            update(column.table).where(column == doublon.id).values({column.name: survivant.id})
+        ).rowcount
+        if count:
+            moved[column.table.name] = count
+
+    for field in CHAMPS_COMPLETES:
+        if getattr(survivant, field) is None and getattr(doublon, field) is not None:
+            setattr(survivant, field, getattr(doublon, field))
+    if doublon.dernier_don and (
+        survivant.dernier_don is None or doublon.dernier_don > survivant.dernier_don
+    ):
+        survivant.dernier_don = doublon.dernier_don
+
+    db.execute(
+        delete(DoublonDonneur).where(
+            DoublonDonneur.statut == "A_EXAMINER",
+            or_(DoublonDonneur.donneur_id == doublon.id, DoublonDonneur.doublon_id == doublon.id),
+        )
+    )
+    # Le numéro de la fiche supprimée désigne désormais la fiche conservée
+    db.add(DonneurCniAlias(donneur_id=survivant.id, cni_hash=doublon.cni_hash))
+    db.expunge(doublon)
+    db.execute(delete(Donneur).where(Donneur.id == doublon.id))
+    db.flush()
+
+    eligibility.recompute(db, Donneur.id == survivant.id)
+    loyalty.recompute(db, CarteDonneur.donneur_id == survivant.id)
+    return moved
@@ -0,0 +1,375 @@
+"""Indicateurs DHIS2 calculés à partir d'agrégats mensuels.
+
+Les compteurs sont pré-agrégés par mois (période DHIS2 ``YYYYMM``) et par région
+du donneur dans ``dhis2_agregats_mensuels``. Un mois n'est recalculé que si ses
+agrégats sont absents, ou s'ils ont été calculés avant la fin du délai de grâce
+(``dhis2_grace_days``) laissé aux saisies tardives. Un export mensuel ne relit
+donc que le mois en cours au lieu de tout l'historique. L'aperçu
+(``persist=False``) compte les mois non définitifs sans rien écrire.
+
+Sans ventilation régionale (``dhis2_org_units`` vide), toute org unit reçoit
+les totaux nationaux. Sinon une org unit est soit l'org unit nationale
+(``dhis2_national_org_unit``, alors obligatoire), soit une org unit régionale
+de ``dhis2_org_units`` : toute autre est refusée.
+"""
+
+from __future__ import annotations
+
+import base64
+import datetime as dt
+import json
+import re
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from collections.abc import Iterable
+
+from sqlalchemy import case, delete, distinct, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.dates import sql_month_key
+from app.db.models import (
+    EIR,
+    ActeTransfusionnel,
+    DHIS2AgregatMensuel,
+    Don,
+    Donneur,
+    Poche,
+    ProcedureApherese,
+    ReactionAdverseDonneur,
+)
+
+NATIONAL = "*"
+REGION_INCONNUE = "INCONNUE"
+
+# Ventilés par région du donneur
+INDICATEURS_DONNEUR = (
+    "total_dons",
+    "dons_sang_total",
+    "dons_apherese",
+    "dons_liberes",
+    "donneurs_actifs",
+    "nouveaux_donneurs",
+    "poches_produites",
+    "reactions_donneurs",
+)
+# Côté receveur : les hôpitaux n'ont pas de région, seul le niveau national existe
+INDICATEURS_RECEVEUR = (
+    "poches_distribuees",
+    "eir_declares",
+)
+INDICATEURS = INDICATEURS_DONNEUR + INDICATEURS_RECEVEUR
+
+
+def normalize_periode(periode: str) -> str:
+    value = periode.strip().replace("-", "")
+    if not re.fullmatch(r"\d{6}", value) or not 1 <= int(value[4:]) <= 12:
+        raise ValueError("periode invalide (attendu: YYYY-MM ou YYYYMM)")
+    return value
+
+
+class OrgUnitInconnue(ValueError):
+    pass
+
+
+def resolve_region(org_unit: str | None) -> str | None:
+    """Région couverte par une org unit DHIS2 ; None pour le niveau national.
+
+    Sans ventilation régionale configurée, toute org unit est nationale. Sinon
+    seules l'org unit nationale (``dhis2_national_org_unit``) ou son absence
+    désignent le niveau national ; une org unit non configurée lève
+    ``OrgUnitInconnue`` plutôt que de recevoir les totaux nationaux.
+    """
+    if not settings.dhis2_org_units:
+        return None
+    if not org_unit or org_unit == settings.dhis2_national_org_unit:
+        return None
+    try:
+        return settings.dhis2_org_units[org_unit]
+    except KeyError:
+        raise OrgUnitInconnue(f"org unit DHIS2 inconnue : {org_unit}") from None
+
+
+def _bornes(periode: str) -> tuple[dt.date, dt.date]:
+    year, month = int(periode[:4]), int(periode[4:])
+    debut = dt.date(year, month, 1)
+    fin = dt.date(year + 1, 1, 1) if month == 12 else dt.date(year, month + 1, 1)
+    return debut, fin
+
+
+def _as_utc(value: dt.datetime) -> dt.datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=dt.timezone.utc)
+    return value
+
+
+def _periodes_a_recalculer(db: Session, periodes: list[str]) -> list[str]:
+    computed = dict(
+        db.execute(
+            select(DHIS2AgregatMensuel.periode, func.min(DHIS2AgregatMensuel.computed_at))
+            .where(DHIS2AgregatMensuel.periode.in_(periodes))
+            .group_by(DHIS2AgregatMensuel.periode)
+        ).all()
+    )
+    stale: list[str] = []
+    for periode in periodes:
+        computed_at = computed.get(periode)
+        _, fin = _bornes(periode)
+        definitif_le = dt.datetime.combine(
+            fin + dt.timedelta(days=settings.dhis2_grace_days), dt.time.min, dt.timezone.utc
+        )
+        if computed_at is None or _as_utc(computed_at) < definitif_le:
+            stale.append(periode)
+    return stale
+
+
+def _compter(db: Session, cibles: list[str]) -> dict[tuple[str, str, str], int]:
+    """Compteurs ``(période, org unit, indicateur)`` des périodes ``cibles`` (triées).
+
+    Une requête groupée par table source couvre toutes les périodes.
+    """
+    wanted = set(cibles)
+    debut = _bornes(cibles[0])[0]
+    fin = _bornes(cibles[-1])[1]
+    debut_ts = dt.datetime.combine(debut, dt.time.min, dt.timezone.utc)
+    fin_ts = dt.datetime.combine(fin, dt.time.min, dt.timezone.utc)
+    counts: dict[tuple[str, str, str], int] = defaultdict(int)
+
+    def _add(periode: str | None, org_unit: str | None, **valeurs: int | None) -> None:
+        if periode not in wanted:
+            return
+        for indicateur, valeur in valeurs.items():
+            counts[(periode, org_unit or REGION_INCONNUE, indicateur)] += int(valeur or 0)
+
+    mois_don = sql_month_key(db, Don.date_don)
+    for periode, region, total, actifs, liberes, sang_total, apherese in db.execute(
+        select(
+            mois_don,
+            Donneur.region,
+            # Comptes sur les dons distincts : la jointure externe aux procédures
+            # d'aphérèse répète un don qui en a plusieurs
+            func.count(distinct(Don.id)),
+            func.count(distinct(Don.donneur_id)),
+            func.count(distinct(case((Don.statut_qualification == "LIBERE", Don.id)))),
+            func.count(distinct(case((Don.type_don == "SANG_TOTAL", Don.id)))),
+            func.count(distinct(ProcedureApherese.don_id)),
+        )
+        .join(Donneur, Donneur.id == Don.donneur_id)
+        .outerjoin(ProcedureApherese, ProcedureApherese.don_id == Don.id)
+        .where(Don.date_don >= debut, Don.date_don < fin)
+        .group_by(mois_don, Donneur.region)
+    ).all():
+        _add(
+            periode,
+            region,
+            total_dons=total,
+            donneurs_actifs=actifs,
+            dons_liberes=liberes,
+            dons_sang_total=sang_total,
+            dons_apherese=apherese,
+        )
+
+    mois_inscription = sql_month_key(db, Donneur.created_at)
+    for periode, region, total in db.execute(
+        select(mois_inscription, Donneur.region, func.count(Donneur.id))
+        .where(Donneur.created_at >= debut_ts, Donneur.created_at < fin_ts)
+        .group_by(mois_inscription, Donneur.region)
+    ).all():
+        _add(periode, region, nouveaux_donneurs=total)
+
+    mois_poche = sql_month_key(db, Poche.created_at)
+    for periode, region, total in db.execute(
+        select(mois_poche, Donneur.region, func.count(Poche.id))
+        .join(Don, Don.id == Poche.don_id)
+        .join(Donneur, Donneur.id == Don.donneur_id)
+        .where(Poche.created_at >= debut_ts, Poche.created_at < fin_ts)
+        .group_by(mois_poche, Donneur.region)
+    ).all():
+        _add(periode, region, poches_produites=total)
+
+    mois_reaction = sql_month_key(db, ReactionAdverseDonneur.created_at)
+    for periode, region, total in db.execute(
+        select(mois_reaction, Donneur.region, func.count(ReactionAdverseDonneur.id))
+        .join(Donneur, Donneur.id == ReactionAdverseDonneur.donneur_id)
+        .where(
+            ReactionAdverseDonneur.created_at >= debut_ts,
+            ReactionAdverseDonneur.created_at < fin_ts,
+        )
+        .group_by(mois_reaction, Donneur.region)
+    ).all():
+        _add(periode, region, reactions_donneurs=total)
+
+    # Les indicateurs nationaux sont toujours écrits (même à 0) : ils marquent la
+    # période comme calculée.
+    for periode in cibles:
+        for indicateur in INDICATEURS_RECEVEUR:
+            counts.setdefault((periode, NATIONAL, indicateur), 0)
+
+    mois_acte = sql_month_key(db, ActeTransfusionnel.date_transfusion)
+    for periode, total in db.execute(
+        select(mois_acte, func.count(ActeTransfusionnel.id))
+        .where(
+            ActeTransfusionnel.date_transfusion >= debut_ts,
+            ActeTransfusionnel.date_transfusion < fin_ts,
+        )
+        .group_by(mois_acte)
+    ).all():
+        _add(periode, NATIONAL, poches_distribuees=total)
+
+    mois_eir = sql_month_key(db, EIR.created_at)
+    for periode, total in db.execute(
+        select(mois_eir, func.count(EIR.id))
+        .where(EIR.created_at >= debut_ts, EIR.created_at < fin_ts)
+        .group_by(mois_eir)
+    ).all():
+        _add(periode, NATIONAL, eir_declares=total)
+    return counts
+
+
+def refresh_agregats(db: Session, periodes: Iterable[str], *, force: bool = False) -> list[str]:
+    """Recalcule les agrégats des périodes absentes ou non définitives.
+
+    Retourne les périodes recalculées ; l'appelant est responsable du commit.
+    """
+    demandees = sorted({normalize_periode(p) for p in periodes})
+    if not demandees:
+        return []
+    cibles = demandees if force else _periodes_a_recalculer(db, demandees)
+    if not cibles:
+        return []
+
+    counts = _compter(db, cibles)
+    now = dt.datetime.now(dt.timezone.utc)
+    db.execute(delete(DHIS2AgregatMensuel).where(DHIS2AgregatMensuel.periode.in_(cibles)))
+    db.execute(
+        insert(DHIS2AgregatMensuel),
+        [
+            {
+                "periode": periode,
+                "org_unit": org_unit,
+                "indicateur": indicateur,
+                "valeur": valeur,
+                "computed_at": now,
+            }
+            for (periode, org_unit, indicateur), valeur in sorted(counts.items())
+        ],
+    )
+    return cibles
+
+
+def compute_indicators_bulk(
+    db: Session,
+    *,
+    periodes: Iterable[str],
+    org_units: Iterable[str | None],
+    persist: bool = True,
+) -> dict[tuple[str, str | None], dict[str, int]]:
+    """Indicateurs de plusieurs (période, org unit) en une seule passe.
+
+    Les agrégats manquants sont rafraîchis puis lus en une requête. Avec
+    ``persist=False`` (aperçu), les périodes à recalculer sont comptées sans
+    rien écrire. Lève ``OrgUnitInconnue`` pour une org unit non configurée.
+    """
+    periodes_norm = sorted({normalize_periode(p) for p in periodes})
+    units = list(dict.fromkeys(org_units))
+    regions = {org_unit: resolve_region(org_unit) for org_unit in units}
+    if persist:
+        refresh_agregats(db, periodes_norm)
+        a_compter = []
+    else:
+        a_compter = _periodes_a_recalculer(db, periodes_norm)
+
+    stockees = [p for p in periodes_norm if p not in a_compter]
+    rows = db.execute(
+        select(
+            DHIS2AgregatMensuel.periode,
+            DHIS2AgregatMensuel.org_unit,
+            DHIS2AgregatMensuel.indicateur,
+            DHIS2AgregatMensuel.valeur,
+        ).where(DHIS2AgregatMensuel.periode.in_(stockees))
+    ).all()
+    if a_compter:
+        rows += [(p, o, i, v) for (p, o, i), v in _compter(db, a_compter).items()]
+
+    national: dict[str, dict[str, int]] = {p: dict.fromkeys(INDICATEURS, 0) for p in periodes_norm}
+    par_region: dict[tuple[str, str], dict[str, int]] = {}
+    for periode, org_unit, indicateur, valeur in rows:
+        national[periode][indicateur] = national[periode].get(indicateur, 0) + valeur
+        if org_unit != NATIONAL:
+            bucket = par_region.setdefault((periode, org_unit), {})
+            bucket[indicateur] = bucket.get(indicateur, 0) + valeur
+
+    out: dict[tuple[str, str | None], dict[str, int]] = {}
+    for periode in periodes_norm:
+        for org_unit in units:
+            region = regions[org_unit]
+            if region is None:
+                out[(periode, org_unit)] = dict(national[periode])
+            else:
+                values = dict.fromkeys(INDICATEURS_DONNEUR, 0)
+                values.update(par_region.get((periode, region), {}))
+                out[(periode, org_unit)] = values
+    return out
+
+
+def compute_indicators(
+    db: Session, *, periode: str, org_unit: str | None = None, persist: bool = True
+) -> dict:
+    periode_norm = normalize_periode(periode)
+    indicateurs = compute_indicators_bulk(
+        db, periodes=[periode_norm], org_units=[org_unit], persist=persist
+    )[(periode_norm, org_unit)]
+    return {
+        "periode": periode_norm,
+        "org_unit": org_unit,
+        "region": resolve_region(org_unit),
+        "indicateurs": indicateurs,
+    }
+
+
+def build_data_value_set(
+    items: Iterable[tuple[str, str, dict[str, int]]], *, data_set: str | None = None
+) -> dict:
+    """Payload ``dataValueSets`` DHIS2 pour des triplets (période, org unit, indicateurs)."""
+    data_values = [
+        {
+            "dataElement": settings.dhis2_data_elements.get(indicateur, indicateur),
+            "period": normalize_periode(periode),
+            "orgUnit": org_unit,
+            "value": str(valeur),
+        }
+        for periode, org_unit, indicateurs in items
+        for indicateur, valeur in sorted(indicateurs.items())
+    ]
+    payload: dict = {"dataValues": data_values}
+    if data_set:
+        payload["dataSet"] = data_set
+    return payload
+
+
+def send_data_value_set(payload: dict) -> tuple[int, dict]:
+    """POST ``/api/dataValueSets`` sur l'instance DHIS2 configurée."""
+    if not settings.dhis2_base_url:
+        raise RuntimeError("dhis2_base_url non configuré")
+
+    request = urllib.request.Request(
+        settings.dhis2_base_url.rstrip("/") + "/api/dataValueSets",
+        data=json.dumps(payload, separators=(",", ":")).encode("utf-8"),
+        method="POST",
+        headers={"Content-Type": "application/json", "Accept": "application/json"},
+    )
+    if settings.dhis2_username:
+        credentials = f"{settings.dhis2_username}:{settings.dhis2_password}".encode("utf-8")
+        request.add_header("Authorization", "Basic " + base64.b64encode(credentials).decode())
+
+    try:
+        with urllib.request.urlopen(request, timeout=settings.dhis2_timeout_seconds) as response:
+            status, body = response.status, response.read()
+    except urllib.error.HTTPError as exc:
+        status, body = exc.code, exc.read()
+
+    try:
+        return status, json.loads(body.decode("utf-8")) if body else {}
+    except ValueError:
+        return status, {"raw": body.decode("utf-8", errors="replace")[:2000]}
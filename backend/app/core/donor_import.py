@@ -0,0 +1,246 @@
+"""Import en masse de donneurs depuis un flux CSV ou NDJSON.
+
+Le flux est lu ligne à ligne, jamais chargé en entier. Les enregistrements sont
+validés (``DonneurCreate``) par lots de ``chunk_size`` ; chaque lot valide est
+inséré en une instruction ``INSERT ... ON CONFLICT (cni_hash) DO NOTHING
+RETURNING`` puis validé (commit). Un doublon, dans le lot ou déjà en base,
+n'est pas une erreur : il est compté et ignoré. Les empreintes CNI d'un lot
+sont calculées ensemble ; pendant une rotation de clé, un donneur encore sous
+une ancienne empreinte compte aussi comme doublon, de même que le numéro d'une
+fiche fusionnée (``DonneurCniAlias``).
+
+Sur PostgreSQL avec psycopg 3, le lot passe d'abord par ``COPY`` dans une table
+temporaire, d'où il est inséré en une seule instruction.
+
+Reprise : chaque lot validé fait avancer ``derniere_ligne`` (lignes de données
+du flux, en-tête CSV exclu). Relancer l'import avec ``skip=derniere_ligne``
+reprend après le dernier lot validé ; relancer depuis le début est sans effet
+sur les donneurs déjà importés.
+"""
+
+from __future__ import annotations
+
+import codecs
+import csv
+import json
+import uuid
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from pydantic import ValidationError
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app.core.security import cni_hash_candidates_many
+from app.core.text import normalize_phone, normalize_text
+from app.db.models import Donneur, DonneurCniAlias
+from app.schemas.donneurs import DonneurCreate
+
+FORMATS = ("csv", "ndjson")
+MAX_REPORTED_ERRORS = 1000
+
+_FIELDS = (
+    "nom",
+    "prenom",
+    "sexe",
+    "date_naissance",
+    "groupe_sanguin",
+    "adresse",
+    "region",
+    "departement",
+    "telephone",
+    "email",
+    "profession",
+)
+_COLUMNS = ("id", "cni_hash", *_FIELDS, "nom_normalise", "telephone_normalise")
+_STAGING = "donneurs_import"
+
+
+@dataclass
+class RowError:
+    ligne: int
+    message: str
+
+
+@dataclass
+class ImportReport:
+    recus: int = 0
+    importes: int = 0
+    doublons: int = 0
+    erreurs: int = 0
+    derniere_ligne: int = 0
+    details_erreurs: list[RowError] = field(default_factory=list)
+
+    def error(self, ligne: int, message: str) -> None:
+        self.erreurs += 1
+        if len(self.details_erreurs) < MAX_REPORTED_ERRORS:
+            self.details_erreurs.append(RowError(ligne, message))
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Lignes (fin de ligne comprise) d'un flux d'octets UTF-8, BOM toléré."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        yield from lines
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def iter_records(lines: Iterable[str], fmt: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """``(ligne, enregistrement, erreur)`` pour chaque ligne de données du flux."""
+    if fmt == "csv":
+        for number, record in enumerate(csv.DictReader(lines), start=1):
+            yield number, {k: (v or None) for k, v in record.items() if k}, None
+        return
+    number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, None, f"JSON invalide : {exc}"
+            continue
+        if isinstance(record, dict):
+            yield number, record, None
+        else:
+            yield number, None, "objet JSON attendu"
+
+
+def _describe(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc']) or 'ligne'} : {err['msg']}" for err in exc.errors()
+    )
+
+
+def _row(payload: DonneurCreate, cni_hash: str) -> dict[str, Any]:
+    values = {name: getattr(payload, name) for name in _FIELDS}
+    return {
+        "id": uuid.uuid4(),
+        "cni_hash": cni_hash,
+        **values,
+        "nom_normalise": normalize_text(payload.nom, payload.prenom),
+        "telephone_normalise": normalize_phone(payload.telephone) or None,
+    }
+
+
+def _known(db: Session, cni_hashes: list[str]) -> set[str]:
+    return set(
+        db.execute(select(Donneur.cni_hash).where(Donneur.cni_hash.in_(cni_hashes))).scalars()
+    )
+
+
+def _aliases(db: Session, cni_hashes: list[str]) -> set[str]:
+    stmt = select(DonneurCniAlias.cni_hash).where(DonneurCniAlias.cni_hash.in_(cni_hashes))
+    return set(db.execute(stmt).scalars())
+
+
+def _insert(db: Session, rows: list[dict[str, Any]]) -> set[str]:
+    """Insère ``rows`` sauf doublons ; renvoie les ``cni_hash`` réellement insérés."""
+    connection = db.connection()
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg":
+        return _copy_insert(db, rows)
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = (
+        insert(Donneur)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["cni_hash"])
+        .returning(Donneur.cni_hash)
+    )
+    return set(connection.execute(stmt).scalars())
+
+
+def _copy_insert(db: Session, rows: list[dict[str, Any]]) -> set[str]:
+    connection = db.connection()
+    connection.execute(
+        text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {_STAGING} "
+            f"(LIKE donneurs INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+    )
+    columns = ", ".join(_COLUMNS)
+    cursor = connection.connection.driver_connection.cursor()
+    with cursor.copy(f"COPY {_STAGING} ({columns}) FROM STDIN") as copy:
+        for row in rows:
+            copy.write_row([row[c] for c in _COLUMNS])
+    inserted = connection.execute(
+        text(
+            f"INSERT INTO donneurs ({columns}) SELECT {columns} FROM {_STAGING} "
+            f"ON CONFLICT (cni_hash) DO NOTHING RETURNING cni_hash"
+        )
+    )
+    return set(inserted.scalars())
+
+
+def import_donneurs(
+    db: Session,
+    lines: Iterable[str],
+    *,
+    fmt: str = "csv",
+    chunk_size: int = 5000,
+    skip: int = 0,
+) -> ImportReport:
+    """Importe les donneurs décrits par ``lines`` (voir le docstring du module)."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format d'import inconnu : {fmt}")
+    report = ImportReport(derniere_ligne=skip)
+    pending: list[DonneurCreate] = []
+    last_line = skip
+
+    def flush() -> None:
+        if pending:
+            chunk: dict[str, dict[str, Any]] = {}
+            previous: dict[str, list[str]] = {}
+            for payload, hashes in zip(
+                pending, cni_hash_candidates_many(p.cni for p in pending), strict=True
+            ):
+                if hashes[0] in chunk:
+                    report.doublons += 1
+                else:
+                    chunk[hashes[0]] = _row(payload, hashes[0])
+                    previous[hashes[0]] = hashes[1:]
+            # Numéros de fiches fusionnées, sous toutes les versions de la clé
+            known = _aliases(db, [h for c, hashes in previous.items() for h in (c, *hashes)])
+            if any(previous.values()):
+                # Rotation de clé en cours : donneurs encore sous une ancienne empreinte
+                known |= _known(db, [h for hashes in previous.values() for h in hashes])
+            for cni_hash, hashes in previous.items():
+                if cni_hash in known or known.intersection(hashes):
+                    del chunk[cni_hash]
+                    report.doublons += 1
+            inserted = _insert(db, list(chunk.values())) if chunk else set()
+            report.importes += len(inserted)
+            report.doublons += len(chunk) - len(inserted)
+        db.commit()
+        report.derniere_ligne = last_line
+        pending.clear()
+
+    for number, record, error in iter_records(lines, fmt):
+        if number <= skip:
+            continue
+        report.recus += 1
+        last_line = number
+        if error is None:
+            try:
+                payload = DonneurCreate.model_validate(record)
+            except ValidationError as exc:
+                error = _describe(exc)
+        if error is not None:
+            report.error(number, error)
+        else:
+            pending.append(payload)
+        if number - report.derniere_ligne >= chunk_size:
+            flush()
+    flush()
+    return report
@@ -0,0 +1,77 @@
+"""Recherche de donneurs par nom, téléphone ou numéro de carte.
+
+Une saisie est comparée aux clés normalisées (``app.core.text``) :
+- nom et prénom : tous les mots saisis, sans accents ni casse, n'importe où dans
+  le nom complet ; sur PostgreSQL aussi par similarité de trigrammes (fautes de
+  frappe, ``%>`` de pg_trgm), l'index GIN servant les deux ;
+- téléphone : préfixe du numéro national, quel que soit le format saisi ;
+- carte donneur : préfixe du numéro.
+
+Les résultats sont classés : identifiant correspondant (téléphone,
+carte) d'abord, puis pertinence du nom (``word_similarity`` sur PostgreSQL,
+début de nom puis début de mot ailleurs), puis les plus récents.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import ColumnElement, and_, case, false, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.text import normalize_phone, normalize_text
+from app.db.models import CarteDonneur, Donneur
+
+# En dessous, un préfixe de téléphone ou de carte est trop peu sélectif
+MIN_PREFIX_LENGTH = 3
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def card_prefix_filter(prefix: str) -> ColumnElement[bool]:
+    """Donneurs dont le numéro de carte commence par ``prefix``."""
+    pattern = _escape_like(prefix.strip().upper()) + "%"
+    cards = select(CarteDonneur.donneur_id).where(
+        CarteDonneur.numero_carte.like(pattern, escape="\\")
+    )
+    return Donneur.id.in_(cards)
+
+
+def search_filter(db: Session, q: str) -> tuple[ColumnElement[bool], list]:
+    """Condition et tri par pertinence pour la saisie ``q``."""
+    key = normalize_text(q)
+    postgresql = db.get_bind().dialect.name == "postgresql"
+
+    identifiers = []
+    digits = normalize_phone(q)
+    if len(digits) >= MIN_PREFIX_LENGTH:
+        identifiers.append(Donneur.telephone_normalise.like(digits + "%"))
+    if len(q.strip()) >= MIN_PREFIX_LENGTH:
+        identifiers.append(card_prefix_filter(q))
+
+    names = []
+    if key:
+        # La clé ne contient que [0-9a-z ] : rien à échapper
+        names.append(and_(*[Donneur.nom_normalise.like(f"%{word}%") for word in key.split()]))
+        if postgresql:
+            names.append(Donneur.nom_normalise.op("%>")(key))
+
+    conditions = identifiers + names
+    if not conditions:
+        return false(), []
+
+    ordering = []
+    if identifiers:
+        ordering.append(case((or_(*identifiers), 0), else_=1))
+    if key and postgresql:
+        ordering.append(func.word_similarity(key, Donneur.nom_normalise).desc())
+    elif key:
+        ordering.append(
+            case(
+                (Donneur.nom_normalise.like(f"{key}%"), 0),
+                (Donneur.nom_normalise.like(f"% {key}%"), 1),
+                else_=2,
+            )
+        )
+    ordering.append(Donneur.created_at.desc())
+    return or_(*conditions), ordering
@@ -0,0 +1,135 @@
+"""Éligibilité au don : date ``eligible_le`` de chaque donneur.
+
+Un donneur est éligible à partir du plus tardif de :
+- son dernier don + délai inter-don selon le sexe (``DELAI_INTER_DON_MOIS``) ;
+- chaque réaction adverse déclarée + ajournement selon sa gravité
+  (``eligibilite_ajournement_mois``) ; une réaction avec séquelle ajourne
+  définitivement (``DEFINITIF``).
+
+``Donneur.eligible_le`` (NULL : aucun délai en cours) est tenu à jour à la
+création d'un don ou d'une réaction (``refresh_eligible_le``) et peut être
+recalculé pour toute la base en une instruction ``UPDATE`` (``recompute``) ;
+``eligible_filter`` sélectionne ensuite les éligibles par l'index.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from collections.abc import Iterable
+
+from sqlalchemy import ColumnElement, Date, case, cast, func, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.dates import add_months, sql_add_months
+from app.db.models import Donneur, ReactionAdverseDonneur
+
+DELAI_INTER_DON_MOIS = {"H": 2, "F": 4}
+DEFINITIF = dt.date(9999, 12, 31)
+_NEVER = dt.date(1, 1, 1)
+
+
+def delai_inter_don(sexe: str) -> int:
+    return DELAI_INTER_DON_MOIS.get(sexe, DELAI_INTER_DON_MOIS["F"])
+
+
+def _reaction_until(gravite: str, evolution: str, declared: dt.date) -> dt.date | None:
+    if evolution == "SEQUELLE":
+        return DEFINITIF
+    months = settings.eligibilite_ajournement_mois.get(gravite)
+    return add_months(declared, months) if months else None
+
+
+def compute_eligible_le(
+    sexe: str,
+    dernier_don: dt.date | None,
+    reactions: Iterable[tuple[str, str, dt.datetime | dt.date]] = (),
+) -> dt.date | None:
+    """Date d'éligibilité à partir des données d'un donneur (``None`` : éligible)."""
+    dates = []
+    if dernier_don is not None:
+        dates.append(add_months(dernier_don, delai_inter_don(sexe)))
+    for gravite, evolution, declared in reactions:
+        if isinstance(declared, dt.datetime):
+            declared = declared.date()
+        until = _reaction_until(gravite, evolution, declared)
+        if until is not None:
+            dates.append(until)
+    return max(dates, default=None)
+
+
+def donor_reactions(db: Session, donneur_id) -> list[tuple[str, str, dt.datetime]]:
+    """``(gravite, evolution, déclarée le)`` des réactions adverses du donneur."""
+    db.flush()  # réactions en attente comprises
+    return db.execute(
+        select(
+            ReactionAdverseDonneur.gravite,
+            ReactionAdverseDonneur.evolution,
+            func.coalesce(ReactionAdverseDonneur.created_at, func.now()),
+        ).where(ReactionAdverseDonneur.donneur_id == donneur_id)
+    ).all()
+
+
+def refresh_eligible_le(db: Session, donneur: Donneur) -> dt.date | None:
+    """Recalcule ``donneur.eligible_le`` (après un don ou une réaction)."""
+    reactions = donor_reactions(db, donneur.id)
+    donneur.eligible_le = compute_eligible_le(donneur.sexe, donneur.dernier_don, reactions)
+    return donneur.eligible_le
+
+
+# ── Calcul ensembliste ──
+
+
+def _sql_date(db: Session, value):
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(value, Date)
+    return func.date(value)
+
+
+def _latest(db: Session, *values):
+    """Plus grande des dates (NULL ignoré), NULL si toutes le sont."""
+    never = literal(_NEVER, Date)
+    values = [func.coalesce(v, never) for v in values]
+    greatest = func.greatest if db.get_bind().dialect.name == "postgresql" else func.max
+    return func.nullif(greatest(*values), never)
+
+
+def eligible_le_expression(db: Session):
+    """Expression SQL de ``compute_eligible_le`` pour chaque ligne de ``donneurs``."""
+    sexe_delay = case(
+        *[
+            (Donneur.sexe == sexe, sql_add_months(db, Donneur.dernier_don, months))
+            for sexe, months in DELAI_INTER_DON_MOIS.items()
+        ],
+        else_=sql_add_months(db, Donneur.dernier_don, delai_inter_don("")),
+    )
+
+    declared = _sql_date(db, ReactionAdverseDonneur.created_at)
+    reaction_until = case(
+        (ReactionAdverseDonneur.evolution == "SEQUELLE", literal(DEFINITIF, Date)),
+        *[
+            (ReactionAdverseDonneur.gravite == gravite, sql_add_months(db, declared, months))
+            for gravite, months in settings.eligibilite_ajournement_mois.items()
+            if months
+        ],
+        else_=None,
+    )
+    deferral = (
+        select(func.max(reaction_until))
+        .where(ReactionAdverseDonneur.donneur_id == Donneur.id)
+        .scalar_subquery()
+    )
+    return _latest(db, sexe_delay, deferral)
+
+
+def recompute(db: Session, *conditions: ColumnElement[bool]) -> int:
+    """Recalcule ``eligible_le`` en une instruction pour les donneurs filtrés."""
+    stmt = update(Donneur).values(eligible_le=eligible_le_expression(db))
+    if conditions:
+        stmt = stmt.where(*conditions)
+    result = db.execute(stmt.execution_options(synchronize_session=False))
+    return result.rowcount
+
+
+def eligible_filter(as_of: dt.date) -> ColumnElement[bool]:
+    return or_(Donneur.eligible_le.is_(None), Donneur.eligible_le <= as_of)
@@ -0,0 +1,190 @@
+"""Agrégats d'hémovigilance maintenus incrémentalement.
+
+Chaque flush qui crée, modifie ou supprime un acte transfusionnel, un rappel ou
+un EIR ajuste les compteurs mensuels de ``hemovigilance_agregats`` dans la même
+transaction. Le rapport aux autorités lit ces compteurs sur une période au lieu
+de regrouper les tables sources à chaque appel. ``rebuild_agregats`` recalcule
+les compteurs depuis les tables sources (reprise d'historique, réconciliation).
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import uuid
+from collections import Counter
+from collections.abc import Iterable
+
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app.core.dates import sql_month_key
+from app.db.models import EIR, ActeTransfusionnel, HemovigilanceAgregat, RappelLot
+
+TRANSFUSIONS_HOPITAL = "transfusions_hopital"
+RAPPELS_LOT = "rappels_lot"
+RAPPELS_STATUT = "rappels_statut"
+EIR_GRAVITE = "eir_gravite"
+DIMENSIONS = (TRANSFUSIONS_HOPITAL, RAPPELS_LOT, RAPPELS_STATUT, EIR_GRAVITE)
+
+_SESSION_KEY = "hemovigilance_deltas"
+
+Cle = tuple[str, str, str]  # (mois, dimension, cle)
+
+
+def _mois(value) -> str:
+    if value is None:
+        value = dt.datetime.now(dt.timezone.utc)
+    elif isinstance(value, dt.datetime) and value.tzinfo is not None:
+        value = value.astimezone(dt.timezone.utc)
+    return value.strftime("%Y%m")
+
+
+def _cle(value) -> str:
+    return "" if value is None else str(value)
+
+
+def _valeur(obj, attr: str, ancien: bool):
+    if ancien:
+        history = inspect(obj).attrs[attr].history
+        if history.deleted:
+            return history.deleted[0]
+    return getattr(obj, attr)
+
+
+def _cles(obj, *, ancien: bool = False) -> list[Cle]:
+    def v(attr: str):
+        return _valeur(obj, attr, ancien)
+
+    if isinstance(obj, ActeTransfusionnel):
+        return [(_mois(v("date_transfusion")), TRANSFUSIONS_HOPITAL, _cle(v("hopital_id")))]
+    if isinstance(obj, RappelLot):
+        mois = _mois(v("created_at"))
+        cles = [(mois, RAPPELS_STATUT, _cle(v("statut")))]
+        if v("type_cible") == "LOT":
+            cles.append((mois, RAPPELS_LOT, _cle(v("valeur_cible"))))
+        return cles
+    if isinstance(obj, EIR):
+        mois = _mois(v("date_declaration") or v("created_at"))
+        return [(mois, EIR_GRAVITE, _cle(v("gravite")))]
+    return []
+
+
+_SUIVIS = (ActeTransfusionnel, RappelLot, EIR)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_deltas(session: Session, _flush_context, _instances) -> None:
+    deltas: Counter[Cle] = session.info.setdefault(_SESSION_KEY, Counter())
+    for obj in session.new:
+        if isinstance(obj, _SUIVIS):
+            deltas.update(_cles(obj))
+    for obj in session.deleted:
+        if isinstance(obj, _SUIVIS):
+            deltas.subtract(_cles(obj, ancien=True))
+    for obj in session.dirty:
+        if isinstance(obj, _SUIVIS) and session.is_modified(obj):
+            avant, apres = _cles(obj, ancien=True), _cles(obj)
+            if avant != apres:
+                deltas.subtract(avant)
+                deltas.update(apres)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_deltas(session: Session, _flush_context) -> None:
+    deltas = session.info.pop(_SESSION_KEY, None)
+    rows = [
+        {"id": uuid.uuid4(), "mois": mois, "dimension": dimension, "cle": cle, "total": total}
+        for (mois, dimension, cle), total in (deltas or {}).items()
+        if total
+    ]
+    if rows:
+        _upsert(session, rows)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_deltas(session: Session, _previous_transaction) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+def _upsert(session: Session, rows: list[dict]) -> None:
+    if session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(HemovigilanceAgregat).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["mois", "dimension", "cle"],
+        set_={"total": HemovigilanceAgregat.total + stmt.excluded.total},
+    )
+    session.connection().execute(stmt)
+
+
+def rebuild_agregats(db: Session, mois: Iterable[str] | None = None) -> int:
+    """Recalcule les compteurs depuis les tables sources (tous les mois par défaut)."""
+    mois = sorted(set(mois)) if mois is not None else None
+
+    def scoped(stmt, column):
+        return stmt if mois is None else stmt.where(sql_month_key(db, column).in_(mois))
+
+    date_eir = func.coalesce(EIR.date_declaration, EIR.created_at)
+    sources = [
+        (TRANSFUSIONS_HOPITAL, ActeTransfusionnel.date_transfusion, ActeTransfusionnel.hopital_id),
+        (RAPPELS_STATUT, RappelLot.created_at, RappelLot.statut),
+        (RAPPELS_LOT, RappelLot.created_at, RappelLot.valeur_cible),
+        (EIR_GRAVITE, date_eir, EIR.gravite),
+    ]
+
+    purge = delete(HemovigilanceAgregat)
+    if mois is not None:
+        purge = purge.where(HemovigilanceAgregat.mois.in_(mois))
+    db.execute(purge)
+
+    rows: list[dict] = []
+    for dimension, date_col, cle_col in sources:
+        mois_col = sql_month_key(db, date_col)
+        stmt = select(mois_col, cle_col, func.count()).group_by(mois_col, cle_col)
+        if dimension == RAPPELS_LOT:
+            stmt = stmt.where(RappelLot.type_cible == "LOT")
+        for mois_value, cle, total in db.execute(scoped(stmt, date_col)).all():
+            rows.append(
+                {
+                    "id": uuid.uuid4(),
+                    "mois": mois_value,
+                    "dimension": dimension,
+                    "cle": _cle(cle),
+                    "total": total,
+                }
+            )
+    if rows:
+        _upsert(db, rows)
+    return len(rows)
+
+
+def rapport_periode(db: Session, *, debut: str, fin: str) -> dict[str, list[tuple[str, str, int]]]:
+    """Compteurs par dimension entre ``debut`` et ``fin`` inclus (``YYYYMM``).
+
+    Retourne ``{dimension: [(mois, cle, total), ...]}`` trié par mois puis clé.
+    """
+    stmt = (
+        select(
+            HemovigilanceAgregat.dimension,
+            HemovigilanceAgregat.mois,
+            HemovigilanceAgregat.cle,
+            HemovigilanceAgregat.total,
+        )
+        .where(
+            HemovigilanceAgregat.mois >= debut,
+            HemovigilanceAgregat.mois <= fin,
+            HemovigilanceAgregat.total != 0,
+        )
+        .order_by(
+            HemovigilanceAgregat.dimension,
+            HemovigilanceAgregat.mois,
+            HemovigilanceAgregat.cle,
+        )
+    )
+    out: dict[str, list[tuple[str, str, int]]] = {d: [] for d in DIMENSIONS}
+    for dimension, mois, cle, total in db.execute(stmt).all():
+        out.setdefault(dimension, []).append((mois, cle, total))
+    return out
@@ -0,0 +1,78 @@
+"""Lignée des poches pour l'analyse d'impact des rappels.
+
+Un rappel cible un DIN ou un lot ; les produits issus du fractionnement héritent
+du défaut de leur poche source quel que soit leur propre lot. ``lineage_cte``
+suit ``Poche.source_poche_id`` à toute profondeur par une CTE récursive, et les
+requêtes d'impact (poches, actes, receveurs, hôpitaux) s'appuient dessus pour
+que le regroupement se fasse en SQL.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import CTE, Select, case, func, select
+from sqlalchemy.orm import aliased
+
+from app.db.models import ActeTransfusionnel, Commande, Don, Poche, Reservation
+
+
+def lineage_cte(type_cible: str, valeur_cible: str) -> CTE:
+    """Identifiants des poches ciblées et de tous leurs dérivés."""
+    if type_cible == "DIN":
+        anchor = select(Poche.id).join(Don, Don.id == Poche.don_id).where(Don.din == valeur_cible)
+    elif type_cible == "LOT":
+        anchor = select(Poche.id).where(Poche.lot == valeur_cible)
+    else:
+        raise ValueError("type_cible invalide")
+
+    lineage = anchor.cte("lineage", recursive=True)
+    derivee = aliased(Poche)
+    # UNION (et non UNION ALL) : une poche atteinte par deux chemins n'apparaît qu'une fois
+    return lineage.union(select(derivee.id).join(lineage, derivee.source_poche_id == lineage.c.id))
+
+
+def impacts_stmt(lineage: CTE) -> Select:
+    """Une ligne par poche impactée, avec l'acte ou la réservation en cours qui la localise."""
+    return (
+        select(
+            Poche.id.label("poche_id"),
+            Poche.don_id,
+            Don.din,
+            Poche.type_produit,
+            Poche.lot,
+            Poche.statut_distribution,
+            func.coalesce(ActeTransfusionnel.hopital_id, Commande.hopital_id).label("hopital_id"),
+            func.coalesce(ActeTransfusionnel.receveur_id, Reservation.receveur_id).label(
+                "receveur_id"
+            ),
+            func.coalesce(ActeTransfusionnel.commande_id, Reservation.commande_id).label(
+                "commande_id"
+            ),
+            ActeTransfusionnel.date_transfusion,
+        )
+        .join(lineage, lineage.c.id == Poche.id)
+        .join(Don, Don.id == Poche.don_id)
+        .outerjoin(ActeTransfusionnel, ActeTransfusionnel.poche_id == Poche.id)
+        .outerjoin(
+            Reservation,
+            (Reservation.poche_id == Poche.id) & (Reservation.released_at.is_(None)),
+        )
+        .outerjoin(Commande, Commande.id == Reservation.commande_id)
+    )
+
+
+def impacts_aggregate_stmt(lineage: CTE, dimension: str) -> Select:
+    """Totaux par ``hopital_id`` ou ``receveur_id`` (NULL en dernier)."""
+    impacts = impacts_stmt(lineage).subquery()
+    key = impacts.c[dimension]
+    statut = impacts.c.statut_distribution
+    return (
+        select(
+            key.label(dimension),
+            func.count().label("total"),
+            func.sum(case((statut == "DISTRIBUE", 1), else_=0)).label("distribuees"),
+            func.sum(case((statut == "RESERVE", 1), else_=0)).label("reservees"),
+            func.sum(case((statut.in_(("DISTRIBUE", "RESERVE")), 0), else_=1)).label("autres"),
+        )
+        .group_by(key)
+        .order_by(key.is_(None), key)
+    )
@@ -1,9 +1,43 @@
+"""Configuration des logs.
+
+Les handlers réels (formatage, écriture sur stderr) tournent dans un thread
+``QueueListener`` : le thread qui journalise ne fait qu'empiler l'enregistrement.
+Un enregistrement porteur de ``extra={"fields": {...}}`` est rendu en JSON
+``{"event": <message>, **fields}`` par ``StructuredFormatter``, donc hors du
+chemin de la requête.
+"""
+
+import atexit
+import json
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 from app.core.request_context import request_id_var
 
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s request_id=%(request_id)s %(message)s"
+
+_listener: QueueListener | None = None
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # File en mémoire du même processus : pas besoin de formater ni de copier
+        # l'enregistrement côté appelant (comportement par défaut de QueueHandler).
+        return record
+
+
+class StructuredFormatter(logging.Formatter):
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None)
+        if fields is not None:
+            record.message = json.dumps({"event": record.message, **fields}, default=str)
+        return super().formatMessage(record)
+
 
 def configure_logging(level: str) -> None:
+    global _listener
+
     old_factory = logging.getLogRecordFactory()
 
     def record_factory(*args, **kwargs):
@@ -12,7 +46,19 @@ def configure_logging(level: str) -> None:
         return record
 
     logging.setLogRecordFactory(record_factory)
-    logging.basicConfig(
-        level=level,
-        format="%(asctime)s %(levelname)s %(name)s request_id=%(request_id)s %(message)s",
-    )
+
+    root = logging.getLogger()
+    if root.handlers:
+        # Déjà configuré (appel répété, ou handlers posés par l'hôte) : comme basicConfig.
+        root.setLevel(level)
+        return
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(StructuredFormatter(LOG_FORMAT))
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root.addHandler(_QueueHandler(log_queue))
+    root.setLevel(level)
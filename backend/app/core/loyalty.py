@@ -0,0 +1,266 @@
+"""Programme de fidélisation : grand livre des points et soldes des cartes.
+
+``PointsHistorique`` est le grand livre ; ``CarteDonneur.points`` (solde) et
+``CarteDonneur.niveau`` en sont le cache. Chaque écriture (``append``) met le
+solde et le niveau à jour dans la même transaction, en une instruction
+``UPDATE`` relative (``points = points + :delta``) : deux écritures
+concurrentes ne s'écrasent pas, et un débit ne rend jamais le solde négatif.
+
+Un don rapporte ``fidelisation_points_don`` points à la carte de son donneur
+(``accrue_don``), au plus une fois par don (index unique partiel
+``uq_points_historique_don``). ``recompute`` recalcule tous les soldes,
+niveaux et compteurs de dons depuis le grand livre (seuls les dons crédités
+sont comptés), en quelques instructions ensemblistes.
+
+Rattrapage de l'historique (une seule fois, jamais planifié : tâche
+``app.tasks.maintenance.backfill_loyalty``) : ``reconcile_dons`` rattache
+d'abord à leurs dons les crédits DON saisis sans référence, puis
+``backfill_dons`` crédite les dons restants faits depuis la création de la
+carte.
+
+Le classement et les filtres par niveau lisent les colonnes de la carte par
+leurs index, sans ``SUM`` sur l'historique.
+"""
+
+from __future__ import annotations
+
+import uuid
+from collections import defaultdict
+from itertools import groupby
+
+from sqlalchemy import (
+    ColumnElement,
+    bindparam,
+    case,
+    exists,
+    func,
+    insert,
+    literal,
+    select,
+    update,
+)
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import CarteDonneur, Don, PointsHistorique
+
+NIVEAU_DE_BASE = "BRONZE"
+
+
+class SoldeInsuffisant(Exception):
+    pass
+
+
+def _seuils() -> list[tuple[str, int]]:
+    return sorted(settings.fidelisation_niveaux.items(), key=lambda item: item[1], reverse=True)
+
+
+def niveau(points: int) -> str:
+    """Niveau correspondant au solde ``points``."""
+    for nom, seuil in _seuils():
+        if points >= seuil:
+            return nom
+    return NIVEAU_DE_BASE
+
+
+def niveau_expression(points: ColumnElement) -> ColumnElement:
+    """``niveau`` en SQL, pour les mises à jour ensemblistes."""
+    return case(
+        *[(points >= seuil, literal(nom)) for nom, seuil in _seuils()],
+        else_=literal(NIVEAU_DE_BASE),
+    )
+
+
+def append(
+    db: Session,
+    carte_id: uuid.UUID,
+    *,
+    type_operation: str,
+    points: int,
+    description: str | None = None,
+    reference_id: uuid.UUID | None = None,
+    **carte_values,
+) -> PointsHistorique:
+    """Écrit ``points`` au grand livre et met à jour le solde et le niveau de la carte.
+
+    ``carte_values`` : autres colonnes de la carte modifiées par la même
+    instruction. Lève ``LookupError`` si la carte n'existe pas et
+    ``SoldeInsuffisant`` si un débit dépasse le solde.
+    """
+    cartes = CarteDonneur.__table__
+    solde = cartes.c.points + points
+    stmt = (
+        update(cartes)
+        .where(cartes.c.id == carte_id)
+        .values(points=solde, niveau=niveau_expression(solde), **carte_values)
+    )
+    if points < 0:
+        stmt = stmt.where(solde >= 0)
+    if db.execute(stmt).rowcount == 0:
+        if db.get(CarteDonneur, carte_id) is None:
+            raise LookupError(carte_id)
+        raise SoldeInsuffisant(carte_id)
+
+    entry = PointsHistorique(
+        carte_id=carte_id,
+        type_operation=type_operation,
+        points=points,
+        description=description,
+        reference_id=reference_id,
+    )
+    db.add(entry)
+    db.flush()
+    return entry
+
+
+def accrue_don(db: Session, don: Don) -> PointsHistorique | None:
+    """Crédite ``don`` sur la carte du donneur (``None`` : pas de carte ou déjà crédité)."""
+    carte_id = db.execute(
+        select(CarteDonneur.id).where(
+            CarteDonneur.donneur_id == don.donneur_id, CarteDonneur.is_active.is_(True)
+        )
+    ).scalar()
+    if carte_id is None:
+        return None
+    already = db.execute(
+        select(PointsHistorique.id).where(
+            PointsHistorique.carte_id == carte_id,
+            PointsHistorique.type_operation == "DON",
+            PointsHistorique.reference_id == don.id,
+        )
+    ).first()
+    if already is not None:
+        return None
+
+    cartes = CarteDonneur.__table__
+    return append(
+        db,
+        carte_id,
+        type_operation="DON",
+        points=settings.fidelisation_points_don,
+        description=f"Don {don.din}",
+        reference_id=don.id,
+        total_dons=cartes.c.total_dons + 1,
+        date_premier_don=func.coalesce(cartes.c.date_premier_don, don.date_don),
+        date_dernier_don=case(
+            (cartes.c.date_dernier_don >= don.date_don, cartes.c.date_dernier_don),
+            else_=don.date_don,
+        ),
+    )
+
+
+def _a_crediter() -> list[ColumnElement]:
+    """Dons d'une carte pas encore crédités, faits depuis la création de la carte."""
+    credited = exists().where(
+        PointsHistorique.carte_id == CarteDonneur.id,
+        PointsHistorique.type_operation == "DON",
+        PointsHistorique.reference_id == Don.id,
+    )
+    return [Don.date_don >= func.date(CarteDonneur.created_at), ~credited]
+
+
+def reconcile_dons(db: Session, chunk_size: int = 500) -> int:
+    """Rattache à un don chaque crédit DON saisi sans référence ; renvoie leur nombre.
+
+    Crédits d'une carte et dons non rattachés (faits depuis la création de la
+    carte) sont pris dans l'ordre chronologique : un crédit revient au plus
+    ancien don restant fait au plus tard le jour du crédit. Un crédit sans don
+    possible reste sans référence.
+    """
+    entries = db.execute(
+        select(PointsHistorique.id, PointsHistorique.carte_id, PointsHistorique.created_at)
+        .where(PointsHistorique.type_operation == "DON", PointsHistorique.reference_id.is_(None))
+        .order_by(PointsHistorique.carte_id, PointsHistorique.created_at, PointsHistorique.id)
+    ).all()
+    by_carte = {carte_id: list(group) for carte_id, group in groupby(entries, lambda e: e.carte_id)}
+    cartes = list(by_carte)
+    links = []
+    for start in range(0, len(cartes), chunk_size):
+        dons: dict[uuid.UUID, list] = defaultdict(list)
+        for row in db.execute(
+            select(CarteDonneur.id.label("carte_id"), Don.id, Don.date_don)
+            .join(Don, Don.donneur_id == CarteDonneur.donneur_id)
+            .where(CarteDonneur.id.in_(cartes[start : start + chunk_size]), *_a_crediter())
+            .order_by(CarteDonneur.id, Don.date_don, Don.id)
+        ):
+            dons[row.carte_id].append(row)
+        for carte_id in cartes[start : start + chunk_size]:
+            restants = dons[carte_id]
+            for entry in by_carte[carte_id]:
+                if restants and restants[0].date_don <= entry.created_at.date():
+                    links.append({"entry_id": entry.id, "don_id": restants.pop(0).id})
+    if links:
+        table = PointsHistorique.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("entry_id"))
+            .values(reference_id=bindparam("don_id")),
+            links,
+        )
+    return len(links)
+
+
+def backfill_dons(db: Session, chunk_size: int = 5000) -> int:
+    """Écrit au grand livre les dons des porteurs de carte pas encore crédités.
+
+    Seuls les dons faits depuis la création de la carte sont crédités.
+    Appeler ``reconcile_dons`` avant (crédits saisis sans référence), et
+    ``recompute`` après : les soldes ne sont pas touchés.
+    """
+    stmt = (
+        select(CarteDonneur.id, Don.id, Don.din)
+        .join(Don, Don.donneur_id == CarteDonneur.donneur_id)
+        .where(CarteDonneur.is_active.is_(True), *_a_crediter())
+        .order_by(Don.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    missing = db.execute(stmt).partitions()
+    written = 0
+    for partition in missing:
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "carte_id": carte_id,
+                "type_operation": "DON",
+                "points": settings.fidelisation_points_don,
+                "description": f"Don {din}",
+                "reference_id": don_id,
+            }
+            for carte_id, don_id, din in partition
+        ]
+        db.execute(insert(PointsHistorique), rows)
+        written += len(rows)
+    return written
+
+
+def recompute(db: Session, *conditions: ColumnElement) -> int:
+    """Recalcule solde, niveau et compteurs de dons des cartes depuis le grand livre.
+
+    ``conditions`` restreint les cartes recalculées ; renvoie leur nombre.
+    """
+    cartes = CarteDonneur.__table__
+    solde = (
+        select(func.coalesce(func.sum(PointsHistorique.points), 0))
+        .where(PointsHistorique.carte_id == cartes.c.id)
+        .scalar_subquery()
+    )
+    # Dons crédités au grand livre, comme les compteurs tenus par accrue_don
+    credite = exists().where(
+        PointsHistorique.carte_id == cartes.c.id,
+        PointsHistorique.type_operation == "DON",
+        PointsHistorique.reference_id == Don.id,
+    )
+    dons = select(Don.date_don).where(Don.donneur_id == cartes.c.donneur_id, credite)
+    updated = db.execute(
+        update(cartes)
+        .where(*conditions)
+        .values(
+            points=solde,
+            total_dons=dons.with_only_columns(func.count()).scalar_subquery(),
+            date_premier_don=dons.with_only_columns(func.min(Don.date_don)).scalar_subquery(),
+            date_dernier_don=dons.with_only_columns(func.max(Don.date_don)).scalar_subquery(),
+        )
+    ).rowcount
+    # Second passage : le niveau se lit sur le solde qui vient d'être écrit
+    db.execute(update(cartes).where(*conditions).values(niveau=niveau_expression(cartes.c.points)))
+    return updated
@@ -1,41 +1,327 @@
+"""Métriques Prometheus en mémoire : compteurs, histogrammes et jauges calculées.
+
+Les séries sont regroupées en familles (``metrics.counter`` / ``metrics.histogram``)
+dont ``labels(...)`` retourne une poignée liée une fois pour toutes : le chemin
+chaud (``handle.inc()``, ``handle.observe(v)``) ne trie ni ne hache de labels et
+ne prend aucun verrou. Chaque poignée écrit dans une cellule propre au thread
+courant ; le rendu additionne les cellules.
+
+Avec ``metrics_multiproc_dir`` (plusieurs workers uvicorn/gunicorn), chaque
+processus écrit périodiquement un instantané ``<pid>.json`` dans ce répertoire
+et ``render_prometheus`` agrège tous les instantanés. Les jauges calculées
+(``register_collector``) restent celles du processus qui répond.
+"""
+
 from __future__ import annotations
 
+import atexit
+import json
+import logging
+import os
 import threading
-from collections import defaultdict
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Sequence
+from pathlib import Path
 
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Collector = Callable[[], Iterable[tuple[str, dict[str, str], float]]]
+LabelValues = tuple[str, ...]
+
+DEFAULT_BUCKETS_MS: tuple[float, ...] = (
+    5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000,
+)  # fmt: skip
+
+
+class _Shards:
+    """Une cellule (liste de ``width`` nombres) par thread écrivain."""
+
+    __slots__ = ("_cells", "_local", "_lock", "_width")
+
+    def __init__(self, width: int) -> None:
+        self._local = threading.local()
+        self._cells: list[list[float]] = []
+        self._lock = threading.Lock()
+        self._width = width
+
+    def cell(self) -> list[float]:
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0] * self._width
+            with self._lock:
+                self._cells.append(cell)
+            self._local.cell = cell
+            return cell
+
+    def totals(self) -> list[float]:
+        with self._lock:
+            cells = list(self._cells)
+        if not cells:
+            return [0] * self._width
+        return [sum(column) for column in zip(*cells)]
+
+
+class CounterHandle:
+    __slots__ = ("_shards",)
 
-class Metrics:
     def __init__(self) -> None:
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._shards.cell()[0] += amount
+
+    def value(self) -> float:
+        return self._shards.totals()[0]
+
+
+class HistogramHandle:
+    """Cellule : un compteur par intervalle (le dernier pour +Inf), puis somme et effectif."""
+
+    __slots__ = ("_bounds", "_shards")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self._bounds = bounds
+        self._shards = _Shards(len(bounds) + 3)
+
+    def observe(self, value: float) -> None:
+        cell = self._shards.cell()
+        cell[bisect_left(self._bounds, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def totals(self) -> list[float]:
+        return self._shards.totals()
+
+    def quantile(self, q: float) -> float | None:
+        return histogram_quantile(q, self._bounds, self.totals())
+
+
+def histogram_quantile(q: float, bounds: Sequence[float], totals: Sequence[float]) -> float | None:
+    """Estimation par interpolation linéaire dans l'intervalle (comme PromQL)."""
+    count = totals[-1]
+    if not count:
+        return None
+    rank = q * count
+    cumulative = 0.0
+    for i, bound in enumerate(bounds):
+        in_bucket = totals[i]
+        if cumulative + in_bucket >= rank and in_bucket:
+            lower = bounds[i - 1] if i else 0.0
+            return lower + (bound - lower) * (rank - cumulative) / in_bucket
+        cumulative += in_bucket
+    return float(bounds[-1]) if bounds else None
+
+
+class _Family:
+    def __init__(self, name: str, kind: str, labelnames: Sequence[str], factory) -> None:
+        self.name = name
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._handles: dict[LabelValues, CounterHandle | HistogramHandle] = {}
         self._lock = threading.Lock()
-        self._counters: dict[tuple[str, tuple[tuple[str, str], ...]], int] = defaultdict(int)
-        self._timers_ms_sum: dict[tuple[str, tuple[tuple[str, str], ...]], float] = defaultdict(
-            float
+
+    def labels(self, *values: str, **kwargs: str):
+        """Poignée pour ces valeurs de labels (positionnelles dans l'ordre de ``labelnames``)."""
+        key = values if values else tuple(kwargs[n] for n in self.labelnames)
+        handle = self._handles.get(key)
+        if handle is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: labels attendus {self.labelnames}")
+            with self._lock:
+                handle = self._handles.setdefault(key, self._factory())
+        return handle
+
+    def items(self) -> list[tuple[LabelValues, CounterHandle | HistogramHandle]]:
+        with self._lock:
+            return list(self._handles.items())
+
+
+class CounterFamily(_Family):
+    def __init__(self, name: str, labelnames: Sequence[str]) -> None:
+        super().__init__(name, "counter", labelnames, CounterHandle)
+
+    def labels(self, *values: str, **kwargs: str) -> CounterHandle:
+        return super().labels(*values, **kwargs)
+
+
+class HistogramFamily(_Family):
+    def __init__(self, name: str, labelnames: Sequence[str], buckets: Sequence[float]) -> None:
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, "histogram", labelnames, lambda: HistogramHandle(self.buckets))
+
+    def labels(self, *values: str, **kwargs: str) -> HistogramHandle:
+        return super().labels(*values, **kwargs)
+
+
+class Metrics:
+    def __init__(
+        self,
+        *,
+        default_buckets: Sequence[float] = DEFAULT_BUCKETS_MS,
+        multiproc_dir: str | None = None,
+        flush_seconds: float = 5.0,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._families: dict[str, CounterFamily | HistogramFamily] = {}
+        # Chemin historique inc()/observe_ms() : (nom, labels tels que passés) -> poignée
+        self._adhoc: dict[tuple[str, tuple[tuple[str, str], ...]], object] = {}
+        self._collectors: list[Collector] = []
+        self._default_buckets = tuple(default_buckets)
+        self._multiproc_dir = Path(multiproc_dir) if multiproc_dir else None
+        if self._multiproc_dir is not None:
+            self._multiproc_dir.mkdir(parents=True, exist_ok=True)
+            self._start_flusher(flush_seconds)
+
+    # ── Déclaration ──
+
+    def counter(self, name: str, labelnames: Sequence[str] = ()) -> CounterFamily:
+        return self._family(name, lambda: CounterFamily(name, labelnames), CounterFamily)
+
+    def histogram(
+        self, name: str, labelnames: Sequence[str] = (), *, buckets: Sequence[float] | None = None
+    ) -> HistogramFamily:
+        return self._family(
+            name,
+            lambda: HistogramFamily(name, labelnames, buckets or self._default_buckets),
+            HistogramFamily,
         )
-        self._timers_ms_count: dict[tuple[str, tuple[tuple[str, str], ...]], int] = defaultdict(int)
+
+    def _family(self, name: str, create, kind: type):
+        family = self._families.get(name)
+        if family is None:
+            with self._lock:
+                family = self._families.setdefault(name, create())
+        if not isinstance(family, kind):
+            raise TypeError(f"métrique {name} déjà déclarée comme {family.kind}")
+        return family
+
+    def get(self, name: str) -> CounterFamily | HistogramFamily | None:
+        return self._families.get(name)
+
+    # ── Chemin historique (labels en dict) ──
 
     def inc(self, name: str, *, labels: dict[str, str]) -> None:
-        key = (name, tuple(sorted(labels.items())))
-        with self._lock:
-            self._counters[key] += 1
+        key = (name, tuple(labels.items()))
+        handle = self._adhoc.get(key)
+        if handle is None:
+            names = tuple(sorted(labels))
+            handle = self.counter(name, names).labels(*(labels[n] for n in names))
+            self._adhoc[key] = handle
+        handle.inc()
 
     def observe_ms(self, name: str, *, value_ms: float, labels: dict[str, str]) -> None:
-        key = (name, tuple(sorted(labels.items())))
-        with self._lock:
-            self._timers_ms_sum[key] += float(value_ms)
-            self._timers_ms_count[key] += 1
+        key = (name, tuple(labels.items()))
+        handle = self._adhoc.get(key)
+        if handle is None:
+            names = tuple(sorted(labels))
+            handle = self.histogram(name, names).labels(*(labels[n] for n in names))
+            self._adhoc[key] = handle
+        handle.observe(float(value_ms))
+
+    def register_collector(self, collector: Collector) -> None:
+        """Jauges calculées au moment du rendu : ``collector()`` -> (nom, labels, valeur)."""
+        self._collectors.append(collector)
+
+    # ── Instantanés et agrégation multi-processus ──
+
+    def snapshot(self) -> dict:
+        """Valeurs courantes du processus, sérialisables en JSON."""
+        families = []
+        for family in list(self._families.values()):
+            series = []
+            for values, handle in family.items():
+                totals = [handle.value()] if family.kind == "counter" else handle.totals()
+                series.append([list(values), totals])
+            entry = {"name": family.name, "kind": family.kind, "labels": list(family.labelnames)}
+            if family.kind == "histogram":
+                entry["buckets"] = list(family.buckets)
+            entry["series"] = series
+            families.append(entry)
+        return {"families": families}
+
+    def flush(self) -> None:
+        if self._multiproc_dir is None:
+            return
+        target = self._multiproc_dir / f"{os.getpid()}.json"
+        tmp = target.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp, target)
+
+    def _start_flusher(self, every: float) -> None:
+        stop = threading.Event()
+
+        def loop() -> None:
+            while not stop.wait(every):
+                try:
+                    self.flush()
+                except OSError:
+                    logger.warning(
+                        "Écriture de l'instantané de métriques impossible", exc_info=True
+                    )
+
+        threading.Thread(target=loop, name="metrics-flush", daemon=True).start()
+        atexit.register(lambda: (stop.set(), self.flush()))
+
+    def collect(self) -> list[dict]:
+        """Familles agrégées (tous les workers en mode multi-processus), format ``snapshot``."""
+        own = self.snapshot()
+        if self._multiproc_dir is None:
+            return own["families"]
+        self.flush()
+        merged: dict[str, dict] = {}
+        series: dict[tuple[str, tuple[str, ...]], list[float]] = {}
+        for path in sorted(self._multiproc_dir.glob("*.json")):
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            for family in data["families"]:
+                merged.setdefault(family["name"], {**family, "series": []})
+                for values, totals in family["series"]:
+                    key = (family["name"], tuple(values))
+                    acc = series.get(key)
+                    if acc is None or len(acc) != len(totals):
+                        series[key] = list(totals)
+                    else:
+                        series[key] = [a + b for a, b in zip(acc, totals)]
+        for (name, values), totals in series.items():
+            merged[name]["series"].append([list(values), totals])
+        return list(merged.values())
+
+    # ── Rendu ──
 
     def render_prometheus(self) -> str:
         lines: list[str] = []
-        with self._lock:
-            for (name, labels), value in sorted(self._counters.items()):
-                lines.append(f"{name}{_fmt_labels(labels)} {value}")
-            for (name, labels), value in sorted(self._timers_ms_sum.items()):
-                lines.append(f"{name}_sum{_fmt_labels(labels)} {value}")
-            for (name, labels), value in sorted(self._timers_ms_count.items()):
-                lines.append(f"{name}_count{_fmt_labels(labels)} {value}")
+        for family in sorted(self.collect(), key=lambda f: f["name"]):
+            name, names = family["name"], family["labels"]
+            lines.append(f"# TYPE {name} {family['kind']}")
+            for values, totals in sorted(family["series"], key=lambda s: s[0]):
+                labels = tuple(sorted(zip(names, values)))
+                if family["kind"] == "counter":
+                    lines.append(f"{name}{_fmt_labels(labels)} {_num(totals[0])}")
+                    continue
+                cumulative = 0
+                for bound, count in zip([*family["buckets"], "+Inf"], totals[:-2]):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _num(bound)
+                    bucket_labels = (*labels, ("le", le))
+                    lines.append(f"{name}_bucket{_fmt_labels(bucket_labels)} {_num(cumulative)}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {_num(totals[-2])}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {_num(totals[-1])}")
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                lines.append(f"{name}{_fmt_labels(tuple(sorted(labels.items())))} {value}")
         return "\n".join(lines) + "\n"
 
 
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
 def _fmt_labels(labels: tuple[tuple[str, str], ...]) -> str:
     if not labels:
         return ""
@@ -49,4 +335,8 @@ def _escape_label(value: str) -> str:
     return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
 
 
-metrics = Metrics()
+metrics = Metrics(
+    default_buckets=settings.metrics_latency_buckets_ms,
+    multiproc_dir=settings.metrics_multiproc_dir or None,
+    flush_seconds=settings.metrics_flush_seconds,
+)
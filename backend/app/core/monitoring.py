@@ -0,0 +1,275 @@
+"""Série temporelle de l'observabilité (``/api/observability/dashboard``).
+
+Le ``Sampler`` lit à pas fixe les cumuls de ``app.core.metrics`` (agrégés entre
+workers) et garde la différence avec l'échantillon précédent : requêtes,
+erreurs 5xx, latence moyenne et percentiles, requêtes SQL lentes, retard
+d'ingestion de la synchronisation. S'y ajoutent des jauges lues à l'instant :
+connexions en cours sur le pool primaire et profondeur des files Celery.
+
+Les points vivent dans un tampon circulaire (``monitoring_retention_hours``,
+24 h par défaut) ; les statistiques par route portent sur les ``route_window``
+derniers pas (15 min par défaut).
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+
+from app.core.config import settings
+from app.core.metrics import Metrics, histogram_quantile, metrics
+from app.core.tracing import instrument_redis
+from app.db.session import pool_stats
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUESTS = "cnts_http_requests_total"
+HTTP_DURATION = "cnts_http_request_duration_ms"
+SLOW_QUERIES = "db_slow_queries_total"
+SYNC_LAG = "sync_ingestion_lag_seconds"
+
+RouteKey = tuple[str, str]  # (méthode, gabarit de route)
+
+
+@dataclass(frozen=True)
+class Point:
+    at: dt.datetime
+    requests: int
+    errors: int  # réponses 5xx
+    latency_avg_ms: float | None
+    latency_p95_ms: float | None
+    latency_p99_ms: float | None
+    slow_queries: int
+    db_checked_out: int | None
+    celery_queue_depth: int | None
+    sync_lag_p95_seconds: float | None
+
+
+@dataclass
+class _Totals:
+    """Cumuls lus dans les métriques à un instant donné."""
+
+    requests: dict[RouteKey, list[float]] = field(default_factory=dict)  # [total, 5xx]
+    statuses: dict[str, float] = field(default_factory=dict)
+    durations: dict[RouteKey, list[float]] = field(default_factory=dict)
+    duration_bounds: tuple[float, ...] = ()
+    slow_queries: float = 0
+    sync_lag: list[float] = field(default_factory=list)
+    sync_lag_bounds: tuple[float, ...] = ()
+
+
+def _read_totals(families: list[dict]) -> _Totals:
+    totals = _Totals()
+    for family in families:
+        name = family["name"]
+        if name == HTTP_REQUESTS:
+            for (method, route, status), values in family["series"]:
+                acc = totals.requests.setdefault((method, route), [0, 0])
+                acc[0] += values[0]
+                if status.startswith("5"):
+                    acc[1] += values[0]
+                totals.statuses[status] = totals.statuses.get(status, 0) + values[0]
+        elif name == HTTP_DURATION:
+            totals.duration_bounds = tuple(family["buckets"])
+            for (method, route), values in family["series"]:
+                totals.durations[(method, route)] = list(values)
+        elif name == SLOW_QUERIES:
+            totals.slow_queries = sum(values[0] for _, values in family["series"])
+        elif name == SYNC_LAG:
+            totals.sync_lag_bounds = tuple(family["buckets"])
+            for _, values in family["series"]:
+                totals.sync_lag = _add(totals.sync_lag, values)
+    return totals
+
+
+def _add(a: list[float], b: list[float]) -> list[float]:
+    if len(a) != len(b):
+        return list(b) if not a else list(a)
+    return [x + y for x, y in zip(a, b)]
+
+
+def _delta(new: list[float], old: list[float] | None) -> list[float]:
+    """Différence de cumuls ; un cumul qui recule (worker redémarré) repart de zéro."""
+    if not old or len(old) != len(new):
+        return list(new)
+    diff = [n - o for n, o in zip(new, old)]
+    return list(new) if any(d < 0 for d in diff) else diff
+
+
+def _sum_histograms(histograms: dict[RouteKey, list[float]]) -> list[float]:
+    merged: list[float] = []
+    for values in histograms.values():
+        merged = _add(merged, values)
+    return merged
+
+
+def _avg(totals: list[float]) -> float | None:
+    return totals[-2] / totals[-1] if totals and totals[-1] else None
+
+
+def _quantile(q: float, bounds: tuple[float, ...], totals: list[float]) -> float | None:
+    return histogram_quantile(q, bounds, totals) if totals else None
+
+
+_redis_client = None
+
+
+def celery_queue_depth() -> int | None:
+    """Messages en attente dans les files Celery (broker Redis) ; ``None`` si injoignable."""
+    global _redis_client
+    try:
+        if _redis_client is None:
+            import redis
+
+            _redis_client = instrument_redis(
+                redis.Redis.from_url(
+                    settings.redis_url, socket_timeout=0.2, socket_connect_timeout=0.2
+                )
+            )
+        return sum(int(_redis_client.llen(q)) for q in settings.monitoring_celery_queues)
+    except Exception:
+        logger.debug("Profondeur des files Celery indisponible", exc_info=True)
+        return None
+
+
+def _primary_checked_out() -> int | None:
+    for stats in pool_stats():
+        if stats["pool"] == "primary":
+            return stats.get("checked_out")
+    return None
+
+
+class Sampler:
+    def __init__(
+        self,
+        *,
+        interval_seconds: float,
+        retention: int,
+        route_window: int = 15,
+        source: Metrics = metrics,
+    ) -> None:
+        self.interval_seconds = interval_seconds
+        self._source = source
+        self._points: deque[Point] = deque(maxlen=retention)
+        self._window: deque[tuple[dt.datetime, _Totals]] = deque(maxlen=route_window + 1)
+        self._previous = _Totals()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def sample(self, now: dt.datetime | None = None) -> Point:
+        now = now or dt.datetime.now(dt.timezone.utc)
+        totals = _read_totals(self._source.collect())
+        checked_out = _primary_checked_out()
+        depth = celery_queue_depth()
+        with self._lock:
+            prev = self._previous
+            deltas = [_delta(v, prev.requests.get(k)) for k, v in totals.requests.items()]
+            requests = sum(d[0] for d in deltas)
+            errors = sum(d[1] for d in deltas)
+            durations = _delta(_sum_histograms(totals.durations), _sum_histograms(prev.durations))
+            lag = _delta(totals.sync_lag, prev.sync_lag)
+            point = Point(
+                at=now,
+                requests=int(requests),
+                errors=int(errors),
+                latency_avg_ms=_avg(durations),
+                latency_p95_ms=_quantile(0.95, totals.duration_bounds, durations),
+                latency_p99_ms=_quantile(0.99, totals.duration_bounds, durations),
+                slow_queries=int(max(0, totals.slow_queries - prev.slow_queries)),
+                db_checked_out=checked_out,
+                celery_queue_depth=depth,
+                sync_lag_p95_seconds=_quantile(0.95, totals.sync_lag_bounds, lag),
+            )
+            self._points.append(point)
+            self._window.append((now, totals))
+            self._previous = totals
+        return point
+
+    def sample_if_due(self) -> None:
+        """Échantillonne si le dernier point a plus d'un pas (sans thread d'échantillonnage)."""
+        now = dt.datetime.now(dt.timezone.utc)
+        with self._lock:
+            last = self._points[-1].at if self._points else None
+        if last is None or (now - last).total_seconds() >= self.interval_seconds:
+            self.sample(now)
+
+    def points(self) -> list[Point]:
+        with self._lock:
+            return list(self._points)
+
+    def route_stats(self, limit: int = 50) -> list[dict]:
+        """Débit, taux d'erreur et percentiles par route sur la fenêtre glissante."""
+        with self._lock:
+            if not self._window:
+                return []
+            newest_at, newest = self._window[-1]
+            if len(self._window) > 1:
+                oldest_at, oldest = self._window[0]
+                seconds = (newest_at - oldest_at).total_seconds()
+            else:
+                oldest, seconds = _Totals(), self.interval_seconds
+        minutes = max(seconds, 1.0) / 60
+        out = []
+        for key, values in newest.requests.items():
+            count, errors = _delta(values, oldest.requests.get(key))
+            if not count:
+                continue
+            durations = _delta(newest.durations.get(key, []), oldest.durations.get(key))
+            bounds = newest.duration_bounds
+            out.append(
+                {
+                    "method": key[0],
+                    "route": key[1],
+                    "requests": int(count),
+                    "rate_per_minute": round(count / minutes, 2),
+                    "errors": int(errors),
+                    "error_rate": round(100 * errors / count, 2),
+                    "latency_p50_ms": _round(_quantile(0.5, bounds, durations)),
+                    "latency_p95_ms": _round(_quantile(0.95, bounds, durations)),
+                    "latency_p99_ms": _round(_quantile(0.99, bounds, durations)),
+                }
+            )
+        out.sort(key=lambda r: r["requests"], reverse=True)
+        return out[:limit]
+
+    def status_counts(self) -> dict[str, int]:
+        """Réponses par code HTTP depuis le démarrage (cumuls du dernier échantillon)."""
+        with self._lock:
+            return {k: int(v) for k, v in self._previous.statuses.items()}
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def loop() -> None:
+            while not self._stop.wait(self.interval_seconds):
+                try:
+                    self.sample()
+                except Exception:
+                    logger.warning("Échantillonnage des métriques impossible", exc_info=True)
+
+        self._thread = threading.Thread(target=loop, name="monitoring-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+
+def _round(value: float | None) -> float | None:
+    return round(value, 2) if value is not None else None
+
+
+sampler = Sampler(
+    interval_seconds=settings.monitoring_sample_seconds,
+    retention=max(
+        1, int(settings.monitoring_retention_hours * 3600 / settings.monitoring_sample_seconds)
+    ),
+)
@@ -0,0 +1,187 @@
+"""Notifications en masse : insertion, envoi par lots, statuts.
+
+Les destinataires sont insérés en une instruction multi-lignes
+(``insert_notifications``) puis répartis en lots de
+``notification_batch_size`` envoyés chacun par une tâche Celery
+(``dispatch``) sur la file de leur canal (``QUEUES``) : chaque canal a ses
+workers, qui gardent leurs connexions aux fournisseurs
+(``app.core.channels``).
+
+Une tâche d'envoi réserve d'abord son lot (``claim`` : EN_ATTENTE → EN_COURS
+en une instruction) et n'envoie que les lignes obtenues : un identifiant mis
+en file deux fois (relance manuelle, redistribution Celery) ne part qu'une
+fois. Les résultats d'un lot sont enregistrés en deux instructions
+(``record_results``). Un échec temporaire passe en ``A_RELANCER`` avec la date
+du prochain essai (``notification_retry_delays_seconds``) ; ``claim_retries``
+regroupe ensuite toutes les relances échues en lots, au lieu d'une tâche
+différée par message.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import uuid
+from collections import defaultdict
+from collections.abc import Iterable, Iterator, Sequence
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.channels import CANAUX, DeliveryError
+from app.core.config import settings
+from app.db.models import Notification
+
+logger = logging.getLogger(__name__)
+
+# File Celery de chaque canal (un pool de workers par file)
+QUEUES = {canal: f"notifications.{canal.lower()}" for canal in CANAUX}
+
+
+def insert_notifications(db: Session, rows: Iterable[dict]) -> list[uuid.UUID]:
+    """Insère les notifications ``rows`` (EN_ATTENTE) ; renvoie leurs identifiants."""
+    values = [
+        {"statut": "EN_ATTENTE", "priorite": "NORMALE", "tentatives": 0, **row, "id": uuid.uuid4()}
+        for row in rows
+    ]
+    if values:
+        db.execute(insert(Notification), values)
+    return [v["id"] for v in values]
+
+
+def batches(ids: Sequence, size: int | None = None) -> Iterator[list[str]]:
+    size = size or settings.notification_batch_size
+    for start in range(0, len(ids), size):
+        yield [str(i) for i in ids[start : start + size]]
+
+
+def dispatch(ids: Sequence, canal: str, size: int | None = None) -> int:
+    """Met en file l'envoi de ``ids``, une tâche par lot ; renvoie le nombre de lots.
+
+    Sans broker joignable les notifications restent EN_ATTENTE (best effort,
+    comme pour l'envoi unitaire).
+    """
+    from app.tasks.notifications import send_notifications
+
+    queued = 0
+    try:
+        for batch in batches(ids, size):
+            send_notifications.apply_async(args=[batch], queue=QUEUES[canal])
+            queued += 1
+    except Exception:
+        logger.warning("Mise en file des notifications impossible", exc_info=True)
+    return queued
+
+
+def claim(db: Session, ids: Sequence[uuid.UUID]) -> list:
+    """Réserve les notifications ``ids`` encore EN_ATTENTE ; renvoie les lignes à envoyer.
+
+    Les lignes passent EN_COURS avec une échéance
+    (``notification_claim_timeout_seconds``) au-delà de laquelle
+    ``claim_retries`` les remet en envoi si le lot n'a pas abouti.
+    """
+    table = Notification.__table__
+    lease = dt.datetime.now(dt.timezone.utc) + dt.timedelta(
+        seconds=settings.notification_claim_timeout_seconds
+    )
+    rows = db.execute(
+        update(table)
+        .where(table.c.id.in_(ids), table.c.statut == "EN_ATTENTE")
+        .values(statut="EN_COURS", prochain_essai=lease)
+        .returning(
+            table.c.id,
+            table.c.canal,
+            table.c.destinataire,
+            table.c.template,
+            table.c.variables,
+            table.c.tentatives,
+        )
+    ).all()
+    return sorted(rows, key=lambda row: (row.canal, row.id))
+
+
+def retry_delay(tentatives: int) -> dt.timedelta | None:
+    """Délai avant le prochain essai après ``tentatives`` échecs, ``None`` si abandon."""
+    delays = settings.notification_retry_delays_seconds
+    if tentatives > len(delays):
+        return None
+    return dt.timedelta(seconds=delays[tentatives - 1])
+
+
+def record_results(
+    db: Session,
+    sent: Sequence[uuid.UUID],
+    failed: Sequence[tuple[uuid.UUID, int, DeliveryError]],
+) -> None:
+    """Statuts d'un lot : une instruction pour les envois, une pour les échecs.
+
+    ``failed`` : ``(id, tentatives précédentes, erreur)``.
+    """
+    table = Notification.__table__
+    now = dt.datetime.now(dt.timezone.utc)
+    if sent:
+        db.execute(
+            update(table)
+            .where(table.c.id.in_(sent))
+            .values(
+                statut="ENVOYE",
+                sent_at=now,
+                erreur=None,
+                prochain_essai=None,
+                tentatives=table.c.tentatives + 1,
+            )
+        )
+    if failed:
+        params = []
+        for notification_id, tentatives, error in failed:
+            delay = None if error.permanent else retry_delay(tentatives + 1)
+            params.append(
+                {
+                    "notification_id": notification_id,
+                    "new_statut": "ECHEC" if delay is None else "A_RELANCER",
+                    "message": str(error)[:500],
+                    "retry_at": None if delay is None else now + delay,
+                }
+            )
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("notification_id"))
+            .values(
+                statut=bindparam("new_statut"),
+                erreur=bindparam("message"),
+                prochain_essai=bindparam("retry_at"),
+                tentatives=table.c.tentatives + 1,
+            ),
+            params,
+        )
+
+
+def claim_retries(db: Session, limit: int = 10_000) -> dict[str, list[uuid.UUID]]:
+    """Repasse en EN_ATTENTE les relances échues ; identifiants par canal.
+
+    Les lots réservés dont la réservation a expiré (worker arrêté en cours
+    d'envoi) sont repris de la même façon.
+    """
+    now = dt.datetime.now(dt.timezone.utc)
+    rows = db.execute(
+        select(Notification.id, Notification.canal)
+        .where(
+            Notification.statut.in_(["A_RELANCER", "EN_COURS"]),
+            Notification.prochain_essai <= now,
+        )
+        .order_by(Notification.prochain_essai)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not rows:
+        return {}
+    db.execute(
+        update(Notification)
+        .where(Notification.id.in_([row.id for row in rows]))
+        .values(statut="EN_ATTENTE", prochain_essai=None)
+        .execution_options(synchronize_session=False)
+    )
+    by_canal: dict[str, list[uuid.UUID]] = defaultdict(list)
+    for row in rows:
+        by_canal[row.canal].append(row.id)
+    return dict(by_canal)
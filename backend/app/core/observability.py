@@ -0,0 +1,201 @@
+"""Middleware ASGI d'observabilité : request id, en-têtes, span, métriques, log d'accès.
+
+Implémenté en ASGI brut (et non ``BaseHTTPMiddleware``) : pas de tâche ni de
+flux mémoire intermédiaires par requête, et les réponses en streaming passent
+telles quelles. Les en-têtes ajoutés sont des tuples d'octets préalloués ; le
+log d'accès transporte ses champs en ``extra`` et n'est sérialisé qu'à
+l'écriture (voir ``app.core.logging``).
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import tracing
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.request_context import request_id_var
+from app.db.instrumentation import track_queries
+
+logger = logging.getLogger("app.http")
+
+http_requests = metrics.counter("cnts_http_requests_total", ("method", "route", "status"))
+http_duration = metrics.histogram("cnts_http_request_duration_ms", ("method", "route"))
+db_queries = metrics.histogram(
+    "db_queries_per_request", ("method", "route"), buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+db_time = metrics.histogram("db_time_per_request_ms", ("method", "route"))
+db_n_plus_one = metrics.counter("db_n_plus_one_total", ("method", "route"))
+
+SECURITY_HEADERS: tuple[tuple[bytes, bytes], ...] = (
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+)
+
+
+def header_value(scope: Scope, name: bytes) -> bytes | None:
+    """Premier en-tête ``name`` (minuscules) de la requête, sans construire de ``Headers``."""
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+def _trace_carrier(scope: Scope) -> dict[str, str]:
+    carrier = {}
+    for name in (b"traceparent", b"tracestate"):
+        value = header_value(scope, name)
+        if value is not None:
+            carrier[name.decode()] = value.decode("latin-1")
+    return carrier
+
+
+def route_template(scope: Scope) -> str:
+    """Gabarit de la route servie (``/api/poches/{poche_id}``), à défaut le chemin brut.
+
+    Lu après le passage dans le routeur. Les versions récentes de FastAPI gardent
+    la route d'origine (sans préfixe d'inclusion) dans ``scope["route"]`` et le
+    chemin complet dans le contexte effectif.
+    """
+    effective = scope.get("fastapi", {}).get("effective_route_context")
+    path = getattr(effective, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or scope["path"]
+
+
+class ObservabilityMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        raw_rid = header_value(scope, b"x-request-id")
+        rid = raw_rid.decode("latin-1") if raw_rid else str(uuid.uuid4())
+        method = scope["method"]
+        span = span_token = None
+        if tracing.enabled and "fastapi.telemetry" not in scope:
+            # FastAPI récent ouvre lui-même le span serveur dès qu'un fournisseur
+            # est configuré ; sinon on le crée ici.
+            span = tracing.start_span(
+                method,
+                kind="server",
+                context=tracing.extract(_trace_carrier(scope)),
+                attributes={"http.request.method": method, "url.path": scope["path"]},
+            )
+            span_token = tracing.activate(span)
+        server_span = span or tracing.current_span()
+        if server_span is not None:
+            server_span.set_attribute("cnts.request_id", rid)
+        response_traceparent = tracing.traceparent(server_span)
+        token = request_id_var.set(rid)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-request-id", rid.encode("latin-1")))
+                headers.extend(SECURITY_HEADERS)
+                if response_traceparent is not None:
+                    headers.append((b"traceparent", response_traceparent.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000.0
+            route_path = route_template(scope)  # cardinalité bornée pour les labels
+            http_requests.labels(method, route_path, str(status_code)).inc()
+            http_duration.labels(method, route_path).observe(duration_ms)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "http.request",
+                    extra={
+                        "fields": {
+                            "method": method,
+                            "path": scope["path"],
+                            "route": route_path,
+                            "status": status_code,
+                            "duration_ms": round(duration_ms, 2),
+                        }
+                    },
+                )
+            request_id_var.reset(token)
+            if span is not None:
+                span.update_name(f"{method} {route_path}")
+                span.set_attribute("http.route", route_path)
+                span.set_attribute("http.response.status_code", status_code)
+                if status_code >= 500:
+                    tracing.mark_error(span, str(status_code))
+                tracing.deactivate(span_token)
+                tracing.end_span(span)
+
+
+class QueryStatsMiddleware:
+    """Profil SQL par requête : en-têtes ``X-DB-*``, métriques et alerte N+1.
+
+    Activé dans les environnements ``db_query_tracking_envs`` (dev, staging). Les
+    en-têtes ne comptent que les requêtes émises avant l'envoi de la réponse.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    message["headers"] = [
+                        *message.get("headers", ()),
+                        (b"x-db-query-count", str(stats.count).encode()),
+                        (b"x-db-time-ms", f"{stats.total_ms:.2f}".encode()),
+                        (b"x-db-n-plus-one", str(len(stats.repeated())).encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route_path = route_template(scope)
+                method = scope["method"]
+                db_queries.labels(method, route_path).observe(stats.count)
+                db_time.labels(method, route_path).observe(stats.total_ms)
+                repeated = stats.repeated()
+                if repeated:
+                    db_n_plus_one.labels(method, route_path).inc()
+                if repeated or stats.total_ms >= settings.db_slow_query_ms:
+                    logger.warning(
+                        "db.request_profile",
+                        extra={
+                            "fields": {
+                                "method": method,
+                                "route": route_path,
+                                "queries": stats.count,
+                                "db_time_ms": round(stats.total_ms, 2),
+                                "repeated": [
+                                    {"statement": stmt[:300], "executions": n}
+                                    for stmt, n in repeated[:3]
+                                ],
+                                "slowest": [
+                                    {"statement": stmt[:300], "duration_ms": round(ms, 2)}
+                                    for ms, stmt in stats.slowest()[:3]
+                                ],
+                            }
+                        },
+                    )
@@ -1,18 +1,44 @@
 """
-Simple in-memory rate limiting middleware.
-For production, consider using Redis-based rate limiting.
+Rate limiting middleware (GCRA).
+
+Chaque clé ne garde qu'un horodatage, le « theoretical arrival time » (TAT) de
+l'algorithme GCRA : O(1) en mémoire et en calcul quelle que soit la limite. Avec
+``rate_limit_redis_enabled`` l'état vit dans Redis et la décision est prise
+atomiquement par un script Lua (horloge Redis), donc partagée entre workers et
+instances ; si Redis est injoignable, le limiteur retombe sur l'état local du
+processus.
+
+Politiques :
+- ``rate_limit_routes`` : limites par route (``"POST /api/auth/login": 5``),
+  préfixe le plus long d'abord ;
+- sinon par type d'endpoint (auth, admin, écriture, lecture) ;
+- un utilisateur authentifié (jeton d'accès valide) est limité par son id avec
+  les limites ``user_*`` ; les endpoints d'authentification restent par IP.
 """
 
+from __future__ import annotations
+
+import logging
+import math
+import threading
 import time
-from collections import defaultdict
-from dataclasses import dataclass, field
-from typing import Callable
+from collections import OrderedDict
+from dataclasses import dataclass
 
-from fastapi import HTTPException, Request, status
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from fastapi import status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.observability import header_value
+from app.core.tokens import verify_token
+from app.core.tracing import instrument_redis
+
+logger = logging.getLogger(__name__)
+
+_redis_fallbacks = metrics.counter("rate_limit_redis_fallback_total").labels()
+_rejected = metrics.counter("rate_limit_rejected_total", ("policy",))
 
 
 @dataclass
@@ -27,159 +53,280 @@ class RateLimitConfig:
     admin_rpm: int = 30
     # Write operations (POST, PUT, DELETE)
     write_rpm: int = 60
+    # Authenticated users (keyed by user id rather than IP)
+    user_default_rpm: int = 300
+    user_write_rpm: int = 120
+
+
+@dataclass(frozen=True)
+class Policy:
+    """``limit`` requêtes par ``period_seconds``, rafale de ``limit`` comprise."""
+
+    name: str
+    limit: int
+    period_seconds: float = 60.0
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # secondes avant la prochaine requête acceptée (0 si acceptée)
+    reset_after: float  # secondes avant le retour au quota plein
+
+
+def _gcra(tat: float | None, now: float, policy: Policy) -> tuple[Decision, float | None]:
+    """Décision GCRA ; retourne aussi le nouveau TAT (``None`` si refusée)."""
+    interval = policy.period_seconds / policy.limit
+    burst = policy.period_seconds  # tolérance : ``limit`` requêtes d'affilée
+    new_tat = max(tat or now, now) + interval
+    allow_at = new_tat - burst
+    if now < allow_at:
+        current = max(tat or now, now)
+        return (
+            Decision(False, policy.limit, 0, allow_at - now, current - now),
+            None,
+        )
+    remaining = int((now - allow_at) / interval)
+    return Decision(True, policy.limit, remaining, 0.0, new_tat - now), new_tat
+
+
+class _LocalStore:
+    """TAT par clé dans le processus ; LRU borné (une clé expirée vaut une clé absente)."""
+
+    def __init__(self, max_keys: int) -> None:
+        self._tats: OrderedDict[str, float] = OrderedDict()
+        self._max_keys = max_keys
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, policy: Policy) -> Decision:
+        now = time.monotonic()
+        with self._lock:
+            decision, new_tat = _gcra(self._tats.get(key), now, policy)
+            if new_tat is not None:
+                self._tats[key] = new_tat
+                self._tats.move_to_end(key)
+                while len(self._tats) > self._max_keys:
+                    self._tats.popitem(last=False)
+        return decision
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tats.clear()
+
+
+# KEYS[1] = clé ; ARGV = intervalle, rafale (secondes). Horloge du serveur Redis
+# pour que tous les workers partagent la même référence de temps.
+_GCRA_LUA = """
+redis.replicate_commands()
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - burst
+if now < allow_at then
+  return {0, 0, tostring(allow_at - now), tostring(tat - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, math.floor((now - allow_at) / interval), '0', tostring(new_tat - now)}
+"""
 
 
-@dataclass
-class RequestCounter:
-    """Track request counts with sliding window."""
-
-    counts: dict = field(default_factory=lambda: defaultdict(list))
-
-    def is_rate_limited(self, key: str, limit: int, window_seconds: int = 60) -> bool:
-        """Check if the key has exceeded the rate limit."""
-        now = time.time()
-        cutoff = now - window_seconds
-
-        # Clean old entries
-        self.counts[key] = [t for t in self.counts[key] if t > cutoff]
-
-        # Check if over limit
-        if len(self.counts[key]) >= limit:
-            return True
-
-        # Record this request
-        self.counts[key].append(now)
-        return False
-
-    def get_remaining(self, key: str, limit: int, window_seconds: int = 60) -> int:
-        """Get remaining requests in the current window."""
-        now = time.time()
-        cutoff = now - window_seconds
-        current_count = len([t for t in self.counts[key] if t > cutoff])
-        return max(0, limit - current_count)
-
-    def cleanup(self, max_age_seconds: int = 120) -> None:
-        """Remove stale entries to prevent memory leaks."""
-        now = time.time()
-        cutoff = now - max_age_seconds
-        keys_to_remove = []
-
-        for key, timestamps in self.counts.items():
-            self.counts[key] = [t for t in timestamps if t > cutoff]
-            if not self.counts[key]:
-                keys_to_remove.append(key)
-
-        for key in keys_to_remove:
-            del self.counts[key]
+class RateLimiter:
+    def __init__(self, *, redis_url: str | None = None, max_local_keys: int = 100_000) -> None:
+        self._local = _LocalStore(max_local_keys)
+        self._script = None
+        if redis_url:
+            try:
+                import redis
+
+                client = instrument_redis(redis.Redis.from_url(redis_url, socket_timeout=0.2))
+                self._script = client.register_script(_GCRA_LUA)
+            except ImportError:
+                logger.warning("redis indisponible, limitation de débit par processus")
+
+    def hit(self, key: str, policy: Policy) -> Decision:
+        if self._script is not None:
+            interval = policy.period_seconds / policy.limit
+            try:
+                allowed, remaining, retry_after, reset_after = self._script(
+                    keys=[f"cnts:rl:{key}"], args=[interval, policy.period_seconds]
+                )
+                return Decision(
+                    bool(allowed),
+                    policy.limit,
+                    int(remaining),
+                    float(retry_after),
+                    float(reset_after),
+                )
+            except Exception:
+                _redis_fallbacks.inc()
+                logger.warning("Redis injoignable, limitation locale", exc_info=True)
+        return self._local.hit(key, policy)
+
+    def reset(self) -> None:
+        self._local.clear()
 
 
-# Global rate limit counter (for single-instance deployments)
-# For multi-instance, use Redis instead
-_counter = RequestCounter()
 _config = RateLimitConfig()
-_last_cleanup = time.time()
+limiter = RateLimiter(redis_url=settings.redis_url if settings.rate_limit_redis_enabled else None)
 
 
-def get_client_ip(request: Request) -> str:
-    """Extract client IP from request, considering proxies."""
+def get_client_ip(scope: Scope) -> str:
+    """Extract client IP from the ASGI scope, considering proxies."""
     # Check X-Forwarded-For header (set by proxies/load balancers)
-    forwarded_for = request.headers.get("X-Forwarded-For")
+    forwarded_for = header_value(scope, b"x-forwarded-for")
     if forwarded_for:
         # Take the first IP in the chain (original client)
-        return forwarded_for.split(",")[0].strip()
+        return forwarded_for.decode("latin-1").split(",")[0].strip()
 
     # Check X-Real-IP header (nginx)
-    real_ip = request.headers.get("X-Real-IP")
+    real_ip = header_value(scope, b"x-real-ip")
     if real_ip:
-        return real_ip
+        return real_ip.decode("latin-1")
 
     # Fall back to direct client IP
-    if request.client:
-        return request.client.host
+    client = scope.get("client")
+    if client:
+        return client[0]
 
     return "unknown"
 
 
-def get_rate_limit_for_path(path: str, method: str) -> int:
-    """Determine the rate limit based on the request path and method."""
+def get_user_id(scope: Scope) -> str | None:
+    """Identifiant de l'utilisateur si la requête porte un jeton d'accès valide."""
+    authorization = header_value(scope, b"authorization")
+    if not authorization or authorization[:7].lower() != b"bearer ":
+        return None
+    payload = verify_token(
+        authorization[7:].decode("latin-1").strip(), secret=settings.auth_token_secret
+    )
+    if not payload or payload.get("type") != "access":
+        return None
+    return str(payload.get("sub"))
+
+
+def _route_policies() -> list[tuple[str | None, str, Policy]]:
+    rules: list[tuple[str | None, str, Policy]] = []
+    for rule, limit in settings.rate_limit_routes.items():
+        method, _, prefix = rule.partition(" ") if " " in rule else (None, "", rule)
+        rules.append((method.upper() if method else None, prefix, Policy(f"route:{rule}", limit)))
+    # Préfixe le plus long d'abord, règle avec méthode avant la règle générique
+    return sorted(rules, key=lambda r: (len(r[1]), r[0] is not None), reverse=True)
+
+
+_ROUTE_POLICIES = _route_policies()
+
+
+def get_policy(path: str, method: str, *, authenticated: bool = False) -> Policy:
+    """Determine the rate limit policy based on the request path, method and caller."""
+    for rule_method, prefix, policy in _ROUTE_POLICIES:
+        if path.startswith(prefix) and rule_method in (None, method):
+            return policy
+
     path_lower = path.lower()
 
     # Auth endpoints - strictest limits (prevent brute force)
     if "/auth/" in path_lower or path_lower.endswith("/auth"):
-        return _config.auth_rpm
+        return Policy("auth", _config.auth_rpm)
 
     # Admin endpoints
     if "/admin/" in path_lower:
-        return _config.admin_rpm
+        return Policy("admin", _config.admin_rpm)
 
     # Write operations
     if method in ("POST", "PUT", "PATCH", "DELETE"):
-        return _config.write_rpm
+        if authenticated:
+            return Policy("user_write", _config.user_write_rpm)
+        return Policy("write", _config.write_rpm)
 
     # Default for read operations
-    return _config.default_rpm
+    if authenticated:
+        return Policy("user_read", _config.user_default_rpm)
+    return Policy("read", _config.default_rpm)
+
+
+def get_rate_limit_for_path(path: str, method: str) -> int:
+    """Determine the rate limit based on the request path and method."""
+    return get_policy(path, method).limit
+
 
+_EXEMPT_PATHS = frozenset({"/api/health", "/api/health/db", "/health"})
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+
+class RateLimitMiddleware:
     """
-    Rate limiting middleware using sliding window algorithm.
+    Rate limiting middleware (GCRA, raw ASGI).
 
-    Limits are per-IP and vary by endpoint type:
-    - Auth endpoints: 10 req/min (prevent brute force)
+    Anonymous callers are keyed by IP, authenticated users by user id. Limits
+    vary by endpoint type unless a route policy applies:
+    - Auth endpoints: 10 req/min (prevent brute force, always per IP)
     - Admin endpoints: 30 req/min
-    - Write operations: 60 req/min
-    - Read operations: 100 req/min
+    - Write operations: 60 req/min (120 for an authenticated user)
+    - Read operations: 100 req/min (300 for an authenticated user)
     """
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        global _last_cleanup
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
         # Skip rate limiting in development if configured
         if settings.env == "dev" and not getattr(settings, "rate_limit_in_dev", False):
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
         # Skip health checks
-        if request.url.path in ("/api/health", "/api/health/db", "/health"):
-            return await call_next(request)
-
-        # Periodic cleanup (every 2 minutes)
-        now = time.time()
-        if now - _last_cleanup > 120:
-            _counter.cleanup()
-            _last_cleanup = now
-
-        # Get client identifier
-        client_ip = get_client_ip(request)
-
-        # Determine rate limit for this request
-        limit = get_rate_limit_for_path(request.url.path, request.method)
-
-        # Create rate limit key (IP + path prefix for granular limits)
-        path_prefix = "/".join(request.url.path.split("/")[:4])  # e.g., /api/auth/login
-        rate_key = f"{client_ip}:{path_prefix}"
-
-        # Check rate limit
-        if _counter.is_rate_limited(rate_key, limit):
-            remaining = _counter.get_remaining(rate_key, limit)
-            raise HTTPException(
+        path = scope["path"]
+        if path in _EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        user_id = get_user_id(scope)
+        policy = get_policy(path, method, authenticated=user_id is not None)
+        if user_id is not None and policy.name != "auth":
+            identity = f"u:{user_id}"
+        else:
+            identity = f"ip:{get_client_ip(scope)}"
+
+        # Per-route buckets: path prefix granularity (e.g. /api/auth/login)
+        path_prefix = "/".join(path.split("/")[:4])
+        decision = limiter.hit(f"{policy.name}:{identity}:{path_prefix}", policy)
+        rate_headers = [
+            (b"x-ratelimit-limit", str(decision.limit).encode()),
+            (b"x-ratelimit-remaining", str(decision.remaining).encode()),
+            (b"x-ratelimit-reset", str(math.ceil(decision.reset_after)).encode()),
+        ]
+
+        if not decision.allowed:
+            retry_after = max(1, math.ceil(decision.retry_after))
+            _rejected.labels(policy.name).inc()
+            response = JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail={
-                    "error": "rate_limit_exceeded",
-                    "message": "Trop de requêtes. Veuillez réessayer plus tard.",
-                    "retry_after_seconds": 60,
-                },
-                headers={
-                    "Retry-After": "60",
-                    "X-RateLimit-Limit": str(limit),
-                    "X-RateLimit-Remaining": str(remaining),
+                content={
+                    "detail": {
+                        "error": "rate_limit_exceeded",
+                        "message": "Trop de requêtes. Veuillez réessayer plus tard.",
+                        "retry_after_seconds": retry_after,
+                    }
                 },
+                headers={"Retry-After": str(retry_after)},
             )
+            response.raw_headers.extend(rate_headers)
+            await response(scope, receive, send)
+            return
 
-        # Process request and add rate limit headers
-        response = await call_next(request)
-
-        remaining = _counter.get_remaining(rate_key, limit)
-        response.headers["X-RateLimit-Limit"] = str(limit)
-        response.headers["X-RateLimit-Remaining"] = str(remaining)
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *rate_headers]
+            await send(message)
 
-        return response
+        await self.app(scope, receive, send_wrapper)
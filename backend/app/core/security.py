@@ -1,14 +1,126 @@
+"""Empreinte HMAC-SHA256 des numéros CNI (le numéro en clair n'est pas stocké).
+
+Le contexte HMAC est préparé une fois par clé (``_keyed``) puis copié pour
+chaque numéro : la clé n'est plus dérivée à chaque appel. ``hash_cni_many``
+traite un lot (import, synchronisation) avec le même contexte.
+
+Rotation de clé
+---------------
+Une empreinte de version 1 est ``HMAC(k1, cni)`` ; la version n enveloppe
+celle de la version n-1 : ``HMAC(kn, empreinte n-1)``, stockée préfixée
+``vn$``. Sans le numéro en clair, une empreinte existante peut ainsi passer à
+la nouvelle version (tâche ``app.tasks.maintenance.rehash_cni``), et la clé
+compromise seule ne suffit plus à vérifier un numéro. Les clés des versions
+précédentes restent donc nécessaires (``cni_hash_previous_keys``).
+
+Pendant la migration les recherches portent sur toutes les versions
+(``cni_hash_candidates``) : un donneur est retrouvé qu'il soit déjà repris ou
+non.
+"""
+
 import hashlib
 import hmac
+import re
+from collections.abc import Iterable
+from functools import lru_cache
 
 from app.core.config import settings
 
+_NOT_ALNUM = re.compile(r"[\W_]+")
+_PREFIX = "v{version}$"
+
+
+def normalize_cni(cni: str) -> str:
+    """Caractères alphanumériques du numéro, en majuscules."""
+    if not cni.isalnum():
+        cni = _NOT_ALNUM.sub("", cni)
+    return cni.upper()
+
+
+@lru_cache(maxsize=16)
+def _keyed(key: str) -> "hmac.HMAC":
+    return hmac.new(key.encode("utf-8"), digestmod=hashlib.sha256)
+
+
+def _key(version: int) -> str:
+    if version == settings.cni_hash_key_version:
+        return settings.cni_hash_key
+    key = settings.cni_hash_previous_keys.get(version)
+    if not key:
+        raise RuntimeError(
+            f"clé CNI de la version {version} absente de cni_hash_previous_keys "
+            f"(cni_hash_key_version={settings.cni_hash_key_version})"
+        )
+    return key
+
+
+def _format(version: int, digest: str) -> str:
+    return digest if version == 1 else _PREFIX.format(version=version) + digest
+
+
+def _parse(value: str) -> tuple[int, str]:
+    if value.startswith("v") and "$" in value:
+        version, digest = value[1:].split("$", 1)
+        return int(version), digest
+    return 1, value
+
+
+def _chain(normalized: list[str], until: int) -> list[list[str]]:
+    """Empreintes de chaque numéro pour les versions 1 à ``until`` (la plus ancienne en tête)."""
+    digests = [m.encode("utf-8") for m in normalized]
+    chains: list[list[str]] = [[] for _ in normalized]
+    for version in range(1, until + 1):
+        base = _keyed(_key(version))
+        for index, message in enumerate(digests):
+            mac = base.copy()
+            mac.update(message)
+            digest = mac.hexdigest()
+            chains[index].append(_format(version, digest))
+            digests[index] = digest.encode("ascii")
+    return chains
+
 
 def hash_cni(cni: str) -> str:
-    normalized = "".join(c for c in cni.strip() if c.isalnum()).upper()
-    digest = hmac.new(
-        key=settings.cni_hash_key.encode("utf-8"),
-        msg=normalized.encode("utf-8"),
-        digestmod=hashlib.sha256,
-    ).hexdigest()
-    return digest
+    """Empreinte de ``cni`` dans la version courante de la clé."""
+    if settings.cni_hash_key_version == 1:
+        mac = _keyed(settings.cni_hash_key).copy()
+        mac.update(normalize_cni(cni).encode("utf-8"))
+        return mac.hexdigest()
+    return _chain([normalize_cni(cni)], settings.cni_hash_key_version)[0][-1]
+
+
+def hash_cni_many(cnis: Iterable[str]) -> list[str]:
+    """``hash_cni`` pour un lot de numéros, dans l'ordre."""
+    chains = _chain([normalize_cni(c) for c in cnis], settings.cni_hash_key_version)
+    return [chain[-1] for chain in chains]
+
+
+def cni_hash_candidates(cni: str) -> list[str]:
+    """Empreintes possibles de ``cni`` en base pendant une rotation (courante en tête)."""
+    return _chain([normalize_cni(cni)], settings.cni_hash_key_version)[0][::-1]
+
+
+def cni_hash_candidates_many(cnis: Iterable[str]) -> list[list[str]]:
+    chains = _chain([normalize_cni(c) for c in cnis], settings.cni_hash_key_version)
+    return [chain[::-1] for chain in chains]
+
+
+def rehash_cni_hash(value: str) -> str | None:
+    """Empreinte stockée ``value`` portée à la version courante (``None`` : déjà à jour)."""
+    version, digest = _parse(value)
+    current = settings.cni_hash_key_version
+    if version == current:
+        return None
+    if version > current:
+        raise ValueError(f"empreinte CNI de version {version} > version courante {current}")
+    for step in range(version + 1, current + 1):
+        mac = _keyed(_key(step)).copy()
+        mac.update(digest.encode("ascii"))
+        digest = mac.hexdigest()
+    return _format(current, digest)
+
+
+def current_cni_hash_prefix() -> str | None:
+    """Préfixe des empreintes de la version courante (``None`` en version 1, sans préfixe)."""
+    version = settings.cni_hash_key_version
+    return None if version == 1 else _PREFIX.format(version=version)
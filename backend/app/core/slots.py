@@ -0,0 +1,282 @@
+"""Créneaux des collectes : capacité et inscriptions sans sur-réservation.
+
+Chaque créneau (``CreneauCollecte``) porte sa capacité et un compteur
+``reserves`` modifié en une instruction ``UPDATE`` conditionnelle
+(``reserves < capacite``) : une inscription ne compte jamais les inscrits du
+créneau, et deux réservations simultanées ne peuvent pas dépasser la capacité
+(contrainte ``ck_creneaux_capacite`` en dernier recours).
+
+Quand un SMS de campagne part, beaucoup de donneurs demandent « le prochain
+créneau libre » en même temps : sous PostgreSQL le candidat est choisi avec
+``FOR UPDATE SKIP LOCKED``, si bien que les réservations concurrentes se
+répartissent sur les créneaux suivants au lieu d'attendre toutes le même
+verrou. Un créneau demandé explicitement attend au contraire son verrou :
+verrouillé ne veut pas dire complet.
+
+``register_many`` place un lot d'inscriptions avec une lecture des créneaux
+libres, une mise à jour groupée des compteurs et une insertion multi-lignes.
+
+Un donneur n'a qu'une inscription active par campagne (index unique partiel
+``uq_inscriptions_collecte_donneur``) ; l'annulation libère sa place
+(``release``).
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import uuid
+from collections import Counter
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.db.models import CampagneCollecte, CreneauCollecte, InscriptionCollecte
+
+# Nouvel essai quand le créneau choisi vient d'être rempli par un autre
+_ATTEMPTS = 5
+
+
+@dataclass(frozen=True)
+class Place:
+    creneau_id: uuid.UUID
+    debut: dt.datetime
+
+
+def _utc(value: dt.datetime) -> dt.datetime:
+    """Instant en UTC ; SQLite renvoie des dates naïves, stockées en UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=dt.timezone.utc)
+    return value.astimezone(dt.timezone.utc)
+
+
+def generate(
+    db: Session,
+    campagne: CampagneCollecte,
+    *,
+    duree_minutes: int,
+    capacite: int,
+    debut: dt.datetime | None = None,
+    fin: dt.datetime | None = None,
+) -> int:
+    """Crée les créneaux de ``debut`` à ``fin`` (la campagne par défaut) ; renvoie leur nombre.
+
+    Les créneaux existants (même début) sont conservés tels quels.
+    """
+    debut = _utc(debut or campagne.date_debut)
+    fin = _utc(fin or campagne.date_fin)
+    step = dt.timedelta(minutes=duree_minutes)
+    existing = {
+        _utc(d)
+        for d in db.execute(
+            select(CreneauCollecte.debut).where(CreneauCollecte.campagne_id == campagne.id)
+        ).scalars()
+    }
+    rows = []
+    start = debut
+    while start + step <= fin:
+        if start not in existing:
+            rows.append(
+                {
+                    "id": uuid.uuid4(),
+                    "campagne_id": campagne.id,
+                    "site_id": campagne.site_id,
+                    "debut": start,
+                    "fin": start + step,
+                    "capacite": capacite,
+                    "reserves": 0,
+                }
+            )
+        start += step
+    if rows:
+        db.execute(insert(CreneauCollecte), rows)
+    return len(rows)
+
+
+def _available(campagne_id: uuid.UUID, after: dt.datetime | None):
+    stmt = select(CreneauCollecte).where(
+        CreneauCollecte.campagne_id == campagne_id,
+        CreneauCollecte.reserves < CreneauCollecte.capacite,
+    )
+    if after is not None:
+        stmt = stmt.where(CreneauCollecte.debut >= after)
+    return stmt.order_by(CreneauCollecte.debut)
+
+
+def next_available(
+    db: Session, campagne_id: uuid.UUID, *, after: dt.datetime | None = None, limit: int = 10
+) -> list[CreneauCollecte]:
+    """Prochains créneaux non complets de la campagne, par l'index des disponibilités."""
+    return list(db.execute(_available(campagne_id, after).limit(limit)).scalars())
+
+
+def _take(db: Session, creneau_id: uuid.UUID, campagne_id: uuid.UUID) -> Place | None:
+    row = db.execute(
+        update(CreneauCollecte)
+        .where(
+            CreneauCollecte.id == creneau_id,
+            CreneauCollecte.campagne_id == campagne_id,
+            CreneauCollecte.reserves < CreneauCollecte.capacite,
+        )
+        .values(reserves=CreneauCollecte.reserves + 1)
+        .returning(CreneauCollecte.id, CreneauCollecte.debut)
+        .execution_options(synchronize_session=False)
+    ).first()
+    return Place(row.id, row.debut) if row else None
+
+
+def reserve(
+    db: Session,
+    campagne_id: uuid.UUID,
+    *,
+    creneau_id: uuid.UUID | None = None,
+    at: dt.datetime | None = None,
+    after: dt.datetime | None = None,
+) -> Place | None:
+    """Réserve une place ; ``None`` si le créneau demandé (ou tous) est complet.
+
+    ``creneau_id`` : ce créneau ; ``at`` : le créneau qui contient cet instant ;
+    sinon le premier créneau libre à partir de ``after``.
+    """
+    # Créneau imposé : l'UPDATE conditionnel attend le verrou d'une réservation
+    # en cours au lieu de conclure à un créneau complet
+    if at is not None:
+        creneau_id = db.execute(
+            select(CreneauCollecte.id).where(
+                CreneauCollecte.campagne_id == campagne_id,
+                CreneauCollecte.debut <= at,
+                CreneauCollecte.fin > at,
+            )
+        ).scalar()
+        if creneau_id is None:
+            return None
+    if creneau_id is not None:
+        return _take(db, creneau_id, campagne_id)
+    candidates = _available(campagne_id, after).with_only_columns(CreneauCollecte.id).limit(1)
+    for _ in range(_ATTEMPTS):
+        candidate = db.execute(candidates.with_for_update(skip_locked=True)).scalar()
+        if candidate is None:
+            return None
+        place = _take(db, candidate, campagne_id)
+        if place is not None:
+            return place
+    return None
+
+
+def release(db: Session, creneau_id: uuid.UUID) -> None:
+    db.execute(
+        update(CreneauCollecte)
+        .where(CreneauCollecte.id == creneau_id, CreneauCollecte.reserves > 0)
+        .values(reserves=CreneauCollecte.reserves - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def has_slots(db: Session, campagne_id: uuid.UUID) -> bool:
+    return (
+        db.execute(
+            select(CreneauCollecte.id).where(CreneauCollecte.campagne_id == campagne_id).limit(1)
+        ).first()
+        is not None
+    )
+
+
+def register_many(
+    db: Session,
+    campagne_id: uuid.UUID,
+    items: Sequence[dict],
+    *,
+    after: dt.datetime | None = None,
+) -> tuple[list[dict], list[tuple[int, str]]]:
+    """Inscrit un lot de donneurs ; renvoie ``(inscriptions, refus)``.
+
+    ``items`` : ``donneur_id``, ``nom``, ``telephone`` et éventuellement
+    ``creneau_id`` ; sans créneau demandé, le premier créneau libre à partir de
+    ``after``. ``refus`` : ``(rang dans le lot, motif)`` avec pour motif
+    ``DEJA_INSCRIT`` ou ``COMPLET``.
+    """
+    refus: list[tuple[int, str]] = []
+
+    donneurs = {item["donneur_id"] for item in items if item.get("donneur_id")}
+    inscrits = set()
+    if donneurs:
+        inscrits = set(
+            db.execute(
+                select(InscriptionCollecte.donneur_id).where(
+                    InscriptionCollecte.campagne_id == campagne_id,
+                    InscriptionCollecte.donneur_id.in_(donneurs),
+                    InscriptionCollecte.statut != "ANNULE",
+                )
+            ).scalars()
+        )
+
+    # Places libres des créneaux, verrouillés le temps du placement. Les
+    # créneaux demandés attendent leur verrou (ordre des identifiants) ; pour
+    # le premier créneau libre, ceux qu'une autre réservation tient sont sautés.
+    columns = (
+        CreneauCollecte.id,
+        CreneauCollecte.debut,
+        CreneauCollecte.capacite - CreneauCollecte.reserves,
+    )
+    requested = sorted({item["creneau_id"] for item in items if item.get("creneau_id")})
+    demandes = []
+    if requested:
+        demandes = db.execute(
+            select(*columns)
+            .where(CreneauCollecte.campagne_id == campagne_id, CreneauCollecte.id.in_(requested))
+            .order_by(CreneauCollecte.id)
+            .with_for_update()
+        ).all()
+    libres = db.execute(
+        _available(campagne_id, after).with_only_columns(*columns).with_for_update(skip_locked=True)
+    ).all()
+    free = {slot_id: places for slot_id, _, places in (*demandes, *libres)}
+    debuts = {slot_id: debut for slot_id, debut, _ in (*demandes, *libres)}
+    order = [slot_id for slot_id, _, _ in libres]
+    first = 0
+
+    taken: Counter[uuid.UUID] = Counter()
+    rows = []
+    for index, item in enumerate(items):
+        donneur_id = item.get("donneur_id")
+        if donneur_id is not None:
+            if donneur_id in inscrits:
+                refus.append((index, "DEJA_INSCRIT"))
+                continue
+            inscrits.add(donneur_id)
+        requested = item.get("creneau_id")
+        if requested is not None:
+            slot_id = requested if free.get(requested, 0) > taken[requested] else None
+        else:
+            while first < len(order) and free[order[first]] <= taken[order[first]]:
+                first += 1
+            slot_id = order[first] if first < len(order) else None
+        if slot_id is None:
+            refus.append((index, "COMPLET"))
+            continue
+        taken[slot_id] += 1
+        rows.append(
+            {
+                "id": uuid.uuid4(),
+                "campagne_id": campagne_id,
+                "donneur_id": donneur_id,
+                "nom": item.get("nom"),
+                "telephone": item.get("telephone"),
+                "creneau_id": slot_id,
+                "creneau": debuts[slot_id],
+                "statut": "INSCRIT",
+            }
+        )
+
+    if taken:
+        table = CreneauCollecte.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("slot_id"))
+            .values(reserves=table.c.reserves + bindparam("places")),
+            [{"slot_id": slot_id, "places": places} for slot_id, places in taken.items()],
+        )
+    if rows:
+        db.execute(insert(InscriptionCollecte), rows)
+    return rows, refus
@@ -0,0 +1,74 @@
+"""Comptages groupés pour les tableaux de statistiques (EIR, réactions, suivis).
+
+``grouped_counts`` calcule en une requête le total, des indicateurs booléens et
+une ventilation par dimension. Sur PostgreSQL la requête utilise
+``GROUPING SETS`` (un seul parcours de la table) ; ailleurs elle retombe sur un
+``UNION ALL`` de ``GROUP BY`` sur la même CTE.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from collections.abc import Sequence
+
+from sqlalchemy import Select, String, case, cast, func, literal, null, select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+
+def period_filters(column, start_date: dt.date | None, end_date: dt.date | None) -> list:
+    """Bornes inclusives sur une colonne datetime."""
+    conditions = []
+    if start_date is not None:
+        conditions.append(column >= dt.datetime.combine(start_date, dt.time.min, dt.timezone.utc))
+    if end_date is not None:
+        end = dt.datetime.combine(end_date + dt.timedelta(days=1), dt.time.min, dt.timezone.utc)
+        conditions.append(column < end)
+    return conditions
+
+
+def grouped_counts(
+    db: Session,
+    base: Select,
+    *,
+    dimensions: Sequence[str],
+    mesures: Sequence[str] = (),
+) -> dict:
+    """Agrège ``base`` : ``{"total": n, <mesure>: n, <dimension>: {valeur: n}}``.
+
+    ``base`` sélectionne une ligne par enregistrement ; ses colonnes nommées par
+    ``dimensions`` servent de clés de ventilation, celles nommées par ``mesures``
+    sont des booléens dont on compte les lignes vraies.
+    """
+    rows = base.cte("stats_base")
+    counts = [func.count()] + [func.sum(case((rows.c[m], 1), else_=0)) for m in mesures]
+
+    out: dict = {"total": 0, **{m: 0 for m in mesures}, **{d: {} for d in dimensions}}
+
+    def record(dimension: str | None, value, total: int, sums) -> None:
+        if dimension is None:
+            out["total"] = total
+            out.update({m: int(v or 0) for m, v in zip(mesures, sums)})
+        else:
+            out[dimension][value] = total
+
+    if db.get_bind().dialect.name == "postgresql":
+        dims = [rows.c[d] for d in dimensions]
+        stmt = select(*dims, *[func.grouping(c) for c in dims], *counts).group_by(
+            func.grouping_sets(tuple_(), *[tuple_(c) for c in dims])
+        )
+        n = len(dims)
+        for row in db.execute(stmt).all():
+            values, flags, (total, *sums) = row[:n], row[n : 2 * n], row[2 * n :]
+            grouped = [i for i, flag in enumerate(flags) if flag == 0]
+            if grouped:
+                record(dimensions[grouped[0]], values[grouped[0]], total, sums)
+            else:
+                record(None, None, total, sums)
+        return out
+
+    parts = [select(literal(""), null(), *counts).select_from(rows)]
+    for d in dimensions:
+        parts.append(select(literal(d), cast(rows.c[d], String), *counts).group_by(rows.c[d]))
+    for dimension, value, total, *sums in db.execute(union_all(*parts)).all():
+        record(dimension or None, value, total, sums)
+    return out
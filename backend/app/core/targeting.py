@@ -0,0 +1,278 @@
+"""Ciblage des donneurs à rappeler pour une campagne de collecte.
+
+Les donneurs sont sélectionnés par région, département, groupe sanguin, niveau
+de fidélité (``CarteDonneur.niveau``) et éligibilité à la date de la collecte
+(``Donneur.eligible_le``, voir ``app.core.eligibility``), puis classés par un
+score calculé en SQL :
+
+- déficit du groupe sanguin (``group_deficits``) : écart entre le stock
+  disponible non périmé et le seuil de confort (``SeuilAlerte``), de 0 à 1,
+  pondéré par ``POIDS_DEFICIT`` ; un seuil propre au site de la campagne se
+  compare au stock de ce site (poches reçues par transfert inter-sites) ;
+- niveau de fidélité (``POIDS_NIVEAU``) ;
+- nombre de dons de la carte, plafonné à ``MAX_BONUS_DONS``.
+
+Le tri et la pagination sont faits par la base ; la diffusion
+(``fan_out``) insère les notifications en une instruction
+``INSERT ... SELECT ... RETURNING id`` sans rapatrier les donneurs.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import uuid
+
+from sqlalchemy import (
+    ColumnElement,
+    Integer,
+    Select,
+    String,
+    and_,
+    case,
+    cast,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+)
+from sqlalchemy.orm import Session, aliased
+
+from app.core.eligibility import eligible_filter
+from app.db.models import (
+    CampagneCollecte,
+    CarteDonneur,
+    Donneur,
+    LigneTransfert,
+    Notification,
+    Poche,
+    SeuilAlerte,
+    TransfertInterSite,
+)
+from app.schemas.collectes import CiblageCriteres
+
+POIDS_DEFICIT = 100
+POIDS_NIVEAU = {"BRONZE": 5, "ARGENT": 10, "OR": 15, "PLATINE": 20}
+MAX_BONUS_DONS = 10
+
+# Canal de notification -> coordonnée du donneur
+_CONTACTS = {"SMS": Donneur.telephone, "WHATSAPP": Donneur.telephone, "EMAIL": Donneur.email}
+# Clé d'unicité de la coordonnée : un téléphone ou une adresse partagé (même
+# foyer, fiches en double) ne reçoit qu'une notification par diffusion
+_TELEPHONE = func.coalesce(Donneur.telephone_normalise, Donneur.telephone)
+_CLES_CONTACT = {"SMS": _TELEPHONE, "WHATSAPP": _TELEPHONE, "EMAIL": func.lower(Donneur.email)}
+
+
+def _stock(db: Session, site_id: uuid.UUID | None = None) -> dict[tuple[str, str], int]:
+    """Poches disponibles et non périmées par (produit, groupe).
+
+    Avec ``site_id``, seules les poches dont le dernier transfert reçu avait ce
+    site pour destination sont comptées.
+    """
+    stmt = (
+        select(Poche.type_produit, Poche.groupe_sanguin, func.count())
+        .where(
+            Poche.statut_distribution == "DISPONIBLE",
+            Poche.date_peremption >= dt.date.today(),
+        )
+        .group_by(Poche.type_produit, Poche.groupe_sanguin)
+    )
+    if site_id is not None:
+        site_actuel = (
+            select(TransfertInterSite.site_destination_id)
+            .join(LigneTransfert, LigneTransfert.transfert_id == TransfertInterSite.id)
+            .where(LigneTransfert.poche_id == Poche.id, TransfertInterSite.statut == "RECU")
+            .order_by(TransfertInterSite.date_reception.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        stmt = stmt.where(site_actuel == site_id)
+    return {(type_produit, groupe): count for type_produit, groupe, count in db.execute(stmt)}
+
+
+def group_deficits(db: Session, site_id: uuid.UUID | None = None) -> dict[str, float]:
+    """Déficit (0 à 1) par groupe sanguin, le plus fort parmi les produits.
+
+    Seuls les seuils actifs propres à un groupe sont pris en compte ; ceux d'un
+    autre site que ``site_id`` sont ignorés, ceux de ``site_id`` se comparent
+    au stock de ce site.
+    """
+    seuils_stmt = select(SeuilAlerte).where(
+        SeuilAlerte.is_active.is_(True), SeuilAlerte.groupe_sanguin.is_not(None)
+    )
+    seuils_stmt = seuils_stmt.where(
+        or_(SeuilAlerte.site_id.is_(None), SeuilAlerte.site_id == site_id)
+        if site_id
+        else SeuilAlerte.site_id.is_(None)
+    )
+    seuils = list(db.execute(seuils_stmt).scalars())
+    if not seuils:
+        return {}
+
+    stocks = {None: _stock(db)}
+    if any(seuil.site_id is not None for seuil in seuils):
+        stocks[site_id] = _stock(db, site_id)
+    deficits: dict[str, float] = {}
+    for seuil in seuils:
+        if seuil.seuil_confort <= 0:
+            continue
+        available = stocks[seuil.site_id].get((seuil.type_produit, seuil.groupe_sanguin), 0)
+        deficit = max(0.0, min(1.0, 1 - available / seuil.seuil_confort))
+        deficits[seuil.groupe_sanguin] = max(deficits.get(seuil.groupe_sanguin, 0.0), deficit)
+    return deficits
+
+
+def score_expression(deficits: dict[str, float]) -> ColumnElement:
+    """Score d'un donneur (requête jointe à ``CarteDonneur``)."""
+    deficit = case(
+        *[
+            (Donneur.groupe_sanguin == g, literal(round(d * POIDS_DEFICIT, 2)))
+            for g, d in deficits.items()
+        ],
+        else_=literal(0.0),
+    )
+    niveau = case(
+        *[(CarteDonneur.niveau == n, literal(p)) for n, p in POIDS_NIVEAU.items()],
+        else_=literal(0),
+    )
+    dons = func.coalesce(CarteDonneur.total_dons, 0)
+    bonus = case((dons > MAX_BONUS_DONS, MAX_BONUS_DONS), else_=dons)
+    return (deficit + niveau + bonus).label("score")
+
+
+def _conditions(
+    campagne: CampagneCollecte, criteres: CiblageCriteres, deficits: dict[str, float]
+) -> list[ColumnElement[bool]]:
+    as_of = criteres.eligible_au or campagne.date_debut.date()
+    conditions = [eligible_filter(as_of)]
+    if criteres.regions:
+        conditions.append(Donneur.region.in_(criteres.regions))
+    if criteres.departements:
+        conditions.append(Donneur.departement.in_(criteres.departements))
+    groupes = set(criteres.groupes_sanguins)
+    if criteres.deficitaires_seulement:
+        deficitaires = {g for g, d in deficits.items() if d > 0}
+        groupes = groupes & deficitaires if groupes else deficitaires
+        if not groupes:
+            conditions.append(literal(False))
+    if groupes:
+        conditions.append(Donneur.groupe_sanguin.in_(sorted(groupes)))
+    if criteres.niveaux:
+        conditions.append(CarteDonneur.niveau.in_(criteres.niveaux))
+    if criteres.canal:
+        conditions.append(_CONTACTS[criteres.canal].is_not(None))
+    return conditions
+
+
+def targets(
+    db: Session, campagne: CampagneCollecte, criteres: CiblageCriteres
+) -> tuple[Select, dict[str, float]]:
+    """Requête des donneurs ciblés, triés par score décroissant, et déficits."""
+    deficits = group_deficits(db, campagne.site_id)
+    score = score_expression(deficits)
+    stmt = (
+        select(Donneur, CarteDonneur.niveau, score)
+        .outerjoin(CarteDonneur, CarteDonneur.donneur_id == Donneur.id)
+        .where(*_conditions(campagne, criteres, deficits))
+        .order_by(score.desc(), Donneur.id)
+    )
+    return stmt, deficits
+
+
+def _new_uuid(db: Session) -> ColumnElement:
+    if db.get_bind().dialect.name == "postgresql":
+        return func.gen_random_uuid()
+    return func.lower(func.hex(func.randomblob(16)))
+
+
+def _json_object(db: Session, values: dict[str, ColumnElement]) -> ColumnElement:
+    build = (
+        func.jsonb_build_object if db.get_bind().dialect.name == "postgresql" else func.json_object
+    )
+    return build(*[part for key, value in values.items() for part in (key, value)])
+
+
+def fan_out(
+    db: Session,
+    campagne: CampagneCollecte,
+    criteres: CiblageCriteres,
+    *,
+    canal: str,
+    template: str,
+    priorite: str = "NORMALE",
+    max_destinataires: int | None = None,
+) -> list[uuid.UUID]:
+    """Crée en une instruction une notification par coordonnée ciblée.
+
+    Les donneurs qui partagent une coordonnée ne sont notifiés qu'une fois,
+    au nom du mieux classé ; ceux déjà notifiés pour cette campagne (même
+    destinataire) sont ignorés. Renvoie les identifiants des notifications
+    créées, seules à mettre en file (les précédentes le sont déjà).
+    """
+    criteres = criteres.model_copy(update={"canal": canal})
+    deficits = group_deficits(db, campagne.site_id)
+    contact = _CONTACTS[canal]
+    already = aliased(Notification)
+    variables = _json_object(
+        db,
+        {
+            "campagne": literal(campagne.code),
+            "nom_campagne": literal(campagne.nom),
+            "lieu": literal(campagne.lieu or ""),
+            "date_debut": literal(campagne.date_debut.isoformat()),
+            "donneur_id": cast(Donneur.id, String),
+            "nom": Donneur.nom,
+            "prenom": Donneur.prenom,
+        },
+    )
+    score = score_expression(deficits)
+    ciblage = (
+        select(
+            contact.label("destinataire"),
+            variables.label("variables"),
+            score,
+            Donneur.id.label("donneur_id"),
+            func.row_number()
+            .over(partition_by=_CLES_CONTACT[canal], order_by=(score.desc(), Donneur.id))
+            .label("rang"),
+        )
+        .outerjoin(CarteDonneur, CarteDonneur.donneur_id == Donneur.id)
+        .where(
+            *_conditions(campagne, criteres, deficits),
+            ~select(already.id)
+            .where(and_(already.reference_id == campagne.id, already.destinataire == contact))
+            .exists(),
+        )
+        .subquery()
+    )
+    rows = (
+        select(
+            _new_uuid(db),
+            literal(canal),
+            ciblage.c.destinataire,
+            literal(template),
+            ciblage.c.variables,
+            literal("EN_ATTENTE"),
+            literal(priorite),
+            literal(0, Integer),
+            literal(campagne.id, Notification.reference_id.type),
+        )
+        .where(ciblage.c.rang == 1)
+        .order_by(ciblage.c.score.desc(), ciblage.c.donneur_id)
+    )
+    if max_destinataires is not None:
+        rows = rows.limit(max_destinataires)
+
+    columns = [
+        Notification.id,
+        Notification.canal,
+        Notification.destinataire,
+        Notification.template,
+        Notification.variables,
+        Notification.statut,
+        Notification.priorite,
+        Notification.tentatives,
+        Notification.reference_id,
+    ]
+    stmt = insert(Notification).from_select(columns, rows).returning(Notification.id)
+    return list(db.execute(stmt).scalars())
@@ -0,0 +1,38 @@
+"""Normalisation des textes recherchés (noms, téléphones).
+
+Les clés produites sont stockées à côté des valeurs saisies (colonnes
+``*_normalise``) et indexées : la recherche compare des clés, jamais les
+valeurs brutes. Sans accents ni casse, « Ndèye N'Diaye » et « ndeye ndiaye »
+ont la même clé.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+
+_APOSTROPHES = str.maketrans("", "", "'’`ʼ")
+_SEPARATORS = re.compile(r"[^0-9a-z]+")
+_NON_DIGITS = re.compile(r"\D+")
+
+# Indicatif du Sénégal ; aucun numéro national (3x, 7x) ne commence par 2 ou 0,
+# un début de saisie « 221 » est donc toujours l'indicatif
+_COUNTRY_PREFIXES = ("00221", "221")
+
+
+def normalize_text(*parts: str | None) -> str:
+    """Minuscules sans diacritiques, mots séparés par une espace."""
+    text = " ".join(p for p in parts if p)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.casefold().translate(_APOSTROPHES)
+    return _SEPARATORS.sub(" ", text).strip()
+
+
+def normalize_phone(value: str | None) -> str:
+    """Chiffres du numéro national (sans ``+221`` / ``00221``), complet ou début."""
+    digits = _NON_DIGITS.sub("", value or "")
+    for prefix in _COUNTRY_PREFIXES:
+        if digits.startswith(prefix) and len(digits) > len(prefix):
+            return digits[len(prefix) :]
+    return digits
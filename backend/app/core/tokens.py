@@ -2,9 +2,17 @@ import base64
 import hashlib
 import hmac
 import json
+import threading
 import time
+from collections import OrderedDict
 from typing import Any
 
+# Jetons déjà vérifiés, par signature : une requête authentifiée ne refait ni le
+# HMAC ni le décodage JSON. Chaque entrée expire avec le jeton ("exp").
+_VERIFIED_MAX_ENTRIES = 4096
+_verified: OrderedDict[tuple[str, str], tuple[str, dict[str, Any]]] = OrderedDict()
+_verified_lock = threading.Lock()
+
 
 def _b64url_encode(raw: bytes) -> str:
     return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
@@ -23,11 +31,41 @@ def sign_token(payload: dict[str, Any], secret: str, ttl_seconds: int) -> str:
     return f"CNTS1.{msg}.{_b64url_encode(sig)}"
 
 
+def _cached_payload(key: tuple[str, str], msg: str) -> dict[str, Any] | None:
+    with _verified_lock:
+        entry = _verified.get(key)
+        if entry is None or entry[0] != msg:
+            return None
+        payload = entry[1]
+        if int(payload["exp"]) < int(time.time()):
+            del _verified[key]
+            return None
+        _verified.move_to_end(key)
+    return dict(payload)
+
+
+def _remember(key: tuple[str, str], msg: str, payload: dict[str, Any]) -> None:
+    with _verified_lock:
+        _verified[key] = (msg, payload)
+        _verified.move_to_end(key)
+        while len(_verified) > _VERIFIED_MAX_ENTRIES:
+            _verified.popitem(last=False)
+
+
+def clear_verified_tokens() -> None:
+    with _verified_lock:
+        _verified.clear()
+
+
 def verify_token(token: str, secret: str) -> dict[str, Any] | None:
     try:
         prefix, msg, sig = token.split(".", 2)
         if prefix != "CNTS1":
             return None
+        key = (secret, sig)
+        cached = _cached_payload(key, msg)
+        if cached is not None:
+            return cached
         expected_sig = hmac.new(
             secret.encode("utf-8"), msg.encode("ascii"), hashlib.sha256
         ).digest()
@@ -36,6 +74,7 @@ def verify_token(token: str, secret: str) -> dict[str, Any] | None:
         payload = json.loads(_b64url_decode(msg).decode("utf-8"))
         if int(payload.get("exp")) < int(time.time()):
             return None
-        return payload
+        _remember(key, msg, payload)
+        return dict(payload)
     except Exception:
         return None
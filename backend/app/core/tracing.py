@@ -0,0 +1,278 @@
+"""Traces distribuées OpenTelemetry : API -> base -> Redis -> worker Celery.
+
+Optionnel (extra ``tracing``). Avec ``tracing_enabled``, chaque requête HTTP
+ouvre un span serveur (contexte W3C ``traceparent`` repris de l'appelant),
+chaque instruction SQL et commande Redis un span client, et chaque tâche
+Celery un span producteur à l'envoi puis un span consommateur dans le worker :
+le contexte voyage dans les en-têtes du message.
+
+L'échantillonnage suit la décision du parent, sinon ``tracing_sample_ratio``.
+Export par lots vers un collecteur OTLP/HTTP local (``tracing_exporter="otlp"``)
+ou en JSON, un span par ligne, dans ``tracing_file_path`` (``"file"``).
+
+Sans SDK ni ``tracing_enabled``, les fonctions de ce module ne font rien.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from app.core.config import settings
+
+try:
+    from opentelemetry import context as otel_context
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind, StatusCode
+except ImportError:  # extra "tracing" non installé
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+enabled = settings.tracing_enabled and trace is not None
+_tracer = trace.get_tracer("cnts") if trace is not None else None
+_configured = False
+
+_KINDS = (
+    {
+        "server": SpanKind.SERVER,
+        "client": SpanKind.CLIENT,
+        "producer": SpanKind.PRODUCER,
+        "consumer": SpanKind.CONSUMER,
+        "internal": SpanKind.INTERNAL,
+    }
+    if trace is not None
+    else {}
+)
+
+
+def configure_tracing(service_name: str | None = None, *, exporter: Any = None) -> bool:
+    """Installe le fournisseur de traces du processus (une seule fois)."""
+    global _configured
+    if not enabled or _configured:
+        return False
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    except ImportError:
+        logger.warning("opentelemetry-sdk indisponible, traces non exportées")
+        return False
+
+    provider = TracerProvider(
+        resource=Resource.create(
+            {
+                "service.name": service_name or settings.tracing_service_name,
+                "service.version": settings.api_version,
+                "deployment.environment": settings.env,
+            }
+        ),
+        sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_ratio)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter or _exporter()))
+    trace.set_tracer_provider(provider)
+    _configured = True
+    return True
+
+
+def _exporter():
+    if settings.tracing_exporter == "file":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        out = open(settings.tracing_file_path, "a", encoding="utf-8")  # noqa: SIM115
+        return ConsoleSpanExporter(out=out, formatter=lambda s: s.to_json(indent=None) + "\n")
+    if settings.tracing_exporter != "otlp":
+        raise ValueError(f"tracing_exporter inconnu : {settings.tracing_exporter}")
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+    return OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)
+
+
+# ── Spans ──
+
+
+def start_span(
+    name: str,
+    *,
+    kind: str = "internal",
+    attributes: dict[str, Any] | None = None,
+    context: Any = None,
+):
+    """Span non courant (à terminer par ``end_span``), ou ``None`` si désactivé."""
+    if not enabled:
+        return None
+    return _tracer.start_span(name, context=context, kind=_KINDS[kind], attributes=attributes)
+
+
+def end_span(span, error: BaseException | None = None) -> None:
+    if span is None:
+        return
+    if error is not None:
+        span.record_exception(error)
+        span.set_status(StatusCode.ERROR, type(error).__name__)
+    span.end()
+
+
+def activate(span) -> object | None:
+    """Rend ``span`` courant (parent des spans suivants) ; jeton pour ``deactivate``."""
+    if span is None:
+        return None
+    return otel_context.attach(trace.set_span_in_context(span))
+
+
+def deactivate(token) -> None:
+    if token is not None:
+        otel_context.detach(token)
+
+
+@contextmanager
+def span(
+    name: str, *, kind: str = "internal", attributes: dict[str, Any] | None = None
+) -> Iterator[Any]:
+    """Span courant le temps du bloc ; une exception le marque en erreur."""
+    if not enabled:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, kind=_KINDS[kind], attributes=attributes) as current:
+        yield current
+
+
+def current_span():
+    return trace.get_current_span() if enabled else None
+
+
+def mark_error(span, description: str) -> None:
+    if span is not None:
+        span.set_status(StatusCode.ERROR, description)
+
+
+# ── Propagation W3C ──
+
+
+def extract(carrier: dict[str, str]):
+    """Contexte parent décrit par ``traceparent``/``tracestate`` (``None`` si désactivé)."""
+    return propagate.extract(carrier) if enabled else None
+
+
+def inject(carrier: dict, span=None) -> None:
+    """Écrit ``traceparent`` (du span donné, sinon du span courant) dans ``carrier``."""
+    if not enabled:
+        return
+    context = trace.set_span_in_context(span) if span is not None else None
+    propagate.inject(carrier, context=context)
+
+
+def traceparent(span) -> str | None:
+    if span is None or not span.get_span_context().is_valid:
+        return None
+    carrier: dict[str, str] = {}
+    inject(carrier, span)
+    return carrier.get("traceparent")
+
+
+# ── Redis ──
+
+
+def instrument_redis(client):
+    """Span client autour de chaque commande envoyée par ``client`` (``redis.Redis``)."""
+    if not enabled:
+        return client
+    execute = client.execute_command
+
+    def execute_command(*args, **options):
+        command = str(args[0]) if args else "?"
+        with span(
+            f"redis {command}",
+            kind="client",
+            attributes={"db.system": "redis", "db.operation.name": command},
+        ):
+            return execute(*args, **options)
+
+    client.execute_command = execute_command
+    return client
+
+
+# ── Celery ──
+
+_task_spans: dict[str, tuple[Any, object | None]] = {}
+_task_spans_lock = threading.Lock()
+
+
+def instrument_celery() -> None:
+    """Spans producteur/consommateur et propagation du contexte par les en-têtes de tâche."""
+    if not enabled:
+        return
+    from celery import signals
+
+    signals.before_task_publish.connect(_before_publish, weak=False)
+    signals.after_task_publish.connect(_after_publish, weak=False)
+    signals.task_prerun.connect(_task_prerun, weak=False)
+    signals.task_failure.connect(_task_failure, weak=False)
+    signals.task_postrun.connect(_task_postrun, weak=False)
+    signals.worker_process_init.connect(_worker_process_init, weak=False)
+
+
+def _worker_process_init(**_kwargs) -> None:
+    # Après le fork : le processeur d'export (thread) doit naître dans l'enfant
+    configure_tracing(f"{settings.tracing_service_name}-worker")
+
+
+def _before_publish(sender=None, headers=None, **_kwargs) -> None:
+    if headers is None:
+        return
+    producer = start_span(
+        f"send {sender}",
+        kind="producer",
+        attributes={"messaging.system": "celery", "celery.task_name": str(sender)},
+    )
+    inject(headers, producer)
+    with _task_spans_lock:
+        _task_spans[f"publish:{headers.get('id')}"] = (producer, None)
+
+
+def _after_publish(headers=None, **_kwargs) -> None:
+    with _task_spans_lock:
+        entry = _task_spans.pop(f"publish:{(headers or {}).get('id')}", None)
+    if entry is not None:
+        end_span(entry[0])
+
+
+def _task_prerun(task_id=None, task=None, **_kwargs) -> None:
+    request = getattr(task, "request", None)
+    carrier = {
+        key: value
+        for key in ("traceparent", "tracestate")
+        if (value := getattr(request, key, None)) is not None
+    }
+    consumer = start_span(
+        f"run {task.name}",
+        kind="consumer",
+        context=extract(carrier),
+        attributes={"messaging.system": "celery", "celery.task_id": str(task_id)},
+    )
+    with _task_spans_lock:
+        _task_spans[f"run:{task_id}"] = (consumer, activate(consumer))
+
+
+def _task_failure(task_id=None, exception=None, **_kwargs) -> None:
+    with _task_spans_lock:
+        entry = _task_spans.get(f"run:{task_id}")
+    if entry is not None and exception is not None:
+        entry[0].record_exception(exception)
+        mark_error(entry[0], type(exception).__name__)
+
+
+def _task_postrun(task_id=None, state=None, **_kwargs) -> None:
+    with _task_spans_lock:
+        entry = _task_spans.pop(f"run:{task_id}", None)
+    if entry is None:
+        return
+    consumer, token = entry
+    if state is not None:
+        consumer.set_attribute("celery.state", str(state))
+    deactivate(token)
+    end_span(consumer)
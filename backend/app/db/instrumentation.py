@@ -0,0 +1,164 @@
+"""Instrumentation SQL : durée des requêtes, profil par requête HTTP, N+1.
+
+Les hooks sont posés sur la classe ``Engine`` : ils couvrent le primaire, les
+réplicas, les engines async (via leur ``sync_engine``) et ceux des tests. Une
+requête plus longue que ``db_slow_query_ms`` incrémente ``db_slow_queries_total``
+et rejoint les dernières requêtes lentes exposées par l'observabilité.
+
+``track_queries()`` ouvre un ``QueryStats`` pour le contexte courant (une requête
+HTTP, voir ``QueryStatsMiddleware``) : nombre de requêtes, temps SQL cumulé,
+requêtes les plus lentes et instructions répétées. Le texte SQL étant
+paramétré, une même instruction exécutée ``db_n_plus_one_threshold`` fois ou
+plus signale très probablement une boucle de chargement (N+1).
+``capture_queries()`` fait de même pour tout le processus (tests, scripts).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import datetime as dt
+import heapq
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from sqlalchemy import Engine, event
+
+from app.core import tracing
+from app.core.config import settings
+from app.core.metrics import metrics
+
+_slow_queries_total = metrics.counter("db_slow_queries_total").labels()
+
+_recent_lock = threading.Lock()
+_recent_slow: deque[dict] = deque(maxlen=50)
+
+_START_KEY = "cnts_query_start"
+_SPAN_KEY = "cnts_query_span"
+
+_SLOWEST_KEPT = 5
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_ms: float = 0.0
+    statements: Counter[str] = field(default_factory=Counter)
+    _slowest: list[tuple[float, int, str]] = field(default_factory=list, repr=False)
+
+    def record(self, statement: str, duration_ms: float) -> None:
+        self.count += 1
+        self.total_ms += duration_ms
+        self.statements[statement] += 1
+        entry = (duration_ms, self.count, statement)
+        if len(self._slowest) < _SLOWEST_KEPT:
+            heapq.heappush(self._slowest, entry)
+        elif duration_ms > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self) -> list[tuple[float, str]]:
+        """Requêtes les plus lentes, la plus lente d'abord."""
+        return [(ms, stmt) for ms, _, stmt in sorted(self._slowest, reverse=True)]
+
+    def repeated(self, threshold: int | None = None) -> list[tuple[str, int]]:
+        """Instructions exécutées au moins ``threshold`` fois (N+1 probable)."""
+        threshold = threshold or settings.db_n_plus_one_threshold
+        return [(stmt, n) for stmt, n in self.statements.most_common() if n >= threshold]
+
+
+_current: contextvars.ContextVar[QueryStats | None] = contextvars.ContextVar(
+    "cnts_query_stats", default=None
+)
+_captures_lock = threading.Lock()
+_captures: list[QueryStats] = []
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Profil des requêtes SQL émises dans le contexte courant (tâche ou thread)."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryStats]:
+    """Profil de toutes les requêtes SQL du processus pendant le bloc."""
+    stats = QueryStats()
+    with _captures_lock:
+        _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        with _captures_lock:
+            _captures.remove(stats)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, _cursor, statement, _parameters, _context, _executemany):
+    if tracing.enabled:
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+        span = tracing.start_span(
+            operation,
+            kind="client",
+            attributes={
+                "db.system": conn.dialect.name,
+                "db.operation.name": operation,
+                "db.query.text": statement[:2000],
+            },
+        )
+        conn.info.setdefault(_SPAN_KEY, []).append(span)
+    conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, _cursor, statement, _parameters, _context, _executemany):
+    if tracing.enabled and conn.info.get(_SPAN_KEY):
+        tracing.end_span(conn.info[_SPAN_KEY].pop())
+    starts = conn.info.get(_START_KEY)
+    if not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000.0
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, duration_ms)
+    if _captures:
+        with _captures_lock:
+            for capture in _captures:
+                capture.record(statement, duration_ms)
+    if duration_ms >= settings.db_slow_query_ms:
+        _slow_queries_total.inc()
+        with _recent_lock:
+            _recent_slow.append(
+                {
+                    "at": dt.datetime.now(dt.timezone.utc),
+                    "duration_ms": round(duration_ms, 2),
+                    "statement": " ".join(statement.split())[:500],
+                }
+            )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context) -> None:
+    # Une requête en échec ne passe pas par after_cursor_execute
+    info = context.connection.info if context.connection is not None else {}
+    if info.get(_START_KEY):
+        info[_START_KEY].pop()
+    if info.get(_SPAN_KEY):
+        tracing.end_span(info[_SPAN_KEY].pop(), context.original_exception)
+
+
+def recent_slow_queries(limit: int = 20) -> list[dict]:
+    """Dernières requêtes lentes, la plus récente d'abord."""
+    with _recent_lock:
+        return list(reversed(_recent_slow))[:limit]
+
+
+def slow_query_count() -> int:
+    return int(_slow_queries_total.value())
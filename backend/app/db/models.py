@@ -2,25 +2,49 @@ import uuid
 
 from sqlalchemy import (
     Boolean,
+    CheckConstraint,
     Date,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     JSON,
     String,
     Text,
     UniqueConstraint,
     func,
+    text,
 )
 from sqlalchemy.dialects.postgresql import JSONB, UUID
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 
+from app.core.text import normalize_phone, normalize_text
 from app.db.base import Base
 
 
 class Donneur(Base):
     __tablename__ = "donneurs"
+    __table_args__ = (
+        # PostgreSQL : trigrammes (pg_trgm) pour LIKE '%...%' et la similarité,
+        # motifs pour LIKE '...%' quelle que soit la collation
+        Index(
+            "ix_donneurs_nom_normalise_trgm",
+            "nom_normalise",
+            postgresql_using="gin",
+            postgresql_ops={"nom_normalise": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_donneurs_telephone_normalise",
+            "telephone_normalise",
+            postgresql_ops={"telephone_normalise": "varchar_pattern_ops"},
+        ),
+        # Ciblage des campagnes (app.core.targeting)
+        Index("ix_donneurs_ciblage", "region", "groupe_sanguin", "eligible_le"),
+        # Blocs de la détection des doublons (app.core.dedup)
+        Index("ix_donneurs_nom_normalise", "nom_normalise"),
+        Index("ix_donneurs_naissance", "date_naissance", "sexe"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     cni_hash: Mapped[str] = mapped_column(String(128), unique=True, index=True)
@@ -38,6 +62,12 @@ class Donneur(Base):
     email: Mapped[str | None] = mapped_column(String(120), nullable=True)
     profession: Mapped[str | None] = mapped_column(String(120), nullable=True)
     dernier_don: Mapped[Date | None] = mapped_column(Date, nullable=True)
+    # Éligible au don à partir de cette date, NULL si aucun délai (app.core.eligibility)
+    eligible_le: Mapped[Date | None] = mapped_column(Date, nullable=True, index=True)
+
+    # Clés de recherche (app.core.text), tenues à jour par _normalise
+    nom_normalise: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    telephone_normalise: Mapped[str | None] = mapped_column(String(32), nullable=True)
 
     # Link to UserAccount for patient access
     user_id: Mapped[uuid.UUID | None] = mapped_column(
@@ -59,6 +89,15 @@ class Donneur(Base):
         back_populates="donneur", uselist=False
     )
 
+    @validates("nom", "prenom", "telephone")
+    def _normalise(self, key: str, value: str | None) -> str | None:
+        if key == "telephone":
+            self.telephone_normalise = normalize_phone(value) or None
+        else:
+            parts = {"nom": self.nom, "prenom": self.prenom, key: value}
+            self.nom_normalise = normalize_text(parts["nom"], parts["prenom"])
+        return value
+
     @property
     def numero_carte(self) -> str | None:
         try:
@@ -69,6 +108,47 @@ class Donneur(Base):
         return None
 
 
+class DoublonDonneur(Base):
+    """Paire de fiches probablement du même donneur (app.core.dedup).
+
+    Les identifiants ne sont pas des clés étrangères : la paire reste en
+    historique après la fusion, qui supprime la fiche ``doublon_id``.
+    """
+
+    __tablename__ = "donneurs_doublons"
+    __table_args__ = (
+        UniqueConstraint("donneur_id", "doublon_id", name="uq_donneurs_doublons_paire"),
+        Index("ix_donneurs_doublons_revue", "statut", "score"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Fiche conservée par défaut (la plus ancienne)
+    donneur_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), index=True)
+    doublon_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), index=True)
+    score: Mapped[float] = mapped_column(Float)
+    motifs: Mapped[list[str]] = mapped_column(JSON().with_variant(JSONB(), "postgresql"))
+    statut: Mapped[str] = mapped_column(
+        String(16), default="A_EXAMINER"
+    )  # A_EXAMINER, FUSIONNE, REJETE
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    decided_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class DonneurCniAlias(Base):
+    """Empreinte CNI d'une fiche fusionnée (app.core.dedup), rattachée à la fiche conservée.
+
+    Les recherches par CNI (``dedup.cni_filter``) la consultent : le numéro de
+    la fiche supprimée retrouve le donneur au lieu de recréer le doublon.
+    """
+
+    __tablename__ = "donneurs_cni_alias"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    donneur_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("donneurs.id"), index=True)
+    cni_hash: Mapped[str] = mapped_column(String(128), unique=True, index=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
 class ExpirationRule(Base):
     __tablename__ = "expiration_rules"
 
@@ -327,6 +407,23 @@ class RappelAction(Base):
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
+class HemovigilanceAgregat(Base):
+    """Compteur mensuel maintenu incrémentalement (voir app.core.hemovigilance)."""
+
+    __tablename__ = "hemovigilance_agregats"
+    __table_args__ = (
+        UniqueConstraint("mois", "dimension", "cle", name="uq_hemovigilance_agregat"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    mois: Mapped[str] = mapped_column(String(6), index=True)  # YYYYMM
+    dimension: Mapped[str] = mapped_column(
+        String(32), index=True
+    )  # transfusions_hopital, rappels_lot, rappels_statut, eir_gravite
+    cle: Mapped[str] = mapped_column(String(64))  # "" quand la valeur source est NULL
+    total: Mapped[int] = mapped_column(Integer, default=0)
+
+
 class SyncDevice(Base):
     __tablename__ = "sync_devices"
 
@@ -539,17 +636,28 @@ class TaskResult(Base):
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Relances échues (app.core.notifications.claim_retries)
+        Index("ix_notifications_relance", "statut", "prochain_essai"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     canal: Mapped[str] = mapped_column(String(16), index=True)
     destinataire: Mapped[str] = mapped_column(String(320), index=True)
     template: Mapped[str] = mapped_column(String(64), index=True)
     variables: Mapped[dict] = mapped_column(JSON().with_variant(JSONB(), "postgresql"))
-    statut: Mapped[str] = mapped_column(String(16), index=True, default="EN_ATTENTE")
+    statut: Mapped[str] = mapped_column(
+        String(16), index=True, default="EN_ATTENTE"
+    )  # EN_ATTENTE, EN_COURS, ENVOYE, A_RELANCER, ECHEC
     priorite: Mapped[str] = mapped_column(String(16), default="NORMALE")
     tentatives: Mapped[int] = mapped_column(Integer, default=0)
     erreur: Mapped[str | None] = mapped_column(Text, nullable=True)
+    prochain_essai: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     sent_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Objet à l'origine de l'envoi (ex. campagne de collecte ciblée)
+    reference_id: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True), nullable=True, index=True
+    )
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
@@ -908,8 +1016,42 @@ class CampagneCollecte(Base):
     inscriptions: Mapped[list["InscriptionCollecte"]] = relationship(back_populates="campagne")
 
 
+class CreneauCollecte(Base):
+    """Créneau d'une collecte ; ``reserves`` est tenu à jour à chaque inscription."""
+
+    __tablename__ = "creneaux_collecte"
+    __table_args__ = (
+        UniqueConstraint("campagne_id", "debut", name="uq_creneaux_collecte_debut"),
+        CheckConstraint("reserves >= 0 AND reserves <= capacite", name="ck_creneaux_capacite"),
+        # Prochains créneaux libres (app.core.slots)
+        Index("ix_creneaux_collecte_disponibles", "campagne_id", "debut", "reserves", "capacite"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    campagne_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("campagnes_collecte.id"))
+    site_id: Mapped[uuid.UUID | None] = mapped_column(
+        ForeignKey("sites.id"), nullable=True, index=True
+    )
+    debut: Mapped[DateTime] = mapped_column(DateTime(timezone=True))
+    fin: Mapped[DateTime] = mapped_column(DateTime(timezone=True))
+    capacite: Mapped[int] = mapped_column(Integer)
+    reserves: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
 class InscriptionCollecte(Base):
     __tablename__ = "inscriptions_collecte"
+    __table_args__ = (
+        # Un donneur n'a qu'une inscription active par campagne
+        Index(
+            "uq_inscriptions_collecte_donneur",
+            "campagne_id",
+            "donneur_id",
+            unique=True,
+            postgresql_where=text("donneur_id IS NOT NULL AND statut <> 'ANNULE'"),
+            sqlite_where=text("donneur_id IS NOT NULL AND statut <> 'ANNULE'"),
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     campagne_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("campagnes_collecte.id"), index=True)
@@ -919,9 +1061,12 @@ class InscriptionCollecte(Base):
     nom: Mapped[str | None] = mapped_column(String(200), nullable=True)
     telephone: Mapped[str | None] = mapped_column(String(32), nullable=True)
     creneau: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    creneau_id: Mapped[uuid.UUID | None] = mapped_column(
+        ForeignKey("creneaux_collecte.id"), nullable=True, index=True
+    )
     statut: Mapped[str] = mapped_column(
         String(16), index=True, default="INSCRIT"
-    )  # INSCRIT, PRESENT, PRELEVE, ABSENT
+    )  # INSCRIT, PRESENT, PRELEVE, ABSENT, ANNULE
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     campagne: Mapped["CampagneCollecte"] = relationship(back_populates="inscriptions")
@@ -1261,6 +1406,20 @@ class DHIS2Export(Base):
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
+class DHIS2AgregatMensuel(Base):
+    __tablename__ = "dhis2_agregats_mensuels"
+    __table_args__ = (
+        UniqueConstraint("periode", "org_unit", "indicateur", name="uq_dhis2_agregat"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    periode: Mapped[str] = mapped_column(String(6), index=True)  # YYYYMM (format DHIS2)
+    org_unit: Mapped[str] = mapped_column(String(64), index=True)  # région ou "*" (national)
+    indicateur: Mapped[str] = mapped_column(String(64))
+    valeur: Mapped[int] = mapped_column(Integer, default=0)
+    computed_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True))
+
+
 # ──────────────────────────────────────────────
 # Phase 6.1 : Facturation
 # ──────────────────────────────────────────────
@@ -1389,6 +1548,16 @@ class MouvementConsommable(Base):
 
 class CarteDonneur(Base):
     __tablename__ = "cartes_donneur"
+    __table_args__ = (
+        Index(
+            "ix_cartes_donneur_numero_carte_prefix",
+            "numero_carte",
+            postgresql_ops={"numero_carte": "varchar_pattern_ops"},
+        ),
+        # Classement par solde, global ou par niveau (app.core.loyalty)
+        Index("ix_cartes_donneur_classement", "points", "id"),
+        Index("ix_cartes_donneur_niveau_points", "niveau", "points"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     donneur_id: Mapped[uuid.UUID] = mapped_column(
@@ -1411,6 +1580,17 @@ class CarteDonneur(Base):
 
 class PointsHistorique(Base):
     __tablename__ = "points_historique"
+    __table_args__ = (
+        # Un don n'est crédité qu'une fois
+        Index(
+            "uq_points_historique_don",
+            "carte_id",
+            "reference_id",
+            unique=True,
+            postgresql_where=text("type_operation = 'DON'"),
+            sqlite_where=text("type_operation = 'DON'"),
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     carte_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("cartes_donneur.id"), index=True)
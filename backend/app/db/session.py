@@ -1,18 +1,192 @@
-from collections.abc import Generator
+"""Engines et sessions.
 
-from sqlalchemy import create_engine
+``engine`` pointe sur le primaire ; ``get_db`` sert toutes les routes qui
+écrivent. ``get_read_db`` sert les lectures tolérant un léger retard (analytics,
+exports, flux) : la session est routée vers un réplica sain
+(``database_read_urls``) dont le retard de réplication est sous
+``db_replica_max_lag_seconds``, et retombe sur le primaire sinon. Un flush
+(écriture) passe toujours par le primaire.
+
+Les routes de lecture les plus sollicitées (pull de synchronisation, stock
+disponible, journal de traçabilité, analytics) passent par ``get_async_db`` /
+``get_async_read_db`` : même base et mêmes réplicas, via le pilote asynchrone
+(psycopg async), pour ne pas occuper un thread du pool par requête en attente
+d'I/O.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from collections.abc import AsyncGenerator, Generator
+
+from sqlalchemy import URL, Delete, Engine, Insert, Update, create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.db import instrumentation  # noqa: F401  (hooks de durée sur Engine)
 
+logger = logging.getLogger(__name__)
 
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-)
+engine_roles: dict[Engine, str] = {}
+_pool_checkouts = metrics.counter("db_pool_checkouts_total", ("pool",))
+_replica_fallbacks = metrics.counter("db_replica_fallback_total").labels()
+
+
+def _engine_options(url: str | URL) -> dict:
+    options: dict = {"pool_pre_ping": settings.db_pool_pre_ping}
+    if make_url(url).get_backend_name() == "postgresql":
+        if settings.db_pgbouncer:
+            # PgBouncer (transaction pooling) mutualise déjà les connexions et ne
+            # supporte pas les prepared statements côté serveur.
+            options.update(poolclass=NullPool, connect_args={"prepare_threshold": None})
+        else:
+            options.update(
+                pool_size=settings.db_pool_size,
+                max_overflow=settings.db_max_overflow,
+                pool_timeout=settings.db_pool_timeout_seconds,
+                pool_recycle=settings.db_pool_recycle_seconds,
+                pool_use_lifo=True,
+            )
+    return options
+
+
+def _track(created: Engine, role: str) -> None:
+    engine_roles[created] = role
+
+    checkouts = _pool_checkouts.labels(role)
+
+    @event.listens_for(created, "checkout")
+    def _on_checkout(*_args) -> None:
+        checkouts.inc()
+
+
+def _create_engine(url: str, *, role: str) -> Engine:
+    created = create_engine(url, **_engine_options(url))
+    _track(created, role)
+    return created
+
+
+def _async_url(url: str) -> URL:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite")
+    if parsed.drivername in ("postgresql", "postgresql+psycopg"):
+        return parsed.set(drivername="postgresql+psycopg_async")
+    return parsed
+
+
+def _create_async_engine(url: str, *, role: str) -> AsyncEngine:
+    async_url = _async_url(url)
+    created = create_async_engine(async_url, **_engine_options(async_url))
+    _track(created.sync_engine, role)
+    return created
+
+
+engine = _create_engine(settings.database_url, role="primary")
+read_engines = [
+    _create_engine(url, role=f"replica{i}") for i, url in enumerate(settings.database_read_urls)
+]
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = _create_async_engine(settings.database_url, role="primary_async")
+async_read_engines: dict[Engine, AsyncEngine] = {
+    replica: _create_async_engine(url, role=f"replica{i}_async")
+    for i, (replica, url) in enumerate(zip(read_engines, settings.database_read_urls))
+}
+
+
+# ── Réplicas ──
+
+_REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaPool:
+    """Sélection round-robin des réplicas dont le retard mesuré est acceptable."""
+
+    def __init__(self, primary: Engine, engines: list[Engine]) -> None:
+        self.primary = primary
+        self.engines = engines
+        self._cycle = itertools.cycle(engines) if engines else None
+        self._lag: dict[Engine, tuple[float, float | None]] = {}  # (mesuré à, retard)
+        self._lock = threading.Lock()
+
+    def lag_seconds(self, replica: Engine) -> float | None:
+        """Retard de réplication (mis en cache), ``None`` si le réplica est injoignable."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._lag.get(replica)
+        if cached is not None and now - cached[0] < settings.db_replica_lag_check_seconds:
+            return cached[1]
+        try:
+            with replica.connect() as conn:
+                lag = float(conn.execute(_REPLICA_LAG_SQL).scalar() or 0)
+        except Exception:
+            logger.warning("Réplica %s injoignable", replica.url, exc_info=True)
+            lag = None
+        with self._lock:
+            self._lag[replica] = (now, lag)
+        return lag
+
+    def last_lag(self, replica: Engine) -> float | None:
+        cached = self._lag.get(replica)
+        return cached[1] if cached else None
+
+    def choose(self) -> Engine:
+        if self._cycle is None:
+            return self.primary
+        for _ in range(len(self.engines)):
+            with self._lock:
+                candidate = next(self._cycle)
+            lag = self.lag_seconds(candidate)
+            if lag is not None and lag <= settings.db_replica_max_lag_seconds:
+                return candidate
+        _replica_fallbacks.inc()
+        return self.primary
+
+
+replicas = ReplicaPool(engine, read_engines)
+
+
+class RoutingSession(Session):
+    """Lit sur le réplica choisi à l'ouverture ; écrit toujours sur le primaire."""
+
+    def __init__(self, *args, read_bind: Engine | None = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.read_bind = read_bind
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.read_bind is None or self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        return self.read_bind
+
+
+ReadSessionLocal = sessionmaker(
+    class_=RoutingSession, autocommit=False, autoflush=False, bind=engine
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(
+    async_engine, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+)
+
 
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
@@ -20,3 +194,60 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    db = ReadSessionLocal(read_bind=replicas.choose())
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    # La mesure du retard est synchrone (et mise en cache) : hors de la boucle d'événements.
+    replica = await asyncio.to_thread(replicas.choose) if read_engines else engine
+    read_engine = async_read_engines.get(replica, async_engine)
+    async with AsyncReadSessionLocal(read_bind=read_engine.sync_engine) as db:
+        yield db
+
+
+async def dispose_async_engines() -> None:
+    for item in (async_engine, *async_read_engines.values()):
+        await item.dispose()
+
+
+def pool_stats() -> list[dict]:
+    """État des pools (primaire + réplicas, sync et async) pour /metrics et l'observabilité."""
+    out: list[dict] = []
+    async_pools = [async_engine.sync_engine, *(a.sync_engine for a in async_read_engines.values())]
+    for item in (engine, *read_engines, *async_pools):
+        pool = item.pool
+        stats: dict = {"pool": engine_roles[item], "class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+        if item in replicas.engines:
+            stats["lag_seconds"] = replicas.last_lag(item)
+        out.append(stats)
+    return out
+
+
+def _pool_gauges():
+    for stats in pool_stats():
+        labels = {"pool": stats["pool"]}
+        for key in ("size", "checked_in", "checked_out", "overflow", "lag_seconds"):
+            if stats.get(key) is not None:
+                yield f"db_pool_{key}", labels, stats[key]
+
+
+metrics.register_collector(_pool_gauges)
@@ -1,7 +1,7 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class CampagneCollecteCreate(BaseModel):
@@ -36,6 +36,7 @@ class InscriptionCollecteOut(BaseModel):
     nom: str | None = None
     telephone: str | None = None
     creneau: datetime | None = None
+    creneau_id: uuid.UUID | None = None
     statut: str
     created_at: datetime
 
@@ -70,3 +71,105 @@ class InscriptionCollecteCreate(BaseModel):
     nom: str | None = None
     telephone: str | None = None
     creneau: datetime | None = None
+    creneau_id: uuid.UUID | None = None
+
+
+# ── Créneaux et inscriptions par lot ────────
+
+
+class CreneauxGeneration(BaseModel):
+    duree_minutes: int = Field(ge=5, le=24 * 60)
+    capacite: int = Field(ge=1)
+    # Par défaut toute la durée de la campagne
+    debut: datetime | None = None
+    fin: datetime | None = None
+
+
+class CreneauCollecteOut(BaseModel):
+    id: uuid.UUID
+    campagne_id: uuid.UUID
+    site_id: uuid.UUID | None = None
+    debut: datetime
+    fin: datetime
+    capacite: int
+    reserves: int
+
+    model_config = {"from_attributes": True}
+
+
+class CreneauxGenerationOut(BaseModel):
+    campagne_id: uuid.UUID
+    crees: int
+
+
+class InscriptionLotItem(BaseModel):
+    donneur_id: uuid.UUID | None = None
+    nom: str | None = None
+    telephone: str | None = None
+    creneau_id: uuid.UUID | None = None
+
+
+class InscriptionsLotCreate(BaseModel):
+    inscriptions: list[InscriptionLotItem] = Field(min_length=1, max_length=5000)
+    # Premier créneau proposé aux inscriptions sans créneau demandé
+    a_partir_de: datetime | None = None
+
+
+class InscriptionRefus(BaseModel):
+    rang: int
+    motif: str  # DEJA_INSCRIT, COMPLET
+
+
+class InscriptionsLotOut(BaseModel):
+    inscrites: list[InscriptionCollecteOut]
+    refus: list[InscriptionRefus]
+
+
+# ── Ciblage des donneurs ────────────────────
+
+
+class CiblageCriteres(BaseModel):
+    regions: list[str] = []
+    departements: list[str] = []
+    groupes_sanguins: list[str] = []
+    niveaux: list[str] = []
+    deficitaires_seulement: bool = False
+    # Éligibles à cette date ; par défaut le début de la campagne
+    eligible_au: date | None = None
+    # Seulement les donneurs joignables sur ce canal
+    canal: str | None = Field(default=None, pattern=r"^(EMAIL|SMS|WHATSAPP)$")
+
+
+class DonneurCibleOut(BaseModel):
+    id: uuid.UUID
+    nom: str
+    prenom: str
+    sexe: str
+    groupe_sanguin: str | None = None
+    region: str | None = None
+    departement: str | None = None
+    telephone: str | None = None
+    email: str | None = None
+    eligible_le: date | None = None
+    niveau: str | None = None
+    score: float = 0
+
+    model_config = {"from_attributes": True}
+
+
+class CiblageOut(BaseModel):
+    total: int
+    deficits: dict[str, float]
+    donneurs: list[DonneurCibleOut]
+
+
+class CiblageNotificationsCreate(CiblageCriteres):
+    canal: str = Field(pattern=r"^(EMAIL|SMS|WHATSAPP)$")
+    template: str = Field(default="rappel_collecte", max_length=64)
+    priorite: str = Field(default="NORMALE", pattern=r"^(BASSE|NORMALE|HAUTE|URGENTE)$")
+    max_destinataires: int | None = Field(default=None, ge=1)
+
+
+class CiblageNotificationsOut(BaseModel):
+    campagne_id: uuid.UUID
+    notifications: int
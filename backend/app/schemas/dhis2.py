@@ -1,7 +1,9 @@
 import uuid
 from datetime import datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
+
+from app.core.dhis2 import normalize_periode
 
 
 class DHIS2ExportCreate(BaseModel):
@@ -9,6 +11,26 @@ class DHIS2ExportCreate(BaseModel):
     org_unit: str
     data_set: str | None = None
 
+    @field_validator("periode")
+    @classmethod
+    def _check_periode(cls, value: str) -> str:
+        normalize_periode(value)
+        return value
+
+
+class DHIS2BulkExportCreate(BaseModel):
+    periodes: list[str] = Field(min_length=1, max_length=120)
+    org_units: list[str] = Field(min_length=1, max_length=200)
+    data_set: str | None = None
+    envoyer: bool = False
+
+    @field_validator("periodes")
+    @classmethod
+    def _check_periodes(cls, value: list[str]) -> list[str]:
+        for periode in value:
+            normalize_periode(periode)
+        return value
+
 
 class DHIS2ExportOut(BaseModel):
     id: uuid.UUID
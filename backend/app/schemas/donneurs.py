@@ -56,8 +56,50 @@ class DonneurOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class DonneurImportErreur(BaseModel):
+    ligne: int
+    message: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class DonneurImportOut(BaseModel):
+    recus: int
+    importes: int
+    doublons: int
+    erreurs: int
+    derniere_ligne: int  # reprise : relancer avec skip=derniere_ligne
+    details_erreurs: list[DonneurImportErreur]  # limité aux premières erreurs
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class EligibiliteOut(BaseModel):
     eligible: bool
     eligible_le: dt.date | None
     raison: str | None = None
     delai_jours: int | None = None
+
+
+class DoublonOut(BaseModel):
+    id: uuid.UUID
+    donneur_id: uuid.UUID  # fiche conservée par défaut (la plus ancienne)
+    doublon_id: uuid.UUID
+    score: float
+    motifs: list[str]
+    statut: str
+    created_at: dt.datetime | None = None
+    decided_at: dt.datetime | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class FusionCreate(BaseModel):
+    # Fiche à conserver, parmi les deux de la paire (défaut : donneur_id)
+    conserver_id: uuid.UUID | None = None
+
+
+class FusionOut(BaseModel):
+    donneur_id: uuid.UUID
+    supprime_id: uuid.UUID
+    lignes_reprises: dict[str, int]
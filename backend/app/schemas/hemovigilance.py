@@ -92,11 +92,27 @@ class RappelLotStat(BaseModel):
     total: int
 
 
+class EIRGraviteStat(BaseModel):
+    gravite: str | None
+    total: int
+
+
+class HemovigilanceMoisStat(BaseModel):
+    mois: str
+    transfusions: int = 0
+    rappels: int = 0
+    eir: int = 0
+
+
 class RapportAutoriteOut(BaseModel):
     generated_at: dt.datetime
+    periode_debut: str
+    periode_fin: str
     rappels_par_statut: list[RappelStatutStat]
     transfusions_par_hopital: list[TransfusionHopitalStat]
     rappels_par_lot: list[RappelLotStat]
+    eir_par_gravite: list[EIRGraviteStat] = []
+    par_mois: list[HemovigilanceMoisStat] = []
 
 
 class PartenaireEventOut(BaseModel):
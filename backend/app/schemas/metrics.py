@@ -1,3 +1,5 @@
+import datetime as dt
+
 from pydantic import BaseModel
 
 
@@ -6,6 +8,12 @@ class MetricPoint(BaseModel):
     requests: int
     errors: int
     latency: int
+    latency_p95: float | None = None
+    latency_p99: float | None = None
+    slow_queries: int = 0
+    db_checked_out: int | None = None
+    celery_queue_depth: int | None = None
+    sync_lag_p95_seconds: float | None = None
 
 
 class ServiceStatus(BaseModel):
@@ -20,6 +28,36 @@ class ErrorDistribution(BaseModel):
     count: int
 
 
+class RouteMetrics(BaseModel):
+    method: str
+    route: str
+    requests: int
+    rate_per_minute: float
+    errors: int
+    error_rate: float
+    latency_p50_ms: float | None = None
+    latency_p95_ms: float | None = None
+    latency_p99_ms: float | None = None
+
+
+class SlowQuery(BaseModel):
+    at: dt.datetime
+    duration_ms: float
+    statement: str
+
+
+class DatabaseMetrics(BaseModel):
+    pools: list[dict]
+    slow_query_threshold_ms: float
+    slow_queries_total: int
+    recent_slow_queries: list[SlowQuery]
+
+
+class SyncMetrics(BaseModel):
+    lag_p95_seconds: float | None = None
+    last_ingested_at: dt.datetime | None = None
+
+
 class MonitoringDashboard(BaseModel):
     metrics: list[MetricPoint]
     services: list[ServiceStatus]
@@ -27,3 +65,7 @@ class MonitoringDashboard(BaseModel):
     total_requests: int
     avg_latency: int
     error_rate: float
+    routes: list[RouteMetrics] = []
+    database: DatabaseMetrics | None = None
+    celery_queue_depth: int | None = None
+    sync: SyncMetrics | None = None
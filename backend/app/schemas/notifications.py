@@ -12,6 +12,27 @@ class NotificationCreate(BaseModel):
     priorite: str = Field(default="NORMALE", pattern=r"^(BASSE|NORMALE|HAUTE|URGENTE)$")
 
 
+class NotificationDestinataire(BaseModel):
+    destinataire: str = Field(max_length=320)
+    variables: dict = {}
+
+
+class NotificationBulkCreate(BaseModel):
+    canal: str = Field(pattern=r"^(EMAIL|SMS|WHATSAPP)$")
+    template: str = Field(max_length=64)
+    # Variables communes, complétées par celles de chaque destinataire
+    variables: dict = {}
+    priorite: str = Field(default="NORMALE", pattern=r"^(BASSE|NORMALE|HAUTE|URGENTE)$")
+    reference_id: uuid.UUID | None = None
+    destinataires: list[NotificationDestinataire] = Field(min_length=1)
+
+
+class NotificationBulkOut(BaseModel):
+    notifications: int
+    lots: int
+    reference_id: uuid.UUID | None = None
+
+
 class NotificationOut(BaseModel):
     id: uuid.UUID
     canal: str
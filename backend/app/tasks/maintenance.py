@@ -101,3 +101,119 @@ def check_expiration_alerts() -> dict:
         raise
     finally:
         db.close()
+
+
+@celery_app.task(name="app.tasks.maintenance.recompute_loyalty")
+def recompute_loyalty() -> dict:
+    """Rebuild card balances, levels and donation counters from the points ledger."""
+    from app.core.loyalty import recompute
+
+    db = SessionLocal()
+    try:
+        cards = recompute(db)
+        db.commit()
+        logger.info("Fidélisation : %d cartes recalculées", cards)
+        return {"cartes": cards}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.tasks.maintenance.backfill_loyalty")
+def backfill_loyalty() -> dict:
+    """One-off catch-up of donations made before the ledger existed (never scheduled).
+
+    Unreferenced DON credits are first linked to their donations; the
+    remaining donations made since each card was issued are then credited.
+    """
+    from app.core.loyalty import backfill_dons, recompute, reconcile_dons
+
+    db = SessionLocal()
+    try:
+        linked = reconcile_dons(db)
+        credited = backfill_dons(db)
+        cards = recompute(db)
+        db.commit()
+        logger.info(
+            "Fidélisation : %d crédits rattachés, %d dons crédités, %d cartes recalculées",
+            linked,
+            credited,
+            cards,
+        )
+        return {"credits_rattaches": linked, "dons_credites": credited, "cartes": cards}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.tasks.maintenance.rehash_cni")
+def rehash_cni(chunk_size: int = 1000) -> dict:
+    """Bring every stored CNI hash to the current key version, one chunk per commit.
+
+    Covers donor records and the hashes kept from merged records. Run once
+    after bumping ``cni_hash_key_version``; lookups accept every version
+    meanwhile, and an interrupted run resumes where it stopped.
+    """
+    from sqlalchemy import bindparam, select, update
+
+    from app.core.security import current_cni_hash_prefix, rehash_cni_hash
+    from app.db.models import Donneur, DonneurCniAlias
+
+    prefix = current_cni_hash_prefix()
+    if prefix is None:
+        return {"rehashed": 0}
+
+    db = SessionLocal()
+    rehashed = 0
+    try:
+        for table in (Donneur.__table__, DonneurCniAlias.__table__):
+            stmt = (
+                select(table.c.id, table.c.cni_hash)
+                .where(~table.c.cni_hash.startswith(prefix, autoescape=True))
+                .order_by(table.c.id)
+                .limit(chunk_size)
+            )
+            last_id = None
+            while True:
+                chunk = stmt if last_id is None else stmt.where(table.c.id > last_id)
+                rows = db.execute(chunk).all()
+                if not rows:
+                    break
+                db.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("row_id"))
+                    .values(cni_hash=bindparam("new_hash")),
+                    [{"row_id": row.id, "new_hash": rehash_cni_hash(row.cni_hash)} for row in rows],
+                )
+                db.commit()
+                rehashed += len(rows)
+                last_id = rows[-1].id
+        logger.info("Empreintes CNI : %d donneurs repris en version %s", rehashed, prefix)
+        return {"rehashed": rehashed}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.tasks.maintenance.detect_duplicates")
+def detect_duplicates() -> dict:
+    """Score donor pairs sharing a blocking key and store new merge candidates."""
+    from app.core.dedup import detect
+
+    db = SessionLocal()
+    try:
+        created = detect(db)
+        db.commit()
+        logger.info("Doublons : %d nouvelles paires candidates", created)
+        return {"candidats": created}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
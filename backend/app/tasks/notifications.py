@@ -1,50 +1,85 @@
-"""Notification sending tasks."""
+"""Notification sending tasks.
+
+Batches are routed to one queue per channel (``app.core.notifications.QUEUES``)
+so each channel gets its own worker pool, e.g.::
+
+    celery -A app.core.celery_app worker -Q notifications.sms -n sms@%h
+"""
 
 import logging
 
+from celery import signals
+
 from app.core.celery_app import celery_app
 
 logger = logging.getLogger(__name__)
 
 
-@celery_app.task(name="app.tasks.notifications.send_notification", bind=True, max_retries=3)
-def send_notification(self, notification_id: str) -> dict:
-    """Send a notification via the appropriate channel (email, SMS, WhatsApp)."""
-    import datetime as dt
+@signals.worker_process_shutdown.connect(weak=False)
+def _close_channels(**_kwargs) -> None:
+    from app.core.channels import close_channels
+
+    close_channels()
+
+
+@celery_app.task(name="app.tasks.notifications.send_notification")
+def send_notification(notification_id: str) -> dict:
+    """Send a single notification (messages queued before batched delivery)."""
+    return send_notifications(notification_ids=[notification_id])
+
+
+@celery_app.task(name="app.tasks.notifications.send_notifications")
+def send_notifications(notification_ids: list[str]) -> dict:
+    """Send a batch of pending notifications.
+
+    The batch is first claimed (EN_ATTENTE -> EN_COURS) and committed, so a
+    notification queued twice (manual retry, Celery redelivery) is sent by
+    one task only. Messages go out over the worker's persistent channel
+    connections, and statuses are written back in bulk. Temporary failures
+    are scheduled for a batched retry (``retry_due``).
+    """
     import uuid
+    from itertools import groupby
 
-    from app.db.models import Notification
+    from app.core.channels import DeliveryError, channel, discard_channel
+    from app.core.notifications import claim, record_results
     from app.db.session import SessionLocal
 
     db = SessionLocal()
+    sent: list[uuid.UUID] = []
+    failed: list[tuple[uuid.UUID, int, DeliveryError]] = []
     try:
-        notif = db.get(Notification, uuid.UUID(notification_id))
-        if notif is None:
-            logger.error("Notification %s introuvable", notification_id)
-            return {"status": "erreur", "detail": "notification introuvable"}
-
-        if notif.statut == "ENVOYE":
-            return {"status": "deja_envoye"}
-
-        notif.tentatives += 1
-
-        try:
-            if notif.canal == "EMAIL":
-                _send_email(notif.destinataire, notif.template, notif.variables)
-            elif notif.canal == "SMS":
-                _send_sms(notif.destinataire, notif.template, notif.variables)
-            elif notif.canal == "WHATSAPP":
-                _send_whatsapp(notif.destinataire, notif.template, notif.variables)
-
-            notif.statut = "ENVOYE"
-            notif.sent_at = dt.datetime.now(dt.timezone.utc)
-            db.commit()
-            return {"status": "envoye"}
-        except Exception as exc:
-            notif.statut = "ECHEC"
-            notif.erreur = str(exc)[:500]
-            db.commit()
-            raise self.retry(exc=exc, countdown=60 * (2**self.request.retries))
+        rows = claim(db, [uuid.UUID(i) for i in notification_ids])
+        db.commit()
+        for canal, group in groupby(rows, key=lambda row: row.canal):
+            pending = list(group)
+            while pending:
+                try:
+                    connection = channel(canal)
+                except Exception as exc:
+                    logger.error("Canal %s indisponible : %s", canal, exc)
+                    failed.extend(
+                        (row.id, row.tentatives, DeliveryError(str(exc))) for row in pending
+                    )
+                    break
+                for index, row in enumerate(pending):
+                    try:
+                        connection.send(row.destinataire, row.template, row.variables)
+                        sent.append(row.id)
+                    except DeliveryError as exc:
+                        failed.append((row.id, row.tentatives, exc))
+                    except Exception as exc:
+                        # Connexion inutilisable : rouverte pour la suite du lot
+                        logger.warning("Echec d'envoi de la notification %s : %s", row.id, exc)
+                        discard_channel(canal)
+                        failed.append((row.id, row.tentatives, DeliveryError(str(exc))))
+                        pending = pending[index + 1 :]
+                        break
+                else:
+                    pending = []
+        record_results(db, sent, failed)
+        db.commit()
+        return {"envoye": len(sent), "echec": len(failed)}
     except Exception:
         db.rollback()
         raise
@@ -52,52 +87,20 @@ def send_notification(self, notification_id: str) -> dict:
         db.close()
 
 
-def _send_email(destinataire: str, template: str, variables: dict) -> None:
-    """Send email via SMTP. To be configured with real SMTP credentials."""
-    from app.core.config import settings
-
-    if settings.env == "dev":
-        logger.info(
-            "[DEV] Email simulé vers %s | template=%s | variables=%s",
-            destinataire,
-            template,
-            variables,
-        )
-        return
-
-    # Production: integrate with SMTP or SendGrid
-    # from app.notifications.channels.email import send_email_smtp
-    # send_email_smtp(destinataire, template, variables)
-    logger.warning("Envoi email non configuré en production pour %s", destinataire)
-
-
-def _send_sms(destinataire: str, template: str, variables: dict) -> None:
-    """Send SMS via provider API. To be configured with real SMS provider."""
-    from app.core.config import settings
-
-    if settings.env == "dev":
-        logger.info(
-            "[DEV] SMS simulé vers %s | template=%s | variables=%s",
-            destinataire,
-            template,
-            variables,
-        )
-        return
-
-    logger.warning("Envoi SMS non configuré en production pour %s", destinataire)
-
-
-def _send_whatsapp(destinataire: str, template: str, variables: dict) -> None:
-    """Send WhatsApp message via Business API. To be configured."""
-    from app.core.config import settings
+@celery_app.task(name="app.tasks.notifications.retry_due")
+def retry_due() -> dict:
+    """Queue every retry that is due, in batches per channel."""
+    from app.core.notifications import claim_retries, dispatch
+    from app.db.session import SessionLocal
 
-    if settings.env == "dev":
-        logger.info(
-            "[DEV] WhatsApp simulé vers %s | template=%s | variables=%s",
-            destinataire,
-            template,
-            variables,
-        )
-        return
+    db = SessionLocal()
+    try:
+        due = claim_retries(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return {canal: dispatch(ids, canal) for canal, ids in due.items()}
 
-    logger.warning("Envoi WhatsApp non configuré en production pour %s", destinataire)
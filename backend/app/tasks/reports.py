@@ -74,3 +74,52 @@ def _generate_stock_report(db, params: dict) -> dict:
     rows = db.execute(stmt).all()
     breakdown = [{"type_produit": r[0], "statut": r[1], "count": r[2]} for r in rows]
     return {"breakdown": breakdown, "params": params}
+
+
+@celery_app.task(name="app.tasks.reports.refresh_dhis2_aggregates")
+def refresh_dhis2_aggregates(periodes: list[str] | None = None) -> dict:
+    """Refresh the DHIS2 monthly aggregates (current and previous month by default)."""
+    import datetime as dt
+
+    from app.core.dhis2 import refresh_agregats
+    from app.db.session import SessionLocal
+
+    if not periodes:
+        today = dt.date.today()
+        previous = today.replace(day=1) - dt.timedelta(days=1)
+        periodes = [previous.strftime("%Y%m"), today.strftime("%Y%m")]
+
+    db = SessionLocal()
+    try:
+        refreshed = refresh_agregats(db, periodes)
+        db.commit()
+        logger.info("Agrégats DHIS2 rafraîchis : %s", ", ".join(refreshed) or "aucun")
+        return {"periodes": refreshed}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.tasks.reports.rebuild_hemovigilance_aggregates")
+def rebuild_hemovigilance_aggregates(mois: list[str] | None = None) -> dict:
+    """Rebuild hemovigilance counters from source tables (all months when ``mois`` is empty).
+
+    Counters are maintained on each flush; this is for backfill and reconciliation
+    after bulk SQL updates that bypass the ORM.
+    """
+    from app.core.hemovigilance import rebuild_agregats
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rows = rebuild_agregats(db, mois or None)
+        db.commit()
+        logger.info("Agrégats hémovigilance reconstruits : %d lignes", rows)
+        return {"lignes": rows}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
@@ -1,25 +1,37 @@
 """
 Shared test fixtures for the CNTS backend test suite.
 
-Provides a reusable SQLite in-memory database setup, test client,
+Provides a reusable SQLite database setup (sync and async sessions), test client,
 and common domain fixtures (donneur, don, analyses).
 """
 
 import datetime as dt
+import os
+import tempfile
 
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 
+from app.api.deps import clear_user_cache
+from app.core.cache import response_cache
 from app.db.base import Base
-from app.db.session import get_db
+from app.db.session import get_async_db, get_async_read_db, get_db, get_read_db
 from app.main import app
 
+pytest_plugins = ["pytester", "query_budget"]
+
 # ---------- Database setup ----------
 
-SQLALCHEMY_TEST_DATABASE_URL = "sqlite://"
+# Fichier temporaire plutôt que ":memory:" : les routes async (aiosqlite) ouvrent
+# leurs propres connexions et doivent voir les mêmes données que la session sync.
+_db_dir = tempfile.mkdtemp(prefix="cnts-tests-")
+_db_path = os.path.join(_db_dir, "test.db")
+
+SQLALCHEMY_TEST_DATABASE_URL = f"sqlite:///{_db_path}"
 engine = create_engine(
     SQLALCHEMY_TEST_DATABASE_URL,
     connect_args={"check_same_thread": False},
@@ -27,6 +39,9 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{_db_path}", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def override_get_db():
     db = TestingSessionLocal()
@@ -36,21 +51,35 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 # ---------- Fixtures ----------
 
 
 @pytest.fixture(autouse=True)
 def setup_database():
     """Create tables before each test and drop them after."""
-    previous = app.dependency_overrides.get(get_db)
-    app.dependency_overrides[get_db] = override_get_db
+    overrides = {
+        get_db: override_get_db,
+        get_read_db: override_get_db,
+        get_async_db: override_get_async_db,
+        get_async_read_db: override_get_async_db,
+    }
+    previous = {dep: app.dependency_overrides.get(dep) for dep in overrides}
+    app.dependency_overrides.update(overrides)
     Base.metadata.create_all(bind=engine)
     yield
     Base.metadata.drop_all(bind=engine)
-    if previous is None:
-        app.dependency_overrides.pop(get_db, None)
-    else:
-        app.dependency_overrides[get_db] = previous
+    response_cache.clear()
+    clear_user_cache()
+    for dep, override in previous.items():
+        if override is None:
+            app.dependency_overrides.pop(dep, None)
+        else:
+            app.dependency_overrides[dep] = override
 
 
 @pytest.fixture
@@ -0,0 +1,68 @@
+"""
+Plugin pytest : budget de requêtes SQL par test.
+
+Opt-in, deux façons :
+- marqueur ``@pytest.mark.query_budget(10)`` sur un test (``n_plus_one=True``
+  fait aussi échouer sur une instruction répétée ``db_n_plus_one_threshold`` fois) ;
+- options ``--query-budget=N`` / ``--fail-on-n-plus-one`` pour toute la session.
+
+Les requêtes sont comptées pour tout le processus (``capture_queries``), donc
+celles des routes servies par ``TestClient`` comprises, fixtures exclues.
+"""
+
+import pytest
+
+from app.db.instrumentation import capture_queries
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("query-budget", "budget de requêtes SQL")
+    group.addoption(
+        "--query-budget",
+        type=int,
+        default=None,
+        help="nombre maximal de requêtes SQL par test",
+    )
+    group.addoption(
+        "--fail-on-n-plus-one",
+        action="store_true",
+        default=False,
+        help="échoue si une même instruction SQL est répétée (N+1 probable)",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "query_budget(max_queries=None, n_plus_one=False): budget de requêtes SQL du test",
+    )
+
+
+def _budget(item) -> tuple[int | None, bool]:
+    marker = item.get_closest_marker("query_budget")
+    max_queries = item.config.getoption("--query-budget")
+    n_plus_one = item.config.getoption("--fail-on-n-plus-one")
+    if marker is not None:
+        max_queries = marker.kwargs.get("max_queries", marker.args[0] if marker.args else None)
+        n_plus_one = marker.kwargs.get("n_plus_one", n_plus_one)
+    return max_queries, n_plus_one
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    max_queries, n_plus_one = _budget(item)
+    if max_queries is None and not n_plus_one:
+        return (yield)
+
+    with capture_queries() as stats:
+        result = yield
+
+    problems = []
+    if max_queries is not None and stats.count > max_queries:
+        problems.append(f"{stats.count} requêtes SQL pour un budget de {max_queries}")
+    if n_plus_one:
+        for statement, executions in stats.repeated():
+            problems.append(f"N+1 probable ({executions} exécutions) : {statement[:200]}")
+    if problems:
+        pytest.fail("\n".join(problems), pytrace=False)
+    return result
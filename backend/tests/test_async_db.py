@@ -0,0 +1,119 @@
+"""
+Tests pour la pile SQLAlchemy asynchrone des routes de lecture.
+
+Vérifie:
+- Routes async (stock disponible, journal, pull, analytics) voient les écritures sync
+- Session async de lecture routée vers le réplica, écritures vers le primaire
+- Choix du pilote async selon l'URL configurée
+"""
+
+import asyncio
+import datetime as dt
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from app.audit.events import TraceEvent
+from app.db.models import Poche
+from app.db.session import RoutingSession, _async_url
+
+
+def _poche(don_id: str, **overrides) -> Poche:
+    values = {
+        "don_id": uuid.UUID(don_id),
+        "type_produit": "CGR",
+        "groupe_sanguin": "O+",
+        "date_peremption": dt.date.today() + dt.timedelta(days=20),
+        "emplacement_stock": "FRIGO-1",
+        "statut_distribution": "DISPONIBLE",
+    }
+    values.update(overrides)
+    return Poche(**values)
+
+
+def test_poches_disponibles_async(client: TestClient, db_session: Session, don_id: str):
+    db_session.add_all(
+        [
+            _poche(don_id),
+            _poche(don_id, type_produit="PFC", groupe_sanguin="A+"),
+            _poche(don_id, statut_distribution="DISTRIBUE"),
+        ]
+    )
+    db_session.commit()
+
+    response = client.get("/api/poches/disponibles")
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+    response = client.get("/api/poches/disponibles", params={"groupe_sanguin": "o+"})
+    assert [p["type_produit"] for p in response.json()] == ["CGR"]
+
+
+def test_trace_et_pull_async(client: TestClient, don_id: str):
+    response = client.get("/api/trace/events", params={"aggregate_id": don_id})
+    assert response.status_code == 200
+    assert response.json()
+    assert all(e["aggregate_type"] == "don" for e in response.json())
+
+    response = client.get("/api/sync/events", params={"limit": 1})
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["events"]) == 1
+    assert body["next_cursor"]
+
+    suite = client.get("/api/sync/events", params={"cursor": body["next_cursor"]})
+    assert body["events"][0]["id"] not in {e["id"] for e in suite.json()["events"]}
+
+
+def test_analytics_async(client: TestClient, db_session: Session, don_id: str):
+    db_session.add(_poche(don_id))
+    db_session.commit()
+
+    response = client.get("/api/analytics/kpi/stock-available")
+    assert response.status_code == 200
+    assert response.json()["value"] == 1
+
+    response = client.get("/api/analytics/kpi/collection-rate")
+    assert response.status_code == 200
+    assert response.json()["value"] == round(1 / 30, 2)
+
+    response = client.get("/api/analytics/export", params={"format": "csv", "report_type": "stock"})
+    assert response.status_code == 200
+    assert response.text.startswith("Code Produit,Type,Groupe,Expiration")
+
+
+def test_async_routing_session_reads_replica(tmp_path):
+    async def scenario():
+        primary = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+        replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+        for target, name in ((primary, "primary"), (replica, "replica")):
+            async with target.begin() as conn:
+                await conn.run_sync(TraceEvent.__table__.create)
+                await conn.execute(text("CREATE TABLE marker (name TEXT)"))
+                await conn.execute(text(f"INSERT INTO marker VALUES ('{name}')"))
+
+        factory = async_sessionmaker(primary, sync_session_class=RoutingSession)
+        async with factory(read_bind=replica.sync_engine) as db:
+            assert (await db.execute(text("SELECT name FROM marker"))).scalar() == "replica"
+            db.add(
+                TraceEvent(
+                    aggregate_type="t", aggregate_id=uuid.uuid4(), event_type="e", payload={}
+                )
+            )
+            await db.commit()
+
+        async with primary.connect() as conn:
+            count = await conn.scalar(text("SELECT count(*) FROM trace_events"))
+        await primary.dispose()
+        await replica.dispose()
+        return count
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_async_url():
+    assert _async_url("postgresql+psycopg://u:p@h/db").drivername == "postgresql+psycopg_async"
+    assert _async_url("sqlite:///x.db").drivername == "sqlite+aiosqlite"
@@ -4,6 +4,7 @@ from fastapi.testclient import TestClient
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.api import deps
 from app.audit.events import TraceEvent
 from app.core.passwords import hash_password, hash_recovery_code
 from app.core.totp import generate_totp
@@ -55,6 +56,8 @@ def test_disable_2fa_is_effective_and_irreversible(client: TestClient, db_sessio
     assert ok_res.status_code == 200
     assert "access_token" in ok_res.json()
 
+    # Compte en cache avec mfa_enabled=True : la désactivation doit l'invalider
+    deps._user_cache[user_id] = (float("inf"), db_session.get(UserAccount, user_id))
     disable_res = client.post(
         f"/api/admin/auth/2fa/disable/{user_id}",
         json={"reason": "incident"},
@@ -63,6 +66,7 @@ def test_disable_2fa_is_effective_and_irreversible(client: TestClient, db_sessio
     assert disable_res.status_code == 200
     assert disable_res.json()["user_id"] == str(user_id)
     assert disable_res.json()["recovery_codes_revoked"] == 2
+    assert user_id not in deps._user_cache
 
     login_res2 = client.post(
         "/api/auth/login", json={"email": "agent@cnts.local", "password": "pw"}
@@ -0,0 +1,81 @@
+"""
+Tests pour les caches d'authentification.
+
+Vérifie:
+- Jeton vérifié servi depuis le cache jusqu'à son expiration
+- Jeton altéré ou autre secret refusés malgré le cache
+- Compte servi sans requête SQL, champs non mis en cache chargés à l'accès
+- Désactivation via /users invalidant immédiatement le cache
+"""
+
+import time
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core import tokens
+from app.core.passwords import hash_password
+from app.db.instrumentation import capture_queries
+from app.db.models import Donneur, UserAccount
+
+
+def test_verified_token_cache_bounded_by_exp(monkeypatch):
+    token = tokens.sign_token({"sub": "u1", "type": "access"}, "secret", ttl_seconds=60)
+    assert tokens.verify_token(token, "secret")["sub"] == "u1"
+
+    decoded = []
+    monkeypatch.setattr(tokens.json, "loads", lambda raw: decoded.append(raw))
+    assert tokens.verify_token(token, "secret")["sub"] == "u1"
+    assert decoded == []
+
+    now = time.time()
+    monkeypatch.setattr(tokens.time, "time", lambda: now + 120)
+    assert tokens.verify_token(token, "secret") is None
+
+
+def test_verified_token_cache_rejects_tampering():
+    token = tokens.sign_token({"sub": "u1", "type": "access"}, "secret", ttl_seconds=60)
+    assert tokens.verify_token(token, "secret") is not None
+
+    prefix, _, sig = token.split(".")
+    forged = tokens._b64url_encode(b'{"sub":"admin","type":"access","exp":9999999999}')
+    assert tokens.verify_token(f"{prefix}.{forged}.{sig}", "secret") is None
+    assert tokens.verify_token(token, "other-secret") is None
+
+    tokens.verify_token(token, "secret")["sub"] = "muté"
+    assert tokens.verify_token(token, "secret")["sub"] == "u1"
+
+
+def _login(client: TestClient, db_session: Session) -> tuple[uuid.UUID, str]:
+    email = f"cache_{uuid.uuid4()}@example.com"
+    user = UserAccount(email=email, password_hash=hash_password("password"))
+    db_session.add(user)
+    db_session.add(Donneur(nom="Cache", prenom="Test", sexe="F", cni_hash="hash", user=user))
+    db_session.commit()
+    response = client.post("/api/auth/login", json={"email": email, "password": "password"})
+    return user.id, response.json()["access_token"]
+
+
+def test_user_served_from_cache(client: TestClient, db_session: Session):
+    _, token = _login(client, db_session)
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/me", headers=headers).status_code == 200
+
+    with capture_queries() as stats:
+        response = client.get("/api/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["nom"] == "Cache"
+    user_selects = [s for s in stats.statements if "FROM user_accounts" in s]
+    assert user_selects == []
+
+
+def test_deactivation_invalidates_cached_user(client: TestClient, db_session: Session):
+    user_id, token = _login(client, db_session)
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/me", headers=headers).status_code == 200
+
+    assert client.delete(f"/api/users/{user_id}").status_code == 200
+    response = client.get("/api/me", headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
@@ -0,0 +1,116 @@
+"""
+Tests pour le cache des réponses de référentiels.
+
+Vérifie:
+- ETag et 304 sur If-None-Match
+- Lecture des règles produits sans écriture une fois les défauts créés
+- Invalidation au commit des routes de mise à jour et des événements d'audit
+- Corps calculé pendant une invalidation jamais servi sous la nouvelle version
+"""
+
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from starlette.requests import Request
+
+from app.audit.events import log_event
+from app.core.cache import cached_json_response, response_cache
+
+
+def _count_statements(engine, fn) -> list[str]:
+    statements: list[str] = []
+
+    def before(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+    return statements
+
+
+def test_etag_not_modified(client: TestClient):
+    response = client.get("/api/parametrage/regions")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert "Dakar" in response.json()
+
+    response = client.get("/api/parametrage/regions", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+
+def test_product_rules_served_from_cache(client: TestClient, db_session):
+    engine = db_session.get_bind()
+    first = client.get("/api/stock/regles")
+    assert [r["type_produit"] for r in first.json()] == ["CGR", "CP", "PFC", "ST"]
+    # La création des règles par défaut a invalidé le cache pendant le calcul :
+    # la réponse suivante est recalculée une fois, sans écriture
+    statements = _count_statements(engine, lambda: client.get("/api/stock/regles"))
+    assert statements and not any(s.lstrip().upper().startswith("INSERT") for s in statements)
+
+    statements = _count_statements(engine, lambda: client.get("/api/stock/regles"))
+    assert statements == []
+
+    response_cache.clear()
+    statements = _count_statements(engine, lambda: client.get("/api/stock/regles"))
+    assert statements and not any(s.lstrip().upper().startswith("INSERT") for s in statements)
+
+
+def test_update_route_invalidates(client: TestClient):
+    etag = client.get("/api/stock/regles").headers["etag"]
+
+    response = client.put(
+        "/api/stock/regles/CP",
+        json={"shelf_life_days": 7, "default_volume_ml": 60},
+    )
+    assert response.status_code == 200
+
+    response = client.get("/api/stock/regles", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert {r["type_produit"]: r["shelf_life_days"] for r in response.json()}["CP"] == 7
+
+
+def test_hopitaux_invalidated_on_create(client: TestClient):
+    assert client.get("/api/hopitaux").json() == []
+    response = client.post("/api/hopitaux", json={"nom": "Hôpital Principal"})
+    assert response.status_code == 201
+    assert [h["nom"] for h in client.get("/api/hopitaux").json()] == ["Hôpital Principal"]
+
+
+def test_audit_event_invalidates(db_session):
+    response_cache.set("stock.recettes", "None:True:True", b"[]")
+    log_event(
+        db_session,
+        aggregate_type="system",
+        aggregate_id=uuid.uuid4(),
+        event_type="recette.updated",
+        payload={},
+    )
+    # rien n'est invalidé avant le commit
+    assert response_cache.get("stock.recettes", "None:True:True") is not None
+    db_session.commit()
+    assert response_cache.get("stock.recettes", "None:True:True") is None
+
+
+def test_invalidation_during_build_not_cached():
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+    builds = []
+
+    def build():
+        builds.append(1)
+        if len(builds) == 1:
+            # Écriture validée pendant le calcul de la première réponse
+            response_cache.invalidate("test.course")
+        return {"build": len(builds)}
+
+    first = cached_json_response(request, namespace="test.course", key="k", build=build)
+    assert first.body == b'{"build":1}'
+    second = cached_json_response(request, namespace="test.course", key="k", build=build)
+    assert second.body == b'{"build":2}'
+    third = cached_json_response(request, namespace="test.course", key="k", build=build)
+    assert third.body == b'{"build":2}'
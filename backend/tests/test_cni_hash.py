@@ -0,0 +1,146 @@
+"""
+Tests pour l'empreinte des numéros CNI et la rotation de sa clé.
+
+Vérifie:
+- Empreinte inchangée en version 1, normalisation du numéro, calcul par lot
+- Rotation : recherche sous l'ancienne et la nouvelle empreinte (API, synchronisation, import)
+- Reprise des empreintes en base par lots (fiches et alias de fusion), sans le numéro en clair
+- Modification de CNI refusée (409) si un autre donneur la porte, même sous l'ancienne empreinte
+"""
+
+import hashlib
+import hmac
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import Settings, settings
+from app.core.security import cni_hash_candidates, hash_cni, hash_cni_many
+from app.db.models import Donneur, DonneurCniAlias
+
+
+def test_hash_is_stable_and_normalized():
+    expected = hmac.new(
+        settings.cni_hash_key.encode(), b"SN12345678", digestmod=hashlib.sha256
+    ).hexdigest()
+    assert hash_cni("SN12345678") == expected
+    assert hash_cni(" sn-1234 5678 ") == expected
+    assert hash_cni_many(["SN12345678", "sn_1234.5678", "SN-0002"]) == [
+        expected,
+        expected,
+        hash_cni("SN-0002"),
+    ]
+
+
+def test_rotation_requires_previous_keys(monkeypatch: pytest.MonkeyPatch):
+    with pytest.raises(ValidationError, match="versions \\[1\\]"):
+        Settings(cni_hash_key_version=3, cni_hash_previous_keys={2: "x" * 32})
+    with pytest.raises(ValidationError):
+        Settings(cni_hash_key_version=2, cni_hash_previous_keys={1: ""})
+
+    # Réglage modifié après le chargement : erreur explicite, pas de KeyError
+    monkeypatch.setattr(settings, "cni_hash_key_version", 2)
+    with pytest.raises(RuntimeError, match="version 1"):
+        hash_cni("SN12345678")
+
+
+@pytest.fixture
+def rotate(monkeypatch: pytest.MonkeyPatch):
+    def rotate() -> None:
+        monkeypatch.setattr(settings, "cni_hash_previous_keys", {1: settings.cni_hash_key})
+        monkeypatch.setattr(settings, "cni_hash_key", "cle-de-version-2-" + "x" * 32)
+        monkeypatch.setattr(settings, "cni_hash_key_version", 2)
+
+    return rotate
+
+
+def _donneur(client: TestClient, cni: str) -> dict:
+    response = client.post(
+        "/api/donneurs", json={"cni": cni, "nom": "Faye", "prenom": cni, "sexe": "F"}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_rotation_dual_lookup_and_rehash(
+    client: TestClient, db_session: Session, rotate, monkeypatch: pytest.MonkeyPatch
+):
+    from app.tasks import maintenance
+
+    anciens = {cni: _donneur(client, cni)["id"] for cni in ("SN-0001", "SN-0002", "SN-0003")}
+    v1 = hash_cni("SN-0001")
+    # Numéro d'une fiche fusionnée dans SN-0001
+    db_session.add(
+        DonneurCniAlias(donneur_id=uuid.UUID(anciens["SN-0001"]), cni_hash=hash_cni("SN-0009"))
+    )
+    db_session.commit()
+    rotate()
+
+    assert cni_hash_candidates("SN-0001")[1] == v1
+    assert hash_cni("SN-0001").startswith("v2$")
+    # Donneurs encore sous l'empreinte v1 retrouvés, nouveaux créés en v2
+    assert _donneur(client, "SN-0001")["id"] == anciens["SN-0001"]
+    assert _donneur(client, "SN-0004")["cni_hash"] == hash_cni("SN-0004")
+    push = client.post(
+        "/api/sync/events",
+        json={
+            "device_id": "tablette-01",
+            "events": [
+                {
+                    "client_event_id": "ev-1",
+                    "type": "don.create",
+                    "payload": {
+                        "donneur_cni": "SN-0002",
+                        "date_don": "2026-10-01",
+                        "type_don": "SANG_TOTAL",
+                    },
+                }
+            ],
+        },
+    )
+    assert push.json()["results"][0]["status"] == "ACCEPTE"
+    report = client.post(
+        "/api/donneurs/import",
+        content=b"cni,nom,prenom,sexe\nSN-0003,Faye,X,F\nSN-0005,Faye,Y,F\n",
+        headers={"Content-Type": "text/csv"},
+    ).json()
+    assert (report["importes"], report["doublons"]) == (1, 1)
+
+    monkeypatch.setattr(maintenance, "SessionLocal", sessionmaker(bind=db_session.get_bind()))
+    assert maintenance.rehash_cni.run(chunk_size=2) == {"rehashed": 4}
+    assert maintenance.rehash_cni.run(chunk_size=2) == {"rehashed": 0}
+    alias = db_session.execute(select(DonneurCniAlias.cni_hash)).scalar_one()
+    assert alias == hash_cni("SN-0009")
+    assert _donneur(client, "SN-0009")["id"] == anciens["SN-0001"]
+
+    stored = dict(db_session.execute(select(Donneur.id, Donneur.cni_hash)).all())
+    assert len(stored) == 5
+    for cni, donneur_id in anciens.items():
+        assert stored[uuid.UUID(donneur_id)] == hash_cni(cni)
+    assert all(value.startswith("v2$") for value in stored.values())
+
+
+def test_rotation_update_rejects_cni_of_other_donor(
+    client: TestClient, db_session: Session, rotate, monkeypatch: pytest.MonkeyPatch
+):
+    from app.tasks import maintenance
+
+    ancien = _donneur(client, "SN-0101")["id"]
+    rotate()
+    autre = _donneur(client, "SN-0102")["id"]
+
+    # SN-0101 n'est encore stocké que sous son empreinte v1
+    conflit = client.put(f"/api/donneurs/{autre}", json={"cni": "sn 0101"})
+    assert conflit.status_code == 409
+    # Le donneur lui-même peut ressaisir son numéro : il passe en v2
+    response = client.put(f"/api/donneurs/{ancien}", json={"cni": "SN-0101"})
+    assert response.status_code == 200
+    assert response.json()["cni_hash"] == hash_cni("SN-0101")
+
+    monkeypatch.setattr(maintenance, "SessionLocal", sessionmaker(bind=db_session.get_bind()))
+    assert maintenance.rehash_cni.run() == {"rehashed": 0}
+    assert client.put(f"/api/donneurs/{autre}", json={"cni": "SN-0101"}).status_code == 409
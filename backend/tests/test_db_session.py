@@ -0,0 +1,66 @@
+"""
+Tests pour le routage des sessions de lecture et les métriques de pool.
+
+Vérifie:
+- Lectures routées vers le réplica, écritures vers le primaire
+- Réplica en retard ou injoignable écarté au profit du primaire
+- Jauges de pool exposées sur /metrics
+"""
+
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.pool import StaticPool
+
+from app.audit.events import TraceEvent
+from app.db.base import Base
+from app.db.session import ReplicaPool, RoutingSession
+
+
+def _sqlite():
+    created = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=created)
+    return created
+
+
+def test_routing_session_reads_replica_writes_primary():
+    primary, replica = _sqlite(), _sqlite()
+    with replica.begin() as conn:
+        conn.execute(text("CREATE TABLE marker (name TEXT)"))
+        conn.execute(text("INSERT INTO marker VALUES ('replica')"))
+
+    db = RoutingSession(bind=primary, read_bind=replica)
+    assert db.execute(text("SELECT name FROM marker")).scalar() == "replica"
+
+    db.add(TraceEvent(aggregate_type="t", aggregate_id=uuid.uuid4(), event_type="e", payload={}))
+    db.commit()
+    db.close()
+
+    with primary.connect() as conn:
+        assert conn.execute(select(TraceEvent.event_type)).scalar() == "e"
+    with replica.connect() as conn:
+        assert conn.execute(select(TraceEvent.event_type)).scalar() is None
+
+
+def test_replica_pool_lag_guard(monkeypatch):
+    primary, replica_a, replica_b = _sqlite(), _sqlite(), _sqlite()
+    pool = ReplicaPool(primary, [replica_a, replica_b])
+
+    # pg_is_in_recovery() n'existe pas sur SQLite : réplicas considérés injoignables
+    assert pool.choose() is primary
+
+    lags = {replica_a: 30.0, replica_b: 0.5}
+    monkeypatch.setattr(pool, "lag_seconds", lambda engine: lags[engine])
+    assert {pool.choose() for _ in range(4)} == {replica_b}
+
+    lags[replica_b] = None
+    assert pool.choose() is primary
+
+
+def test_pool_gauges_exposed(client: TestClient):
+    body = client.get("/api/metrics").text
+    assert 'db_pool_size{pool="primary"}' in body
+    assert 'db_pool_checked_out{pool="primary"}' in body
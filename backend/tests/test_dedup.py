@@ -0,0 +1,169 @@
+"""
+Tests pour la détection et la fusion des doublons de donneurs.
+
+Vérifie:
+- Détection par blocs : faute de frappe, nom et prénom inversés avec le même téléphone
+- Homonymes nés à des dates différentes non proposés, détection relancée sans doublon
+- Fusion : dons, carte et points, phénotypes et rendez-vous repris, fiche en double supprimée
+- CNI de la fiche supprimée : retrouve la fiche conservée (API, synchronisation, import)
+- Rejet d'une paire, décision définitive
+"""
+
+import datetime as dt
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.models import CarteDonneur, Don, Donneur, Phenotypage, RendezVous
+
+
+def _donneur(client: TestClient, cni: str, nom: str, prenom: str, sexe: str, **extra) -> str:
+    response = client.post(
+        "/api/donneurs", json={"cni": cni, "nom": nom, "prenom": prenom, "sexe": sexe, **extra}
+    )
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+@pytest.fixture
+def detect(db_session: Session, monkeypatch: pytest.MonkeyPatch):
+    from app.tasks import maintenance
+
+    monkeypatch.setattr(maintenance, "SessionLocal", sessionmaker(bind=db_session.get_bind()))
+    return maintenance.detect_duplicates.run
+
+
+def _paires(client: TestClient, statut: str = "A_EXAMINER") -> dict[frozenset, dict]:
+    rows = client.get("/api/donneurs/doublons", params={"statut": statut}).json()
+    return {frozenset((row["donneur_id"], row["doublon_id"])): row for row in rows}
+
+
+def test_detection_by_blocks(client: TestClient, detect):
+    aminata = _donneur(
+        client, "DD-1", "Ndiaye", "Aminata", "F", date_naissance="1990-05-01", telephone="771234567"
+    )
+    faute = _donneur(client, "DD-2", "Ndiaye", "Aminatta", "F", date_naissance="1990-05-01")
+    moussa = _donneur(client, "DD-3", "Diallo", "Moussa", "H", telephone="77 555 66 77")
+    inverse = _donneur(client, "DD-4", "Moussa", "Diallo", "H", telephone="+221775556677")
+    # Homonymes : même nom, naissances différentes
+    _donneur(client, "DD-5", "Fall", "Ibrahima", "H", date_naissance="1985-01-01")
+    _donneur(client, "DD-6", "Fall", "Ibrahima", "H", date_naissance="1992-03-03")
+
+    assert detect() == {"candidats": 2}
+    paires = _paires(client)
+    assert set(paires) == {frozenset((aminata, faute)), frozenset((moussa, inverse))}
+    assert paires[frozenset((aminata, faute))]["motifs"] == ["naissance"]
+    assert paires[frozenset((moussa, inverse))]["motifs"] == ["telephone"]
+    assert all(row["score"] >= 0.75 for row in paires.values())
+
+    assert detect() == {"candidats": 0}
+
+
+def test_merge_repoints_references(client: TestClient, db_session: Session, detect):
+    garde = _donneur(client, "DM-1", "Sow", "Mariama", "F", date_naissance="1988-02-02")
+    double = _donneur(
+        client, "DM-2", "Sow", "Mariamma", "F", date_naissance="1988-02-02", telephone="781112233"
+    )
+    for donneur_id, numero in ((garde, "CNTS-M1"), (double, "CNTS-M2")):
+        carte = client.post(
+            "/api/fidelisation/cartes", json={"donneur_id": donneur_id, "numero_carte": numero}
+        )
+        assert carte.status_code == 201
+    for donneur_id, date_don in ((garde, "2026-01-05"), (double, "2026-06-10")):
+        don = client.post(
+            "/api/dons",
+            json={"donneur_id": donneur_id, "date_don": date_don, "type_don": "SANG_TOTAL"},
+        )
+        assert don.status_code == 201
+    for donneur_id, systeme in ((garde, "KELL"), (double, "KELL"), (double, "DUFFY")):
+        db_session.add(
+            Phenotypage(donneur_id=uuid.UUID(donneur_id), systeme=systeme, antigenes={"K": False})
+        )
+    db_session.add(
+        RendezVous(
+            donneur_id=uuid.UUID(double),
+            date_prevue=dt.datetime(2026, 12, 1, 9, tzinfo=dt.timezone.utc),
+        )
+    )
+    db_session.commit()
+
+    assert detect() == {"candidats": 1}
+    (candidat,) = _paires(client).values()
+    response = client.post(
+        f"/api/donneurs/doublons/{candidat['id']}/fusionner", json={"conserver_id": garde}
+    )
+    assert response.status_code == 200, response.text
+    fusion = response.json()
+    assert (fusion["donneur_id"], fusion["supprime_id"]) == (garde, double)
+    assert fusion["lignes_reprises"]["dons"] == 1
+    assert fusion["lignes_reprises"]["points_historique"] == 1
+
+    db_session.expire_all()
+    garde_id = uuid.UUID(garde)
+    survivant = db_session.get(Donneur, garde_id)
+    assert (survivant.telephone, survivant.dernier_don) == ("781112233", dt.date(2026, 6, 10))
+    dons = db_session.execute(select(Don.donneur_id)).scalars().all()
+    assert dons == [garde_id, garde_id]
+    (carte,) = db_session.execute(select(CarteDonneur)).scalars()
+    assert (carte.donneur_id, carte.numero_carte) == (garde_id, "CNTS-M1")
+    assert (carte.points, carte.total_dons, carte.date_dernier_don) == (
+        200,
+        2,
+        dt.date(2026, 6, 10),
+    )
+    systemes = db_session.execute(
+        select(Phenotypage.systeme).where(Phenotypage.donneur_id == garde_id)
+    ).scalars()
+    assert sorted(systemes) == ["DUFFY", "KELL"]
+    assert db_session.execute(select(RendezVous.donneur_id)).scalar_one() == garde_id
+    assert db_session.get(Donneur, uuid.UUID(double)) is None
+
+    assert set(_paires(client, "FUSIONNE")) == {frozenset((garde, double))}
+    again = client.post(f"/api/donneurs/doublons/{candidat['id']}/fusionner")
+    assert again.status_code == 409
+
+    # Le numéro de la fiche supprimée ne recrée pas le doublon
+    assert _donneur(client, "dm 2", "Sow", "Mariamma", "F") == garde
+    upsert = client.post(
+        "/api/sync/events",
+        json={
+            "device_id": "tablette-01",
+            "events": [
+                {
+                    "client_event_id": "ev-dm-2",
+                    "type": "donneur.upsert",
+                    "payload": {"cni": "DM-2", "nom": "Sow", "prenom": "Mariamma", "sexe": "F"},
+                }
+            ],
+        },
+    )
+    assert upsert.json()["results"][0]["response"]["donneur_id"] == garde
+    report = client.post(
+        "/api/donneurs/import",
+        content=b"cni,nom,prenom,sexe\nDM-2,Sow,Mariamma,F\n",
+        headers={"Content-Type": "text/csv"},
+    ).json()
+    assert (report["importes"], report["doublons"]) == (0, 1)
+    assert db_session.execute(select(func.count()).select_from(Donneur)).scalar() == 1
+    assert detect() == {"candidats": 0}
+
+
+def test_reject_candidate(client: TestClient, db_session: Session, detect):
+    un = _donneur(client, "DR-1", "Ba", "Khady", "F", telephone="761234567")
+    deux = _donneur(client, "DR-2", "Ba", "Khadi", "F", telephone="761234567")
+    assert detect() == {"candidats": 1}
+    (candidat,) = _paires(client).values()
+
+    response = client.post(f"/api/donneurs/doublons/{candidat['id']}/rejeter")
+    assert response.status_code == 200
+    assert response.json()["statut"] == "REJETE"
+    assert client.post(f"/api/donneurs/doublons/{candidat['id']}/rejeter").status_code == 409
+
+    # Paire déjà décidée : pas reproposée
+    assert detect() == {"candidats": 0}
+    assert _paires(client) == {}
+    assert set(_paires(client, "REJETE")) == {frozenset((un, deux))}
+    assert db_session.get(Donneur, uuid.UUID(deux)) is not None
@@ -0,0 +1,204 @@
+"""
+Tests pour les indicateurs et exports DHIS2.
+
+Vérifie:
+- Indicateurs limités à la période demandée et ventilés par org unit
+- Agrégats mensuels définitifs réutilisés sans recalcul
+- Export groupé et envoi dataValueSets vers un serveur DHIS2 local
+- Org unit non configurée refusée (422), aperçu sans écriture d'agrégats
+- Sans ventilation régionale configurée, toute org unit reçoit les totaux nationaux
+"""
+
+import datetime as dt
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import Settings, settings
+from app.core.dhis2 import refresh_agregats
+from app.db.models import DHIS2AgregatMensuel
+
+
+def _create_donneur(client: TestClient, cni: str, region: str) -> str:
+    response = client.post(
+        "/api/donneurs",
+        json={"cni": cni, "nom": "Ndiaye", "prenom": "Fatou", "sexe": "F", "region": region},
+    )
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def _create_don(client: TestClient, donneur_id: str, date_don: dt.date) -> None:
+    response = client.post(
+        "/api/dons",
+        json={"donneur_id": donneur_id, "date_don": str(date_don), "type_don": "SANG_TOTAL"},
+    )
+    assert response.status_code == 201
+
+
+@pytest.fixture
+def org_units(monkeypatch):
+    monkeypatch.setattr(settings, "dhis2_national_org_unit", "OU_SN")
+    monkeypatch.setattr(settings, "dhis2_org_units", {"OU_THIES": "Thies"})
+
+
+@pytest.fixture
+def dhis2_stub(monkeypatch):
+    received: list[dict] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers["Content-Length"])
+            received.append({"path": self.path, "body": json.loads(self.rfile.read(length))})
+            body = json.dumps({"status": "SUCCESS"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(settings, "dhis2_base_url", f"http://127.0.0.1:{server.server_port}")
+    yield received
+    server.shutdown()
+    server.server_close()
+
+
+def test_preview_scoped_to_period(client: TestClient):
+    today = dt.date.today()
+    donneur_id = _create_donneur(client, "1111111111111", "Dakar")
+    _create_don(client, donneur_id, today)
+    _create_don(client, donneur_id, dt.date(2020, 3, 15))
+
+    response = client.get("/api/dhis2/preview", params={"periode": today.strftime("%Y-%m")})
+    assert response.status_code == 200
+    indicateurs = response.json()["indicateurs"]
+    assert indicateurs["total_dons"] == 1
+    assert indicateurs["dons_sang_total"] == 1
+    assert indicateurs["donneurs_actifs"] == 1
+    assert indicateurs["poches_produites"] == 2
+
+    response = client.get("/api/dhis2/preview", params={"periode": "202003"})
+    assert response.json()["indicateurs"]["total_dons"] == 1
+
+    response = client.get("/api/dhis2/preview", params={"periode": "2019-01"})
+    assert response.json()["indicateurs"]["total_dons"] == 0
+
+
+def test_preview_invalid_period(client: TestClient):
+    response = client.get("/api/dhis2/preview", params={"periode": "2026-13"})
+    assert response.status_code == 422
+
+
+def test_indicators_by_org_unit(client: TestClient, org_units):
+    today = dt.date.today()
+    _create_don(client, _create_donneur(client, "2222222222222", "Thies"), today)
+    _create_don(client, _create_donneur(client, "3333333333333", "Dakar"), today)
+    periode = today.strftime("%Y%m")
+
+    regional = client.get("/api/dhis2/preview", params={"periode": periode, "org_unit": "OU_THIES"})
+    assert regional.json()["region"] == "Thies"
+    assert regional.json()["indicateurs"]["total_dons"] == 1
+    assert "eir_declares" not in regional.json()["indicateurs"]
+
+    national = client.get("/api/dhis2/preview", params={"periode": periode, "org_unit": "OU_SN"})
+    assert national.json()["indicateurs"]["total_dons"] == 2
+    assert national.json()["indicateurs"]["nouveaux_donneurs"] == 2
+
+
+def test_closed_month_aggregates_are_reused(db_session):
+    current = dt.date.today().strftime("%Y%m")
+    assert refresh_agregats(db_session, ["202001", current]) == ["202001", current]
+    db_session.commit()
+    # 2020-01 est définitif, seul le mois en cours est recalculé
+    assert refresh_agregats(db_session, ["202001", current]) == [current]
+    assert refresh_agregats(db_session, ["202001"], force=True) == ["202001"]
+
+
+def test_bulk_export_sent_to_dhis2(client: TestClient, org_units, dhis2_stub):
+    today = dt.date.today()
+    _create_don(client, _create_donneur(client, "4444444444444", "Thies"), today)
+    periode = today.strftime("%Y-%m")
+
+    response = client.post(
+        "/api/dhis2/exports/bulk",
+        json={
+            "periodes": ["2020-01", periode],
+            "org_units": ["OU_SN", "OU_THIES"],
+            "data_set": "DS_CNTS",
+            "envoyer": True,
+        },
+    )
+    assert response.status_code == 201
+    exports = response.json()
+    assert len(exports) == 4
+    assert all(e["statut"] == "ENVOYE" and e["response_code"] == 200 for e in exports)
+
+    assert len(dhis2_stub) == 4
+    assert dhis2_stub[0]["path"] == "/api/dataValueSets"
+    sent = [r["body"] for r in dhis2_stub if r["body"]["dataValues"][0]["orgUnit"] == "OU_THIES"]
+    values = {
+        (v["period"], v["dataElement"]): v["value"] for body in sent for v in body["dataValues"]
+    }
+    assert values[(today.strftime("%Y%m"), "total_dons")] == "1"
+    assert values[("202001", "total_dons")] == "0"
+    assert sent[0]["dataSet"] == "DS_CNTS"
+
+
+def test_send_export_failure_marks_echec(client: TestClient, org_units, monkeypatch):
+    monkeypatch.setattr(settings, "dhis2_base_url", "http://127.0.0.1:9")
+    response = client.post("/api/dhis2/exports", json={"periode": "2020-01", "org_unit": "OU_SN"})
+    assert response.status_code == 201
+    export_id = response.json()["id"]
+
+    response = client.post(f"/api/dhis2/exports/{export_id}/envoyer")
+    assert response.status_code == 200
+    assert response.json()["statut"] == "ECHEC"
+
+
+def test_unknown_org_unit_rejected(client: TestClient, db_session: Session, org_units):
+    periode = dt.date.today().strftime("%Y%m")
+    preview = client.get("/api/dhis2/preview", params={"periode": periode, "org_unit": "OU_X"})
+    assert preview.status_code == 422
+    export = client.post("/api/dhis2/exports", json={"periode": periode, "org_unit": "OU_X"})
+    assert export.status_code == 422
+    bulk = client.post(
+        "/api/dhis2/exports/bulk", json={"periodes": [periode], "org_units": ["OU_SN", "OU_X"]}
+    )
+    assert bulk.status_code == 422
+    assert client.get("/api/dhis2/exports").json() == []
+
+    # Aperçu : calculé sans écrire d'agrégats
+    national = client.get("/api/dhis2/preview", params={"periode": periode, "org_unit": "OU_SN"})
+    assert national.status_code == 200
+    assert national.json()["region"] is None
+    stored = db_session.execute(select(func.count()).select_from(DHIS2AgregatMensuel)).scalar()
+    assert stored == 0
+
+
+def test_default_settings_export_national(client: TestClient):
+    assert settings.dhis2_org_units == {}
+    today = dt.date.today()
+    _create_don(client, _create_donneur(client, "5555555555555", "Thies"), today)
+    periode = today.strftime("%Y%m")
+
+    export = client.post("/api/dhis2/exports", json={"periode": periode, "org_unit": "OU_SN"})
+    assert export.status_code == 201
+    preview = client.get("/api/dhis2/preview", params={"periode": periode, "org_unit": "OU_SN"})
+    assert preview.status_code == 200
+    assert preview.json()["region"] is None
+    assert preview.json()["indicateurs"]["total_dons"] == 1
+
+    with pytest.raises(ValidationError):
+        Settings(dhis2_org_units={"OU_THIES": "Thies"})
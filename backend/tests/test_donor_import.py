@@ -0,0 +1,79 @@
+"""
+Tests pour l'import en masse de donneurs.
+
+Vérifie:
+- Import CSV : doublons (dans le flux et déjà en base) ignorés, erreurs par ligne
+- Clés de recherche renseignées pour les donneurs importés
+- Import NDJSON par lots, JSON invalide signalé avec son numéro de ligne
+- Reprise avec skip=derniere_ligne sans réimporter
+"""
+
+import json
+
+from fastapi.testclient import TestClient
+
+CSV = (
+    "\ufeffcni,nom,prenom,sexe,telephone,region\n"
+    "SN-0001,N'Diaye,Ndèye,F,+221 77 111 22 33,Dakar\n"
+    "SN-0002,Fall,Moussa,H,,Thiès\n"
+    "SN-0001,N'Diaye,Ndèye,F,+221 77 111 22 33,Dakar\n"
+    'SN-0003,"Sarr, dite Sokhna",Awa,X,,Kaolack\n'
+    "SN-0004,Diop,Amadou,H,,Louga\n"
+)
+
+
+def _import(client: TestClient, body: str, content_type: str = "text/csv", **params):
+    response = client.post(
+        "/api/donneurs/import",
+        params=params,
+        content=body.encode("utf-8"),
+        headers={"Content-Type": content_type},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_csv_import(client: TestClient):
+    existing = client.post(
+        "/api/donneurs", json={"cni": "SN-0004", "nom": "Diop", "prenom": "Amadou", "sexe": "H"}
+    )
+    assert existing.status_code == 200
+
+    report = _import(client, CSV, chunk_size=2)
+    assert report["recus"] == 5
+    assert report["importes"] == 2
+    assert report["doublons"] == 2
+    assert report["erreurs"] == 1
+    assert report["derniere_ligne"] == 5
+    [erreur] = report["details_erreurs"]
+    assert erreur["ligne"] == 4
+    assert erreur["message"].startswith("sexe")
+
+    found = client.get("/api/donneurs", params={"q": "ndeye ndiaye"}).json()
+    assert [d["telephone"] for d in found] == ["+221 77 111 22 33"]
+    assert len(client.get("/api/donneurs", params={"q": "77 111"}).json()) == 1
+
+
+def test_ndjson_import_and_resume(client: TestClient):
+    records = [
+        {"cni": f"SN-1{i:03d}", "nom": "Sow", "prenom": f"Awa {i}", "sexe": "F"} for i in range(6)
+    ]
+    lines = (
+        [json.dumps(r) for r in records[:3]]
+        + ["{pas du json"]
+        + [json.dumps(r) for r in records[3:]]
+    )
+    body = "\n".join(lines) + "\n"
+
+    first = _import(client, "\n".join(lines[:4]) + "\n", "application/x-ndjson", chunk_size=2)
+    assert (first["importes"], first["erreurs"], first["derniere_ligne"]) == (3, 1, 4)
+    assert first["details_erreurs"][0]["ligne"] == 4
+    assert first["details_erreurs"][0]["message"].startswith("JSON invalide")
+
+    resumed = _import(client, body, "application/x-ndjson", skip=first["derniere_ligne"])
+    assert resumed["recus"] == 3
+    assert resumed["importes"] == 3
+    assert resumed["derniere_ligne"] == 7
+
+    again = _import(client, body, format="ndjson")
+    assert (again["importes"], again["doublons"], again["erreurs"]) == (0, 6, 1)
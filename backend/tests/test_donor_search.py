@@ -0,0 +1,77 @@
+"""
+Tests pour la recherche de donneurs.
+
+Vérifie:
+- Normalisation des noms (accents, apostrophes, casse) et des téléphones
+- Recherche par mots du nom sans accents, dans n'importe quel ordre
+- Préfixe de téléphone quel que soit le format, préfixe de carte
+- Classement : identifiant correspondant puis début de nom
+"""
+
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.text import normalize_phone, normalize_text
+from app.db.models import CarteDonneur, Donneur
+
+
+def test_normalize():
+    assert normalize_text("N'Diaye", "Ndèye  Fatou") == "ndiaye ndeye fatou"
+    assert normalize_text("Mame-Diarra", None, "SÈYE") == "mame diarra seye"
+    assert normalize_phone("+221 77 123 45 67") == "771234567"
+    assert normalize_phone("00221771234567") == "771234567"
+    assert normalize_phone("77-123") == "77123"
+
+
+def _donneur(client: TestClient, cni: str, nom: str, prenom: str, telephone: str | None = None):
+    payload = {"cni": cni, "nom": nom, "prenom": prenom, "sexe": "F", "telephone": telephone}
+    response = client.post("/api/donneurs", json=payload)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def _search(client: TestClient, **params) -> list[str]:
+    response = client.get("/api/donneurs", params=params)
+    assert response.status_code == 200
+    return [row["id"] for row in response.json()]
+
+
+def test_search_by_name_ignores_accents(client: TestClient):
+    ndeye = _donneur(client, "1000000000001", "N'Diaye", "Ndèye Fatou")
+    aissatou = _donneur(client, "1000000000002", "Sèye", "Aïssatou")
+    _donneur(client, "1000000000003", "Fall", "Moussa")
+
+    assert _search(client, q="ndeye") == [ndeye]
+    assert _search(client, q="FATOU ndiaye") == [ndeye]
+    assert _search(client, q="aissatou") == [aissatou]
+    assert _search(client, q="Seye") == [aissatou]
+    assert _search(client, q="inconnu") == []
+
+
+def test_search_by_phone_and_card_prefix(client: TestClient, db_session: Session):
+    donneur = _donneur(client, "1000000000004", "Ba", "Khady", telephone="+221 77 123 45 67")
+    autre = _donneur(client, "1000000000005", "Sow", "Ibrahima", telephone="76 000 00 00")
+    db_session.add(CarteDonneur(donneur_id=uuid.UUID(autre), numero_carte="CNTS-2026-0042"))
+    db_session.commit()
+
+    assert _search(client, q="77 123") == [donneur]
+    assert _search(client, q="00221771234567") == [donneur]
+    assert _search(client, q="+221 77 12") == [donneur]
+    assert _search(client, q="cnts-2026-00") == [autre]
+    assert _search(client, numero_carte="CNTS-2026") == [autre]
+    assert _search(client, numero_carte="2026-0042") == []
+
+
+def test_search_ranking(client: TestClient, db_session: Session):
+    milieu = _donneur(client, "1000000000006", "Diallo", "Aminata Sall")
+    debut = _donneur(client, "1000000000007", "Sall", "Mariama")
+
+    assert _search(client, q="sall") == [debut, milieu]
+
+    row = db_session.get(Donneur, uuid.UUID(milieu))
+    row.nom = "Sallah"
+    db_session.commit()
+    assert row.nom_normalise == "sallah aminata sall"
+    assert set(_search(client, q="sallah")) == {milieu}
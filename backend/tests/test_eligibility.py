@@ -0,0 +1,130 @@
+"""
+Tests pour l'éligibilité au don.
+
+Vérifie:
+- eligible_le tenu à jour à la création d'un don (délai selon le sexe)
+- Ajournement après réaction adverse, définitif en cas de séquelle
+- Recalcul SQL en une instruction identique au calcul incrémental
+- Liste des éligibles en NDJSON, filtrée par région et groupe
+"""
+
+import datetime as dt
+import json
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.dates import add_months
+from app.core.eligibility import DEFINITIF
+from app.db.models import Donneur
+
+
+def _donneur(client: TestClient, cni: str, sexe: str, **extra) -> str:
+    payload = {"cni": cni, "nom": "Test", "prenom": cni, "sexe": sexe, **extra}
+    response = client.post("/api/donneurs", json=payload)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def _don(client: TestClient, donneur_id: str, date_don: dt.date) -> str:
+    response = client.post(
+        "/api/dons",
+        json={"donneur_id": donneur_id, "date_don": date_don.isoformat(), "type_don": "SANG_TOTAL"},
+    )
+    assert response.status_code in (200, 201), response.text
+    return response.json()["id"]
+
+
+def _eligible_le(db_session: Session, donneur_id: str) -> dt.date | None:
+    db_session.expire_all()
+    return db_session.get(Donneur, uuid.UUID(donneur_id)).eligible_le
+
+
+def test_don_updates_eligible_le(client: TestClient, db_session: Session):
+    homme = _donneur(client, "EL-0001", "H")
+    femme = _donneur(client, "EL-0002", "F")
+    assert _eligible_le(db_session, homme) is None
+
+    _don(client, homme, dt.date(2026, 1, 31))
+    _don(client, femme, dt.date(2026, 1, 31))
+    assert _eligible_le(db_session, homme) == dt.date(2026, 3, 31)
+    assert _eligible_le(db_session, femme) == dt.date(2026, 5, 31)
+
+    res = client.get(f"/api/donneurs/{femme}/eligibilite", params={"as_of": "2026-05-01"})
+    assert res.json()["eligible"] is False
+    assert res.json()["eligible_le"] == "2026-05-31"
+    assert res.json()["raison"].startswith("Délai inter-don")
+
+
+def test_reaction_defers_donor(client: TestClient, db_session: Session):
+    donneur = _donneur(client, "EL-0003", "H")
+    don = _don(client, donneur, dt.date(2026, 1, 10))
+    res = client.post(
+        "/api/reactions-donneur",
+        json={
+            "don_id": don,
+            "donneur_id": donneur,
+            "type_reaction": "VASOVAGALE",
+            "gravite": "GRAVE",
+            "moment": "PENDANT",
+        },
+    )
+    assert res.status_code == 201
+    assert _eligible_le(db_session, donneur) == add_months(dt.date.today(), 12)
+    eligibilite = client.get(f"/api/donneurs/{donneur}/eligibilite").json()
+    assert eligibilite["raison"] == "Ajournement après réaction adverse"
+
+    patched = client.patch(
+        f"/api/reactions-donneur/{res.json()['id']}", json={"evolution": "SEQUELLE"}
+    )
+    assert patched.status_code == 200
+    assert _eligible_le(db_session, donneur) == DEFINITIF
+    eligibilite = client.get(f"/api/donneurs/{donneur}/eligibilite").json()
+    assert eligibilite["eligible"] is False
+    assert eligibilite["raison"].startswith("Ajournement définitif")
+
+
+def test_recompute_matches_incremental(client: TestClient, db_session: Session):
+    ids = [_donneur(client, f"EL-1{i:03d}", "HF"[i % 2]) for i in range(4)]
+    for i, donneur in enumerate(ids[:3]):
+        _don(client, donneur, dt.date(2025, 12, 31) - dt.timedelta(days=40 * i))
+    don = _don(client, ids[2], dt.date(2026, 2, 28))
+    client.post(
+        "/api/reactions-donneur",
+        json={
+            "don_id": don,
+            "donneur_id": ids[2],
+            "type_reaction": "HEMATOME",
+            "gravite": "MODEREE",
+            "moment": "APRES_IMMEDIAT",
+        },
+    )
+    expected = {d: _eligible_le(db_session, d) for d in ids}
+
+    db_session.execute(update(Donneur).values(eligible_le=None))
+    db_session.commit()
+    res = client.post("/api/donneurs/eligibilite/recalcul")
+    assert res.status_code == 200
+    assert res.json()["donneurs"] == 4
+    assert {d: _eligible_le(db_session, d) for d in ids} == expected
+
+
+def test_list_eligibles_ndjson(client: TestClient):
+    eligible = _donneur(client, "EL-2001", "H", region="Dakar", groupe_sanguin="O+")
+    jamais = _donneur(client, "EL-2002", "F", region="Dakar", groupe_sanguin="O+")
+    recent = _donneur(client, "EL-2003", "H", region="Dakar", groupe_sanguin="O+")
+    _donneur(client, "EL-2004", "H", region="Thiès", groupe_sanguin="O+")
+    _don(client, eligible, dt.date(2026, 1, 1))
+    _don(client, recent, dt.date(2026, 5, 1))
+
+    res = client.get(
+        "/api/donneurs/eligibles",
+        params={"as_of": "2026-06-01", "region": "Dakar", "groupe_sanguin": "O+"},
+    )
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in res.text.splitlines()]
+    assert {r["id"] for r in rows} == {eligible, jamais}
+    assert {r["id"]: r["eligible_le"] for r in rows}[eligible] == "2026-03-01"
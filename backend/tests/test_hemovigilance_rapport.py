@@ -0,0 +1,113 @@
+"""
+Tests pour le rapport d'hémovigilance aux autorités.
+
+Vérifie:
+- Compteurs mensuels maintenus à chaque acte, rappel et EIR
+- Rapport limité à la période demandée
+- Reconstruction identique aux compteurs incrémentaux
+- Exports CSV et PDF en streaming
+"""
+
+import datetime as dt
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.core.hemovigilance import rebuild_agregats
+from app.db.models import EIR, ActeTransfusionnel, HemovigilanceAgregat
+
+
+def _seed(client: TestClient, db_session) -> str:
+    hopital_id = client.post("/api/hopitaux", json={"nom": "Hôpital Le Dantec"}).json()["id"]
+    now = dt.datetime.now(dt.timezone.utc)
+    actes = [
+        ActeTransfusionnel(
+            poche_id=uuid.uuid4(), hopital_id=uuid.UUID(hopital_id), date_transfusion=now
+        ),
+        ActeTransfusionnel(
+            poche_id=uuid.uuid4(),
+            hopital_id=uuid.UUID(hopital_id),
+            date_transfusion=dt.datetime(2020, 5, 4, tzinfo=dt.timezone.utc),
+        ),
+    ]
+    db_session.add_all(actes)
+    db_session.flush()
+    db_session.add(
+        EIR(
+            acte_transfusionnel_id=actes[0].id,
+            receveur_id=uuid.uuid4(),
+            poche_id=actes[0].poche_id,
+            type_eir="ALLERGIQUE",
+            gravite="GRADE_2",
+            imputabilite="PROBABLE",
+        )
+    )
+    db_session.commit()
+
+    rappel = client.post(
+        "/api/hemovigilance/rappels", json={"type_cible": "LOT", "valeur_cible": "LOT-42"}
+    ).json()
+    client.post(f"/api/hemovigilance/rappels/{rappel['id']}/notifier", json={})
+    return hopital_id
+
+
+def _counters(db_session) -> dict:
+    rows = db_session.execute(
+        select(
+            HemovigilanceAgregat.mois,
+            HemovigilanceAgregat.dimension,
+            HemovigilanceAgregat.cle,
+            HemovigilanceAgregat.total,
+        ).where(HemovigilanceAgregat.total != 0)
+    ).all()
+    return {(m, d, c): t for m, d, c, t in rows}
+
+
+def test_rapport_from_incremental_counters(client: TestClient, db_session):
+    hopital_id = _seed(client, db_session)
+
+    response = client.get("/api/hemovigilance/rapports/autorites")
+    assert response.status_code == 200
+    rapport = response.json()
+    assert rapport["rappels_par_statut"] == [{"statut": "NOTIFIE", "total": 1}]
+    assert rapport["rappels_par_lot"] == [{"lot": "LOT-42", "total": 1}]
+    assert rapport["transfusions_par_hopital"] == [{"hopital_id": hopital_id, "total": 1}]
+    assert rapport["eir_par_gravite"] == [{"gravite": "GRADE_2", "total": 1}]
+    assert rapport["par_mois"][0]["transfusions"] == 1
+
+    response = client.get(
+        "/api/hemovigilance/rapports/autorites", params={"debut": "2020-01", "fin": "2020-12"}
+    )
+    rapport = response.json()
+    assert rapport["periode_debut"] == "202001"
+    assert rapport["transfusions_par_hopital"] == [{"hopital_id": hopital_id, "total": 1}]
+    assert rapport["rappels_par_statut"] == []
+
+
+def test_rebuild_matches_incremental(client: TestClient, db_session):
+    _seed(client, db_session)
+    db_session.expire_all()
+    incremental = _counters(db_session)
+
+    rebuild_agregats(db_session)
+    db_session.commit()
+    assert _counters(db_session) == incremental
+
+
+def test_rapport_exports(client: TestClient, db_session):
+    _seed(client, db_session)
+
+    response = client.get("/api/hemovigilance/rapports/autorites", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.strip().splitlines()
+    assert lines[0] == "mois,dimension,cle,total"
+    assert any(",rappels_lot,LOT-42,1" in line for line in lines)
+
+    response = client.get("/api/hemovigilance/rapports/autorites", params={"format": "pdf"})
+    assert response.status_code == 200
+    assert response.content.startswith(b"%PDF")
+
+    response = client.get("/api/hemovigilance/rapports/autorites", params={"debut": "2026-13"})
+    assert response.status_code == 422
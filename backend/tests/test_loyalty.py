@@ -0,0 +1,190 @@
+"""
+Tests pour le grand livre des points de fidélité.
+
+Vérifie:
+- Écriture au grand livre : solde et niveau de la carte mis à jour, débit borné au solde
+- Crédit automatique d'un don (API et synchronisation mobile), une seule fois par don
+- Recalcul en masse des soldes depuis le grand livre, classement par solde
+- Compteurs de dons recalculés sur les seuls dons crédités, comme à chaque don
+- Rattrapage unique de l'historique : crédits sans référence rattachés, dons antérieurs
+  à la carte ignorés
+"""
+
+import datetime as dt
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core import loyalty
+from app.db.models import CarteDonneur, Don, PointsHistorique
+
+
+def _carte(client: TestClient, donneur_id: str, numero: str = "CNTS-0001") -> str:
+    response = client.post(
+        "/api/fidelisation/cartes", json={"donneur_id": donneur_id, "numero_carte": numero}
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def _points(client: TestClient, carte_id: str, points: int, type_operation: str = "BONUS"):
+    return client.post(
+        "/api/fidelisation/points",
+        json={"carte_id": carte_id, "type_operation": type_operation, "points": points},
+    )
+
+
+def _don(client: TestClient, donneur_id: str, date_don: dt.date) -> str:
+    response = client.post(
+        "/api/dons",
+        json={"donneur_id": donneur_id, "date_don": str(date_don), "type_don": "SANG_TOTAL"},
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_niveau_thresholds():
+    assert [loyalty.niveau(p) for p in (0, 199, 200, 500, 999, 1000)] == [
+        "BRONZE", "BRONZE", "ARGENT", "OR", "OR", "PLATINE",
+    ]  # fmt: skip
+
+
+def test_append_maintains_balance_and_level(client: TestClient, donneur_id: str):
+    carte_id = _carte(client, donneur_id)
+    assert _points(client, carte_id, 150).status_code == 201
+    assert _points(client, carte_id, 400).status_code == 201
+    carte = client.get(f"/api/fidelisation/cartes/{carte_id}").json()
+    assert (carte["points"], carte["niveau"]) == (550, "OR")
+
+    assert _points(client, carte_id, -600, "UTILISATION").status_code == 409
+    assert _points(client, carte_id, -400, "UTILISATION").status_code == 201
+    carte = client.get(f"/api/fidelisation/cartes/{carte_id}").json()
+    assert (carte["points"], carte["niveau"]) == (150, "BRONZE")
+    assert len(client.get(f"/api/fidelisation/points/{carte_id}").json()) == 3
+
+    assert _points(client, str(uuid.uuid4()), 10).status_code == 404
+
+
+def test_donation_accrues_points_once(client: TestClient, donneur_id: str, db_session: Session):
+    carte_id = _carte(client, donneur_id)
+    premier, dernier = dt.date(2026, 1, 10), dt.date(2026, 5, 20)
+    don_id = _don(client, donneur_id, premier)
+    response = client.post(
+        "/api/sync/events",
+        json={
+            "device_id": "tablette-collecte-01",
+            "events": [
+                {
+                    "client_event_id": "ev-don-1",
+                    "type": "don.create",
+                    "payload": {
+                        "donneur_cni": "1234567890123",
+                        "date_don": str(dernier),
+                        "type_don": "SANG_TOTAL",
+                    },
+                }
+            ],
+        },
+    )
+    assert response.json()["results"][0]["status"] == "ACCEPTE", response.text
+
+    carte = client.get(f"/api/fidelisation/cartes/{carte_id}").json()
+    assert (carte["points"], carte["niveau"], carte["total_dons"]) == (200, "ARGENT", 2)
+    assert (carte["date_premier_don"], carte["date_dernier_don"]) == (str(premier), str(dernier))
+
+    # Le recalcul nocturne retrouve les compteurs tenus à chaque don
+    assert loyalty.recompute(db_session) == 1
+    db_session.commit()
+    carte = client.get(f"/api/fidelisation/cartes/{carte_id}").json()
+    assert (carte["points"], carte["total_dons"], carte["date_dernier_don"]) == (
+        200,
+        2,
+        str(dernier),
+    )
+
+    don = db_session.get(Don, uuid.UUID(don_id))
+    assert loyalty.accrue_don(db_session, don) is None
+    manual = client.post(
+        "/api/fidelisation/points",
+        json={"carte_id": carte_id, "type_operation": "DON", "points": 100, "reference_id": don_id},
+    )
+    assert manual.status_code == 409
+
+
+def test_recompute_job_and_leaderboard(
+    client: TestClient, db_session: Session, monkeypatch: pytest.MonkeyPatch
+):
+    from app.tasks import maintenance
+
+    cartes = {}
+    for i, points in enumerate((300, 50, 700)):
+        donneur = client.post(
+            "/api/donneurs",
+            json={"cni": f"LOY-{i}", "nom": "Sarr", "prenom": f"Fatou {i}", "sexe": "F"},
+        ).json()["id"]
+        cartes[points] = carte_id = _carte(client, donneur, f"CNTS-L{i}")
+        _points(client, carte_id, points)
+    db_session.get(CarteDonneur, uuid.UUID(cartes[50])).points = 9999
+    db_session.commit()
+
+    monkeypatch.setattr(maintenance, "SessionLocal", sessionmaker(bind=db_session.get_bind()))
+    assert maintenance.recompute_loyalty.run() == {"cartes": 3}
+
+    db_session.expire_all()
+    corrigee = db_session.get(CarteDonneur, uuid.UUID(cartes[50]))
+    assert (corrigee.points, corrigee.niveau) == (50, "BRONZE")
+
+    top = client.get("/api/fidelisation/classement", params={"limit": 2}).json()
+    assert [c["points"] for c in top] == [700, 300]
+    argent = client.get("/api/fidelisation/classement", params={"niveau": "ARGENT"}).json()
+    assert [c["id"] for c in argent] == [cartes[300]]
+
+
+def test_one_off_backfill(
+    client: TestClient, donneur_id: str, db_session: Session, monkeypatch: pytest.MonkeyPatch
+):
+    from app.tasks import maintenance
+
+    carte_id = _carte(client, donneur_id)
+    carte = db_session.get(CarteDonneur, uuid.UUID(carte_id))
+    carte.created_at = dt.datetime(2026, 1, 1, tzinfo=dt.timezone.utc)
+    # Dons saisis avant le grand livre : antérieur à la carte, puis deux après
+    dons = {}
+    for i, date_don in enumerate((dt.date(2025, 12, 1), dt.date(2026, 2, 1), dt.date(2026, 3, 1))):
+        don = Don(
+            donneur_id=uuid.UUID(donneur_id),
+            din=f"LOY{i:010d}",
+            date_don=date_don,
+            type_don="SANG_TOTAL",
+            statut_qualification="EN_ATTENTE",
+        )
+        db_session.add(don)
+        dons[date_don] = don
+    db_session.commit()
+    # Crédit DON saisi à la main, sans référence au don
+    assert _points(client, carte_id, 100, "DON").status_code == 201
+
+    monkeypatch.setattr(maintenance, "SessionLocal", sessionmaker(bind=db_session.get_bind()))
+    assert maintenance.backfill_loyalty.run() == {
+        "credits_rattaches": 1,
+        "dons_credites": 1,
+        "cartes": 1,
+    }
+    assert maintenance.backfill_loyalty.run() == {
+        "credits_rattaches": 0,
+        "dons_credites": 0,
+        "cartes": 1,
+    }
+
+    db_session.expire_all()
+    carte = db_session.get(CarteDonneur, uuid.UUID(carte_id))
+    # Le don antérieur à la carte n'est ni crédité ni compté
+    assert (carte.points, carte.niveau, carte.total_dons) == (200, "ARGENT", 2)
+    assert carte.date_premier_don == dt.date(2026, 2, 1)
+    references = db_session.execute(
+        select(PointsHistorique.reference_id).where(PointsHistorique.carte_id == carte.id)
+    ).scalars()
+    assert set(references) == {dons[dt.date(2026, 2, 1)].id, dons[dt.date(2026, 3, 1)].id}
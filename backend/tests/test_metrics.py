@@ -0,0 +1,88 @@
+"""
+Tests pour les métriques (compteurs, histogrammes, agrégation multi-processus).
+
+Vérifie:
+- Poignées de labels liées et rendu Prometheus des histogrammes
+- Estimation des percentiles depuis les intervalles
+- Compteurs exacts sous écriture concurrente (cellules par thread)
+- Agrégation des instantanés de plusieurs workers
+"""
+
+import json
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.core.metrics import Metrics
+
+
+def test_histogram_render_and_quantile():
+    m = Metrics(default_buckets=(10, 100, 1000))
+    latency = m.histogram("latency_ms", ("route",)).labels("/api/x")
+    for value in (5, 50, 50, 500, 5000):
+        latency.observe(value)
+
+    rendered = m.render_prometheus()
+    assert "# TYPE latency_ms histogram" in rendered
+    assert 'latency_ms_bucket{route="/api/x",le="10"} 1' in rendered
+    assert 'latency_ms_bucket{route="/api/x",le="100"} 3' in rendered
+    assert 'latency_ms_bucket{route="/api/x",le="1000"} 4' in rendered
+    assert 'latency_ms_bucket{route="/api/x",le="+Inf"} 5' in rendered
+    assert 'latency_ms_sum{route="/api/x"} 5605' in rendered
+    assert 'latency_ms_count{route="/api/x"} 5' in rendered
+
+    assert latency.quantile(0.5) == 77.5  # 10 + 90 * (2.5 - 1) / 2
+    assert latency.quantile(0.99) == 1000.0  # au-delà du dernier intervalle fini
+
+
+def test_labels_handles_and_legacy_inc():
+    m = Metrics()
+    family = m.counter("events_total", ("kind",))
+    assert family.labels("a") is family.labels(kind="a")
+    family.labels("a").inc()
+    m.inc("events_total", labels={"kind": "a"})
+    m.inc("other_total", labels={})
+    assert family.labels("a").value() == 2
+    assert "other_total 1" in m.render_prometheus()
+
+
+def test_sharded_counter_under_threads():
+    m = Metrics()
+    handle = m.counter("hits_total").labels()
+
+    def work():
+        for _ in range(10_000):
+            handle.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert handle.value() == 80_000
+
+
+def test_multiprocess_aggregation(tmp_path):
+    m = Metrics(default_buckets=(10,), multiproc_dir=str(tmp_path), flush_seconds=3600)
+    m.counter("req_total", ("route",)).labels("/a").inc(3)
+    m.histogram("lat_ms").labels().observe(4)
+
+    autre_worker = Metrics(default_buckets=(10,))
+    autre_worker.counter("req_total", ("route",)).labels("/a").inc(2)
+    autre_worker.counter("req_total", ("route",)).labels("/b").inc()
+    autre_worker.histogram("lat_ms").labels().observe(40)
+    (tmp_path / "999999.json").write_text(json.dumps(autre_worker.snapshot()))
+
+    rendered = m.render_prometheus()
+    assert 'req_total{route="/a"} 5' in rendered
+    assert 'req_total{route="/b"} 1' in rendered
+    assert 'lat_ms_bucket{le="10"} 1' in rendered
+    assert 'lat_ms_bucket{le="+Inf"} 2' in rendered
+
+
+def test_http_latency_histogram_exposed(client: TestClient):
+    client.get("/api/health")
+    body = client.get("/api/metrics").text
+    assert (
+        'cnts_http_request_duration_ms_bucket{method="GET",route="/api/health",le="+Inf"}' in body
+    )
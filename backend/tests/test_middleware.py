@@ -0,0 +1,68 @@
+"""
+Tests pour les middlewares ASGI (observabilité, limitation de débit).
+
+Vérifie:
+- Request id propagé, en-têtes de sécurité ajoutés
+- Métriques HTTP étiquetées par gabarit de route
+- Log d'accès structuré rendu en JSON par le formatter
+- 429 avec Retry-After et en-têtes X-RateLimit-*
+"""
+
+import json
+import logging
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.core import rate_limit
+from app.core.config import settings
+from app.core.logging import LOG_FORMAT, StructuredFormatter
+from app.core.metrics import metrics
+
+
+def test_observability_headers(client: TestClient):
+    response = client.get("/api/health", headers={"X-Request-ID": "rid-123"})
+    assert response.headers["x-request-id"] == "rid-123"
+    assert response.headers["x-frame-options"] == "DENY"
+    assert response.headers["x-content-type-options"] == "nosniff"
+    # Sans tracing_enabled, aucun traceparent n'est inventé (voir test_tracing)
+    assert "traceparent" not in response.headers
+
+    anonymous = client.get("/api/health")
+    uuid.UUID(anonymous.headers["x-request-id"])
+
+
+def test_metrics_use_route_template(client: TestClient):
+    client.get(f"/api/poches/{uuid.uuid4()}")
+    rendered = metrics.render_prometheus()
+    assert 'route="/api/poches/{poche_id}",status="404"' in rendered
+
+
+def test_structured_formatter():
+    record = logging.LogRecord("app.http", logging.INFO, __file__, 1, "http.request", None, None)
+    record.request_id = "rid"
+    record.fields = {"status": 200, "route": "/api/health"}
+    line = StructuredFormatter(LOG_FORMAT).format(record)
+    payload = json.loads(line.split("request_id=rid ", 1)[1])
+    assert payload == {"event": "http.request", "status": 200, "route": "/api/health"}
+
+
+def test_rate_limit_429(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_in_dev", True)
+    rate_limit.limiter.reset()
+    limit = rate_limit._config.auth_rpm
+
+    for i in range(limit):
+        response = client.get("/api/auth/inexistant")
+        assert response.headers["x-ratelimit-limit"] == str(limit)
+        assert response.headers["x-ratelimit-remaining"] == str(limit - i - 1)
+
+    response = client.get("/api/auth/inexistant")
+    assert response.status_code == 429
+    # GCRA : une requête redevient possible après période / limite (60 s / 10)
+    assert response.headers["retry-after"] == "6"
+    assert response.json()["detail"]["error"] == "rate_limit_exceeded"
+    assert response.json()["detail"]["retry_after_seconds"] == 6
+
+    assert client.get("/api/health").status_code == 200
+    rate_limit.limiter.reset()
@@ -0,0 +1,107 @@
+"""
+Tests pour le tableau de bord d'observabilité.
+
+Vérifie:
+- Journal des requêtes SQL lentes alimenté par les hooks SQLAlchemy
+- Échantillons par différence de cumuls (débit, erreurs, percentiles, par route)
+- Retard d'ingestion de la synchronisation mesuré depuis occurred_at
+- /api/observability/dashboard servi à partir des vraies métriques
+"""
+
+import datetime as dt
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core import monitoring
+from app.core.config import settings
+from app.core.metrics import Metrics, metrics
+from app.db.instrumentation import recent_slow_queries, slow_query_count
+
+
+def test_slow_query_log(db_session: Session, monkeypatch):
+    monkeypatch.setattr(settings, "db_slow_query_ms", 0)
+    before = slow_query_count()
+    db_session.execute(text("SELECT 42"))
+    assert slow_query_count() > before
+    assert recent_slow_queries(limit=1)[0]["statement"] == "SELECT 42"
+
+
+def test_sampler_deltas(monkeypatch):
+    monkeypatch.setattr(monitoring, "celery_queue_depth", lambda: 3)
+    source = Metrics(default_buckets=(10, 100, 1000))
+    requests = source.counter(monitoring.HTTP_REQUESTS, ("method", "route", "status"))
+    durations = source.histogram(monitoring.HTTP_DURATION, ("method", "route"))
+    sampler = monitoring.Sampler(interval_seconds=60, retention=3, source=source)
+
+    for _ in range(8):
+        requests.labels("GET", "/api/poches", "200").inc()
+        durations.labels("GET", "/api/poches").observe(50)
+    requests.labels("GET", "/api/poches", "503").inc(2)
+    durations.labels("GET", "/api/poches").observe(500)
+    durations.labels("GET", "/api/poches").observe(500)
+    first = sampler.sample()
+    assert (first.requests, first.errors, first.celery_queue_depth) == (10, 2, 3)
+    assert first.latency_avg_ms == 140
+
+    requests.labels("GET", "/api/poches", "200").inc()
+    durations.labels("GET", "/api/poches").observe(5)
+    second = sampler.sample()
+    assert (second.requests, second.errors) == (1, 0)
+    assert second.latency_p99_ms is not None and second.latency_p99_ms <= 10
+
+    for _ in range(3):
+        sampler.sample()
+    assert len(sampler.points()) == 3
+
+    [route] = sampler.route_stats()
+    assert route["route"] == "/api/poches"
+    assert route["requests"] == 1  # depuis le premier échantillon de la fenêtre
+    assert sampler.status_counts() == {"200": 9, "503": 2}
+
+
+def test_sync_ingestion_lag(client: TestClient):
+    family = metrics.get("sync_ingestion_lag_seconds")
+    count_before = family.labels().totals()[-1]
+    occurred_at = dt.datetime.now(dt.timezone.utc) - dt.timedelta(hours=2)
+    response = client.post(
+        "/api/sync/events",
+        json={
+            "device_id": f"device-{uuid.uuid4().hex[:8]}",
+            "events": [
+                {
+                    "client_event_id": f"ev-{uuid.uuid4().hex}",
+                    "type": "donneur.upsert",
+                    "payload": {"cni": "CNI-LAG", "nom": "Diop", "prenom": "Awa", "sexe": "F"},
+                    "occurred_at": occurred_at.isoformat(),
+                }
+            ],
+        },
+    )
+    assert response.status_code == 200
+    totals = family.labels().totals()
+    assert totals[-1] == count_before + 1
+    assert family.labels().quantile(0.5) > 3600
+
+
+def test_dashboard(client: TestClient, monkeypatch):
+    monkeypatch.setattr(monitoring, "celery_queue_depth", lambda: None)
+    monkeypatch.setattr(monitoring.sampler, "interval_seconds", 0)
+    client.get("/api/health")
+    client.get(f"/api/poches/{uuid.uuid4()}")
+
+    response = client.get("/api/observability/dashboard")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["metrics"]
+    assert body["total_requests"] >= 2
+    assert "404 Not Found" in {e["name"] for e in body["errors"]}
+    assert any(r["route"] == "/api/health" for r in body["routes"])
+
+    services = {s["name"]: s["status"] for s in body["services"]}
+    assert services["Base de données"] == "healthy"
+    assert services["Celery (Redis)"] == "down"
+    assert body["database"]["pools"][0]["pool"] == "primary"
+    assert body["sync"] is not None
@@ -0,0 +1,166 @@
+"""
+Tests pour les canaux d'envoi des notifications, contre des serveurs locaux.
+
+Vérifie:
+- SMTP : une session pour plusieurs messages, reconnexion après coupure,
+  destinataire refusé = échec définitif
+- Passerelle SMS : connexion HTTP keep-alive réutilisée, 429 temporaire, 400 définitif
+- Quota du fournisseur (seau à jetons) respecté
+"""
+
+import json
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.core import channels
+from app.core.config import settings
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    """Sous-ensemble de SMTP suffisant pour smtplib."""
+
+    def handle(self) -> None:
+        server = self.server
+        server.connections += 1
+        self._reply("220 stub ESMTP")
+        while line := self.rfile.readline():
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self._reply("250 stub")
+            elif verb == "RCPT" and "refuse" in command:
+                self._reply("550 mailbox unavailable")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 go ahead")
+                while self.rfile.readline() != b".\r\n":
+                    pass
+                server.messages += 1
+                self._reply("250 queued")
+                if server.drop_after_message:
+                    server.drop_after_message = False
+                    return  # coupe la connexion
+            elif verb == "QUIT":
+                self._reply("221 bye")
+                return
+            else:
+                self._reply("502 unknown")
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(line.encode() + b"\r\n")
+
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self) -> None:
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.received.append(payload)
+        status = {"770000429": 429, "770000400": 400}.get(payload["to"], 200)
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture(autouse=True)
+def production_channels(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "env", "test")
+    monkeypatch.setattr(settings, "notification_rate_limits", {})
+    monkeypatch.setattr(channels, "_limiter", None)
+    yield
+    channels.close_channels()
+
+
+@pytest.fixture
+def smtp_server(monkeypatch: pytest.MonkeyPatch):
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SmtpHandler)
+    server.daemon_threads = True
+    server.connections = server.messages = 0
+    server.drop_after_message = False
+    _serve(server)
+    monkeypatch.setattr(settings, "smtp_host", "127.0.0.1")
+    monkeypatch.setattr(settings, "smtp_port", server.server_address[1])
+    monkeypatch.setattr(settings, "smtp_user", "")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sms_gateway(monkeypatch: pytest.MonkeyPatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _GatewayHandler)
+    server.connections = 0
+    server.received = []
+    _serve(server)
+    monkeypatch.setattr(channels, "httpx", None)  # HTTP/1.1 keep-alive (sans h2)
+    monkeypatch.setattr(
+        settings, "sms_api_url", f"http://127.0.0.1:{server.server_address[1]}/send"
+    )
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_smtp_session_reused_and_reopened(smtp_server):
+    email = channels.channel("EMAIL")
+    for i in range(3):
+        email.send(f"donneur{i}@example.sn", "rappel_collecte", {"prenom": "Awa"})
+    assert channels.channel("EMAIL") is email
+    assert (smtp_server.connections, smtp_server.messages) == (1, 3)
+
+    smtp_server.drop_after_message = True
+    email.send("donneur3@example.sn", "rappel_collecte", {})
+    email.send("donneur4@example.sn", "rappel_collecte", {})
+    assert (smtp_server.connections, smtp_server.messages) == (2, 5)
+
+    with pytest.raises(channels.DeliveryError) as refused:
+        email.send("refuse@example.sn", "rappel_collecte", {})
+    assert refused.value.permanent
+
+
+def test_sms_gateway_keep_alive_and_errors(sms_gateway):
+    sms = channels.channel("SMS")
+    for i in range(5):
+        sms.send(f"77000000{i}", "alerte", {"message": f"message {i}"})
+    assert sms_gateway.connections == 1
+    assert [r["message"] for r in sms_gateway.received] == [f"message {i}" for i in range(5)]
+
+    with pytest.raises(channels.DeliveryError) as throttled:
+        sms.send("770000429", "alerte", {"message": "x"})
+    assert not throttled.value.permanent
+    with pytest.raises(channels.DeliveryError) as invalid:
+        sms.send("770000400", "alerte", {"message": "x"})
+    assert invalid.value.permanent
+    assert sms_gateway.connections == 1
+
+
+def test_provider_quota_shapes_rate(sms_gateway, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "notification_rate_limits", {"SMS": 20})
+    sms = channels.channel("SMS")
+    start = time.perf_counter()
+    for i in range(30):
+        sms.send(f"7700{i:05d}", "alerte", {"message": "x"})
+    elapsed = time.perf_counter() - start
+    # Rafale d'une seconde de quota (20), puis un message toutes les 50 ms
+    assert elapsed >= 0.4
+    assert len(sms_gateway.received) == 30
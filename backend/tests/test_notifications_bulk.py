@@ -0,0 +1,165 @@
+"""
+Tests pour l'envoi de notifications en masse.
+
+Vérifie:
+- Insertion multi-lignes et répartition en lots de tâches Celery
+- Envoi d'un lot : connexion du canal réutilisée, statuts mis à jour en masse
+- Échecs d'envoi enregistrés par notification, relance groupée des échecs temporaires
+- Lot réservé avant l'envoi : une notification mise en file deux fois ne part qu'une fois
+"""
+
+import datetime as dt
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core import channels
+from app.core.config import settings
+from app.db.models import Notification
+
+
+@pytest.fixture(autouse=True)
+def _close_channels():
+    yield
+    channels.close_channels()
+
+
+@pytest.fixture
+def queued(monkeypatch: pytest.MonkeyPatch) -> list[list[str]]:
+    from app.tasks import notifications
+
+    batches: list[list[str]] = []
+
+    def apply_async(args, queue):
+        assert queue == "notifications.sms"
+        batches.append(args[0])
+
+    monkeypatch.setattr(notifications.send_notifications, "apply_async", apply_async)
+    monkeypatch.setattr(settings, "notification_batch_size", 2)
+    return batches
+
+
+def _bulk(client: TestClient, count: int) -> dict:
+    response = client.post(
+        "/api/notifications/bulk",
+        json={
+            "canal": "SMS",
+            "template": "alerte_penurie",
+            "variables": {"groupe": "O-"},
+            "destinataires": [
+                {"destinataire": f"77000000{i}", "variables": {"prenom": f"Awa {i}"}}
+                for i in range(count)
+            ],
+        },
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def test_bulk_insert_and_dispatch(client: TestClient, db_session: Session, queued: list[list[str]]):
+    body = _bulk(client, 5)
+    assert (body["notifications"], body["lots"]) == (5, 3)
+    assert [len(batch) for batch in queued] == [2, 2, 1]
+
+    notifs = db_session.execute(select(Notification)).scalars().all()
+    assert {str(n.id) for n in notifs} == {i for batch in queued for i in batch}
+    assert all(n.statut == "EN_ATTENTE" for n in notifs)
+    assert {n.variables["prenom"] for n in notifs} == {f"Awa {i}" for i in range(5)}
+    assert all(n.variables["groupe"] == "O-" for n in notifs)
+
+
+def test_send_batch_records_statuses(
+    client: TestClient,
+    db_session: Session,
+    queued: list[list[str]],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    from app.tasks.notifications import retry_due, send_notifications
+
+    monkeypatch.setattr("app.db.session.SessionLocal", sessionmaker(bind=db_session.get_bind()))
+    opened, sent = [], []
+    refusals = {"770000001": True, "770000002": False}
+
+    def send(self, destinataire, template, variables):
+        if destinataire in refusals:
+            raise channels.DeliveryError("refusé", permanent=refusals.pop(destinataire))
+        sent.append(destinataire)
+
+    monkeypatch.setattr(channels.DevChannel, "connect", lambda self: opened.append(self))
+    monkeypatch.setattr(channels.DevChannel, "_send", send)
+
+    _bulk(client, 3)
+    ids = [i for batch in queued for i in batch]
+    assert send_notifications.run(ids[:2]) == {"envoye": 1, "echec": 1}
+    assert send_notifications.run(ids[2:]) == {"envoye": 0, "echec": 1}
+    assert len(opened) == 1  # connexion gardée d'un lot à l'autre
+    assert sent == ["770000000"]
+
+    db_session.expire_all()
+    notifs = {n.destinataire: n for n in db_session.execute(select(Notification)).scalars()}
+    assert notifs["770000000"].statut == "ENVOYE"
+    assert notifs["770000000"].sent_at is not None
+    assert notifs["770000001"].statut == "ECHEC"
+    assert notifs["770000001"].prochain_essai is None
+    assert notifs["770000002"].statut == "A_RELANCER"
+    assert notifs["770000002"].prochain_essai is not None
+    assert all(n.tentatives == 1 for n in notifs.values())
+
+    # Relances : rien d'échu, puis regroupées en un lot une fois l'échéance passée
+    queued.clear()
+    assert retry_due.run() == {}
+    notifs["770000002"].prochain_essai = dt.datetime(2020, 1, 1, tzinfo=dt.timezone.utc)
+    db_session.commit()
+    assert retry_due.run() == {"SMS": 1}
+    assert queued == [[str(notifs["770000002"].id)]]
+    assert send_notifications.run(queued[0]) == {"envoye": 1, "echec": 0}
+    db_session.expire_all()
+    assert notifs["770000002"].statut == "ENVOYE"
+    assert notifs["770000002"].tentatives == 2
+
+
+def test_batch_claimed_before_sending(
+    client: TestClient,
+    db_session: Session,
+    queued: list[list[str]],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    from app.tasks.notifications import retry_due, send_notifications
+
+    monkeypatch.setattr("app.db.session.SessionLocal", sessionmaker(bind=db_session.get_bind()))
+    sent = []
+    monkeypatch.setattr(
+        channels.DevChannel, "_send", lambda self, destinataire, *_: sent.append(destinataire)
+    )
+
+    _bulk(client, 2)
+    ids = [i for batch in queued for i in batch]
+    assert send_notifications.run(ids) == {"envoye": 2, "echec": 0}
+    # Même lot redistribué : déjà réservé puis envoyé, rien ne repart
+    assert send_notifications.run(ids) == {"envoye": 0, "echec": 0}
+    assert sorted(sent) == ["770000000", "770000001"]
+
+    # Lot réservé par un worker arrêté en cours d'envoi : repris après l'échéance
+    notif = db_session.execute(
+        select(Notification).where(Notification.destinataire == "770000001")
+    ).scalar_one()
+    notif.statut = "EN_COURS"
+    notif.prochain_essai = dt.datetime.now(dt.timezone.utc) + dt.timedelta(minutes=5)
+    db_session.commit()
+    queued.clear()
+    assert retry_due.run() == {}
+    notif.prochain_essai = dt.datetime(2020, 1, 1, tzinfo=dt.timezone.utc)
+    db_session.commit()
+    assert retry_due.run() == {"SMS": 1}
+    assert send_notifications.run(queued[0]) == {"envoye": 1, "echec": 0}
+
+
+def test_retry_gives_up_after_configured_delays(monkeypatch: pytest.MonkeyPatch):
+    from app.core.notifications import retry_delay
+
+    monkeypatch.setattr(settings, "notification_retry_delays_seconds", [60, 300])
+    assert retry_delay(1) == dt.timedelta(seconds=60)
+    assert retry_delay(2) == dt.timedelta(seconds=300)
+    assert retry_delay(3) is None
@@ -0,0 +1,108 @@
+"""
+Tests pour le profil SQL par requête et la détection N+1.
+
+Vérifie:
+- QueryStats : comptage, requêtes les plus lentes, instructions répétées
+- En-têtes X-DB-* (routes sync et async) et métriques par route
+- Boucle de requêtes signalée comme N+1
+- Plugin pytest query_budget (marqueur et échec au-delà du budget)
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.metrics import metrics
+from app.db.instrumentation import QueryStats, capture_queries, track_queries
+from app.db.models import SeuilAlerte
+
+
+def test_query_stats():
+    stats = QueryStats()
+    for ms in (3.0, 1.0, 9.0, 2.0, 5.0, 7.0):
+        stats.record("SELECT * FROM poches WHERE id = ?", ms)
+    stats.record("SELECT 1", 4.0)
+    assert stats.count == 7
+    assert stats.total_ms == 31.0
+    assert [ms for ms, _ in stats.slowest()] == [9.0, 7.0, 5.0, 4.0, 3.0]
+    assert stats.repeated(threshold=5) == [("SELECT * FROM poches WHERE id = ?", 6)]
+
+
+def test_track_queries_is_scoped(db_session: Session):
+    with capture_queries() as everything:
+        with track_queries() as scoped:
+            db_session.execute(text("SELECT 1"))
+        db_session.execute(text("SELECT 2"))
+    assert scoped.count == 1
+    assert everything.count == 2
+
+
+def test_headers(client: TestClient):
+    response = client.get("/api/poches")
+    assert int(response.headers["x-db-query-count"]) >= 1
+    assert float(response.headers["x-db-time-ms"]) >= 0
+    assert response.headers["x-db-n-plus-one"] == "0"
+
+    # Route async (AsyncSession)
+    response = client.get("/api/trace/events")
+    assert int(response.headers["x-db-query-count"]) >= 1
+
+
+def test_n_plus_one_flagged(client: TestClient, db_session: Session):
+    db_session.add_all(
+        SeuilAlerte(
+            type_produit="CGR",
+            groupe_sanguin=groupe,
+            seuil_critique=5,
+            seuil_alerte=10,
+            seuil_confort=20,
+        )
+        for groupe in ("A+", "A-", "B+", "B-", "O+", "O-")
+    )
+    db_session.commit()
+    n_plus_one = metrics.get("db_n_plus_one_total").labels("GET", "/api/prevision/alertes")
+    before = n_plus_one.value()
+
+    response = client.get("/api/prevision/alertes")
+    assert response.status_code == 200
+    assert len(response.json()) == 6
+    assert int(response.headers["x-db-query-count"]) >= 7
+    assert response.headers["x-db-n-plus-one"] == "1"
+    assert n_plus_one.value() == before + 1
+
+
+@pytest.mark.query_budget(5)
+def test_budget_marker(client: TestClient):
+    assert client.get("/api/health/db").status_code == 200
+
+
+def test_budget_plugin_fails(pytester):
+    pytester.makepyfile(
+        """
+        import pytest
+        from sqlalchemy import create_engine, text
+
+        engine = create_engine("sqlite://")
+
+        @pytest.mark.query_budget(2)
+        def test_over_budget():
+            with engine.connect() as conn:
+                for i in range(3):
+                    conn.execute(text("SELECT 1"))
+
+        @pytest.mark.query_budget(n_plus_one=True)
+        def test_repeated():
+            with engine.connect() as conn:
+                for i in range(5):
+                    conn.execute(text("SELECT 2"))
+
+        def test_unmarked():
+            with engine.connect() as conn:
+                for i in range(10):
+                    conn.execute(text("SELECT 3"))
+        """
+    )
+    result = pytester.runpytest_inprocess("-p", "query_budget")
+    result.assert_outcomes(passed=1, failed=2)
+    result.stdout.fnmatch_lines(["*3 requêtes SQL pour un budget de 2*", "*N+1 probable*"])
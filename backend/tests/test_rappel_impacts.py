@@ -0,0 +1,100 @@
+"""
+Tests pour l'analyse d'impact des rappels.
+
+Vérifie:
+- Dérivés de fractionnement inclus à toute profondeur, quel que soit leur lot
+- Aucune limite implicite sur le nombre de poches
+- Agrégats par hôpital et par receveur calculés en SQL
+"""
+
+import datetime as dt
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.db.models import ActeTransfusionnel, Poche
+
+
+def _poche(don_id: str, *, lot=None, source=None, type_produit="ST", statut="DISPONIBLE") -> Poche:
+    return Poche(
+        don_id=uuid.UUID(don_id),
+        source_poche_id=source.id if source else None,
+        type_produit=type_produit,
+        lot=lot,
+        date_peremption=dt.date.today() + dt.timedelta(days=30),
+        emplacement_stock="STOCK",
+        statut_distribution=statut,
+    )
+
+
+def _rappel(client: TestClient, type_cible: str, valeur: str) -> str:
+    response = client.post(
+        "/api/hemovigilance/rappels", json={"type_cible": type_cible, "valeur_cible": valeur}
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_impacts_follow_lineage(client: TestClient, db_session, don_id: str):
+    hopital_id = uuid.uuid4()
+    source = _poche(don_id, lot="LOT-A")
+    db_session.add(source)
+    db_session.flush()
+    cgr = _poche(don_id, source=source, type_produit="CGR", statut="DISTRIBUE")
+    db_session.add(cgr)
+    db_session.flush()
+    pediatrique = _poche(don_id, lot="LOT-Z", source=cgr, type_produit="CGR")
+    autre = _poche(don_id, lot="LOT-B")
+    db_session.add_all([pediatrique, autre])
+    db_session.add(
+        ActeTransfusionnel(poche_id=cgr.id, hopital_id=hopital_id, receveur_id=uuid.uuid4())
+    )
+    db_session.commit()
+
+    rappel_id = _rappel(client, "LOT", "LOT-A")
+    response = client.get(f"/api/hemovigilance/rappels/{rappel_id}/impacts")
+    assert response.status_code == 200
+    impacts = {i["poche_id"]: i for i in response.json()}
+    assert set(impacts) == {str(source.id), str(cgr.id), str(pediatrique.id)}
+    assert impacts[str(cgr.id)]["hopital_id"] == str(hopital_id)
+
+    response = client.get(f"/api/hemovigilance/rappels/{rappel_id}/export/hopitaux")
+    assert response.json() == [
+        {"hopital_id": str(hopital_id), "total": 1, "distribuees": 1, "reservees": 0, "autres": 0},
+        {"hopital_id": None, "total": 2, "distribuees": 0, "reservees": 0, "autres": 2},
+    ]
+
+    response = client.get(
+        f"/api/hemovigilance/rappels/{rappel_id}/export/receveurs", params={"format": "csv"}
+    )
+    lines = response.text.strip().splitlines()
+    assert lines[0] == "receveur_id,total,distribuees,reservees,autres"
+    assert len(lines) == 3
+
+
+def test_impacts_not_capped(client: TestClient, db_session, don_id: str):
+    db_session.add_all(_poche(don_id, lot="LOT-GROS") for _ in range(2100))
+    db_session.commit()
+
+    rappel_id = _rappel(client, "LOT", "LOT-GROS")
+    response = client.get(f"/api/hemovigilance/rappels/{rappel_id}/impacts")
+    assert len(response.json()) == 2100
+
+    response = client.get(f"/api/hemovigilance/rappels/{rappel_id}/impacts", params={"limit": 10})
+    assert len(response.json()) == 10
+
+    response = client.get(
+        f"/api/hemovigilance/rappels/{rappel_id}/impacts", params={"format": "csv"}
+    )
+    assert len(response.text.strip().splitlines()) == 2101
+
+    response = client.get(f"/api/hemovigilance/rappels/{rappel_id}/export/hopitaux")
+    assert response.json()[0]["total"] == 2100
+
+
+def test_impacts_by_din(client: TestClient, db_session, don_id: str):
+    rappel_din = client.get(f"/api/dons/{don_id}").json()["din"]
+    rappel_id = _rappel(client, "DIN", rappel_din)
+    response = client.get(f"/api/hemovigilance/rappels/{rappel_id}/impacts")
+    assert response.status_code == 200
+    assert len(response.json()) == 1  # poche ST créée avec le don
@@ -0,0 +1,97 @@
+"""
+Tests pour le limiteur de débit GCRA.
+
+Vérifie:
+- Rafale de ``limit`` requêtes puis refus avec Retry-After exact
+- Retour progressif du quota avec le temps
+- Politiques par route et par utilisateur authentifié
+- Repli sur l'état local quand Redis est injoignable
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import rate_limit
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.rate_limit import Policy, RateLimiter, _gcra, get_policy
+from app.core.tokens import sign_token
+
+
+def test_gcra_burst_and_retry_after():
+    policy = Policy("t", limit=5, period_seconds=10)
+    tat, now = None, 100.0
+    for expected_remaining in (4, 3, 2, 1, 0):
+        decision, tat = _gcra(tat, now, policy)
+        assert decision.allowed and decision.remaining == expected_remaining
+
+    decision, new_tat = _gcra(tat, now, policy)
+    assert not decision.allowed and new_tat is None
+    assert decision.retry_after == pytest.approx(2.0)  # 10 s / 5
+    assert decision.reset_after == pytest.approx(10.0)
+
+    # Une requête regagnée toutes les 2 s
+    decision, _ = _gcra(tat, now + 2.0, policy)
+    assert decision.allowed and decision.remaining == 0
+    decision, _ = _gcra(tat, now + 6.0, policy)
+    assert decision.allowed and decision.remaining == 2
+
+
+def test_local_store_keys_are_bounded():
+    limiter = RateLimiter(max_local_keys=3)
+    policy = Policy("t", limit=1)
+    for i in range(10):
+        assert limiter.hit(f"k{i}", policy).allowed
+    assert len(limiter._local._tats) == 3
+
+
+def test_route_and_user_policies(monkeypatch):
+    monkeypatch.setattr(
+        rate_limit,
+        "_ROUTE_POLICIES",
+        [
+            ("POST", "/api/sync/events", Policy("route:sync-push", 500)),
+            (None, "/api/sync", Policy("route:sync", 200)),
+        ],
+    )
+    assert get_policy("/api/sync/events", "POST").limit == 500
+    assert get_policy("/api/sync/events", "GET").limit == 200
+    assert get_policy("/api/poches", "GET").name == "read"
+    assert get_policy("/api/poches", "GET", authenticated=True).name == "user_read"
+    assert get_policy("/api/poches", "POST", authenticated=True).name == "user_write"
+    assert get_policy("/api/auth/login", "POST", authenticated=True).name == "auth"
+
+
+def test_route_policies_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_routes", {"/api/sync": 200, "POST /api/sync": 50})
+    rules = rate_limit._route_policies()
+    assert [(m, p) for m, p, _ in rules] == [("POST", "/api/sync"), (None, "/api/sync")]
+
+
+def test_authenticated_user_keyed_by_id(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_in_dev", True)
+    monkeypatch.setattr(rate_limit._config, "user_default_rpm", 2)
+    rate_limit.limiter.reset()
+    token = sign_token(
+        {"sub": "user-1", "type": "access"}, secret=settings.auth_token_secret, ttl_seconds=60
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for forwarded in ("10.0.0.1", "10.0.0.2"):
+        response = client.get("/api/health/inexistant", headers={**headers, "X-Real-IP": forwarded})
+        assert response.headers["x-ratelimit-limit"] == "2"
+    response = client.get("/api/health/inexistant", headers={**headers, "X-Real-IP": "10.0.0.3"})
+    assert response.status_code == 429
+
+    # Anonyme depuis une autre IP : seau distinct, limite de lecture par défaut
+    response = client.get("/api/health/inexistant", headers={"X-Real-IP": "10.0.0.3"})
+    assert response.headers["x-ratelimit-limit"] == str(rate_limit._config.default_rpm)
+    rate_limit.limiter.reset()
+
+
+def test_redis_unreachable_falls_back_to_local():
+    limiter = RateLimiter(redis_url="redis://127.0.0.1:1/0")
+    policy = Policy("t", limit=1)
+    assert limiter.hit("k", policy).allowed
+    assert not limiter.hit("k", policy).allowed
+    assert "rate_limit_redis_fallback_total 2" in metrics.render_prometheus()
@@ -0,0 +1,139 @@
+"""
+Tests pour les créneaux des collectes.
+
+Vérifie:
+- Génération des créneaux sur la durée de la campagne, sans doublon
+- Réservation : compteur du créneau, refus quand il est complet, prochains créneaux libres
+- Un donneur n'a qu'une inscription active par campagne ; l'annulation libère la place
+- Inscriptions par lot : placement au plus tôt, refus motivés
+"""
+
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.models import CreneauCollecte
+
+
+@pytest.fixture
+def campagne_id(client: TestClient) -> str:
+    response = client.post(
+        "/api/collectes",
+        json={
+            "code": "COL-UCAD-01",
+            "nom": "Collecte UCAD",
+            "type_campagne": "UNIVERSITE",
+            "date_debut": "2027-03-01T08:00:00Z",
+            "date_fin": "2027-03-01T10:00:00Z",
+        },
+    )
+    assert response.status_code == 201
+    response = client.post(
+        f"/api/collectes/{response.json()['id']}/creneaux",
+        json={"duree_minutes": 30, "capacite": 2},
+    )
+    assert response.status_code == 201, response.text
+    assert response.json()["crees"] == 4
+    return response.json()["campagne_id"]
+
+
+def _inscrire(client: TestClient, campagne_id: str, **payload):
+    return client.post(
+        f"/api/collectes/{campagne_id}/inscriptions",
+        json={"campagne_id": campagne_id, **payload},
+    )
+
+
+def _libres(client: TestClient, campagne_id: str) -> list[dict]:
+    response = client.get(f"/api/collectes/{campagne_id}/creneaux")
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_generation_is_idempotent(client: TestClient, campagne_id: str):
+    response = client.post(
+        f"/api/collectes/{campagne_id}/creneaux",
+        json={"duree_minutes": 30, "capacite": 2, "fin": "2027-03-01T11:00:00Z"},
+    )
+    assert response.json()["crees"] == 2
+    libres = _libres(client, campagne_id)
+    assert [c["debut"][11:16] for c in libres] == [
+        "08:00", "08:30", "09:00", "09:30", "10:00", "10:30",
+    ]  # fmt: skip
+
+
+def test_booking_fills_slots_in_order(client: TestClient, campagne_id: str, db_session: Session):
+    creneaux = [_inscrire(client, campagne_id, nom=f"Donneur {i}").json() for i in range(3)]
+    assert [c["creneau"][11:16] for c in creneaux] == ["08:00", "08:00", "08:30"]
+    assert len({c["creneau_id"] for c in creneaux}) == 2
+
+    libres = _libres(client, campagne_id)
+    assert [(c["debut"][11:16], c["reserves"]) for c in libres] == [
+        ("08:30", 1), ("09:00", 0), ("09:30", 0),
+    ]  # fmt: skip
+
+    # Créneau demandé : par son identifiant ou par l'heure
+    premier = creneaux[0]["creneau_id"]
+    assert _inscrire(client, campagne_id, creneau_id=premier).status_code == 409
+    response = _inscrire(client, campagne_id, creneau="2027-03-01T09:10:00Z")
+    assert response.json()["creneau"][11:16] == "09:00"
+
+    compteurs = db_session.execute(select(CreneauCollecte.reserves)).scalars().all()
+    assert sum(compteurs) == 4
+
+
+def test_one_active_registration_per_donor(
+    client: TestClient, campagne_id: str, donneur_id: str, db_session: Session
+):
+    first = _inscrire(client, campagne_id, donneur_id=donneur_id)
+    assert first.status_code == 201
+    again = _inscrire(client, campagne_id, donneur_id=donneur_id)
+    assert again.status_code == 409
+    # La place prise par la tentative refusée est rendue
+    assert _libres(client, campagne_id)[0]["reserves"] == 1
+
+    inscription = first.json()
+    response = client.post(f"/api/collectes/{campagne_id}/inscriptions/{inscription['id']}/annuler")
+    assert response.json()["statut"] == "ANNULE"
+    assert _libres(client, campagne_id)[0]["reserves"] == 0
+    assert _inscrire(client, campagne_id, donneur_id=donneur_id).status_code == 201
+
+    bilan = client.get(f"/api/collectes/{campagne_id}/bilan").json()
+    assert bilan["inscrits"] == 1
+
+
+def test_batch_registration(client: TestClient, campagne_id: str, donneur_id: str):
+    libres = _libres(client, campagne_id)
+    dernier = libres[-1]["id"]
+    response = client.post(
+        f"/api/collectes/{campagne_id}/inscriptions/lot",
+        json={
+            "inscriptions": [
+                {"donneur_id": donneur_id},
+                {"donneur_id": donneur_id},
+                {"nom": "Demande 09:30", "creneau_id": dernier},
+                *({"nom": f"Donneur {i}", "telephone": f"77100000{i}"} for i in range(8)),
+            ]
+        },
+    )
+    assert response.status_code == 201, response.text
+    body = response.json()
+    assert len(body["inscrites"]) == 8
+    assert {r["rang"]: r["motif"] for r in body["refus"]} == {
+        1: "DEJA_INSCRIT",
+        9: "COMPLET",
+        10: "COMPLET",
+    }
+    demande = next(i for i in body["inscrites"] if i["nom"] == "Demande 09:30")
+    assert demande["creneau_id"] == dernier
+    assert _libres(client, campagne_id) == []
+    assert _inscrire(client, campagne_id, nom="En retard").status_code == 409
+
+    inconnue = client.post(
+        f"/api/collectes/{uuid.uuid4()}/inscriptions/lot",
+        json={"inscriptions": [{"nom": "x"}]},
+    )
+    assert inconnue.status_code == 404
@@ -0,0 +1,77 @@
+"""
+Tests pour le démarrage de l'API.
+
+Vérifie:
+- Assemblage complet sous le budget de temps (interpréteur neuf)
+- Aucune dépendance lourde (pandas, reportlab, Celery...) importée au démarrage
+- Application limitée à un domaine : routes et modules importés restreints
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Budget large (machines de CI lentes) : il détecte une régression d'ordre de
+# grandeur, pas quelques dizaines de millisecondes.
+STARTUP_BUDGET_SECONDS = float(os.environ.get("CNTS_STARTUP_BUDGET_SECONDS", "5"))
+
+HEAVY_MODULES = ("pandas", "openpyxl", "reportlab", "docx", "pptx", "celery")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+app.main.app
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def _cold_start(**env: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "PYTHONPATH": str(BACKEND_DIR), **env},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_full_app_startup_budget():
+    probe = _cold_start()
+    assert probe["elapsed"] < STARTUP_BUDGET_SECONDS
+    assert "app.api.routes.fhir" in probe["modules"]
+    heavy = [m for m in HEAVY_MODULES if m in probe["modules"]]
+    assert heavy == []
+
+
+def test_domain_app_imports_only_its_routes():
+    probe = _cold_start(CNTS_API_DOMAINS='["sync"]')
+    routes = {m for m in probe["modules"] if m.startswith("app.api.routes.")}
+    assert routes == {"app.api.routes.health", "app.api.routes.metrics", "app.api.routes.sync"}
+
+
+def test_create_app_domains():
+    fhir_app = create_app(["fhir"])
+    paths = set(fhir_app.openapi()["paths"])
+    assert any(p.startswith("/api/fhir/") for p in paths)
+    assert not any(p.startswith("/api/poches") for p in paths)
+
+    client = TestClient(fhir_app)
+    assert client.get("/api/health").status_code == 200
+    assert client.get("/api/metrics").status_code == 200
+    assert client.get("/api/poches").status_code == 404
+
+    with pytest.raises(ValueError, match="inconnus : inexistant"):
+        create_app(["inexistant"])
@@ -0,0 +1,110 @@
+"""
+Tests pour les statistiques EIR, réactions donneur et suivis per-transfusionnels.
+
+Vérifie:
+- Total, indicateurs et ventilations calculés en une requête groupée
+- Filtres de période et de site
+- Résultat mis en cache jusqu'à la prochaine écriture
+"""
+
+import datetime as dt
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.db.models import ActeTransfusionnel
+
+
+def _acte(db_session, hopital_id: uuid.UUID | None = None) -> str:
+    acte = ActeTransfusionnel(poche_id=uuid.uuid4(), hopital_id=hopital_id)
+    db_session.add(acte)
+    db_session.commit()
+    return str(acte.id)
+
+
+def _eir(client: TestClient, acte_id: str, gravite: str, type_eir: str = "ALLERGIQUE") -> str:
+    response = client.post(
+        "/api/eir",
+        json={
+            "acte_transfusionnel_id": acte_id,
+            "receveur_id": str(uuid.uuid4()),
+            "poche_id": str(uuid.uuid4()),
+            "type_eir": type_eir,
+            "gravite": gravite,
+            "imputabilite": "PROBABLE",
+        },
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_statistiques_eir(client: TestClient, db_session):
+    hopital_id = uuid.uuid4()
+    acte_a, acte_b = _acte(db_session, hopital_id), _acte(db_session)
+    _eir(client, acte_a, "GRADE_1")
+    _eir(client, acte_a, "GRADE_3", "TRALI")
+    eir_id = _eir(client, acte_b, "GRADE_1")
+
+    response = client.get("/api/eir/statistiques")
+    assert response.json() == {
+        "total": 3,
+        "investigations_ouvertes": 3,
+        "par_type": {"ALLERGIQUE": 2, "TRALI": 1},
+        "par_gravite": {"GRADE_1": 2, "GRADE_3": 1},
+    }
+    etag = response.headers["etag"]
+
+    stats = client.get("/api/eir/statistiques", params={"hopital_id": str(hopital_id)}).json()
+    assert stats["total"] == 2
+
+    tomorrow = dt.date.today() + dt.timedelta(days=1)
+    stats = client.get("/api/eir/statistiques", params={"start_date": str(tomorrow)}).json()
+    assert stats == {"total": 0, "investigations_ouvertes": 0, "par_type": {}, "par_gravite": {}}
+
+    # servi depuis le cache tant que la table n'est pas modifiée
+    response = client.get("/api/eir/statistiques", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.post(f"/api/eir/{eir_id}/cloturer", json={"conclusion": "RAS"})
+    response = client.get("/api/eir/statistiques", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["investigations_ouvertes"] == 2
+
+
+def test_statistiques_reactions(client: TestClient, donneur_id: str, don_id: str):
+    for gravite, moment in (("MINEURE", "PENDANT"), ("GRAVE", "APRES_IMMEDIAT")):
+        response = client.post(
+            "/api/reactions-donneur",
+            json={
+                "don_id": don_id,
+                "donneur_id": donneur_id,
+                "type_reaction": "VASOVAGALE",
+                "gravite": gravite,
+                "moment": moment,
+            },
+        )
+        assert response.status_code == 201
+
+    stats = client.get("/api/reactions-donneur/statistiques").json()
+    assert stats["total"] == 2
+    assert stats["graves"] == 1
+    assert stats["en_cours"] == 2
+    assert stats["par_moment"] == {"PENDANT": 1, "APRES_IMMEDIAT": 1}
+
+    stats = client.get("/api/reactions-donneur/statistiques", params={"region": "Matam"}).json()
+    assert stats["total"] == 0
+
+
+def test_statistiques_suivis(client: TestClient, db_session):
+    acte_id = _acte(db_session)
+    for moment, alerte in (("T0", False), ("T15", True), ("T30", False)):
+        response = client.post(
+            "/api/suivi-transfusion",
+            json={"acte_transfusionnel_id": acte_id, "moment": moment, "alerte": alerte},
+        )
+        assert response.status_code == 201
+
+    stats = client.get("/api/suivi-transfusion/statistiques").json()
+    assert stats["total"] == 3
+    assert stats["alertes"] == 1
+    assert stats["par_moment"] == {"T0": 1, "T15": 1, "T30": 1}
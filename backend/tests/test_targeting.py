@@ -0,0 +1,248 @@
+"""
+Tests pour le ciblage des donneurs d'une campagne de collecte.
+
+Vérifie:
+- Déficit par groupe sanguin calculé depuis le stock non périmé et les seuils
+- Seuil propre au site de la campagne comparé au stock reçu par ce site
+- Filtres région / éligibilité, classement par score, pagination
+- Diffusion : une notification par donneur joignable, sans doublon au rappel
+- Coordonnée partagée par plusieurs donneurs : une seule notification, au mieux classé
+- Seules les notifications créées par une diffusion sont mises en file
+"""
+
+import datetime as dt
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.targeting import group_deficits
+from app.db.models import (
+    CarteDonneur,
+    LigneTransfert,
+    Notification,
+    Poche,
+    SeuilAlerte,
+    Site,
+    TransfertInterSite,
+)
+
+
+@pytest.fixture
+def campagne_id(client: TestClient) -> str:
+    response = client.post(
+        "/api/collectes",
+        json={
+            "code": "COL-DKR-01",
+            "nom": "Collecte Dakar Plateau",
+            "type_campagne": "MOBILE",
+            "lieu": "Place de l'Indépendance",
+            "date_debut": "2026-06-01T08:00:00Z",
+            "date_fin": "2026-06-01T17:00:00Z",
+        },
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def _donneur(client: TestClient, cni: str, groupe: str, region: str, **extra) -> str:
+    payload = {
+        "cni": cni,
+        "nom": "Ndiaye",
+        "prenom": cni,
+        "sexe": "H",
+        "groupe_sanguin": groupe,
+        "region": region,
+        **extra,
+    }
+    response = client.post("/api/donneurs", json=payload)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+@pytest.fixture
+def donneurs(client: TestClient, db_session: Session, don_id: str) -> dict[str, str]:
+    ids = {
+        "o_dakar": _donneur(client, "CB-01", "O+", "Dakar", telephone="771000001"),
+        "a_platine": _donneur(client, "CB-02", "A+", "Dakar", telephone="771000002"),
+        "o_thies": _donneur(client, "CB-03", "O+", "Thiès", telephone="771000003"),
+        "o_recent": _donneur(client, "CB-04", "O+", "Dakar", telephone="771000004"),
+        "b_sans_tel": _donneur(client, "CB-05", "B+", "Dakar"),
+    }
+    client.post(
+        "/api/dons",
+        json={"donneur_id": ids["o_recent"], "date_don": "2026-05-15", "type_don": "SANG_TOTAL"},
+    )
+    db_session.add(
+        CarteDonneur(
+            donneur_id=uuid.UUID(ids["a_platine"]), numero_carte="CB-0002", niveau="PLATINE"
+        )
+    )
+    # O+ : aucun stock ; A+ : moitié du seuil de confort
+    for groupe in ("O+", "A+"):
+        db_session.add(
+            SeuilAlerte(
+                type_produit="CGR",
+                groupe_sanguin=groupe,
+                seuil_critique=2,
+                seuil_alerte=5,
+                seuil_confort=10,
+            )
+        )
+    # Dont une poche périmée encore DISPONIBLE, hors stock
+    peremptions = [dt.date.today() + dt.timedelta(days=30)] * 5 + [dt.date(2026, 1, 1)]
+    for i, date_peremption in enumerate(peremptions):
+        db_session.add(
+            Poche(
+                don_id=uuid.UUID(don_id),
+                type_produit="CGR",
+                groupe_sanguin="A+",
+                date_peremption=date_peremption,
+                emplacement_stock=f"F1-{i}",
+                statut_distribution="DISPONIBLE",
+            )
+        )
+    db_session.commit()
+    return ids
+
+
+def test_ciblage_ranks_by_deficit_and_loyalty(
+    client: TestClient, campagne_id: str, donneurs: dict[str, str]
+):
+    res = client.post(f"/api/collectes/{campagne_id}/ciblage", json={"regions": ["Dakar"]})
+    assert res.status_code == 200
+    body = res.json()
+    assert body["deficits"] == {"O+": 1.0, "A+": 0.5}
+    assert body["total"] == 3
+    ranked = [(d["id"], d["score"]) for d in body["donneurs"]]
+    assert ranked[:2] == [(donneurs["o_dakar"], 100), (donneurs["a_platine"], 70)]
+    assert body["donneurs"][1]["niveau"] == "PLATINE"
+
+    page = client.post(
+        f"/api/collectes/{campagne_id}/ciblage",
+        params={"offset": 1, "limit": 1},
+        json={"regions": ["Dakar"]},
+    ).json()
+    assert [d["id"] for d in page["donneurs"]] == [donneurs["a_platine"]]
+
+    # Éligibilité à une date ultérieure : le donneur de mai redevient éligible
+    later = client.post(
+        f"/api/collectes/{campagne_id}/ciblage",
+        json={"regions": ["Dakar"], "groupes_sanguins": ["O+"], "eligible_au": "2026-08-01"},
+    ).json()
+    assert {d["id"] for d in later["donneurs"]} == {donneurs["o_dakar"], donneurs["o_recent"]}
+
+
+def test_site_threshold_uses_site_stock(db_session: Session, donneurs: dict[str, str]):
+    sites = [Site(code=code, nom=code, type_site="REGIONAL") for code in ("THS", "SLO")]
+    db_session.add_all(sites)
+    db_session.flush()
+    db_session.add(
+        SeuilAlerte(
+            site_id=sites[0].id,
+            type_produit="CGR",
+            groupe_sanguin="A+",
+            seuil_critique=1,
+            seuil_alerte=2,
+            seuil_confort=4,
+        )
+    )
+    db_session.flush()
+    poches = (
+        db_session.execute(
+            select(Poche)
+            .where(
+                Poche.statut_distribution == "DISPONIBLE", Poche.date_peremption > dt.date.today()
+            )
+            .order_by(Poche.id)
+        )
+        .scalars()
+        .all()
+    )
+    # Une poche reçue à Thiès, une autre passée par Thiès puis reçue à Saint-Louis
+    for index, (poche, destinations) in enumerate(
+        ((poches[0], [sites[0]]), (poches[1], [sites[0], sites[1]]))
+    ):
+        for jour, site in enumerate(destinations, start=1):
+            transfert = TransfertInterSite(
+                site_source_id=sites[1].id,
+                site_destination_id=site.id,
+                statut="RECU",
+                date_reception=dt.datetime(2026, 9, jour + index, tzinfo=dt.timezone.utc),
+            )
+            transfert.lignes.append(LigneTransfert(poche_id=poche.id))
+            db_session.add(transfert)
+    db_session.commit()
+
+    # Stock national (5 poches non périmées) pour le seuil global, 1 poche pour Thiès
+    assert group_deficits(db_session) == {"O+": 1.0, "A+": 0.5}
+    assert group_deficits(db_session, sites[0].id) == {"O+": 1.0, "A+": 0.75}
+    assert group_deficits(db_session, sites[1].id) == {"O+": 1.0, "A+": 0.5}
+
+
+def test_fan_out_notifications(
+    client: TestClient,
+    db_session: Session,
+    campagne_id: str,
+    donneurs: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    from app.tasks import notifications
+
+    # Envoi par lots : chaque diffusion ne met en file que ses propres notifications
+    queued = []
+    monkeypatch.setattr(
+        notifications.send_notifications,
+        "apply_async",
+        lambda args, queue: queued.append((queue, args[0])),
+    )
+
+    url = f"/api/collectes/{campagne_id}/ciblage/notifications"
+    payload = {"regions": ["Dakar"], "canal": "SMS", "max_destinataires": 1}
+    first = client.post(url, json=payload)
+    assert first.status_code == 201
+    assert first.json()["notifications"] == 1
+
+    rest = client.post(url, json={**payload, "max_destinataires": None})
+    assert rest.json()["notifications"] == 1  # le donneur sans téléphone est exclu
+    assert client.post(url, json=payload).json()["notifications"] == 0
+
+    notifs = (
+        db_session.execute(select(Notification).order_by(Notification.destinataire)).scalars().all()
+    )
+    assert [n.destinataire for n in notifs] == ["771000001", "771000002"]
+    assert {n.reference_id for n in notifs} == {uuid.UUID(campagne_id)}
+    assert all(n.statut == "EN_ATTENTE" and n.template == "rappel_collecte" for n in notifs)
+    assert notifs[0].variables["campagne"] == "COL-DKR-01"
+    assert notifs[0].variables["prenom"] == "CB-01"
+
+    assert [queue for queue, _ in queued] == ["notifications.sms", "notifications.sms"]
+    batched = [notification_id for _, batch in queued for notification_id in batch]
+    assert sorted(batched) == sorted(str(n.id) for n in notifs)
+
+
+def test_fan_out_once_per_shared_contact(
+    client: TestClient,
+    db_session: Session,
+    campagne_id: str,
+    donneurs: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    from app.tasks import notifications
+
+    monkeypatch.setattr(notifications.send_notifications, "apply_async", lambda *a, **k: None)
+    # Téléphone du foyer de o_dakar, saisi dans un autre format
+    _donneur(client, "CB-06", "B+", "Dakar", telephone="+221 77 100 00 01")
+
+    url = f"/api/collectes/{campagne_id}/ciblage/notifications"
+    response = client.post(url, json={"regions": ["Dakar"], "canal": "SMS"})
+    assert response.json()["notifications"] == 2
+
+    notifs = db_session.execute(select(Notification)).scalars().all()
+    par_donneur = {uuid.UUID(n.variables["donneur_id"]): n.destinataire for n in notifs}
+    assert par_donneur == {
+        uuid.UUID(donneurs["o_dakar"]): "771000001",
+        uuid.UUID(donneurs["a_platine"]): "771000002",
+    }
@@ -0,0 +1,107 @@
+"""
+Tests pour les traces OpenTelemetry.
+
+Vérifie:
+- Span serveur HTTP rattaché au traceparent entrant, spans SQL enfants
+- Décision d'échantillonnage du parent respectée
+- Contexte propagé dans les en-têtes d'une tâche Celery jusqu'au worker
+- Commande Redis en échec tracée en erreur
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("opentelemetry.sdk")
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import SpanKind, StatusCode
+
+from app.core import tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+_exporter = InMemorySpanExporter()
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    monkeypatch.setattr(tracing, "enabled", True)
+    tracing.configure_tracing(exporter=_exporter)
+    _exporter.clear()
+
+    def finished():
+        trace.get_tracer_provider().force_flush()
+        return _exporter.get_finished_spans()
+
+    return finished
+
+
+def test_http_and_sql_spans(client: TestClient, spans):
+    response = client.get("/api/poches", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+    assert response.status_code == 200
+    assert response.headers["traceparent"].startswith(f"00-{TRACE_ID}-")
+
+    finished = spans()
+    [server] = [s for s in finished if s.kind == SpanKind.SERVER]
+    assert server.name == "GET /api/poches"
+    assert server.parent.span_id == int(PARENT_ID, 16)
+    assert server.attributes["http.response.status_code"] == 200
+
+    parents = {s.context.span_id: s.parent for s in finished}
+
+    def descends_from_server(span) -> bool:
+        parent = span.parent
+        while parent is not None and parent.span_id != server.context.span_id:
+            parent = parents.get(parent.span_id)
+        return parent is not None
+
+    queries = [s for s in finished if s.attributes.get("db.operation.name") == "SELECT"]
+    assert queries
+    assert all(descends_from_server(q) for q in queries)
+
+
+def test_parent_sampling_decision(client: TestClient, spans):
+    response = client.get("/api/health", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+    assert response.headers["traceparent"].endswith("-00")
+    assert not spans()
+
+
+def test_celery_context_propagation(spans):
+    headers = {"id": "task-1"}
+    with tracing.span("api"):
+        tracing._before_publish(sender="app.tasks.demo", headers=headers)
+        tracing._after_publish(headers=headers)
+    assert headers["traceparent"].startswith("00-")
+
+    task = SimpleNamespace(name="app.tasks.demo", request=SimpleNamespace(**headers))
+    tracing._task_prerun(task_id="task-1", task=task)
+    with tracing.span("travail"):
+        pass
+    tracing._task_failure(task_id="task-1", exception=RuntimeError("boom"))
+    tracing._task_postrun(task_id="task-1", state="FAILURE")
+
+    by_name = {s.name: s for s in spans()}
+    producer, consumer = by_name["send app.tasks.demo"], by_name["run app.tasks.demo"]
+    assert producer.parent.span_id == by_name["api"].context.span_id
+    assert consumer.parent.span_id == producer.context.span_id
+    assert consumer.context.trace_id == by_name["api"].context.trace_id
+    assert by_name["travail"].parent.span_id == consumer.context.span_id
+    assert consumer.status.status_code == StatusCode.ERROR
+
+
+def test_redis_command_span(spans):
+    redis = pytest.importorskip("redis")
+    client = tracing.instrument_redis(
+        redis.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.1)
+    )
+    with pytest.raises(redis.ConnectionError):
+        client.get("cle")
+    [span] = spans()
+    assert span.name == "redis GET"
+    assert span.status.status_code == StatusCode.ERROR
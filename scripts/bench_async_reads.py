@@ -0,0 +1,101 @@
+"""Benchmark de charge des routes de lecture (pile async vs sync).
+
+Lance N clients concurrents contre une API démarrée et mesure débit, latences
+(p50/p95/p99) et erreurs par route. À exécuter avant/après un changement pour
+comparer, par exemple avec un seul worker uvicorn :
+
+    uvicorn app.main:app --workers 1
+    python scripts/bench_async_reads.py --clients 300 --requests 20
+
+Les routes servies par ``get_async_db`` ne consomment pas de thread du pool
+pendant l'attente de la base : à concurrence élevée leur p95 doit rester stable
+là où les routes sync saturent le pool de threads (40 par défaut) et le pool de
+connexions.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DEFAULT_ROUTES = [
+    "/api/poches/disponibles",
+    "/api/sync/events?limit=200",
+    "/api/trace/events?limit=200",
+    "/api/analytics/kpi/stock-available",
+    "/api/analytics/dashboard",
+    # Route restée sync, comme point de comparaison
+    "/api/poches/stock/summary",
+]
+
+
+def _percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))]
+
+
+async def _client(
+    http: httpx.AsyncClient, route: str, n: int, latencies: list[float], errors: list[int]
+) -> None:
+    for _ in range(n):
+        start = time.perf_counter()
+        try:
+            response = await http.get(route)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        if not ok:
+            errors.append(1)
+
+
+async def bench_route(api_url: str, route: str, clients: int, requests: int, headers: dict) -> dict:
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    latencies: list[float] = []
+    errors: list[int] = []
+    async with httpx.AsyncClient(
+        base_url=api_url, headers=headers, limits=limits, timeout=60.0
+    ) as http:
+        await http.get(route)  # échauffement (pool de connexions, caches)
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(_client(http, route, requests, latencies, errors) for _ in range(clients))
+        )
+        elapsed = time.perf_counter() - start
+    return {
+        "route": route,
+        "requetes": len(latencies),
+        "erreurs": len(errors),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": _percentile(latencies, 95),
+        "p99": _percentile(latencies, 99),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=300, help="clients concurrents")
+    parser.add_argument("--requests", type=int, default=20, help="requêtes par client")
+    parser.add_argument("--token", default=None, help="jeton Bearer si l'API l'exige")
+    parser.add_argument("routes", nargs="*", default=DEFAULT_ROUTES)
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    print(f"{args.clients} clients x {args.requests} requêtes sur {args.url}\n")
+    print(f"{'route':45} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err':>6}")
+    for route in args.routes:
+        r = await bench_route(args.url, route, args.clients, args.requests, headers)
+        print(
+            f"{r['route']:45} {r['rps']:9.1f} {r['p50']:9.1f} {r['p95']:9.1f}"
+            f" {r['p99']:9.1f} {r['erreurs']:6d}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,194 @@
+"""Benchmark de la recherche de donneurs (ancien ILIKE vs clés indexées).
+
+Remplit un schéma dédié (``cnts_bench`` sur PostgreSQL, jamais les tables de
+production) avec N donneurs synthétiques, puis compare pour quelques saisies
+typiques l'ancienne requête ``ILIKE '%q%'`` et ``app.core.donor_search`` :
+latences p50/p95 et plan choisi par PostgreSQL.
+
+    cd backend && python ../scripts/bench_donor_search.py --donors 2000000
+    cd backend && python ../scripts/bench_donor_search.py --reuse --repeat 50
+
+Sur SQLite (``--database-url sqlite:///bench.db``) le script fonctionne aussi,
+sans trigrammes : utile pour vérifier les résultats, pas pour les temps.
+"""
+
+import argparse
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import create_engine, func, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.donor_search import search_filter
+from app.core.text import normalize_phone, normalize_text
+from app.db.models import CarteDonneur, Donneur, UserAccount
+
+NOMS = [
+    "Ndiaye", "Diop", "Fall", "Sow", "Gueye", "Diouf", "Faye", "Sy", "Camara", "Cissé",
+    "Ba", "Diallo", "Mbaye", "Thiam", "Mbacké", "Ly", "Niang", "Ndoye", "Seck", "Kane",
+    "Sarr", "Dia", "Diaw", "Sané", "Touré", "Gaye", "Samb", "Boye", "Wade", "Diagne",
+    "N'Diaye", "Sèye", "Ndour", "Dramé", "Kébé", "Lô", "Mbengue", "Badji", "Sagna", "Coly",
+]  # fmt: skip
+PRENOMS = [
+    "Mamadou", "Ibrahima", "Abdoulaye", "Ousmane", "Amadou", "Moussa", "Cheikh", "Babacar",
+    "Alioune", "Lamine", "Omar", "Samba", "Assane", "Pape", "Serigne", "Souleymane",
+    "Fatou", "Aminata", "Mariama", "Aïssatou", "Ndèye", "Khady", "Mame Diarra", "Astou",
+    "Coumba", "Sokhna", "Awa", "Bineta", "Seynabou", "Adama", "Rokhaya", "Dieynaba",
+]  # fmt: skip
+
+QUERIES = [
+    "ndiaye",
+    "ndeye fatou",
+    "Aissatou Seye",
+    "mbaye khady",
+    "Ndiay",  # faute de frappe
+    "77 12",
+    "+221 76 543",
+    "CNTS-2024-00012",
+]
+
+BATCH = 20_000
+
+
+def _rows(n: int, seed: int):
+    rng = random.Random(seed)
+    for i in range(n):
+        nom, prenom = rng.choice(NOMS), rng.choice(PRENOMS)
+        telephone = f"+221 7{rng.choice('05678')} {rng.randrange(10**7):07d}"
+        donneur_id = uuid.uuid4()
+        yield (
+            {
+                "id": donneur_id,
+                "cni_hash": uuid.uuid4().hex,
+                "nom": nom,
+                "prenom": prenom,
+                "sexe": rng.choice("HF"),
+                "telephone": telephone,
+                "nom_normalise": normalize_text(nom, prenom),
+                "telephone_normalise": normalize_phone(telephone),
+            },
+            {
+                "id": uuid.uuid4(),
+                "donneur_id": donneur_id,
+                "numero_carte": f"CNTS-{2015 + i // 2 % 12}-{i:07d}",
+            }
+            if i % 2 == 0
+            else None,
+        )
+
+
+def _flush(conn, donneurs: list[dict], cartes: list[dict]) -> None:
+    if donneurs:
+        conn.execute(Donneur.__table__.insert(), donneurs)
+    if cartes:
+        conn.execute(CarteDonneur.__table__.insert(), cartes)
+
+
+def populate(engine, n: int) -> None:
+    tables = [UserAccount.__table__, Donneur.__table__, CarteDonneur.__table__]
+    Donneur.metadata.drop_all(engine, tables=tables[::-1])
+    Donneur.metadata.create_all(engine, tables=tables)
+    start = time.perf_counter()
+    donneurs, cartes = [], []
+    with engine.begin() as conn:
+        for donneur, carte in _rows(n, seed=42):
+            donneurs.append(donneur)
+            if carte is not None:
+                cartes.append(carte)
+            if len(donneurs) >= BATCH:
+                _flush(conn, donneurs, cartes)
+                donneurs, cartes = [], []
+        _flush(conn, donneurs, cartes)
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE donneurs"))
+            conn.execute(text("ANALYZE cartes_donneur"))
+    print(f"{n} donneurs insérés en {time.perf_counter() - start:.1f} s")
+
+
+def legacy_statement(q: str):
+    """Requête d'avant les clés de recherche (aucun index utilisable)."""
+    cartes = select(CarteDonneur.donneur_id).where(CarteDonneur.numero_carte.ilike(f"%{q}%"))
+    return (
+        select(Donneur.id)
+        .where(
+            or_(
+                Donneur.nom.ilike(f"%{q}%"),
+                Donneur.prenom.ilike(f"%{q}%"),
+                Donneur.telephone.ilike(f"%{q}%"),
+                Donneur.id.in_(cartes),
+            )
+        )
+        .order_by(Donneur.created_at.desc())
+    )
+
+
+def search_statement(db: Session, q: str):
+    condition, ordering = search_filter(db, q)
+    return select(Donneur.id).where(condition).order_by(*ordering)
+
+
+def _time(db: Session, stmt, repeat: int, limit: int) -> tuple[list[float], int]:
+    durations, found = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = len(db.execute(stmt.limit(limit)).all())
+        durations.append((time.perf_counter() - start) * 1000.0)
+    return durations, found
+
+
+def _p95(values: list[float]) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))]
+
+
+def _plan(db: Session, stmt, limit: int) -> str:
+    if db.get_bind().dialect.name != "postgresql":
+        return ""
+    compiled = stmt.limit(limit).compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+    lines = db.execute(text(f"EXPLAIN {compiled}")).scalars().all()
+    nodes = [line.strip().removeprefix("-> ").split("  (")[0] for line in lines]
+    return " / ".join(n for n in nodes if "Scan" in n)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--schema", default="cnts_bench", help="schéma dédié (PostgreSQL)")
+    parser.add_argument("--donors", type=int, default=2_000_000)
+    parser.add_argument("--reuse", action="store_true", help="garde les données existantes")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("queries", nargs="*", default=QUERIES)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{args.schema}"'))
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        engine = engine.execution_options(schema_translate_map={None: args.schema})
+    if not args.reuse:
+        populate(engine, args.donors)
+
+    with Session(engine) as db:
+        total = db.execute(select(func.count()).select_from(Donneur)).scalar_one()
+        print(f"\n{total} donneurs, {args.repeat} exécutions par requête, limite {args.limit}\n")
+        print(f"{'saisie':20} {'ancien p50':>11} {'p95':>9} {'nouveau p50':>12} {'p95':>9} {'trouvés':>8}")  # fmt: skip
+        for q in args.queries:
+            old, _ = _time(db, legacy_statement(q), args.repeat, args.limit)
+            new_stmt = search_statement(db, q)
+            new, found = _time(db, new_stmt, args.repeat, args.limit)
+            print(
+                f"{q:20} {statistics.median(old):11.1f} {_p95(old):9.1f}"
+                f" {statistics.median(new):12.1f} {_p95(new):9.1f} {found:8d}"
+            )
+            plan = _plan(db, new_stmt, args.limit)
+            if plan:
+                print(f"{'':20} plan : {plan}")
+
+
+if __name__ == "__main__":
+    main()
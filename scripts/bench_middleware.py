@@ -0,0 +1,172 @@
+"""Micro-benchmark du coût par requête des middlewares HTTP.
+
+Compare, en appelant l'application ASGI directement (sans réseau) :
+- une application nue ;
+- l'ancienne pile ``BaseHTTPMiddleware`` (observabilité + limitation, reproduite ici) ;
+- la pile ASGI brute de ``app.core.observability`` / ``app.core.rate_limit``.
+
+Mesure aussi le coût côté appelant d'un log d'accès : ``json.dumps`` + handler
+synchrone contre ``QueueHandler`` (sérialisation dans le thread d'écriture).
+
+    cd backend && PYTHONPATH=. python ../scripts/bench_middleware.py --requests 20000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import queue
+import time
+import uuid
+from logging.handlers import QueueListener
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.core.config import settings
+from app.core.logging import LOG_FORMAT, StructuredFormatter, _QueueHandler
+from app.core.observability import ObservabilityMiddleware
+from app.core.rate_limit import RateLimitMiddleware
+
+
+async def _ok(_request):
+    return PlainTextResponse("ok")
+
+
+class LegacyObservability(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        rid = request.headers.get("x-request-id") or str(uuid.uuid4())
+        start = time.perf_counter()
+        response = await call_next(request)
+        response.headers["X-Request-Id"] = rid
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        response.headers["traceparent"] = f"00-{rid.replace('-', '')}-{uuid.uuid4().hex[:16]}-01"
+        logging.getLogger("bench.legacy").info(
+            json.dumps(
+                {
+                    "event": "http.request",
+                    "path": request.url.path,
+                    "status": response.status_code,
+                    "duration_ms": round((time.perf_counter() - start) * 1000.0, 2),
+                }
+            )
+        )
+        return response
+
+
+class LegacyRateLimit(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+def _app(*middlewares) -> Starlette:
+    app = Starlette(routes=[Route("/api/ping", _ok)])
+    for middleware in middlewares:
+        app.add_middleware(middleware)
+    return app
+
+
+async def _drive(app, n: int) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/ping",
+        "raw_path": b"/api/ping",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 5000),
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(_message):
+        return None
+
+    for _ in range(200):  # échauffement
+        await app(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def _bench_logging(n: int) -> tuple[float, float, float]:
+    sink = open(os.devnull, "w")  # noqa: SIM115 - écriture réelle (appel système) par log
+    fields = {"method": "GET", "path": "/api/ping", "status": 200, "duration_ms": 1.23}
+
+    sync_logger = logging.getLogger("bench.sync")
+    sync_handler = logging.StreamHandler(sink)
+    sync_handler.setFormatter(logging.Formatter(LOG_FORMAT, defaults={"request_id": "-"}))
+    sync_logger.addHandler(sync_handler)
+    sync_logger.propagate = False
+    sync_logger.setLevel(logging.INFO)
+    start = time.perf_counter()
+    for _ in range(n):
+        sync_logger.info(json.dumps({"event": "http.request", **fields}))
+    sync_us = (time.perf_counter() - start) / n * 1e6
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream = logging.StreamHandler(sink)
+    stream.setFormatter(StructuredFormatter(LOG_FORMAT, defaults={"request_id": "-"}))
+    queued_logger = logging.getLogger("bench.queued")
+    queued_logger.addHandler(_QueueHandler(log_queue))
+    queued_logger.propagate = False
+    queued_logger.setLevel(logging.INFO)
+    # Coût côté requête seul : le thread d'écriture est démarré ensuite pour vider la file
+    start = time.perf_counter()
+    for _ in range(n):
+        queued_logger.info("http.request", extra={"fields": fields})
+    queued_us = (time.perf_counter() - start) / n * 1e6
+    listener = QueueListener(log_queue, stream)
+    start = time.perf_counter()
+    listener.start()
+    listener.stop()
+    drain_us = (time.perf_counter() - start) / n * 1e6
+    sink.close()
+    return sync_us, queued_us, drain_us
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    # On mesure la plomberie des middlewares, pas l'algorithme de limitation :
+    # la limitation reste désactivée (env dev) dans les deux piles.
+    settings.rate_limit_in_dev = False
+    logging.getLogger("app.http").disabled = True
+    logging.getLogger("bench.legacy").disabled = True
+
+    cases = [
+        ("sans middleware", _app()),
+        ("BaseHTTPMiddleware (ancienne pile)", _app(LegacyObservability, LegacyRateLimit)),
+        ("ASGI brut (pile actuelle)", _app(ObservabilityMiddleware, RateLimitMiddleware)),
+    ]
+    results = {name: asyncio.run(_drive(app, args.requests)) for name, app in cases}
+    base = results["sans middleware"]
+    print(f"{args.requests} requêtes par cas\n")
+    print(f"{'pile':40} {'µs/req':>9} {'surcoût µs':>11}")
+    for name, us in results.items():
+        print(f"{name:40} {us:9.1f} {us - base:11.1f}")
+
+    sync_us, queued_us, drain_us = _bench_logging(args.requests)
+    print("\nlog d'accès, coût par enregistrement :")
+    print(f"{'json.dumps + StreamHandler (requête)':40} {sync_us:9.2f} µs")
+    print(f"{'QueueHandler (requête)':40} {queued_us:9.2f} µs")
+    print(f"{'StructuredFormatter (thread écriture)':40} {drain_us:9.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Benchmark du ciblage des donneurs d'une campagne (``app.core.targeting``).
+
+Remplit un schéma dédié (``cnts_bench`` sur PostgreSQL, jamais les tables de
+production) avec N donneurs synthétiques répartis sur les régions, groupes
+sanguins et niveaux de fidélité, puis mesure pour une campagne à Dakar :
+le comptage des cibles, la première page classée et la diffusion
+(``INSERT ... SELECT`` des notifications, annulée ensuite).
+
+    cd backend && python ../scripts/bench_targeting.py --donors 1000000
+    cd backend && python ../scripts/bench_targeting.py --reuse --repeat 10
+
+Sur SQLite (``--database-url sqlite:///bench.db``) le script fonctionne aussi :
+utile pour vérifier les résultats, pas pour les temps.
+"""
+
+import argparse
+import datetime as dt
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.targeting import fan_out, targets
+from app.db.models import (
+    CampagneCollecte,
+    CarteDonneur,
+    Don,
+    Donneur,
+    Notification,
+    Poche,
+    SeuilAlerte,
+    Site,
+    UserAccount,
+)
+from app.schemas.collectes import CiblageCriteres
+
+REGIONS = ["Dakar", "Thiès", "Diourbel", "Saint-Louis", "Kaolack", "Ziguinchor", "Louga"]
+GROUPES = ["O+", "A+", "B+", "AB+", "O-", "A-", "B-", "AB-"]
+NIVEAUX = ["BRONZE", "ARGENT", "OR", "PLATINE"]
+BATCH = 20_000
+
+
+def _rows(n: int, seed: int):
+    rng = random.Random(seed)
+    today = dt.date.today()
+    for i in range(n):
+        donneur_id = uuid.uuid4()
+        eligible_le = today + dt.timedelta(days=rng.randrange(-365, 120)) if i % 3 else None
+        yield (
+            {
+                "id": donneur_id,
+                "cni_hash": uuid.uuid4().hex,
+                "nom": "Bench",
+                "prenom": f"Donneur {i}",
+                "sexe": rng.choice("HF"),
+                "groupe_sanguin": rng.choice(GROUPES),
+                "region": rng.choice(REGIONS),
+                "telephone": f"+221 77 {i:07d}",
+                "eligible_le": eligible_le,
+            },
+            {
+                "id": uuid.uuid4(),
+                "donneur_id": donneur_id,
+                "numero_carte": f"BENCH-{i:08d}",
+                "niveau": rng.choice(NIVEAUX),
+                "total_dons": rng.randrange(1, 30),
+            }
+            if i % 2 == 0
+            else None,
+        )
+
+
+def populate(engine, n: int) -> None:
+    tables = [
+        UserAccount.__table__,
+        Site.__table__,
+        Donneur.__table__,
+        CarteDonneur.__table__,
+        Notification.__table__,
+        SeuilAlerte.__table__,
+        Don.__table__,
+        Poche.__table__,
+        CampagneCollecte.__table__,
+    ]
+    Donneur.metadata.drop_all(engine, tables=tables[::-1])
+    Donneur.metadata.create_all(engine, tables=tables)
+    start = time.perf_counter()
+    donneurs, cartes = [], []
+    with engine.begin() as conn:
+        for donneur, carte in _rows(n, seed=42):
+            donneurs.append(donneur)
+            if carte is not None:
+                cartes.append(carte)
+            if len(donneurs) >= BATCH:
+                conn.execute(Donneur.__table__.insert(), donneurs)
+                conn.execute(CarteDonneur.__table__.insert(), cartes)
+                donneurs, cartes = [], []
+        if donneurs:
+            conn.execute(Donneur.__table__.insert(), donneurs)
+        if cartes:
+            conn.execute(CarteDonneur.__table__.insert(), cartes)
+        conn.execute(
+            SeuilAlerte.__table__.insert(),
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "type_produit": "CGR",
+                    "groupe_sanguin": g,
+                    "seuil_critique": 10,
+                    "seuil_alerte": 20,
+                    "seuil_confort": 40,
+                    "is_active": True,
+                }
+                for g in GROUPES
+            ],
+        )
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE donneurs"))
+            conn.execute(text("ANALYZE cartes_donneur"))
+    print(f"{n} donneurs insérés en {time.perf_counter() - start:.1f} s")
+
+
+def _ms(fn, repeat: int) -> tuple[float, object]:
+    durations, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        durations.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(durations), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--schema", default="cnts_bench", help="schéma dédié (PostgreSQL)")
+    parser.add_argument("--donors", type=int, default=1_000_000)
+    parser.add_argument("--reuse", action="store_true", help="garde les données existantes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{args.schema}"'))
+        engine = engine.execution_options(schema_translate_map={None: args.schema})
+    if not args.reuse:
+        populate(engine, args.donors)
+
+    campagne = CampagneCollecte(
+        id=uuid.uuid4(),
+        code="BENCH",
+        nom="Collecte de test",
+        type_campagne="MOBILE",
+        date_debut=dt.datetime.combine(dt.date.today(), dt.time(8)),
+        date_fin=dt.datetime.combine(dt.date.today(), dt.time(17)),
+    )
+    criteres = CiblageCriteres(regions=["Dakar", "Thiès"], canal="SMS")
+    with Session(engine) as db:
+        total = db.execute(select(func.count()).select_from(Donneur)).scalar_one()
+        stmt, deficits = targets(db, campagne, criteres)
+        print(f"\n{total} donneurs, déficits {deficits}\n")
+
+        count_ms, found = _ms(
+            lambda: db.execute(
+                select(func.count()).select_from(stmt.order_by(None).subquery())
+            ).scalar_one(),
+            args.repeat,
+        )
+        print(f"comptage des cibles     {count_ms:9.1f} ms  ({found} donneurs)")
+        page_ms, _ = _ms(lambda: db.execute(stmt.limit(args.limit)).all(), args.repeat)
+        print(f"première page ({args.limit:4d})    {page_ms:9.1f} ms")
+
+        start = time.perf_counter()
+        inserted = fan_out(db, campagne, criteres, canal="SMS", template="rappel_collecte")
+        print(
+            f"diffusion               {(time.perf_counter() - start) * 1000:9.1f} ms"
+            f"  ({inserted} notifications, annulée)"
+        )
+        db.rollback()
+
+
+if __name__ == "__main__":
+    main()
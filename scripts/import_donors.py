@@ -1,69 +1,115 @@
+"""Import d'un registre de donneurs via ``POST /api/donneurs/import``.
+
+Lit le registre (CSV ou JSON, format de ``generate_senegal_donors.py``) au fil
+de l'eau, le convertit en NDJSON au format ``DonneurCreate`` et l'envoie par
+lots de ``--batch`` lignes, chaque lot dans une requête en streaming. Le
+serveur valide, déduplique par CNI et insère ; ce script affiche le bilan.
+
+Reprise : après chaque lot, la ligne atteinte est écrite dans le fichier
+``<registre>.checkpoint``. Relancé, le script repart de là (``--restart`` pour
+tout renvoyer ; les donneurs déjà importés sont de toute façon ignorés).
+
+    python scripts/import_donors.py donneurs_senegal_2000.csv
+    python scripts/import_donors.py registre.csv --batch 50000 --token $TOKEN
+"""
+
+import argparse
+import csv
+import itertools
 import json
+import sys
 import time
+from collections.abc import Iterator
+from pathlib import Path
+
 import requests
-import sys
-import os
-
-# Configuration
-API_URL = "http://localhost:8000"
-JSON_FILE = "donneurs_senegal_2000.json"
-
-def import_donors():
-    print(f"Lecture du fichier {JSON_FILE}...")
-    try:
-        with open(JSON_FILE, "r", encoding="utf-8") as f:
-            donors = json.load(f)
-    except FileNotFoundError:
-        print(f"Erreur: Le fichier {JSON_FILE} est introuvable.")
-        sys.exit(1)
-
-    print(f"{len(donors)} donneurs trouvés. Début de l'importation...")
-    
-    success_count = 0
-    error_count = 0
-    
-    for i, d in enumerate(donors):
-        # Mapping JSON keys to API schema
-        payload = {
-            "cni": f"CNI-{d['id']}", # Génération d'une CNI fictive basée sur l'ID
-            "nom": d["nom"],
-            "prenom": d["prenom"],
-            "sexe": "H" if d["sexe"] == "M" else d["sexe"],
-            "date_naissance": (
-                # Estimation date naissance basée sur l'âge
-                f"{2024 - d['age']}-01-01" 
-            ),
-            "groupe_sanguin": d["groupe_sanguin"],
-            "adresse": d["adresse"],
-            "region": d["region"],
-            "departement": d["departement"],
-            "telephone": d["telephone"],
-            "email": d["email"],
-            "profession": d["profession"]
-        }
-        
-        try:
-            # Check if donor exists (optional, skipping for speed in demo)
-            # Create donor
-            response = requests.post(f"{API_URL}/donneurs", json=payload)
-            
-            if response.status_code in (200, 201):
-                success_count += 1
-                print(f"[{i+1}/{len(donors)}] Importé: {d['prenom']} {d['nom']}", end="\r")
-            elif response.status_code == 409:
-                print(f"[{i+1}/{len(donors)}] Doublon ignoré: {d['prenom']} {d['nom']} (CNI déjà existante)", end="\r")
-                error_count += 1
-            else:
-                print(f"\nErreur pour {d['prenom']} {d['nom']}: {response.status_code} - {response.text}")
-                error_count += 1
-                
-        except Exception as e:
-            print(f"\nException: {e}")
-            error_count += 1
-
-    print(f"\n\nImportation terminée.")
-    print(f"Succès: {success_count}")
-    print(f"Erreurs/Doublons: {error_count}")
+
+
+def read_registry(path: Path) -> Iterator[dict]:
+    if path.suffix == ".json":
+        with path.open(encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+    with path.open(encoding="utf-8-sig", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def to_payload(d: dict) -> dict:
+    """Registre -> champs de DonneurCreate."""
+    age = d.get("age")
+    return {
+        "cni": f"CNI-{d['id']}",  # CNI fictive dérivée de l'identifiant du registre
+        "nom": d["nom"],
+        "prenom": d["prenom"],
+        "sexe": "H" if d["sexe"] == "M" else d["sexe"],
+        # Date de naissance estimée depuis l'âge
+        "date_naissance": f"{2024 - int(age)}-01-01" if age not in (None, "") else None,
+        "groupe_sanguin": d.get("groupe_sanguin") or None,
+        "adresse": d.get("adresse") or None,
+        "region": d.get("region") or None,
+        "departement": d.get("departement") or None,
+        "telephone": d.get("telephone") or None,
+        "email": d.get("email") or None,
+        "profession": d.get("profession") or None,
+    }
+
+
+def _ndjson(rows: list[dict]) -> Iterator[bytes]:
+    for row in rows:
+        yield (json.dumps(to_payload(row), ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("registry", nargs="?", default="donneurs_senegal_2000.csv")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--batch", type=int, default=20_000, help="lignes par requête")
+    parser.add_argument("--token", default=None, help="jeton Bearer si l'API l'exige")
+    parser.add_argument("--restart", action="store_true", help="ignore le point de reprise")
+    args = parser.parse_args()
+
+    path = Path(args.registry)
+    if not path.exists():
+        sys.exit(f"Erreur : le fichier {path} est introuvable.")
+    checkpoint = path.with_name(path.name + ".checkpoint")
+    done = 0 if args.restart or not checkpoint.exists() else int(checkpoint.read_text())
+    if done:
+        print(f"Reprise après la ligne {done} ({checkpoint})")
+
+    headers = {"Content-Type": "application/x-ndjson"}
+    if args.token:
+        headers["Authorization"] = f"Bearer {args.token}"
+
+    totals = {"importes": 0, "doublons": 0, "erreurs": 0}
+    rows = itertools.islice(read_registry(path), done, None)
+    sent, start = 0, time.perf_counter()
+    while batch := list(itertools.islice(rows, args.batch)):
+        response = requests.post(
+            f"{args.url}/api/donneurs/import",
+            data=_ndjson(batch),
+            headers=headers,
+            timeout=600,
+        )
+        response.raise_for_status()
+        report = response.json()
+        for erreur in report["details_erreurs"]:
+            print(f"  ligne {done + erreur['ligne']} : {erreur['message']}")
+        for key in totals:
+            totals[key] += report[key]
+        done += report["derniere_ligne"]
+        sent += report["derniere_ligne"]
+        checkpoint.write_text(str(done))
+        rate = sent / (time.perf_counter() - start)
+        print(
+            f"{done} lignes ({report['importes']} importés, {report['doublons']} doublons,"
+            f" {report['erreurs']} erreurs) — {rate:.0f} lignes/s"
+        )
+
+    print(f"\nImportation terminée : {done} lignes traitées.")
+    print(f"Importés : {totals['importes']}")
+    print(f"Doublons ignorés : {totals['doublons']}")
+    print(f"Erreurs : {totals['erreurs']}")
+
 
 if __name__ == "__main__":
-    import_donors()
+    main()
@@ -0,0 +1,80 @@
+"""Profil du temps de démarrage de l'API (``python -X importtime``).
+
+Lance un interpréteur neuf qui importe ``app.main`` et assemble l'application
+(optionnellement limitée à quelques domaines), puis résume la trace
+``-X importtime`` : modules les plus coûteux (cumulé et propre) et coût
+cumulé par paquet de premier niveau.
+
+    cd backend && python ../scripts/profile_imports.py --top 25
+    cd backend && python ../scripts/profile_imports.py --domains sync fhir
+    cd backend && python ../scripts/profile_imports.py --target app.core.celery_app
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run(target: str, domains: list[str] | None) -> tuple[list[tuple[str, int, int, int]], float]:
+    code = f"import {target}"
+    if target == "app.main":
+        code += "; app.main.app"
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    if domains:
+        env["CNTS_API_DOMAINS"] = "[" + ",".join(f'"{d}"' for d in domains) + "]"
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = time.perf_counter() - start
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            rows.append((m[4], int(m[1]), int(m[2]), len(m[3])))
+    return rows, wall
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="app.main", help="module à importer")
+    parser.add_argument("--domains", nargs="*", help="api_domains (défaut : toutes les routes)")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    rows, wall = run(args.target, args.domains)
+    total_us = sum(self_us for _, self_us, _, _ in rows)
+    print(f"{args.target} : {wall:.2f} s (processus), {total_us / 1e6:.2f} s d'imports, "
+          f"{len(rows)} modules")  # fmt: skip
+
+    print(f"\n── {args.top} modules les plus coûteux (cumulé) ──")
+    for name, _, cum, _ in sorted(rows, key=lambda r: r[2], reverse=True)[: args.top]:
+        print(f"{cum / 1000:9.1f} ms  {name}")
+
+    print(f"\n── {args.top} modules les plus coûteux (propre) ──")
+    for name, self_us, _, _ in sorted(rows, key=lambda r: r[1], reverse=True)[: args.top]:
+        print(f"{self_us / 1000:9.1f} ms  {name}")
+
+    packages: dict[str, int] = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        top = name.split(".")[0]
+        # Les modules de l'application sont détaillés par sous-paquet
+        key = ".".join(name.split(".")[:4]) if top == "app" else top
+        packages[key] += self_us
+    print(f"\n── {args.top} paquets les plus coûteux (temps propre cumulé) ──")
+    for key, self_us in sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[: args.top]:
+        print(f"{self_us / 1000:9.1f} ms  {key}")
+
+
+if __name__ == "__main__":
+    main()